@@ -0,0 +1,288 @@
+"""
+Async, read-only database access for the streaming service.
+
+The streaming service reads organization context straight from the Django
+database through a shared asyncpg pool instead of calling back into Django:
+
+- Pool: opened at startup and closed at shutdown (see the app lifespan);
+  connections are reused across requests
+- Read-only: every session runs with default_transaction_read_only and a
+  statement timeout, so a slow context query cannot stall a stream
+- Queries: independent aggregates run concurrently on separate pooled
+  connections
+- Context cache: per organization, keyed by a data generation (latest
+  upload and supplier/category change) and bounded by
+  STREAMING_CONTEXT_TTL for edits the generation does not see
+- Request logs: LLMRequestLog rows are buffered in memory and inserted in
+  batches; only these inserts run in read-write transactions
+
+Connection settings use the same DB_* environment variables as Django.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = os.getenv("DB_NAME", "analytics_db")
+DB_USER = os.getenv("DB_USER", "analytics_user")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "analytics_pass")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
+
+POOL_MIN_SIZE = int(os.getenv("STREAMING_DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("STREAMING_DB_POOL_MAX", "10"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("STREAMING_DB_STATEMENT_TIMEOUT_MS", "2000"))
+
+CONTEXT_TTL = float(os.getenv("STREAMING_CONTEXT_TTL", "300"))
+LOG_BATCH_SIZE = int(os.getenv("STREAMING_LOG_BATCH_SIZE", "50"))
+LOG_FLUSH_INTERVAL = float(os.getenv("STREAMING_LOG_FLUSH_INTERVAL", "5"))
+LOG_MAX_PENDING = int(os.getenv("STREAMING_LOG_MAX_PENDING", "5000"))
+
+TOP_N = 5
+
+LOG_COLUMNS = (
+    "id", "organization_id", "request_type", "model_used", "model_tier", "provider",
+    "tokens_input", "tokens_output", "latency_ms", "ttft_ms", "tokens_per_second",
+    "cost_usd", "cache_hit", "prompt_cache_read_tokens", "prompt_cache_write_tokens",
+    "validation_passed", "validation_errors", "error_occurred", "error_message", "created_at",
+)
+
+_pool = None
+_context_cache: Dict[int, Tuple[object, float, dict]] = {}  # org -> (generation, expires_at, context)
+_pending_logs: List[tuple] = []
+
+
+async def init_pool():
+    """Open the shared connection pool; the service runs without context if this fails."""
+    global _pool
+    if _pool is not None:
+        return _pool
+    try:
+        import asyncpg
+    except ImportError:
+        logger.warning("asyncpg package not installed; organization context disabled")
+        return None
+
+    try:
+        _pool = await asyncpg.create_pool(
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST,
+            port=DB_PORT,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            server_settings={
+                "application_name": "ai_streaming",
+                "default_transaction_read_only": "on",
+                "statement_timeout": str(STATEMENT_TIMEOUT_MS),
+            },
+        )
+        logger.info(f"Database pool ready ({POOL_MIN_SIZE}-{POOL_MAX_SIZE} connections)")
+    except Exception as e:
+        logger.error(f"Database pool unavailable: {e}")
+        _pool = None
+    return _pool
+
+
+async def close_pool() -> None:
+    """Close the shared connection pool."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool():
+    """The shared pool, or None when the database is not configured."""
+    return _pool
+
+
+async def user_has_org_access(user_id: int, organization_id: int) -> bool:
+    """Whether the user is a superuser or an active member of the organization."""
+    if _pool is None or user_id is None:
+        return False
+    return bool(await _pool.fetchval(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM auth_user WHERE id = $1 AND is_active AND is_superuser
+        ) OR EXISTS (
+            SELECT 1 FROM authentication_userorganizationmembership
+            WHERE user_id = $1 AND organization_id = $2 AND is_active
+        )
+        """,
+        user_id,
+        organization_id,
+    ))
+
+
+async def get_organization_context(organization_id: int) -> Optional[dict]:
+    """
+    Spend summary, top suppliers and top categories for an organization.
+
+    Returns:
+        Context dict, or None when the pool is unavailable or a query fails
+    """
+    if _pool is None:
+        return None
+
+    try:
+        summary, suppliers, categories = await asyncio.gather(
+            _pool.fetchrow(
+                """
+                SELECT COALESCE(SUM(amount), 0) AS total_spend,
+                       COUNT(*) AS transaction_count,
+                       COUNT(DISTINCT supplier_id) AS supplier_count,
+                       COUNT(DISTINCT category_id) AS category_count,
+                       MIN(date) AS first_date,
+                       MAX(date) AS last_date
+                FROM procurement_transaction
+                WHERE organization_id = $1
+                """,
+                organization_id,
+            ),
+            _pool.fetch(
+                """
+                SELECT s.name, SUM(t.amount) AS spend, COUNT(*) AS transactions
+                FROM procurement_transaction t
+                JOIN procurement_supplier s ON s.id = t.supplier_id
+                WHERE t.organization_id = $1
+                GROUP BY s.name
+                ORDER BY spend DESC
+                LIMIT $2
+                """,
+                organization_id,
+                TOP_N,
+            ),
+            _pool.fetch(
+                """
+                SELECT c.name, SUM(t.amount) AS spend, COUNT(*) AS transactions
+                FROM procurement_transaction t
+                JOIN procurement_category c ON c.id = t.category_id
+                WHERE t.organization_id = $1
+                GROUP BY c.name
+                ORDER BY spend DESC
+                LIMIT $2
+                """,
+                organization_id,
+                TOP_N,
+            ),
+        )
+    except Exception as e:
+        logger.warning(f"Organization context query failed: {e}")
+        return None
+
+    return {
+        "total_spend": float(summary["total_spend"]),
+        "transaction_count": summary["transaction_count"],
+        "supplier_count": summary["supplier_count"],
+        "category_count": summary["category_count"],
+        "date_range": {
+            "start": summary["first_date"].isoformat() if summary["first_date"] else None,
+            "end": summary["last_date"].isoformat() if summary["last_date"] else None,
+        },
+        "top_suppliers": [
+            {"name": row["name"], "spend": float(row["spend"]), "transactions": row["transactions"]}
+            for row in suppliers
+        ],
+        "top_categories": [
+            {"name": row["name"], "spend": float(row["spend"]), "transactions": row["transactions"]}
+            for row in categories
+        ],
+    }
+
+
+async def get_data_generation(organization_id: int):
+    """Latest upload or supplier/category change for an organization."""
+    return await _pool.fetchval(
+        """
+        SELECT GREATEST(
+            (SELECT MAX(COALESCE(completed_at, created_at))
+             FROM procurement_dataupload WHERE organization_id = $1),
+            (SELECT MAX(updated_at) FROM procurement_supplier WHERE organization_id = $1),
+            (SELECT MAX(updated_at) FROM procurement_category WHERE organization_id = $1)
+        )
+        """,
+        organization_id,
+    )
+
+
+async def get_cached_organization_context(organization_id: int) -> Optional[dict]:
+    """Organization context, recomputed only when its data generation changes or the TTL lapses."""
+    if _pool is None:
+        return None
+    try:
+        generation = await get_data_generation(organization_id)
+    except Exception as e:
+        logger.warning(f"Data generation query failed: {e}")
+        return await get_organization_context(organization_id)
+
+    cached = _context_cache.get(organization_id)
+    if cached and cached[0] == generation and cached[1] > time.monotonic():
+        return cached[2]
+
+    context = await get_organization_context(organization_id)
+    if context is not None:
+        _context_cache[organization_id] = (generation, time.monotonic() + CONTEXT_TTL, context)
+    return context
+
+
+def record_request(
+    organization_id: Optional[int],
+    model: str,
+    model_tier: Optional[str],
+    provider: str,
+    tokens_input: int = 0,
+    tokens_output: int = 0,
+    latency_ms: int = 0,
+    ttft_ms: Optional[int] = None,
+    tokens_per_second: Optional[float] = None,
+    cost_usd: float = 0.0,
+    error: Optional[str] = None,
+) -> None:
+    """Queue an LLMRequestLog row for a streamed chat request; oldest rows drop when full."""
+    if len(_pending_logs) >= LOG_MAX_PENDING:
+        _pending_logs.pop(0)
+    _pending_logs.append((
+        uuid.uuid4(), organization_id, "chat", model, model_tier, provider,
+        tokens_input, tokens_output, latency_ms, ttft_ms, tokens_per_second,
+        Decimal(str(round(cost_usd, 6))), False, 0, 0, True, json.dumps([]), bool(error), error or "",
+    ))
+
+
+async def flush_request_logs() -> int:
+    """Insert queued request logs in one batch; returns rows written."""
+    if _pool is None or not _pending_logs:
+        return 0
+
+    batch = _pending_logs[:LOG_BATCH_SIZE * 10]
+    del _pending_logs[:len(batch)]
+    placeholders = ", ".join(f"${i}" for i in range(1, len(LOG_COLUMNS)))
+    try:
+        async with _pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("SET TRANSACTION READ WRITE")
+                await connection.executemany(
+                    f"INSERT INTO analytics_llmrequestlog ({', '.join(LOG_COLUMNS)}) "
+                    f"VALUES ({placeholders}, now())",
+                    batch,
+                )
+    except Exception as e:
+        logger.error(f"Request log flush failed ({len(batch)} rows dropped): {e}")
+        return 0
+    return len(batch)
+
+
+async def run_log_flusher() -> None:
+    """Flush request logs every LOG_FLUSH_INTERVAL seconds, or sooner once a batch fills."""
+    while True:
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        while time.monotonic() < deadline and len(_pending_logs) < LOG_BATCH_SIZE:
+            await asyncio.sleep(0.1)
+        await flush_request_logs()
@@ -4,12 +4,23 @@ FastAPI Streaming Service for AI Insights.
 Provides Server-Sent Events (SSE) streaming for real-time LLM responses.
 Runs as a separate microservice alongside Django backend.
 
+Provider clients share one keep-alive HTTP connection pool and are created
+once per process; organization context is read through the async database
+pool in ai_streaming.db.
+
+Streams open with a 'started' event while the organization context is
+assembled concurrently, and end with time-to-first-token, tokens/sec and
+total latency, which are also written to LLMRequestLog in batches.
+
 Usage:
     uvicorn ai_streaming.main:app --host 0.0.0.0 --port 8002
 """
+import asyncio
 import json
 import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Depends, Request
@@ -18,19 +29,50 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import jwt
 
+from ai_streaming import db
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title="AI Insights Streaming Service",
-    description="Real-time streaming for AI-powered procurement insights",
-    version="1.0.0"
-)
-
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",")
 SECRET_KEY = os.getenv("SECRET_KEY", "django-insecure-default-key")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+HTTP_MAX_CONNECTIONS = int(os.getenv("STREAMING_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("STREAMING_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("STREAMING_HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# USD per million tokens (input, output), for request log cost estimates
+MODEL_PRICING = {
+    "claude-sonnet-4-20250514": (3.0, 15.0),
+    "claude-3-5-haiku-20241022": (0.25, 1.25),
+    "claude-opus-4-20250514": (15.0, 75.0),
+    "gpt-4o": (2.5, 10.0),
+}
+
+_http_client = None
+_anthropic_client = None
+_openai_client = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the database pool and log flusher at startup; drain and close them at shutdown."""
+    await db.init_pool()
+    flusher = asyncio.create_task(db.run_log_flusher())
+    yield
+    flusher.cancel()
+    await db.flush_request_logs()
+    await db.close_pool()
+    await close_clients()
+
+
+app = FastAPI(
+    title="AI Insights Streaming Service",
+    description="Real-time streaming for AI-powered procurement insights",
+    version="1.0.0",
+    lifespan=lifespan,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -119,28 +161,139 @@ Guidelines:
 When uncertain, ask clarifying questions rather than guessing."""
 
 
+def get_http_client():
+    """Shared keep-alive HTTP client used by every provider client."""
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+    return _http_client
+
+
 def get_anthropic_client():
-    """Get Anthropic client if available."""
+    """Get the process-wide Anthropic client if available."""
+    global _anthropic_client
     if not ANTHROPIC_API_KEY:
         return None
-    try:
-        from anthropic import AsyncAnthropic
-        return AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
-    except ImportError:
-        logger.warning("anthropic package not installed")
-        return None
+    if _anthropic_client is None:
+        try:
+            from anthropic import AsyncAnthropic
+            _anthropic_client = AsyncAnthropic(api_key=ANTHROPIC_API_KEY, http_client=get_http_client())
+        except ImportError:
+            logger.warning("anthropic package not installed")
+            return None
+    return _anthropic_client
 
 
 def get_openai_client():
-    """Get OpenAI client if available."""
+    """Get the process-wide OpenAI client if available."""
+    global _openai_client
     if not OPENAI_API_KEY:
         return None
-    try:
-        from openai import AsyncOpenAI
-        return AsyncOpenAI(api_key=OPENAI_API_KEY)
-    except ImportError:
-        logger.warning("openai package not installed")
-        return None
+    if _openai_client is None:
+        try:
+            from openai import AsyncOpenAI
+            _openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=get_http_client())
+        except ImportError:
+            logger.warning("openai package not installed")
+            return None
+    return _openai_client
+
+
+async def close_clients() -> None:
+    """Close the shared HTTP client and drop the provider clients."""
+    global _http_client, _anthropic_client, _openai_client
+    _anthropic_client = None
+    _openai_client = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def authorize_organization(organization_id: Optional[int], user: dict) -> None:
+    """Raise 403 when the user cannot access the organization."""
+    if organization_id is None or db.get_pool() is None:
+        return
+    if not await db.user_has_org_access(user.get("user_id"), organization_id):
+        raise HTTPException(status_code=403, detail="No access to this organization")
+
+
+async def build_organization_context(organization_id: Optional[int]) -> str:
+    """
+    Procurement context block for the system prompt.
+
+    Returns an empty string when no organization is given or the database
+    is unavailable.
+    """
+    if organization_id is None or db.get_pool() is None:
+        return ""
+    context = await db.get_cached_organization_context(organization_id)
+    if not context:
+        return ""
+    return f"\n\nOrganization procurement data:\n{json.dumps(context, indent=2)}"
+
+
+def sse_event(payload: dict) -> str:
+    """Format a payload as a Server-Sent Events data frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class StreamTimer:
+    """Latency metrics for one streamed response."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+
+    def token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def metrics(self, output_tokens: int) -> dict:
+        now = time.perf_counter()
+        ttft_ms = None
+        tokens_per_second = None
+        if self.first_token_at is not None:
+            ttft_ms = int((self.first_token_at - self.started) * 1000)
+            if now > self.first_token_at:
+                tokens_per_second = round(output_tokens / (now - self.first_token_at), 1)
+        return {
+            "ttft_ms": ttft_ms,
+            "tokens_per_second": tokens_per_second,
+            "latency_ms": int((now - self.started) * 1000),
+        }
+
+
+def record_stream(
+    organization_id: Optional[int],
+    model: str,
+    provider: str,
+    timing: dict,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    error: Optional[str] = None,
+) -> None:
+    """Queue the request log for a finished stream."""
+    input_price, output_price = MODEL_PRICING.get(model, MODEL_PRICING["claude-sonnet-4-20250514"])
+    tier = next((name for name in ("haiku", "opus", "sonnet") if name in model), None)
+    db.record_request(
+        organization_id=organization_id,
+        model=model,
+        model_tier=tier,
+        provider=provider,
+        tokens_input=input_tokens,
+        tokens_output=output_tokens,
+        cost_usd=(input_tokens * input_price + output_tokens * output_price) / 1_000_000,
+        error=error,
+        **timing,
+    )
 
 
 @app.get("/health")
@@ -150,6 +303,7 @@ async def health_check():
         "status": "healthy",
         "anthropic_configured": bool(ANTHROPIC_API_KEY),
         "openai_configured": bool(OPENAI_API_KEY),
+        "database_configured": db.get_pool() is not None,
     }
 
 
@@ -161,7 +315,10 @@ async def stream_chat(
     """
     Stream chat responses using Server-Sent Events.
 
-    Attempts Anthropic first, falls back to OpenAI if unavailable.
+    Attempts Anthropic first, falls back to OpenAI if unavailable. When an
+    organization is given, its procurement summary (cached per data
+    generation) is appended to the system prompt; it is assembled while the
+    'started' preamble is already on the wire.
     """
     anthropic_client = get_anthropic_client()
     openai_client = get_openai_client()
@@ -172,31 +329,60 @@ async def stream_chat(
             detail="No AI provider configured"
         )
 
-    system_prompt = request.system_prompt or PROCUREMENT_CHAT_PROMPT
+    await authorize_organization(request.organization_id, user)
+
+    timer = StreamTimer()
+    context_task = asyncio.create_task(build_organization_context(request.organization_id))
+    base_prompt = request.system_prompt or PROCUREMENT_CHAT_PROMPT
     messages = [{"role": m.role, "content": m.content} for m in request.messages]
 
+    async def system_prompt() -> str:
+        try:
+            return base_prompt + await context_task
+        except Exception as e:
+            logger.warning(f"Organization context unavailable: {e}")
+            return base_prompt
+
     async def anthropic_stream():
         """Stream from Anthropic Claude."""
+        yield sse_event({"status": "started", "model": request.model})
+        usage = {"input_tokens": 0, "output_tokens": 0}
+        error = None
         try:
             async with anthropic_client.messages.stream(
                 model=request.model,
                 max_tokens=request.max_tokens,
-                system=system_prompt,
+                system=await system_prompt(),
                 messages=messages,
             ) as stream:
                 async for text in stream.text_stream:
-                    yield f"data: {json.dumps({'token': text})}\n\n"
+                    timer.token()
+                    yield sse_event({"token": text})
 
                 final_message = await stream.get_final_message()
-                yield f"data: {json.dumps({'done': True, 'usage': {'input_tokens': final_message.usage.input_tokens, 'output_tokens': final_message.usage.output_tokens}})}\n\n"
+                usage = {
+                    "input_tokens": final_message.usage.input_tokens,
+                    "output_tokens": final_message.usage.output_tokens,
+                }
+                timing = timer.metrics(usage["output_tokens"])
+                yield sse_event({"done": True, "usage": usage, "metrics": timing})
         except Exception as e:
+            error = str(e)
             logger.error(f"Anthropic streaming error: {e}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_event({"error": error})
+        finally:
+            record_stream(
+                request.organization_id, request.model, "anthropic",
+                timer.metrics(usage["output_tokens"]), error=error, **usage
+            )
 
     async def openai_stream():
         """Stream from OpenAI."""
+        yield sse_event({"status": "started", "model": "gpt-4o"})
+        usage = {"input_tokens": 0, "output_tokens": 0}
+        error = None
         try:
-            openai_messages = [{"role": "system", "content": system_prompt}]
+            openai_messages = [{"role": "system", "content": await system_prompt()}]
             openai_messages.extend(messages)
 
             stream = await openai_client.chat.completions.create(
@@ -205,16 +391,30 @@ async def stream_chat(
                 max_tokens=request.max_tokens,
                 temperature=request.temperature,
                 stream=True,
+                stream_options={"include_usage": True},
             )
 
             async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield f"data: {json.dumps({'token': chunk.choices[0].delta.content})}\n\n"
-
-            yield f"data: {json.dumps({'done': True})}\n\n"
+                if chunk.usage:
+                    usage = {
+                        "input_tokens": chunk.usage.prompt_tokens,
+                        "output_tokens": chunk.usage.completion_tokens,
+                    }
+                if chunk.choices and chunk.choices[0].delta.content:
+                    timer.token()
+                    yield sse_event({"token": chunk.choices[0].delta.content})
+
+            timing = timer.metrics(usage["output_tokens"])
+            yield sse_event({"done": True, "usage": usage, "metrics": timing})
         except Exception as e:
+            error = str(e)
             logger.error(f"OpenAI streaming error: {e}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_event({"error": error})
+        finally:
+            record_stream(
+                request.organization_id, "gpt-4o", "openai",
+                timer.metrics(usage["output_tokens"]), error=error, **usage
+            )
 
     if anthropic_client and request.model.startswith("claude"):
         stream_generator = anthropic_stream()
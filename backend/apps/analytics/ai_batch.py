@@ -0,0 +1,394 @@
+"""
+Batch pipeline for nightly AI insight enhancement.
+
+Instead of one synchronous provider call per organization, the nightly job
+assembles every organization's enhancement prompt into a provider batch
+submission (Anthropic Message Batches are billed at 50% and processed
+asynchronously). A separate polling task collects the results and fans them
+out per organization:
+
+- AIInsightsCache: stored under the organization's insights key, so the next
+  get_all_insights() call is a cache hit
+- SemanticCache: stored under the key AIProviderManager.enhance_insights
+  looks up
+- LLMRequestLog: one row per organization with its share of the batch usage
+
+Organizations are grouped by API key, since a batch is billed to the key that
+submits it; organizations sharing a key share one submission. Each
+submission's manifest is an AIBatchJob row, so collection survives cache
+eviction and restarts during the provider's processing window.
+
+Backends are pluggable via AI_BATCH_BACKEND. 'local' answers requests
+in-process and is for tests and development only.
+"""
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .ai_cache import AIInsightsCache
+from .ai_providers import AIProviderManager, AnthropicProvider, LLMRequestMetrics
+
+logger = logging.getLogger(__name__)
+
+LOCAL_BATCH_PREFIX = "ai_batch:local"
+LOCAL_BATCH_TTL = 172800  # 48 hours
+
+
+@dataclass
+class BatchRequest:
+    """One organization's enhancement prompt within a batch."""
+
+    custom_id: str
+    organization_id: int
+    params: dict  # Messages API parameters
+    insights: list
+    context: dict
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one request in a completed batch."""
+
+    custom_id: str
+    output: Optional[dict] = None
+    model: str = ''
+    tokens_input: int = 0
+    tokens_output: int = 0
+    prompt_cache_read_tokens: int = 0
+    error: Optional[str] = None
+
+
+class BatchBackend(ABC):
+    """Submits requests to a provider batch API and retrieves their results."""
+
+    name: str = "base"
+
+    @abstractmethod
+    def submit(self, requests: List[BatchRequest]) -> str:
+        """Submit requests and return the provider's batch ID."""
+
+    @abstractmethod
+    def is_complete(self, batch_id: str) -> bool:
+        """Whether the provider has finished processing the batch."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> List[BatchResult]:
+        """Results of a completed batch, one per request."""
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """Anthropic Message Batches API."""
+
+    name = "anthropic"
+
+    def __init__(self, api_key: str):
+        import anthropic
+        self.client = anthropic.Anthropic(api_key=api_key)
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        batch = self.client.messages.batches.create(requests=[
+            {'custom_id': request.custom_id, 'params': request.params}
+            for request in requests
+        ])
+        return batch.id
+
+    def is_complete(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == 'ended'
+
+    def results(self, batch_id: str) -> List[BatchResult]:
+        results = []
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type != 'succeeded':
+                error = getattr(entry.result, 'error', None)
+                results.append(BatchResult(
+                    custom_id=entry.custom_id,
+                    error=str(error) if error else entry.result.type
+                ))
+                continue
+
+            message = entry.result.message
+            output = next(
+                (dict(block.input) for block in message.content if block.type == 'tool_use'),
+                None
+            )
+            results.append(BatchResult(
+                custom_id=entry.custom_id,
+                output=output,
+                model=message.model,
+                tokens_input=message.usage.input_tokens,
+                tokens_output=message.usage.output_tokens,
+                prompt_cache_read_tokens=getattr(message.usage, 'cache_read_input_tokens', 0) or 0,
+                error=None if output else 'No tool_use block in response',
+            ))
+        return results
+
+
+def _stub_response(request: dict) -> dict:
+    """Deterministic tool output for the local backend."""
+    return {
+        'priority_actions': [],
+        'quick_wins': [],
+        'strategic_summary': f"Local batch analysis for {request['custom_id']}",
+    }
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    In-process batch backend, for tests and development only.
+
+    Requests are kept in the Django cache so polling can happen in a
+    different task invocation; batches complete immediately and each request
+    is answered by `responder`. A batch whose cache entry is evicted is
+    never reported complete.
+    """
+
+    name = "local"
+
+    responder: Callable[[dict], dict] = staticmethod(_stub_response)
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        batch_id = f"local_{uuid.uuid4().hex}"
+        cache.set(
+            f"{LOCAL_BATCH_PREFIX}:{batch_id}",
+            [{'custom_id': request.custom_id, 'params': request.params} for request in requests],
+            LOCAL_BATCH_TTL
+        )
+        return batch_id
+
+    def is_complete(self, batch_id: str) -> bool:
+        return cache.get(f"{LOCAL_BATCH_PREFIX}:{batch_id}") is not None
+
+    def results(self, batch_id: str) -> List[BatchResult]:
+        results = []
+        for request in cache.get(f"{LOCAL_BATCH_PREFIX}:{batch_id}") or []:
+            try:
+                output = self.responder(request)
+            except Exception as e:
+                results.append(BatchResult(custom_id=request['custom_id'], error=str(e)))
+                continue
+            results.append(BatchResult(
+                custom_id=request['custom_id'],
+                output=output,
+                model=request['params'].get('model', ''),
+                tokens_input=len(json.dumps(request['params'], default=str)) // 4,
+                tokens_output=len(json.dumps(output, default=str)) // 4,
+            ))
+        return results
+
+
+BATCH_BACKENDS: Dict[str, type] = {
+    'anthropic': AnthropicBatchBackend,
+    'local': LocalBatchBackend,
+}
+
+
+def get_batch_backend(api_key: str = None, name: str = None) -> BatchBackend:
+    """Instantiate the configured batch backend (AI_BATCH_BACKEND by default)."""
+    name = name or getattr(settings, 'AI_BATCH_BACKEND', 'anthropic')
+    if name not in BATCH_BACKENDS:
+        raise ValueError(f"Unknown batch backend: {name}")
+    return BATCH_BACKENDS[name](api_key)
+
+
+def get_org_ai_settings(organization) -> Optional[dict]:
+    """
+    AI settings of the organization's first active admin, or None when
+    external AI is not enabled or no API key is configured.
+    """
+    from apps.authentication.models import UserProfile
+
+    admin_profile = UserProfile.objects.filter(
+        organization=organization,
+        role='admin',
+        is_active=True
+    ).first()
+    if not admin_profile:
+        return None
+
+    ai_settings = admin_profile.preferences.get('ai_settings', {})
+    if not ai_settings.get('use_external_ai') or not ai_settings.get('ai_api_key'):
+        return None
+    return ai_settings
+
+
+@dataclass
+class EnhancementBatch:
+    """Requests sharing one API key, submitted together."""
+
+    api_key: str
+    key_owner_id: int  # organization whose settings hold the API key
+    requests: List[BatchRequest] = field(default_factory=list)
+
+
+def prepare_enhancement_request(organization, ai_settings: dict) -> Optional[BatchRequest]:
+    """
+    Build an organization's enhancement request.
+
+    Returns None when the organization has no insights or its current
+    insights already have a cached enhancement.
+    """
+    from .ai_services import AIInsightsService, INSIGHT_ENHANCEMENT_TOOL
+
+    service = AIInsightsService(organization=organization, use_external_ai=False)
+    insights = service.get_all_insights()['insights']
+    if not insights:
+        return None
+    if AIInsightsCache.get_cached_enhancement(organization.id, insights):
+        return None
+
+    context = service._build_comprehensive_context(insights)
+    params = AnthropicProvider(ai_settings['ai_api_key']).build_enhance_request(
+        insights, context, INSIGHT_ENHANCEMENT_TOOL
+    )
+    return BatchRequest(
+        custom_id=f"org-{organization.id}",
+        organization_id=organization.id,
+        params=params,
+        insights=insights,
+        context=context,
+    )
+
+
+def submit_enhancement_batch(batch: EnhancementBatch, backend_name: str = None) -> str:
+    """
+    Submit a batch and record its manifest (an AIBatchJob) for the polling task.
+
+    Returns:
+        Provider batch ID
+    """
+    from .models import AIBatchJob
+
+    backend_name = backend_name or getattr(settings, 'AI_BATCH_BACKEND', 'anthropic')
+    backend = get_batch_backend(batch.api_key, backend_name)
+    batch_id = backend.submit(batch.requests)
+
+    AIBatchJob.objects.create(
+        batch_id=batch_id,
+        backend=backend_name,
+        key_owner_id=batch.key_owner_id,
+        requests=json.loads(json.dumps({
+            request.custom_id: {
+                'organization_id': request.organization_id,
+                'insights': request.insights,
+                'context': request.context,
+            }
+            for request in batch.requests
+        }, cls=DjangoJSONEncoder)),
+    )
+    logger.info(
+        f"Submitted enhancement batch {batch_id} with {len(batch.requests)} organizations"
+    )
+    return batch_id
+
+
+def collect_enhancement_batch(batch_id: str) -> Optional[dict]:
+    """
+    Fan a completed batch's results out to the caches and request log.
+
+    Returns:
+        Summary dict, or None while the batch is still processing
+    """
+    from .models import AIBatchJob
+
+    job = AIBatchJob.objects.filter(batch_id=batch_id, status='submitted').select_related('key_owner').first()
+    if job is None:
+        return {'status': 'failed', 'batch_id': batch_id, 'error': 'Batch manifest not found'}
+
+    ai_settings = get_org_ai_settings(job.key_owner)
+    if not ai_settings:
+        summary = {'status': 'failed', 'batch_id': batch_id, 'error': 'API key no longer configured'}
+        job.finish(summary)
+        return summary
+
+    backend = get_batch_backend(ai_settings['ai_api_key'], job.backend)
+    if not backend.is_complete(batch_id):
+        return None
+
+    summary = {
+        'status': 'success',
+        'batch_id': batch_id,
+        'organizations_enhanced': 0,
+        'organizations_failed': 0,
+        'errors': [],
+    }
+
+    for result in backend.results(batch_id):
+        request = job.requests.get(result.custom_id)
+        if request is None:
+            continue
+        try:
+            _apply_result(request, result)
+            summary['organizations_enhanced'] += 1
+        except Exception as e:
+            summary['organizations_failed'] += 1
+            summary['errors'].append(f"{result.custom_id}: {e}")
+            logger.error(f"Batch {batch_id} result {result.custom_id} failed: {e}")
+
+    if summary['errors']:
+        summary['status'] = 'partial'
+    job.finish(summary)
+    return summary
+
+
+def expire_enhancement_batch(batch_id: str, error: str) -> dict:
+    """Mark a batch that was never collected as failed."""
+    from .models import AIBatchJob
+
+    summary = {'status': 'failed', 'batch_id': batch_id, 'error': error}
+    job = AIBatchJob.objects.filter(batch_id=batch_id, status='submitted').first()
+    if job is not None:
+        job.finish(summary)
+    return summary
+
+
+def _apply_result(request: dict, result: BatchResult) -> None:
+    """Cache and log one organization's batch result."""
+    model = result.model or 'unknown'
+    metrics = LLMRequestMetrics(
+        provider='anthropic',
+        model=model,
+        model_tier='haiku' if 'haiku' in model else 'opus' if 'opus' in model else 'sonnet',
+        request_type='enhance',
+        tokens_input=result.tokens_input,
+        tokens_output=result.tokens_output,
+        prompt_cache_read_tokens=result.prompt_cache_read_tokens,
+        error=result.error,
+        batch=True,
+    )
+    manager = AIProviderManager(
+        primary_provider='anthropic',
+        api_keys={},
+        organization_id=request['organization_id'],
+        enable_rag=False
+    )
+
+    if not result.output:
+        manager._log_request(metrics)
+        raise RuntimeError(result.error or 'Empty batch result')
+
+    output = dict(result.output)
+    output['provider'] = 'anthropic'
+    output['model'] = model
+    output['generated_at'] = datetime.now().isoformat()
+    output['batch_generated'] = True
+    output['_metrics'] = {
+        'tokens_input': metrics.tokens_input,
+        'tokens_output': metrics.tokens_output,
+        'cache_read_tokens': metrics.prompt_cache_read_tokens,
+        'cost_usd': float(metrics.cost_usd),
+        'latency_ms': 0,
+    }
+
+    output = manager.record_enhancement(request['insights'], request['context'], output, metrics)
+    AIInsightsCache.cache_enhancement(request['organization_id'], request['insights'], output)
@@ -5,22 +5,58 @@ Provides Redis-based caching for AI-enhanced insights to reduce API costs
 and improve response times.
 
 Cache Strategy:
-- Key: org_id + hash of insight signatures
+- Key: org_id + order-independent hash of canonical insight content
 - TTL: 1 hour default, configurable via AI_INSIGHTS_CACHE_TTL
 - Invalidation: On transaction upload, manual refresh
+
+On Redis the bookkeeping uses native commands: hit/miss counters are INCR'd,
+each organization's keys are tracked in a Redis SET, and invalidation
+UNLINKs them in one pipelined round trip. Every key of an organization
+carries the hash tag {org_id}, so they share a cluster slot and multi-key
+commands stay valid on Redis Cluster. Other cache backends (locmem in tests)
+fall back to the Django cache API.
 """
 
-import hashlib
-import json
 import logging
 from typing import Optional
 
 from django.conf import settings
 from django.core.cache import cache
 
+from .insight_keys import insight_fingerprint, insights_fingerprint
+
 logger = logging.getLogger(__name__)
 
 
+_redis_fallback_logged = False
+
+
+def get_redis_client():
+    """
+    Raw redis-py client behind the default cache, or None when the cache
+    is not Redis-backed.
+
+    Works with Django's RedisCache (cache._cache) and django-redis
+    (cache.client), both of which expose get_client(write=...). Callers
+    fall back to non-atomic cache get/set when this returns None; that is
+    logged once per process.
+    """
+    global _redis_fallback_logged
+
+    for backend_client in (getattr(cache, '_cache', None), getattr(cache, 'client', None)):
+        if backend_client is not None and hasattr(backend_client, 'get_client'):
+            try:
+                return backend_client.get_client(write=True)
+            except Exception as e:
+                logger.warning(f"Redis client unavailable: {e}")
+                return None
+
+    if not _redis_fallback_logged:
+        _redis_fallback_logged = True
+        logger.info("Default cache is not Redis-backed; using non-atomic cache operations")
+    return None
+
+
 class AIInsightsCache:
     """
     Caching layer for AI-enhanced insights.
@@ -31,41 +67,62 @@ class AIInsightsCache:
 
     CACHE_PREFIX = "ai_insights"
     DEFAULT_TTL = 3600  # 1 hour
+    STATS_TTL = 86400  # 24 hours
 
     @classmethod
     def _get_ttl(cls) -> int:
         """Get cache TTL from settings or use default."""
         return getattr(settings, 'AI_INSIGHTS_CACHE_TTL', cls.DEFAULT_TTL)
 
+    @staticmethod
+    def _redis_client():
+        """Raw redis-py client behind the default cache, or None."""
+        return get_redis_client()
+
+    @classmethod
+    def _org_tag(cls, organization_id: int) -> str:
+        """Key prefix with the organization's cluster hash tag."""
+        return f"{cls.CACHE_PREFIX}:{{{organization_id}}}"
+
+    @classmethod
+    def _stat_key(cls, organization_id: int, stat_name: str) -> str:
+        return f"{cls._org_tag(organization_id)}:stats:{stat_name}"
+
     @classmethod
     def _generate_cache_key(cls, organization_id: int, insights: list) -> str:
         """
         Generate deterministic cache key from insights data.
 
-        Uses a hash of insight signatures (type, title, savings) to create
-        a unique key that changes when the underlying data changes.
+        Hashes the canonical content of every insight, ignoring list order,
+        timestamps and internal fields, so identical data always maps to the
+        same key and any change to the insights produces a new one.
 
         Args:
             organization_id: Organization's primary key
             insights: List of insight dictionaries
 
         Returns:
-            Cache key string in format: ai_insights:{org_id}:{content_hash}
+            Cache key string in format: ai_insights:{<org_id>}:<content_hash>
         """
-        insight_signatures = [
-            f"{i['type']}:{i['title']}:{i.get('potential_savings', 0)}"
-            for i in sorted(insights, key=lambda x: x['id'])
-        ]
-        content_hash = hashlib.sha256(
-            json.dumps(insight_signatures).encode()
-        ).hexdigest()[:16]
+        content_hash = insights_fingerprint(insights)[:16]
 
-        return f"{cls.CACHE_PREFIX}:{organization_id}:{content_hash}"
+        return f"{cls._org_tag(organization_id)}:{content_hash}"
+
+    @classmethod
+    def _generate_insight_key(cls, organization_id: int, insight: dict) -> str:
+        """
+        Generate cache key for a single insight's AI analysis.
+
+        Returns:
+            Cache key string in format: ai_insights:{<org_id>}:insight:<content_hash>
+        """
+        content_hash = insight_fingerprint(insight)[:16]
+        return f"{cls._org_tag(organization_id)}:insight:{content_hash}"
 
     @classmethod
     def _get_org_pattern_key(cls, organization_id: int) -> str:
-        """Get the pattern key for tracking org's cache entries."""
-        return f"{cls.CACHE_PREFIX}:org_keys:{organization_id}"
+        """Get the key tracking the org's cache entries (a Redis SET on Redis)."""
+        return f"{cls._org_tag(organization_id)}:keys"
 
     @classmethod
     def get_cached_enhancement(
@@ -124,12 +181,58 @@ class AIInsightsCache:
             f"key={cache_key}, TTL={effective_ttl}s"
         )
 
+    @classmethod
+    def get_cached_insight_analysis(cls, organization_id: int, insight: dict) -> Optional[dict]:
+        """
+        Retrieve cached per-insight AI analysis if available.
+
+        Args:
+            organization_id: Organization's primary key
+            insight: Insight the analysis was generated for
+
+        Returns:
+            Cached analysis dict or None if not found
+        """
+        cached = cache.get(cls._generate_insight_key(organization_id, insight))
+        cls._increment_stat(organization_id, "hits" if cached else "misses")
+        return cached
+
+    @classmethod
+    def cache_insight_analysis(
+        cls,
+        organization_id: int,
+        insight: dict,
+        analysis: dict,
+        ttl: int = None
+    ) -> None:
+        """
+        Store per-insight AI analysis in cache.
+
+        Args:
+            organization_id: Organization's primary key
+            insight: Insight the analysis was generated for (used for key generation)
+            analysis: AI analysis to cache
+            ttl: Optional custom TTL in seconds
+        """
+        cache_key = cls._generate_insight_key(organization_id, insight)
+        cache.set(cache_key, analysis, ttl or cls._get_ttl())
+        cls._track_org_key(organization_id, cache_key)
+
     @classmethod
     def _track_org_key(cls, organization_id: int, cache_key: str) -> None:
         """Track cache keys by organization for invalidation."""
         pattern_key = cls._get_org_pattern_key(organization_id)
-        existing_keys = cache.get(pattern_key) or []
+        client = cls._redis_client()
+
+        if client is not None:
+            set_key = cache.make_key(pattern_key)
+            pipe = client.pipeline(transaction=False)
+            pipe.sadd(set_key, cache.make_key(cache_key))
+            pipe.expire(set_key, cls._get_ttl() * 2)
+            pipe.execute()
+            return
 
+        existing_keys = cache.get(pattern_key) or []
         if cache_key not in existing_keys:
             existing_keys.append(cache_key)
             cache.set(pattern_key, existing_keys, cls._get_ttl() * 2)
@@ -148,16 +251,26 @@ class AIInsightsCache:
             Number of cache entries invalidated
         """
         pattern_key = cls._get_org_pattern_key(organization_id)
-        cached_keys = cache.get(pattern_key) or []
-
-        invalidated = 0
-        for key in cached_keys:
-            if cache.delete(key):
-                invalidated += 1
-
-        cache.delete(pattern_key)
-        cache.delete(f"{cls.CACHE_PREFIX}:stats:{organization_id}:hits")
-        cache.delete(f"{cls.CACHE_PREFIX}:stats:{organization_id}:misses")
+        bookkeeping_keys = [
+            pattern_key,
+            cls._stat_key(organization_id, "hits"),
+            cls._stat_key(organization_id, "misses"),
+        ]
+        client = cls._redis_client()
+
+        if client is not None:
+            set_key = cache.make_key(pattern_key)
+            cached_keys = list(client.smembers(set_key))
+            pipe = client.pipeline(transaction=False)
+            if cached_keys:
+                pipe.unlink(*cached_keys)
+            pipe.unlink(*(cache.make_key(key) for key in bookkeeping_keys))
+            results = pipe.execute()
+            invalidated = results[0] if cached_keys else 0
+        else:
+            cached_keys = cache.get(pattern_key) or []
+            invalidated = sum(1 for key in cached_keys if cache.has_key(key))
+            cache.delete_many(cached_keys + bookkeeping_keys)
 
         logger.info(
             f"AI insights cache invalidated for org {organization_id}, "
@@ -167,11 +280,29 @@ class AIInsightsCache:
 
     @classmethod
     def _increment_stat(cls, organization_id: int, stat_name: str) -> None:
-        """Increment cache statistics counter."""
-        stat_key = f"{cls.CACHE_PREFIX}:stats:{organization_id}:{stat_name}"
+        """
+        Increment cache statistics counter.
+
+        Atomic on Redis (INCR) and on backends implementing incr() atomically,
+        so counts stay correct across concurrent workers.
+        """
+        stat_key = cls._stat_key(organization_id, stat_name)
         try:
-            current = cache.get(stat_key) or 0
-            cache.set(stat_key, current + 1, 86400)  # 24 hour TTL for stats
+            client = cls._redis_client()
+            if client is not None:
+                full_key = cache.make_key(stat_key)
+                pipe = client.pipeline(transaction=False)
+                pipe.incr(full_key)
+                pipe.expire(full_key, cls.STATS_TTL)
+                pipe.execute()
+                return
+
+            cache.add(stat_key, 0, cls.STATS_TTL)
+            try:
+                cache.incr(stat_key)
+            except ValueError:
+                # Expired between add() and incr()
+                cache.add(stat_key, 1, cls.STATS_TTL)
         except Exception:
             pass  # Stats are best-effort
 
@@ -186,8 +317,11 @@ class AIInsightsCache:
         Returns:
             Dict with hits, misses, and hit_rate
         """
-        hits = cache.get(f"{cls.CACHE_PREFIX}:stats:{organization_id}:hits") or 0
-        misses = cache.get(f"{cls.CACHE_PREFIX}:stats:{organization_id}:misses") or 0
+        hits_key = cls._stat_key(organization_id, "hits")
+        misses_key = cls._stat_key(organization_id, "misses")
+        stats = cache.get_many([hits_key, misses_key])
+        hits = int(stats.get(hits_key) or 0)
+        misses = int(stats.get(misses_key) or 0)
         total = hits + misses
 
         return {
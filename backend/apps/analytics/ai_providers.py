@@ -21,6 +21,7 @@ Usage:
 
 import json
 import logging
+import threading
 import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
@@ -28,6 +29,8 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Optional, List, Dict, Any, Callable
 
+from .insight_keys import canonical_json, insight_fingerprint, insights_fingerprint
+
 logger = logging.getLogger(__name__)
 
 
@@ -85,9 +88,12 @@ class LLMRequestMetrics:
     tokens_input: int = 0
     tokens_output: int = 0
     latency_ms: int = 0
+    ttft_ms: Optional[int] = None
+    tokens_per_second: Optional[float] = None
     prompt_cache_read_tokens: int = 0
     prompt_cache_write_tokens: int = 0
     error: Optional[str] = None
+    batch: bool = False  # Submitted through a provider batch API (50% discount)
 
     @property
     def cost_usd(self) -> Decimal:
@@ -105,8 +111,11 @@ class LLMRequestMetrics:
         input_cost = (regular_input_tokens / 1_000_000) * model_pricing['input']
         cache_cost = (self.prompt_cache_read_tokens / 1_000_000) * model_pricing['cache_read']
         output_cost = (self.tokens_output / 1_000_000) * model_pricing['output']
+        total_cost = input_cost + cache_cost + output_cost
+        if self.batch:
+            total_cost *= 0.5
 
-        return Decimal(str(round(input_cost + cache_cost + output_cost, 6)))
+        return Decimal(str(round(total_cost, 6)))
 
 
 class AIProvider(ABC):
@@ -114,6 +123,24 @@ class AIProvider(ABC):
 
     name: str = "base"
 
+    @property
+    def _last_metrics(self) -> Optional[LLMRequestMetrics]:
+        """
+        Metrics from the calling thread's most recent request.
+
+        Thread-local so concurrent calls on a shared provider never log each
+        other's metrics.
+        """
+        return getattr(self._thread_state, 'last_metrics', None)
+
+    @_last_metrics.setter
+    def _last_metrics(self, metrics: Optional[LLMRequestMetrics]) -> None:
+        self._thread_state.last_metrics = metrics
+
+    @property
+    def _thread_state(self) -> threading.local:
+        return self.__dict__.setdefault('_thread_local', threading.local())
+
     @abstractmethod
     def enhance_insights(
         self,
@@ -206,17 +233,20 @@ class AnthropicProvider(AIProvider):
         'opus': 'claude-opus-4-20250514',
     }
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: Optional[float] = None):
         self.api_key = api_key
+        self.timeout = timeout
         self._client = None
-        self._last_metrics: Optional[LLMRequestMetrics] = None
 
     @property
     def client(self):
         if not self._client and self.api_key:
             try:
                 import anthropic
-                self._client = anthropic.Anthropic(api_key=self.api_key)
+                client_kwargs = {'api_key': self.api_key}
+                if self.timeout:
+                    client_kwargs['timeout'] = self.timeout
+                self._client = anthropic.Anthropic(**client_kwargs)
             except ImportError:
                 logger.warning("anthropic package not installed")
         return self._client
@@ -315,6 +345,31 @@ TOP SUPPLIERS:
         self._last_metrics = metrics
         return metrics
 
+    def build_enhance_request(
+        self,
+        insights: list,
+        context: dict,
+        tool_schema: dict,
+        model: str = None
+    ) -> dict:
+        """Messages API parameters for an enhancement request (also used for batch submissions)."""
+        user_content = f"""Analyze these procurement insights and provide structured recommendations.
+
+Current Insights ({len(insights)} total):
+{json.dumps(context.get('insights', insights[:15]), indent=2)}
+
+Provide actionable recommendations prioritized by impact and effort.
+Focus on quick wins and high-impact actions that address the identified issues."""
+
+        return {
+            'model': model or self.MODELS['sonnet'],
+            'max_tokens': 2048,
+            'system': self._build_cacheable_system_prompt(context),
+            'tools': [tool_schema],
+            'tool_choice': {"type": "tool", "name": tool_schema["name"]},
+            'messages': [{"role": "user", "content": user_content}],
+        }
+
     def enhance_insights(
         self,
         insights: list,
@@ -329,23 +384,8 @@ TOP SUPPLIERS:
         start_time = time.time()
 
         try:
-            system_blocks = self._build_cacheable_system_prompt(context)
-
-            user_content = f"""Analyze these procurement insights and provide structured recommendations.
-
-Current Insights ({len(insights)} total):
-{json.dumps(context.get('insights', insights[:15]), indent=2)}
-
-Provide actionable recommendations prioritized by impact and effort.
-Focus on quick wins and high-impact actions that address the identified issues."""
-
             message = self.client.messages.create(
-                model=model,
-                max_tokens=2048,
-                system=system_blocks,
-                tools=[tool_schema],
-                tool_choice={"type": "tool", "name": tool_schema["name"]},
-                messages=[{"role": "user", "content": user_content}]
+                **self.build_enhance_request(insights, context, tool_schema, model)
             )
 
             metrics = self._extract_metrics(message, model, 'enhance', start_time)
@@ -626,17 +666,20 @@ class OpenAIProvider(AIProvider):
         'turbo': 'gpt-4-turbo-preview',
     }
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: Optional[float] = None):
         self.api_key = api_key
+        self.timeout = timeout
         self._client = None
-        self._last_metrics: Optional[LLMRequestMetrics] = None
 
     @property
     def client(self):
         if not self._client and self.api_key:
             try:
                 import openai
-                self._client = openai.OpenAI(api_key=self.api_key)
+                client_kwargs = {'api_key': self.api_key}
+                if self.timeout:
+                    client_kwargs['timeout'] = self.timeout
+                self._client = openai.OpenAI(**client_kwargs)
             except ImportError:
                 logger.warning("openai package not installed")
         return self._client
@@ -967,7 +1010,9 @@ class AIProviderManager:
         enable_logging: bool = True,
         enable_semantic_cache: bool = True,
         enable_rag: bool = True,
-        enable_validation: bool = True
+        enable_validation: bool = True,
+        request_timeout: Optional[float] = None,
+        providers: Optional[Dict[str, AIProvider]] = None
     ):
         """
         Initialize the provider manager.
@@ -982,6 +1027,9 @@ class AIProviderManager:
             enable_semantic_cache: Whether to use semantic caching
             enable_rag: Whether to use RAG for context augmentation
             enable_validation: Whether to validate LLM responses against source data
+            request_timeout: Per-request timeout in seconds passed to provider clients
+            providers: Pre-built provider instances by name; used instead of
+                PROVIDER_CLASSES for those names (e.g. local or fake providers)
         """
         self.primary_provider = primary_provider
         self.api_keys = api_keys or {}
@@ -992,8 +1040,9 @@ class AIProviderManager:
         self.enable_semantic_cache = enable_semantic_cache
         self.enable_rag = enable_rag
         self.enable_validation = enable_validation
+        self.request_timeout = request_timeout
 
-        self._providers: Dict[str, AIProvider] = {}
+        self._providers: Dict[str, AIProvider] = dict(providers or {})
         self._provider_errors: Dict[str, str] = {}
         self._last_successful_provider: Optional[str] = None
         self._semantic_cache = None
@@ -1008,9 +1057,11 @@ class AIProviderManager:
     def _initialize_providers(self) -> None:
         """Initialize all available providers."""
         for name, api_key in self.api_keys.items():
-            if api_key and name in self.PROVIDER_CLASSES:
+            if api_key and name in self.PROVIDER_CLASSES and name not in self._providers:
                 try:
-                    self._providers[name] = self.PROVIDER_CLASSES[name](api_key)
+                    self._providers[name] = self.PROVIDER_CLASSES[name](
+                        api_key, timeout=self.request_timeout
+                    )
                     logger.info(f"Initialized {name} provider")
                 except Exception as e:
                     logger.warning(f"Failed to initialize {name} provider: {e}")
@@ -1121,7 +1172,7 @@ class AIProviderManager:
 
         Args:
             context: Base context to augment
-            insights: Optional list of insights to derive query from
+            insights: Optional list of insights to derive queries from
             query: Optional explicit query for RAG search
 
         Returns:
@@ -1132,12 +1183,11 @@ class AIProviderManager:
 
         try:
             if not query and insights:
-                query_parts = []
-                for insight in insights[:3]:
-                    query_parts.append(
-                        f"{insight.get('type', '')} {insight.get('title', '')}"
-                    )
-                query = ' '.join(query_parts)
+                # One query per insight, searched together in a single round trip
+                query = [
+                    f"{insight.get('type', '')} {insight.get('title', '')}"
+                    for insight in insights[:3]
+                ]
 
             if query:
                 context = self._rag_service.augment_context(
@@ -1152,17 +1202,17 @@ class AIProviderManager:
         return context
 
     def _build_cache_key(self, insights: list, context: dict) -> str:
-        """Build a cache key from insights and context."""
-        key_parts = [
-            json.dumps([{
-                'type': i.get('type'),
-                'title': i.get('title'),
-                'severity': i.get('severity')
-            } for i in insights[:10]], sort_keys=True),
-            str(context.get('spending', {}).get('total_ytd', 0)),
-            str(context.get('spending', {}).get('supplier_count', 0)),
-        ]
-        return '|'.join(key_parts)
+        """
+        Build a cache key from insights and context.
+
+        Uses the order-independent insight fingerprint so identical
+        recomputations produce identical keys.
+        """
+        return canonical_json({
+            'insights': insights_fingerprint(insights),
+            'total_ytd': context.get('spending', {}).get('total_ytd', 0),
+            'supplier_count': context.get('spending', {}).get('supplier_count', 0),
+        })
 
     def _get_providers_to_try(self) -> List[str]:
         """Get ordered list of providers to attempt."""
@@ -1181,6 +1231,9 @@ class AIProviderManager:
         """
         Log LLM request to database for cost tracking.
 
+        The row is queued on the telemetry buffer and written in a batch
+        off the request path.
+
         Args:
             metrics: LLMRequestMetrics from provider call
             cache_hit: Whether response was from semantic cache
@@ -1191,9 +1244,9 @@ class AIProviderManager:
             return
 
         try:
-            from .models import LLMRequestLog
+            from .llm_telemetry import log_llm_request
 
-            LLMRequestLog.objects.create(
+            log_llm_request(
                 organization_id=self.organization_id,
                 request_type=metrics.request_type,
                 model_used=metrics.model,
@@ -1202,6 +1255,8 @@ class AIProviderManager:
                 tokens_input=metrics.tokens_input,
                 tokens_output=metrics.tokens_output,
                 latency_ms=metrics.latency_ms,
+                ttft_ms=metrics.ttft_ms,
+                tokens_per_second=metrics.tokens_per_second,
                 cost_usd=metrics.cost_usd,
                 cache_hit=cache_hit,
                 prompt_cache_read_tokens=metrics.prompt_cache_read_tokens,
@@ -1321,6 +1376,44 @@ class AIProviderManager:
         logger.error(f"All providers failed for enhancement. Last error: {last_error}")
         return None
 
+    def record_enhancement(
+        self,
+        insights: list,
+        context: dict,
+        result: dict,
+        metrics: LLMRequestMetrics
+    ) -> dict:
+        """
+        Validate, log and semantically cache an enhancement produced outside
+        enhance_insights (e.g. by a provider batch job).
+
+        Uses the same cache key as enhance_insights, so a later call for the
+        same insights and context is a cache hit.
+
+        Returns:
+            The result with validation metadata added
+        """
+        source_data = {
+            'total_spend': context.get('spending', {}).get('total_ytd', 0),
+            'insights': insights,
+        }
+        result = self._validate_and_adjust_response(result, source_data, request_type='enhance')
+
+        validation_info = result.get('_validation', {})
+        self._log_request(
+            metrics,
+            cache_hit=False,
+            validation_passed=validation_info.get('validated', True),
+            validation_errors=validation_info.get('issues', [])
+        )
+
+        if self._semantic_cache:
+            self._semantic_cache.store(
+                self._build_cache_key(insights, context), result, request_type='enhance'
+            )
+
+        return result
+
     def analyze_single_insight(
         self,
         insight: dict,
@@ -1328,12 +1421,10 @@ class AIProviderManager:
         skip_cache: bool = False
     ) -> Optional[dict]:
         """Analyze single insight with semantic caching, automatic failover, and logging."""
-        cache_key = json.dumps({
-            'type': insight.get('type'),
-            'title': insight.get('title'),
-            'severity': insight.get('severity'),
-            'savings': insight.get('potential_savings', 0)
-        }, sort_keys=True)
+        cache_key = canonical_json({
+            'id': insight.get('id'),
+            'fingerprint': insight_fingerprint(insight)
+        })
 
         if self._semantic_cache and not skip_cache:
             cached = self._semantic_cache.lookup(cache_key, request_type='single_insight')
@@ -1404,12 +1495,11 @@ class AIProviderManager:
         skip_rag: bool = False
     ) -> Optional[dict]:
         """Perform deep analysis with RAG, semantic caching, automatic failover, and logging."""
-        cache_key = json.dumps({
+        cache_key = canonical_json({
             'id': insight_data.get('id'),
-            'type': insight_data.get('type'),
-            'title': insight_data.get('title'),
+            'fingerprint': insight_fingerprint(insight_data),
             'total_ytd': context.get('spending', {}).get('total_ytd', 0)
-        }, sort_keys=True)
+        })
 
         if self._semantic_cache and not skip_cache:
             cached = self._semantic_cache.lookup(cache_key, request_type='deep_analysis')
@@ -4,7 +4,7 @@ AI Insights Service - Intelligent recommendations for procurement analytics.
 Provides:
 - Cost optimization insights (price variance detection)
 - Supplier risk analysis (concentration risk)
-- Anomaly detection (statistical outliers)
+- Anomaly detection (robust statistical outliers)
 - Consolidation recommendations
 
 Supports hybrid mode: Built-in ML + Optional External AI (Claude/OpenAI)
@@ -15,24 +15,43 @@ Enhancement features:
 - Rich context building for better AI recommendations
 - Multi-provider support with automatic failover
 """
+import hashlib
 import json
-import uuid
 import logging
-from decimal import Decimal
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 from datetime import datetime
+from functools import cached_property
 from typing import Optional, Dict
 
-from django.db.models import Sum, Count, Avg, StdDev, F, Q
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Sum, Count, Avg, F, Q
 from django.db.models.functions import TruncMonth
+from django.utils import timezone
 
 from apps.procurement.models import Transaction, Supplier, Category
 from .services import AnalyticsService
+from .services.base import BaseAnalyticsService
 from .ai_cache import AIInsightsCache
+from .anomaly_engine import TransactionAnomalyEngine
+from .insight_features import SpendFeatures
+from .insight_keys import canonical_json, insight_id
 from .ai_providers import AIProviderManager
 
 logger = logging.getLogger(__name__)
 
 
+def insight_snapshot_presets() -> list:
+    """
+    Filter sets precomputed as InsightSnapshots: no filters (the dashboard
+    default) and the current fiscal year (July-June, as the years filter
+    is applied to Transaction.fiscal_year).
+    """
+    return [{}, {'years': [BaseAnalyticsService._get_fiscal_year(timezone.localdate())]}]
+
+
 # Structured output tool schema for Claude API
 # Forces AI to return predictable, parseable JSON
 INSIGHT_ENHANCEMENT_TOOL = {
@@ -342,6 +361,11 @@ class AIInsightsService:
                 enable_logging=True
             )
 
+    @cached_property
+    def features(self) -> SpendFeatures:
+        """Grouped spend shared by the insight generators; one query on first use."""
+        return SpendFeatures.from_queryset(self.transactions)
+
     def _build_filtered_queryset(self):
         """Build transaction queryset with applied filters."""
         from datetime import datetime as dt
@@ -389,16 +413,71 @@ class AIInsightsService:
         """
         Get all AI insights combined with optional AI enhancement.
 
+        Base insights are served from the organization's InsightSnapshot when
+        one exists for these filters, otherwise computed live.
+
         Args:
-            force_refresh: If True, bypass cache and regenerate AI enhancement
+            force_refresh: If True, bypass the snapshot and cache and
+                regenerate insights and AI enhancement
 
         Returns:
             Dictionary with:
             - insights: List of insight objects
             - summary: Summary statistics
+            - snapshot: computed_at, age_seconds and source of the snapshot
+              served, or None when computed live
             - ai_enhancement: Structured AI recommendations (if enabled)
             - cache_hit: Whether AI enhancement was served from cache
         """
+        result = None if force_refresh else self.get_snapshot()
+        if result is None:
+            result = self.compute_base_insights()
+            result['snapshot'] = None
+        clean_insights = result['insights']
+
+        if self.use_external_ai and self.api_key:
+            cache_hit = False
+            ai_enhancement = None
+
+            if not force_refresh:
+                ai_enhancement = AIInsightsCache.get_cached_enhancement(
+                    self.organization.id,
+                    clean_insights
+                )
+                cache_hit = ai_enhancement is not None
+
+            if not ai_enhancement:
+                ai_enhancement = self._enhance_with_external_ai(clean_insights)
+                if ai_enhancement:
+                    AIInsightsCache.cache_enhancement(
+                        self.organization.id,
+                        clean_insights,
+                        ai_enhancement
+                    )
+
+            if ai_enhancement:
+                result['ai_enhancement'] = ai_enhancement
+                result['cache_hit'] = cache_hit
+
+            # Per-insight enhancement for high-value insights
+            per_insight_enhancer = PerInsightEnhancer(
+                api_key=self.api_key,
+                provider=self.ai_provider,
+                api_keys=self.api_keys,
+                enable_fallback=self.enable_fallback,
+                organization_id=self.organization.id
+            )
+            result['insights'] = per_insight_enhancer.enhance_insights(clean_insights)
+
+        return result
+
+    def compute_base_insights(self) -> dict:
+        """
+        Run every insight generator, deduplicate savings and summarize.
+
+        Returns:
+            Dictionary with insights (internal fields stripped) and summary
+        """
         # Collect raw insights from all generators
         cost_insights = self.get_cost_optimization_insights()
         risk_insights = self.get_supplier_risk_insights()
@@ -410,17 +489,16 @@ class AIInsightsService:
         # Apply deduplication to prevent double-counting savings
         deduplicated_insights, adjusted_total = self.deduplicate_savings(all_insights)
 
-        # Sort by severity, then by adjusted savings
+        # Sort by severity, then by adjusted savings; ID breaks ties so order is stable
         severity_order = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
         deduplicated_insights.sort(key=lambda x: (
             severity_order.get(x['severity'], 4),
-            -(x.get('potential_savings', 0) or 0)
+            -(x.get('potential_savings', 0) or 0),
+            x.get('id', '')
         ))
 
         # Calculate total spend for capping
-        total_spend = float(
-            self.transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        )
+        total_spend = float(self.features.total_spend)
 
         # Cap at total spend (safety net)
         savings_capped = adjusted_total > total_spend
@@ -457,40 +535,115 @@ class AIInsightsService:
             'summary': summary
         }
 
-        if self.use_external_ai and self.api_key:
-            cache_hit = False
-            ai_enhancement = None
+        return result
 
-            if not force_refresh:
-                ai_enhancement = AIInsightsCache.get_cached_enhancement(
-                    self.organization.id,
-                    clean_insights
-                )
-                cache_hit = ai_enhancement is not None
+    def get_snapshot(self) -> Optional[dict]:
+        """
+        Read base insights from the persisted snapshot for these filters.
 
-            if not ai_enhancement:
-                ai_enhancement = self._enhance_with_external_ai(clean_insights)
-                if ai_enhancement:
-                    AIInsightsCache.cache_enhancement(
-                        self.organization.id,
-                        clean_insights,
-                        ai_enhancement
-                    )
+        Returns None when no snapshot exists or it is older than
+        INSIGHT_SNAPSHOT_MAX_AGE, so the caller computes live.
+        """
+        from .models import InsightSnapshot
 
-            if ai_enhancement:
-                result['ai_enhancement'] = ai_enhancement
-                result['cache_hit'] = cache_hit
+        snapshot = InsightSnapshot.objects.filter(
+            organization=self.organization,
+            filters_key=self.snapshot_key()
+        ).first()
+        if snapshot is None:
+            return None
 
-            # Per-insight enhancement for high-value insights
-            per_insight_enhancer = PerInsightEnhancer(
-                api_key=self.api_key,
-                provider=self.ai_provider,
-                api_keys=self.api_keys,
-                enable_fallback=self.enable_fallback
-            )
-            result['insights'] = per_insight_enhancer.enhance_insights(clean_insights)
+        age = timezone.now() - snapshot.computed_at
+        if age.total_seconds() > getattr(settings, 'INSIGHT_SNAPSHOT_MAX_AGE', 93600):
+            return None
 
-        return result
+        return {
+            'insights': snapshot.insights,
+            'summary': snapshot.summary,
+            'snapshot': {
+                'computed_at': snapshot.computed_at.isoformat(),
+                'age_seconds': int(age.total_seconds()),
+                'source': snapshot.source,
+            },
+        }
+
+    def snapshot_key(self) -> str:
+        """
+        Snapshot key for this service's filters and savings configuration.
+
+        List filters are sorted so equivalent requests share a snapshot, and
+        the savings configuration is included so changing it bypasses
+        snapshots computed with the old rates.
+        """
+        filters = {
+            key: sorted(value) if isinstance(value, list) else value
+            for key, value in self.filters.items() if value not in (None, '', [])
+        }
+        return hashlib.sha256(canonical_json({
+            'filters': filters,
+            'savings_config': self.organization.get_savings_config(),
+        }).encode()).hexdigest()
+
+    def save_snapshot(self, source: str = 'nightly'):
+        """
+        Compute base insights and persist them as this filter set's snapshot.
+
+        Returns:
+            The InsightSnapshot written
+        """
+        from .models import InsightSnapshot
+
+        result = self.compute_base_insights()
+        snapshot, _ = InsightSnapshot.objects.update_or_create(
+            organization=self.organization,
+            filters_key=self.snapshot_key(),
+            defaults={
+                'filters': self.filters,
+                'insights': json.loads(json.dumps(result['insights'], cls=DjangoJSONEncoder)),
+                'summary': json.loads(json.dumps(result['summary'], cls=DjangoJSONEncoder)),
+                'source': source,
+                'computed_at': timezone.now(),
+            }
+        )
+        return snapshot
+
+    @classmethod
+    def refresh_snapshots(cls, organization, source: str = 'nightly') -> list:
+        """
+        Replace the organization's snapshots for every filter preset.
+
+        Returns:
+            Snapshots written, in preset order (unfiltered first)
+        """
+        from .models import InsightSnapshot
+
+        with transaction.atomic():
+            InsightSnapshot.objects.filter(organization=organization).delete()
+            return [
+                cls(organization=organization, filters=filters).save_snapshot(source)
+                for filters in insight_snapshot_presets()
+            ]
+
+    @classmethod
+    def score_upload_anomalies(cls, organization, upload_batch: str) -> int:
+        """
+        Score a completed upload's transactions for anomalies.
+
+        Only the batch is scanned; baselines come from the cache or the rest
+        of the organization's data. The insights are stored on the upload's
+        DataUpload record.
+
+        Returns:
+            Number of anomaly insights found
+        """
+        from apps.procurement.models import DataUpload
+
+        insights = cls(organization=organization).get_anomaly_insights(upload_batch=upload_batch)
+        # update() rather than save(): the upload's post_save signal must not fire again
+        DataUpload.objects.filter(organization=organization, batch_id=upload_batch).update(
+            anomaly_insights=insights
+        )
+        return len(insights)
 
     def get_cost_optimization_insights(self) -> list:
         """
@@ -500,40 +653,24 @@ class AIInsightsService:
         """
         insights = []
 
-        # Get spend by category, subcategory, and supplier to find variance
-        # Group by subcategory for apples-to-apples comparison
-        category_supplier_spend = self.transactions.values(
-            'category__name',
-            'category__uuid',
-            'subcategory',
-            'supplier__name',
-            'supplier__uuid'
-        ).annotate(
-            total_amount=Sum('amount'),
-            transaction_count=Count('id'),
-            avg_transaction=Avg('amount')
-        ).order_by('category__name', 'subcategory', '-total_amount')
-
         # Group by (category, subcategory) for apples-to-apples comparison
         category_data = {}
-        for item in category_supplier_spend:
-            cat_name = item['category__name']
-            subcategory = item['subcategory'] or 'Unspecified'
-            group_key = (cat_name, subcategory)
-            if group_key not in category_data:
-                category_data[group_key] = {
-                    'category': cat_name,
-                    'subcategory': subcategory,
-                    'uuid': str(item['category__uuid']),
-                    'suppliers': []
-                }
-            category_data[group_key]['suppliers'].append({
-                'name': item['supplier__name'],
-                'uuid': str(item['supplier__uuid']),
-                'total': float(item['total_amount']),
-                'avg_transaction': float(item['avg_transaction']),
-                'count': item['transaction_count']
-            })
+        for group in self.features.subcategory_groups:
+            category_data[(group.category, group.subcategory)] = {
+                'category': group.category,
+                'subcategory': group.subcategory,
+                'uuid': group.category_uuid,
+                'suppliers': [
+                    {
+                        'name': supplier.name,
+                        'uuid': supplier.uuid,
+                        'total': float(supplier.total),
+                        'avg_transaction': supplier.avg_transaction,
+                        'count': supplier.count
+                    }
+                    for supplier in group.suppliers
+                ]
+            }
 
         # Analyze each (category, subcategory) group for price variance
         for group_key, data in category_data.items():
@@ -566,7 +703,7 @@ class AIInsightsService:
                 display_name = f"{cat_name} > {subcategory}" if subcategory != 'Unspecified' else cat_name
 
                 insights.append({
-                    'id': str(uuid.uuid4()),
+                    'id': insight_id('cost_optimization', data['uuid'], subcategory),
                     'type': 'cost_optimization',
                     'severity': severity,
                     'confidence': min(0.95, 0.70 + (price_variance * 0.5)),
@@ -602,40 +739,30 @@ class AIInsightsService:
         """
         insights = []
 
-        # Get total spend
-        total_spend = self.transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        total_spend = self.features.total_spend
         if total_spend == 0:
             return insights
 
-        # Get spend by supplier
-        supplier_spend = self.transactions.values(
-            'supplier__name',
-            'supplier__uuid'
-        ).annotate(
-            total=Sum('amount'),
-            transaction_count=Count('id')
-        ).order_by('-total')
-
-        for supplier in supplier_spend:
-            concentration = float(supplier['total']) / float(total_spend)
+        for supplier in self.features.supplier_totals:
+            concentration = float(supplier.total) / float(total_spend)
 
             if concentration >= self.SUPPLIER_CONCENTRATION_THRESHOLD:
                 severity = 'critical' if concentration > 0.50 else 'high'
 
                 insights.append({
-                    'id': str(uuid.uuid4()),
+                    'id': insight_id('risk', supplier.uuid),
                     'type': 'risk',
                     'severity': severity,
                     'confidence': 0.90,
-                    'title': f'High supplier concentration: {supplier["supplier__name"]}',
+                    'title': f'High supplier concentration: {supplier.name}',
                     'description': (
-                        f'{supplier["supplier__name"]} represents '
+                        f'{supplier.name} represents '
                         f'{round(concentration * 100, 1)}% of total spend '
-                        f'(${float(supplier["total"]):,.2f} of ${float(total_spend):,.2f}). '
+                        f'(${float(supplier.total):,.2f} of ${float(total_spend):,.2f}). '
                         f'This creates supply chain vulnerability.'
                     ),
                     'potential_savings': None,  # Risk insight, not cost saving
-                    'affected_entities': [supplier['supplier__name']],
+                    'affected_entities': [supplier.name],
                     'recommended_actions': [
                         'Identify alternative suppliers for key categories',
                         'Negotiate backup supply agreements',
@@ -647,99 +774,104 @@ class AIInsightsService:
 
         return insights
 
-    def get_anomaly_insights(self, sensitivity: float = None) -> list:
+    def get_anomaly_insights(self, sensitivity: float = None, upload_batch: str = None) -> list:
         """
         Detect anomalous transactions using statistical analysis.
 
-        Uses Z-score to identify transactions that deviate significantly from the mean.
+        Scores log-amounts with robust z-scores (median/MAD) against category
+        and per-supplier baselines in a single vectorized pass; see
+        TransactionAnomalyEngine.
+
+        Args:
+            sensitivity: Robust z-score threshold (default ANOMALY_Z_SCORE_THRESHOLD)
+            upload_batch: If given, only transactions from this upload are
+                scored, against cached baselines from the rest of the data
         """
         insights = []
         sensitivity = sensitivity or self.ANOMALY_Z_SCORE_THRESHOLD
 
-        # Get statistics by category
-        category_stats = self.transactions.values(
-            'category__name',
-            'category__uuid'
-        ).annotate(
-            avg_amount=Avg('amount'),
-            std_amount=StdDev('amount'),
-            transaction_count=Count('id')
-        ).filter(transaction_count__gt=5)  # Need enough data for meaningful stats
-
-        for cat_stat in category_stats:
-            if not cat_stat['std_amount'] or cat_stat['std_amount'] == 0:
+        engine = TransactionAnomalyEngine(self.organization.id, self.filters)
+        if upload_batch:
+            groups = engine.detect_batch(
+                self.transactions.filter(upload_batch=upload_batch),
+                self.transactions.exclude(upload_batch=upload_batch),
+                threshold=sensitivity
+            )
+        else:
+            groups = engine.detect(self.transactions, threshold=sensitivity)
+
+        if not groups:
+            return insights
+
+        # One lookup for the display fields of every reported transaction
+        flagged_ids = [a['id'] for group in groups for a in group['anomalies']]
+        details_by_id = {
+            row['id']: row
+            for row in Transaction.objects.filter(id__in=flagged_ids).values(
+                'id', 'uuid', 'supplier__name', 'category__name', 'category__uuid'
+            )
+        }
+
+        for group in groups:
+            anomalies_list = [
+                {**a, **details_by_id[a['id']]}
+                for a in group['anomalies'] if a['id'] in details_by_id
+            ]
+            if not anomalies_list:
                 continue
 
-            avg = float(cat_stat['avg_amount'])
-            std = float(cat_stat['std_amount'])
-            upper_threshold = avg + (sensitivity * std)
-            lower_threshold = max(0, avg - (sensitivity * std))
-
-            # Find anomalous transactions
-            anomalies = self.transactions.filter(
-                category__name=cat_stat['category__name']
-            ).filter(
-                Q(amount__gt=upper_threshold) | Q(amount__lt=lower_threshold)
-            ).values(
-                'uuid',
-                'amount',
-                'date',
-                'supplier__name',
-                'description'
-            )[:10]  # Limit to top 10
-
-            if anomalies:
-                anomalies_list = list(anomalies)
-                high_anomalies = [a for a in anomalies_list if float(a['amount']) > upper_threshold]
-                low_anomalies = [a for a in anomalies_list if float(a['amount']) < lower_threshold]
-
-                total_anomaly_spend = sum(float(a['amount']) for a in high_anomalies)
-
-                severity = 'high' if len(high_anomalies) > 3 else 'medium'
+            category_name = anomalies_list[0]['category__name']
+            high_anomalies = [a for a in anomalies_list if a['z_score'] > 0]
+            total_anomaly_spend = sum(a['amount'] for a in high_anomalies)
 
-                insights.append({
-                    'id': str(uuid.uuid4()),
-                    'type': 'anomaly',
-                    'severity': severity,
-                    'confidence': 0.75,
-                    'title': f'Unusual transactions in {cat_stat["category__name"]}',
-                    'description': (
-                        f'Found {len(anomalies_list)} transactions outside normal range. '
-                        f'Average for category: ${avg:,.2f}, Threshold: ±${sensitivity * std:,.2f}. '
-                        f'{len(high_anomalies)} unusually high, {len(low_anomalies)} unusually low.'
-                    ),
-                    'potential_savings': round(total_anomaly_spend * self.anomaly_rate, 2) if high_anomalies else None,
-                    'affected_entities': [f"{a['supplier__name']} (${float(a['amount']):,.2f})" for a in anomalies_list],
-                    'recommended_actions': [
-                        'Review flagged transactions for accuracy',
-                        'Verify pricing and quantities',
-                        'Check for duplicate or erroneous entries',
-                        'Investigate supplier invoicing practices'
-                    ],
-                    '_attribution': {
-                        'category_ids': [str(cat_stat['category__uuid'])],
-                        'transaction_ids': [str(a['uuid']) for a in anomalies_list],
-                        'spend_basis': total_anomaly_spend,
-                    },
-                    'details': {
-                        'category': cat_stat['category__name'],
-                        'average': avg,
-                        'std_deviation': std,
-                        'threshold_upper': upper_threshold,
-                        'threshold_lower': lower_threshold,
-                        'anomaly_count': len(anomalies_list),
-                        'sample_anomalies': [
-                            {
-                                'uuid': str(a['uuid']),
-                                'amount': float(a['amount']),
-                                'date': str(a['date']),
-                                'supplier': a['supplier__name']
-                            }
-                            for a in anomalies_list[:5]
-                        ]
-                    },
-                    'created_at': datetime.now().isoformat()
-                })
+            severity = 'high' if group['high_count'] > 3 else 'medium'
+
+            insights.append({
+                'id': insight_id('anomaly', str(anomalies_list[0]['category__uuid'])),
+                'type': 'anomaly',
+                'severity': severity,
+                'confidence': 0.75,
+                'title': f'Unusual transactions in {category_name}',
+                'description': (
+                    f'Found {group["anomaly_count"]} transactions outside normal range. '
+                    f'Typical amount for category: ${group["median_amount"]:,.2f}, '
+                    f'normal range: ${group["threshold_lower"]:,.2f} - ${group["threshold_upper"]:,.2f}. '
+                    f'{group["high_count"]} unusually high, {group["low_count"]} unusually low.'
+                ),
+                'potential_savings': round(total_anomaly_spend * self.anomaly_rate, 2) if high_anomalies else None,
+                'affected_entities': [f"{a['supplier__name']} (${a['amount']:,.2f})" for a in anomalies_list],
+                'recommended_actions': [
+                    'Review flagged transactions for accuracy',
+                    'Verify pricing and quantities',
+                    'Check for duplicate or erroneous entries',
+                    'Investigate supplier invoicing practices'
+                ],
+                '_attribution': {
+                    'category_ids': [str(anomalies_list[0]['category__uuid'])],
+                    'transaction_ids': [str(a['uuid']) for a in anomalies_list],
+                    'spend_basis': total_anomaly_spend,
+                },
+                'details': {
+                    'category': category_name,
+                    'average': group['mean_amount'],
+                    'median': group['median_amount'],
+                    'robust_scale': group['log_scale'],
+                    'threshold_upper': group['threshold_upper'],
+                    'threshold_lower': group['threshold_lower'],
+                    'anomaly_count': group['anomaly_count'],
+                    'sample_anomalies': [
+                        {
+                            'uuid': str(a['uuid']),
+                            'amount': a['amount'],
+                            'date': a['date'],
+                            'supplier': a['supplier__name'],
+                            'z_score': a['z_score']
+                        }
+                        for a in anomalies_list[:5]
+                    ]
+                },
+                'created_at': datetime.now().isoformat()
+            })
 
         return insights
 
@@ -752,88 +884,71 @@ class AIInsightsService:
         """
         insights = []
 
-        # Get (category, subcategory) groups with multiple suppliers
-        category_subcategory_groups = self.transactions.values(
-            'category__name',
-            'category__uuid',
-            'subcategory'
-        ).annotate(
-            supplier_count=Count('supplier', distinct=True),
-            total_spend=Sum('amount'),
-            transaction_count=Count('id')
-        ).filter(supplier_count__gte=self.CONSOLIDATION_MIN_SUPPLIERS).order_by('-supplier_count')
-
-        for group in category_subcategory_groups:
-            cat_name = group['category__name']
-            subcategory = group['subcategory'] or 'Unspecified'
-            display_name = f"{cat_name} > {subcategory}" if subcategory != 'Unspecified' else cat_name
-
-            # Get suppliers in this (category, subcategory) group
-            suppliers_filter = {'category__name': cat_name}
-            if subcategory != 'Unspecified':
-                suppliers_filter['subcategory'] = group['subcategory']
-            else:
-                suppliers_filter['subcategory__isnull'] = True
-
-            suppliers = self.transactions.filter(
-                **suppliers_filter
-            ).values(
-                'supplier__name',
-                'supplier__uuid'
-            ).annotate(
-                spend=Sum('amount'),
-                count=Count('id')
-            ).order_by('-spend')
-
-            supplier_list = list(suppliers)
+        # (category, subcategory) groups with multiple suppliers, most suppliers first
+        groups = sorted(
+            (
+                group for group in self.features.subcategory_groups
+                if len(group.suppliers) >= self.CONSOLIDATION_MIN_SUPPLIERS
+            ),
+            key=lambda group: -len(group.suppliers)
+        )
+
+        for group in groups:
+            cat_name = group.category
+            subcategory = group.subcategory
+            display_name = group.display_name
+            total_spend = float(group.total)
+            supplier_count = len(group.suppliers)
+
+            supplier_list = group.suppliers
             top_supplier = supplier_list[0] if supplier_list else None
             top_supplier_share = (
-                float(top_supplier['spend']) / float(group['total_spend'])
-                if top_supplier and group['total_spend']
+                float(top_supplier.total) / total_spend
+                if top_supplier and total_spend
                 else 0
             )
 
             # Potential savings: apply configurable consolidation rate (industry benchmark)
-            potential_savings = float(group['total_spend']) * self.consolidation_rate
+            potential_savings = total_spend * self.consolidation_rate
 
-            severity = 'high' if group['supplier_count'] >= 5 else 'medium'
+            severity = 'high' if supplier_count >= 5 else 'medium'
 
             insights.append({
-                'id': str(uuid.uuid4()),
+                'id': insight_id('consolidation', group.category_uuid, subcategory),
                 'type': 'consolidation',
                 'severity': severity,
                 'confidence': 0.80,
                 'title': f'Consolidation opportunity: {display_name}',
                 'description': (
-                    f'{group["supplier_count"]} suppliers for {display_name} '
-                    f'(${float(group["total_spend"]):,.2f} total). '
-                    f'Top supplier ({top_supplier["supplier__name"] if top_supplier else "N/A"}) '
+                    f'{supplier_count} suppliers for {display_name} '
+                    f'(${total_spend:,.2f} total). '
+                    f'Top supplier ({top_supplier.name if top_supplier else "N/A"}) '
                     f'has {round(top_supplier_share * 100, 1)}% share. '
                     f'Consider consolidating to reduce costs and complexity.'
                 ),
                 'potential_savings': round(potential_savings, 2),
-                'affected_entities': [display_name] + [s['supplier__name'] for s in supplier_list],
+                'affected_entities': [display_name] + [s.name for s in supplier_list],
                 'recommended_actions': [
-                    f'Evaluate {top_supplier["supplier__name"] if top_supplier else "primary supplier"} as preferred vendor',
+                    f'Evaluate {top_supplier.name if top_supplier else "primary supplier"} as preferred vendor',
                     'Request volume discount proposals',
                     'Review supplier performance metrics',
                     'Develop preferred supplier program'
                 ],
                 '_attribution': {
                     'subcategory_keys': [(cat_name, subcategory)],
-                    'supplier_ids': [str(s['supplier__uuid']) for s in supplier_list],
-                    'spend_basis': float(group['total_spend']),
+                    'supplier_ids': [s.uuid for s in supplier_list],
+                    'spend_basis': total_spend,
                 },
                 'details': {
                     'category': cat_name,
                     'subcategory': subcategory,
-                    'supplier_count': group['supplier_count'],
-                    'total_spend': float(group['total_spend']),
+                    'supplier_count': supplier_count,
+                    'total_spend': total_spend,
                     'suppliers': [
                         {
-                            'name': s['supplier__name'],
-                            'spend': float(s['spend']),
-                            'share': round(float(s['spend']) / float(group['total_spend']) * 100, 1)
+                            'name': s.name,
+                            'spend': float(s.total),
+                            'share': round(float(s.total) / total_spend * 100, 1)
                         }
                         for s in supplier_list[:5]
                     ]
@@ -893,7 +1008,7 @@ class AIInsightsService:
         # Sort by priority, then by potential_savings descending
         sorted_insights = sorted(
             insights,
-            key=lambda i: (priority.get(i['type'], 5), -(i.get('potential_savings') or 0))
+            key=lambda i: (priority.get(i['type'], 5), -(i.get('potential_savings') or 0), i.get('id', ''))
         )
 
         # Track claimed entities and their savings
@@ -975,32 +1090,7 @@ class AIInsightsService:
         Returns:
             Dict with organization, spending, top_categories, top_suppliers, insights, historical
         """
-        total_spend = self.transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        avg_transaction = self.transactions.aggregate(avg=Avg('amount'))['avg'] or Decimal('0')
-
-        top_categories = list(
-            self.transactions.values('category__name')
-            .annotate(spend=Sum('amount'))
-            .order_by('-spend')[:5]
-        )
-
-        top_suppliers = list(
-            self.transactions.values('supplier__name')
-            .annotate(spend=Sum('amount'))
-            .order_by('-spend')[:5]
-        )
-
-        date_range = {
-            "earliest": None,
-            "latest": None
-        }
-        if self.transactions.exists():
-            earliest = self.transactions.order_by('date').first()
-            latest = self.transactions.order_by('-date').first()
-            if earliest:
-                date_range["earliest"] = str(earliest.date)
-            if latest:
-                date_range["latest"] = str(latest.date)
+        features = self.features
 
         insights_context = [
             {
@@ -1028,20 +1118,20 @@ class AIInsightsService:
                 "procurement_maturity": self._assess_procurement_maturity(),
             },
             "spending": {
-                "total_ytd": float(total_spend),
-                "supplier_count": self.transactions.values('supplier').distinct().count(),
-                "category_count": self.transactions.values('category').distinct().count(),
-                "transaction_count": self.transactions.count(),
-                "avg_transaction": float(avg_transaction),
-                "date_range": date_range,
+                "total_ytd": float(features.total_spend),
+                "supplier_count": features.supplier_count,
+                "category_count": features.category_count,
+                "transaction_count": features.transaction_count,
+                "avg_transaction": float(features.avg_transaction),
+                "date_range": features.date_range,
             },
             "top_categories": [
-                {"name": c["category__name"], "spend": float(c["spend"])}
-                for c in top_categories
+                {"name": name, "spend": float(spend)}
+                for name, spend in features.category_totals[:5]
             ],
             "top_suppliers": [
-                {"name": s["supplier__name"], "spend": float(s["spend"])}
-                for s in top_suppliers
+                {"name": s.name, "spend": float(s.total)}
+                for s in features.supplier_totals[:5]
             ],
             "insights": insights_context,
             "historical": historical_context,
@@ -1053,9 +1143,9 @@ class AIInsightsService:
 
         Returns one of: 'early_stage', 'basic', 'developing', 'mature'
         """
-        supplier_count = self.transactions.values('supplier').distinct().count()
-        category_count = self.transactions.values('category').distinct().count()
-        transaction_count = self.transactions.count()
+        supplier_count = self.features.supplier_count
+        category_count = self.features.category_count
+        transaction_count = self.features.transaction_count
 
         if transaction_count < 100:
             return "early_stage"
@@ -1497,9 +1587,9 @@ Provide thorough analysis with root cause, implementation roadmap, financial imp
                 "maturity": self._assess_procurement_maturity(),
             },
             "spending": {
-                "total_ytd": float(self.transactions.aggregate(total=Sum('amount'))['total'] or 0),
-                "supplier_count": self.transactions.values('supplier').distinct().count(),
-                "category_count": self.transactions.values('category').distinct().count(),
+                "total_ytd": float(self.features.total_spend),
+                "supplier_count": self.features.supplier_count,
+                "category_count": self.features.category_count,
             }
         }
 
@@ -1623,12 +1713,30 @@ class PerInsightEnhancer:
         provider: str = 'anthropic',
         api_keys: Optional[Dict[str, str]] = None,
         enable_fallback: bool = True,
-        organization_id: Optional[int] = None
+        organization_id: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        call_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        provider_manager: Optional[AIProviderManager] = None
     ):
+        """
+        Args:
+            max_concurrency: Parallel provider calls; 1 runs sequentially
+                (default AI_ENHANCEMENT_CONCURRENCY)
+            call_timeout: Timeout in seconds for each provider call
+                (default AI_ENHANCEMENT_CALL_TIMEOUT)
+            deadline: Seconds after which enhance_insights returns whatever
+                has completed (default AI_ENHANCEMENT_DEADLINE)
+            provider_manager: Pre-configured manager, e.g. with local providers
+        """
         self.api_key = api_key
         self.provider = provider
         self.enable_fallback = enable_fallback
         self.organization_id = organization_id
+        self.max_concurrency = max(1, max_concurrency or getattr(settings, 'AI_ENHANCEMENT_CONCURRENCY', 4))
+        self.call_timeout = call_timeout or getattr(settings, 'AI_ENHANCEMENT_CALL_TIMEOUT', 20)
+        self.deadline = deadline or getattr(settings, 'AI_ENHANCEMENT_DEADLINE', 45)
+        self.last_run_stats = {}
 
         # Build api_keys dict from legacy api_key if not provided
         if api_keys:
@@ -1639,14 +1747,15 @@ class PerInsightEnhancer:
             self.api_keys = {}
 
         # Initialize provider manager for multi-provider support
-        self._provider_manager: Optional[AIProviderManager] = None
-        if self.api_keys:
+        self._provider_manager: Optional[AIProviderManager] = provider_manager
+        if self._provider_manager is None and self.api_keys:
             self._provider_manager = AIProviderManager(
                 primary_provider=provider,
                 api_keys=self.api_keys,
                 enable_fallback=enable_fallback,
                 organization_id=organization_id,
-                enable_logging=True
+                enable_logging=True,
+                request_timeout=self.call_timeout
             )
 
     def enhance_insights(self, insights: list) -> list:
@@ -1654,7 +1763,9 @@ class PerInsightEnhancer:
         Enhance individual high-value insights with AI analysis.
 
         Only enhances insights that meet the value threshold to control costs.
-        Uses Haiku model for cost-efficient processing.
+        Uses Haiku model for cost-efficient processing. Uncached insights are
+        sent to the provider concurrently, bounded by max_concurrency; when the
+        deadline passes, insights still in flight are returned unenhanced.
 
         Args:
             insights: List of insight dictionaries
@@ -1662,7 +1773,7 @@ class PerInsightEnhancer:
         Returns:
             List of insights with ai_analysis added to qualifying insights
         """
-        if not self.api_key:
+        if not self.api_key and not self._provider_manager:
             return insights
 
         high_value = self._filter_high_value_insights(insights)
@@ -1673,16 +1784,98 @@ class PerInsightEnhancer:
 
         logger.info(f"Enhancing {len(high_value)} high-value insights")
 
+        pending = []
+        cached_count = 0
         for insight in high_value:
-            try:
-                enhancement = self._get_single_insight_enhancement(insight)
+            enhancement = self._get_cached_enhancement(insight)
+            if enhancement:
+                self._apply_enhancement(insight, enhancement)
+                cached_count += 1
+            else:
+                pending.append(insight)
+
+        completed = self._run_enhancements(pending)
+        for insight, enhancement in completed:
+            if self.organization_id:
+                AIInsightsCache.cache_insight_analysis(self.organization_id, insight, enhancement)
+            self._apply_enhancement(insight, enhancement)
+
+        self.last_run_stats = {
+            'requested': len(high_value),
+            'cached': cached_count,
+            'enhanced': len(completed),
+            'incomplete': len(pending) - len(completed),
+        }
+        return insights
+
+    @staticmethod
+    def _apply_enhancement(insight: dict, enhancement: dict) -> None:
+        insight['ai_analysis'] = enhancement
+        insight['ai_enhanced'] = True
+
+    def _run_enhancements(self, insights: list) -> list:
+        """
+        Call the provider for each insight within the overall deadline.
+
+        Returns:
+            List of (insight, enhancement) pairs that completed successfully
+        """
+        if not insights:
+            return []
+
+        deadline_at = time.monotonic() + self.deadline
+        completed = []
+
+        if self.max_concurrency == 1 or len(insights) == 1:
+            for insight in insights:
+                if time.monotonic() >= deadline_at:
+                    logger.warning("Insight enhancement deadline reached; returning partial results")
+                    break
+                enhancement = self._safe_enhance(insight)
                 if enhancement:
-                    insight['ai_analysis'] = enhancement
-                    insight['ai_enhanced'] = True
-            except Exception as e:
-                logger.warning(f"Failed to enhance insight {insight['id']}: {e}")
+                    completed.append((insight, enhancement))
+            return completed
 
-        return insights
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(insights)),
+            thread_name_prefix='insight-enhance'
+        )
+        futures = {executor.submit(self._enhance_in_worker, insight): insight for insight in insights}
+        try:
+            for future in as_completed(futures, timeout=max(0, deadline_at - time.monotonic())):
+                enhancement = future.result()
+                if enhancement:
+                    completed.append((futures[future], enhancement))
+        except FuturesTimeoutError:
+            logger.warning(
+                f"Insight enhancement deadline of {self.deadline}s reached; "
+                f"returning {len(completed)} of {len(insights)} enhancements"
+            )
+        finally:
+            # Do not block the request on stragglers; queued calls are dropped
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return completed
+
+    def _safe_enhance(self, insight: dict) -> Optional[dict]:
+        try:
+            return self._get_single_insight_enhancement(insight)
+        except Exception as e:
+            logger.warning(f"Failed to enhance insight {insight['id']}: {e}")
+            return None
+
+    def _enhance_in_worker(self, insight: dict) -> Optional[dict]:
+        """Thread pool entry point; releases the worker's DB connections afterwards."""
+        try:
+            return self._safe_enhance(insight)
+        finally:
+            connections.close_all()
+
+    def _get_cached_enhancement(self, insight: dict) -> Optional[dict]:
+        """Look up a previous analysis of an identical insight."""
+        if not self.organization_id:
+            return None
+        return AIInsightsCache.get_cached_insight_analysis(self.organization_id, insight)
 
     def _filter_high_value_insights(self, insights: list) -> list:
         """Filter insights that warrant AI enhancement based on value and severity."""
@@ -1714,7 +1907,7 @@ class PerInsightEnhancer:
         try:
             import anthropic
 
-            client = anthropic.Anthropic(api_key=self.api_key)
+            client = anthropic.Anthropic(api_key=self.api_key, timeout=self.call_timeout)
 
             message = client.messages.create(
                 model="claude-3-5-haiku-20241022",
@@ -1761,7 +1954,7 @@ Provide root cause analysis, industry benchmarks, and actionable remediation ste
         try:
             import openai
 
-            client = openai.OpenAI(api_key=self.api_key)
+            client = openai.OpenAI(api_key=self.api_key, timeout=self.call_timeout)
 
             openai_tool = {
                 "type": "function",
@@ -16,8 +16,12 @@ from typing import Dict, List, Optional, Any, Set
 
 from django.db.models import Sum, Min, Max
 
+from .tiered_cache import lookup_cache
+
 logger = logging.getLogger(__name__)
 
+ENTITY_NAMES_CACHE = 'entity_names'
+
 
 class LLMResponseValidator:
     """
@@ -50,19 +54,24 @@ class LLMResponseValidator:
         self._category_names: Optional[Set[str]] = None
         self._data_bounds: Optional[Dict] = None
 
+    def _load_names(self, model) -> Set[str]:
+        """Active names of a model for this organization, plus lowercase forms."""
+        names = set(
+            model.objects.filter(
+                organization_id=self.organization_id,
+                is_active=True
+            ).values_list('name', flat=True)
+        )
+        names.update([name.lower() for name in names])
+        return names
+
     @property
     def supplier_names(self) -> Set[str]:
         """Lazy-load supplier names for this organization."""
         if self._supplier_names is None:
             from apps.procurement.models import Supplier
-            self._supplier_names = set(
-                Supplier.objects.filter(
-                    organization_id=self.organization_id,
-                    is_active=True
-                ).values_list('name', flat=True)
-            )
-            self._supplier_names.update(
-                name.lower() for name in self._supplier_names
+            self._supplier_names = lookup_cache(ENTITY_NAMES_CACHE).get_or_set(
+                self.organization_id, 'suppliers', lambda: self._load_names(Supplier)
             )
         return self._supplier_names
 
@@ -71,14 +80,8 @@ class LLMResponseValidator:
         """Lazy-load category names for this organization."""
         if self._category_names is None:
             from apps.procurement.models import Category
-            self._category_names = set(
-                Category.objects.filter(
-                    organization_id=self.organization_id,
-                    is_active=True
-                ).values_list('name', flat=True)
-            )
-            self._category_names.update(
-                name.lower() for name in self._category_names
+            self._category_names = lookup_cache(ENTITY_NAMES_CACHE).get_or_set(
+                self.organization_id, 'categories', lambda: self._load_names(Category)
             )
         return self._category_names
 
@@ -0,0 +1,363 @@
+"""
+Vectorized anomaly detection for procurement transactions.
+
+Fetches (id, category, supplier, amount, date) columns once as NumPy arrays
+and scores every transaction against robust per-group baselines:
+
+- Category baseline: median and MAD of log(amount)
+- Supplier baseline: the same statistics per (category, supplier); when a
+  supplier has enough history, a transaction must also be unusual for that
+  supplier, so a supplier's normal price level is not flagged on its own
+- Robust z-score: (log_amount - median) / scale, where scale is MAD / 0.6745,
+  or the scaled mean absolute deviation when MAD is zero
+
+Group statistics are cached so a just-uploaded batch can be scored without
+rescanning the organization's history. Cache keys carry a per-organization
+version that the procurement signals bump whenever transactions are saved,
+deleted or uploaded, so batches are never scored against stale baselines.
+"""
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Minimum transactions for a category baseline (matches the previous count > 5 rule)
+MIN_GROUP_SIZE = 6
+
+# Minimum transactions for a supplier's own baseline within a category
+MIN_SUPPLIER_HISTORY = 5
+
+# Maximum anomalies reported per category
+TOP_PER_GROUP = 10
+
+# MAD → standard deviation for normally distributed data
+MAD_SCALE = 0.6745
+
+# Mean absolute deviation → standard deviation (sqrt(pi / 2))
+MEAN_AD_SCALE = 1.2533
+
+# Offset for packing (category_id, supplier_id) into one int64 key
+SUPPLIER_KEY_FACTOR = 2 ** 32
+
+
+@dataclass
+class TransactionArrays:
+    """Column arrays for a set of transactions; amounts are positive only."""
+
+    ids: np.ndarray
+    category_ids: np.ndarray
+    supplier_ids: np.ndarray
+    amounts: np.ndarray
+    dates: np.ndarray  # datetime64[D]
+
+    @classmethod
+    def from_queryset(cls, queryset) -> 'TransactionArrays':
+        """
+        Fetch the columns in one query.
+
+        Non-positive amounts (credits, reversals) have no log-amount and are
+        left out of both the baselines and the scoring.
+        """
+        rows = list(
+            queryset.filter(amount__gt=0).order_by().values_list(
+                'id', 'category_id', 'supplier_id', 'amount', 'date'
+            )
+        )
+        if not rows:
+            return cls.empty()
+
+        ids, category_ids, supplier_ids, amounts, dates = zip(*rows)
+        return cls(
+            ids=np.array(ids, dtype=np.int64),
+            category_ids=np.array(category_ids, dtype=np.int64),
+            supplier_ids=np.array(supplier_ids, dtype=np.int64),
+            amounts=np.array(amounts, dtype=float),
+            dates=np.array(dates, dtype='datetime64[D]'),
+        )
+
+    @classmethod
+    def empty(cls) -> 'TransactionArrays':
+        return cls(
+            ids=np.empty(0, dtype=np.int64),
+            category_ids=np.empty(0, dtype=np.int64),
+            supplier_ids=np.empty(0, dtype=np.int64),
+            amounts=np.empty(0, dtype=float),
+            dates=np.empty(0, dtype='datetime64[D]'),
+        )
+
+    @property
+    def log_amounts(self) -> np.ndarray:
+        return np.log(self.amounts)
+
+    @property
+    def supplier_keys(self) -> np.ndarray:
+        return self.category_ids * SUPPLIER_KEY_FACTOR + self.supplier_ids
+
+
+def _group_medians(keys: np.ndarray, values: np.ndarray):
+    """
+    Median of values per key, vectorized.
+
+    Returns:
+        (unique sorted keys, medians, counts)
+    """
+    order = np.lexsort((values, keys))
+    sorted_keys = keys[order]
+    sorted_values = values[order]
+    unique_keys, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+    lower = starts + (counts - 1) // 2
+    upper = starts + counts // 2
+    return unique_keys, (sorted_values[lower] + sorted_values[upper]) / 2, counts
+
+
+@dataclass
+class GroupStats:
+    """Robust location/scale of log(amount) per group key."""
+
+    keys: np.ndarray
+    medians: np.ndarray
+    scales: np.ndarray
+    counts: np.ndarray
+    means: np.ndarray  # arithmetic mean of amounts, for reporting
+
+    @classmethod
+    def compute(cls, keys: np.ndarray, log_amounts: np.ndarray) -> 'GroupStats':
+        if keys.size == 0:
+            empty = np.empty(0)
+            return cls(np.empty(0, dtype=np.int64), empty, empty, np.empty(0, dtype=np.int64), empty)
+
+        unique_keys, medians, counts = _group_medians(keys, log_amounts)
+        index = np.searchsorted(unique_keys, keys)
+        deviations = np.abs(log_amounts - medians[index])
+
+        _, mad, _ = _group_medians(keys, deviations)
+        mean_ad = np.bincount(index, weights=deviations) / counts
+        scales = np.where(mad > 0, mad / MAD_SCALE, mean_ad * MEAN_AD_SCALE)
+        means = np.bincount(index, weights=np.exp(log_amounts)) / counts
+
+        return cls(unique_keys, medians, scales, counts, means)
+
+    def lookup(self, keys: np.ndarray):
+        """
+        Align group statistics with an array of keys.
+
+        Returns:
+            (index into this object's arrays, mask of keys that have stats)
+        """
+        if self.keys.size == 0:
+            return np.zeros(keys.size, dtype=np.int64), np.zeros(keys.size, dtype=bool)
+        index = np.clip(np.searchsorted(self.keys, keys), 0, self.keys.size - 1)
+        return index, self.keys[index] == keys
+
+    def z_scores(self, keys: np.ndarray, log_amounts: np.ndarray, min_count: int):
+        """
+        Robust z-scores against each key's group.
+
+        Returns:
+            (index into this object's arrays, z-scores, mask of rows whose group
+            has at least min_count members and a non-zero scale; z is 0 elsewhere)
+        """
+        index, found = self.lookup(keys)
+        z = np.zeros(keys.size)
+        if not found.any():
+            return index, z, found
+
+        valid = found & (self.counts[index] >= min_count) & (self.scales[index] > 0)
+        z[valid] = (log_amounts[valid] - self.medians[index[valid]]) / self.scales[index[valid]]
+        return index, z, valid
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field).tolist() for field in ('keys', 'medians', 'scales', 'counts', 'means')}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'GroupStats':
+        return cls(
+            keys=np.array(data['keys'], dtype=np.int64),
+            medians=np.array(data['medians'], dtype=float),
+            scales=np.array(data['scales'], dtype=float),
+            counts=np.array(data['counts'], dtype=np.int64),
+            means=np.array(data['means'], dtype=float),
+        )
+
+
+class TransactionAnomalyEngine:
+    """
+    Scores transactions against cached category and supplier baselines.
+
+    Usage:
+        engine = TransactionAnomalyEngine(org.id, filters)
+        groups = engine.detect(queryset, threshold=2.0)
+        batch_groups = engine.detect_batch(batch_qs, baseline_qs, threshold=2.0)
+    """
+
+    CACHE_PREFIX = "anomaly_stats"
+    STATS_TTL = 86400  # 24 hours
+
+    def __init__(self, organization_id: int, filters: dict = None):
+        self.organization_id = organization_id
+        filters_hash = hashlib.sha256(
+            json.dumps(filters or {}, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        version = self.get_version(organization_id)
+        self.cache_key = f"{self.CACHE_PREFIX}:{organization_id}:{version}:{filters_hash}"
+
+    @classmethod
+    def _version_key(cls, organization_id: int) -> str:
+        return f"{cls.CACHE_PREFIX}:version:{organization_id}"
+
+    @staticmethod
+    def _initial_version() -> int:
+        """Time-based seed, so an evicted counter never reuses an old version."""
+        return int(time.time() * 1000)
+
+    @classmethod
+    def get_version(cls, organization_id: int):
+        """Current baseline version for an organization; a missing counter is initialized."""
+        key = cls._version_key(organization_id)
+        try:
+            version = cache.get(key)
+            if version is None:
+                cache.add(key, cls._initial_version(), None)
+                version = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Anomaly baseline version unavailable: {e}")
+            version = None
+        return version
+
+    @classmethod
+    def invalidate(cls, organization_id: int) -> None:
+        """Orphan every cached baseline of an organization, for all filter sets."""
+        key = cls._version_key(organization_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Counter missing (never read or evicted)
+            cache.set(key, cls._initial_version(), None)
+
+    def build_stats(self, arrays: TransactionArrays) -> dict:
+        """Compute category and supplier baselines and cache them."""
+        log_amounts = arrays.log_amounts
+        stats = {
+            'category': GroupStats.compute(arrays.category_ids, log_amounts),
+            'supplier': GroupStats.compute(arrays.supplier_keys, log_amounts),
+        }
+        try:
+            cache.set(
+                self.cache_key,
+                {name: group.to_dict() for name, group in stats.items()},
+                self.STATS_TTL
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache anomaly baselines: {e}")
+        return stats
+
+    def get_cached_stats(self) -> dict:
+        """Return cached baselines, or None."""
+        try:
+            data = cache.get(self.cache_key)
+        except Exception as e:
+            logger.warning(f"Failed to read anomaly baselines: {e}")
+            return None
+        if not data:
+            return None
+        return {name: GroupStats.from_dict(group) for name, group in data.items()}
+
+    def detect(self, queryset, threshold: float, top_k: int = TOP_PER_GROUP) -> list:
+        """Full scan: build baselines from the queryset and score every row."""
+        arrays = TransactionArrays.from_queryset(queryset)
+        stats = self.build_stats(arrays)
+        return self.score(arrays, stats, threshold, top_k)
+
+    def detect_batch(self, batch_queryset, baseline_queryset, threshold: float,
+                     top_k: int = TOP_PER_GROUP) -> list:
+        """
+        Incremental scan: score only the batch against cached baselines.
+
+        Baselines are rebuilt from baseline_queryset when the cache is cold.
+        """
+        stats = self.get_cached_stats()
+        if stats is None:
+            stats = self.build_stats(TransactionArrays.from_queryset(baseline_queryset))
+        arrays = TransactionArrays.from_queryset(batch_queryset)
+        return self.score(arrays, stats, threshold, top_k)
+
+    @staticmethod
+    def score(arrays: TransactionArrays, stats: dict, threshold: float,
+              top_k: int = TOP_PER_GROUP) -> list:
+        """
+        Flag transactions whose robust z-score exceeds the threshold.
+
+        Returns:
+            One dict per category with anomalies, holding the baseline and the
+            top_k anomalies by |z| (ids, amounts, dates, z-scores).
+        """
+        if arrays.ids.size == 0:
+            return []
+
+        log_amounts = arrays.log_amounts
+        category_stats = stats['category']
+        supplier_stats = stats['supplier']
+
+        cat_index, z_category, eligible = category_stats.z_scores(
+            arrays.category_ids, log_amounts, MIN_GROUP_SIZE
+        )
+        _, z_supplier, own_history = supplier_stats.z_scores(
+            arrays.supplier_keys, log_amounts, MIN_SUPPLIER_HISTORY
+        )
+
+        # With supplier history, the weaker of the two signals decides
+        same_direction = np.sign(z_category) == np.sign(z_supplier)
+        z = np.where(
+            own_history,
+            np.where(same_direction, np.sign(z_category) * np.minimum(np.abs(z_category), np.abs(z_supplier)), 0.0),
+            z_category
+        )
+
+        flagged = np.flatnonzero(eligible & (np.abs(z) > threshold))
+        if flagged.size == 0:
+            return []
+
+        # Rank within each category by |z| and keep the top_k
+        order = flagged[np.lexsort((-np.abs(z[flagged]), arrays.category_ids[flagged]))]
+        group_keys = arrays.category_ids[order]
+        unique_categories, starts, counts = np.unique(group_keys, return_index=True, return_counts=True)
+        high_counts = np.bincount(
+            np.searchsorted(unique_categories, group_keys), weights=(z[order] > 0), minlength=unique_categories.size
+        )
+
+        groups = []
+        for category_id, start, count, high_count in zip(unique_categories, starts, counts, high_counts):
+            top = order[start:start + min(count, top_k)]
+            stats_index = cat_index[top[0]]
+            median = category_stats.medians[stats_index]
+            scale = category_stats.scales[stats_index]
+            groups.append({
+                'category_id': int(category_id),
+                'median_amount': float(np.exp(median)),
+                'mean_amount': float(category_stats.means[stats_index]),
+                'log_scale': float(scale),
+                'threshold_upper': float(np.exp(median + threshold * scale)),
+                'threshold_lower': float(np.exp(median - threshold * scale)),
+                'baseline_count': int(category_stats.counts[stats_index]),
+                'anomaly_count': int(count),
+                'high_count': int(high_count),
+                'low_count': int(count - high_count),
+                'anomalies': [
+                    {
+                        'id': int(arrays.ids[i]),
+                        'supplier_id': int(arrays.supplier_ids[i]),
+                        'amount': float(arrays.amounts[i]),
+                        'date': str(arrays.dates[i]),
+                        'z_score': round(float(z[i]), 2),
+                    }
+                    for i in top
+                ],
+            })
+
+        return groups
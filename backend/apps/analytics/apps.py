@@ -5,3 +5,7 @@ class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.analytics'
     verbose_name = 'Analytics'
+
+    def ready(self):
+        """Import signals to register receivers."""
+        import apps.analytics.signals  # noqa: F401
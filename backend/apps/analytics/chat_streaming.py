@@ -0,0 +1,235 @@
+"""
+Streaming AI Chat.
+
+Assembles and streams chat responses for the ai_chat_stream and
+ai_quick_query endpoints:
+
+- Preamble: a 'started' SSE event is the first thing yielded, before any
+  context is loaded or the provider is called, so clients get bytes at once
+- Context: spend totals, top suppliers and top categories are computed
+  server-side and cached in the 'chat_context' lookup cache, which the
+  procurement signals invalidate whenever the organization's data changes
+- Client: one Anthropic client per API key per process, reusing its
+  connection pool across requests
+- Metrics: time to first token, output tokens per second and total latency
+  are logged to LLMRequestLog through the batched telemetry buffer
+
+Usage:
+    events = stream_chat(organization, messages, model, max_tokens, api_key)
+    return StreamingHttpResponse(events, content_type='text/event-stream')
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from django.db.models import Count, Max, Min, Sum
+
+from .ai_providers import LLMRequestMetrics
+from .llm_telemetry import log_llm_request
+from .tiered_cache import lookup_cache
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_NAMESPACE = 'chat_context'
+TOP_N = 5
+
+_clients: Dict[str, object] = {}
+_clients_lock = threading.Lock()
+
+
+def sse_event(payload: dict) -> str:
+    """Format a payload as a Server-Sent Events data frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def get_anthropic_client(api_key: str):
+    """Process-wide Anthropic client for an API key."""
+    with _clients_lock:
+        if api_key not in _clients:
+            import anthropic
+            _clients[api_key] = anthropic.Anthropic(api_key=api_key)
+        return _clients[api_key]
+
+
+def _load_chat_context(organization_id: int) -> dict:
+    from apps.procurement.models import Transaction
+
+    transactions = Transaction.objects.filter(organization_id=organization_id).order_by()
+    totals = transactions.aggregate(
+        total_spend=Sum('amount'),
+        transaction_count=Count('id'),
+        supplier_count=Count('supplier', distinct=True),
+        category_count=Count('category', distinct=True),
+        first_date=Min('date'),
+        last_date=Max('date'),
+    )
+
+    def top(field):
+        rows = (
+            transactions.values(field)
+            .annotate(spend=Sum('amount'), transactions=Count('id'))
+            .order_by('-spend')[:TOP_N]
+        )
+        return [
+            {'name': row[field], 'spend': float(row['spend']), 'transactions': row['transactions']}
+            for row in rows
+        ]
+
+    return {
+        'total_spend': float(totals['total_spend'] or 0),
+        'transaction_count': totals['transaction_count'],
+        'supplier_count': totals['supplier_count'],
+        'category_count': totals['category_count'],
+        'date_range': {
+            'start': totals['first_date'].isoformat() if totals['first_date'] else None,
+            'end': totals['last_date'].isoformat() if totals['last_date'] else None,
+        },
+        'top_suppliers': top('supplier__name'),
+        'top_categories': top('category__name'),
+    }
+
+
+def get_chat_context(organization_id: int) -> dict:
+    """Server-side procurement summary for an organization, cached per data generation."""
+    return lookup_cache(CONTEXT_NAMESPACE).get_or_set(
+        organization_id, 'summary', lambda: _load_chat_context(organization_id)
+    )
+
+
+def build_chat_system_prompt(organization, context: dict = None) -> str:
+    """Build system prompt for chat with organization context."""
+    context = context or {}
+
+    context_str = ""
+    if context:
+        context_str = f"""
+
+Current Data Context:
+- Total Spend: ${context.get('total_spend', 0):,.2f}
+- Transaction Count: {context.get('transaction_count', 0):,}
+- Supplier Count: {context.get('supplier_count', 0)}
+- Category Count: {context.get('category_count', 0)}"""
+
+        for label, key in (('Top Suppliers', 'top_suppliers'), ('Top Categories', 'top_categories')):
+            if context.get(key):
+                lines = '\n'.join(f"  - {row['name']}: ${row['spend']:,.2f}" for row in context[key])
+                context_str += f"\n- {label}:\n{lines}"
+
+    return f"""You are an AI procurement analytics assistant for {organization.name}.
+You help users understand their procurement data, identify cost savings opportunities,
+analyze supplier performance, and answer questions about their spending patterns.
+
+Guidelines:
+- Be concise and actionable in your responses
+- Reference specific data when available
+- Suggest follow-up questions or analyses when appropriate
+- Flag any concerning patterns or risks
+- Use clear formatting with bullet points for lists
+- Include confidence levels when making estimates or projections
+
+When uncertain, ask clarifying questions rather than guessing.
+{context_str}"""
+
+
+def _model_tier(model: str) -> str:
+    if 'haiku' in model:
+        return 'haiku'
+    if 'opus' in model:
+        return 'opus'
+    return 'sonnet'
+
+
+def stream_chat(
+    organization,
+    messages: List[dict],
+    model: str,
+    max_tokens: int,
+    api_key: str,
+    include_context: bool = True
+) -> Iterator[str]:
+    """
+    Stream a chat response as SSE frames.
+
+    Yields the preamble first, then loads the (cached) organization context,
+    then provider tokens, then a 'done' frame with usage and latency
+    metrics. The request is logged when the stream ends, including on error
+    or client disconnect.
+    """
+    started = time.perf_counter()
+    yield sse_event({'status': 'started', 'model': model})
+
+    metrics = LLMRequestMetrics(
+        provider='anthropic', model=model, model_tier=_model_tier(model), request_type='chat'
+    )
+    first_token_at = None
+
+    try:
+        context = {}
+        if include_context:
+            try:
+                context = get_chat_context(organization.id)
+            except Exception as e:
+                logger.warning(f"Chat context unavailable for org {organization.id}: {e}")
+
+        client = get_anthropic_client(api_key)
+        with client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            system=build_chat_system_prompt(organization, context),
+            messages=messages,
+        ) as stream:
+            for text in stream.text_stream:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    metrics.ttft_ms = int((first_token_at - started) * 1000)
+                yield sse_event({'token': text})
+
+            final_message = stream.get_final_message()
+
+        metrics.tokens_input = final_message.usage.input_tokens
+        metrics.tokens_output = final_message.usage.output_tokens
+        metrics.latency_ms = int((time.perf_counter() - started) * 1000)
+        if first_token_at is not None:
+            generation_seconds = time.perf_counter() - first_token_at
+            if generation_seconds > 0:
+                metrics.tokens_per_second = round(metrics.tokens_output / generation_seconds, 1)
+
+        usage = {
+            'input_tokens': metrics.tokens_input,
+            'output_tokens': metrics.tokens_output,
+        }
+        timing = {
+            'ttft_ms': metrics.ttft_ms,
+            'tokens_per_second': metrics.tokens_per_second,
+            'latency_ms': metrics.latency_ms,
+        }
+        yield sse_event({'done': True, 'usage': usage, 'metrics': timing})
+
+    except Exception as e:
+        metrics.error = str(e)
+        yield sse_event({'error': str(e)})
+
+    finally:
+        if not metrics.latency_ms:
+            metrics.latency_ms = int((time.perf_counter() - started) * 1000)
+        try:
+            log_llm_request(
+                organization_id=organization.id,
+                request_type=metrics.request_type,
+                model_used=metrics.model,
+                model_tier=metrics.model_tier,
+                provider=metrics.provider,
+                tokens_input=metrics.tokens_input,
+                tokens_output=metrics.tokens_output,
+                latency_ms=metrics.latency_ms,
+                ttft_ms=metrics.ttft_ms,
+                tokens_per_second=metrics.tokens_per_second,
+                cost_usd=metrics.cost_usd,
+                error_occurred=bool(metrics.error),
+                error_message=metrics.error or '',
+            )
+        except Exception as e:
+            logger.warning(f"Failed to log chat stream: {e}")
@@ -19,6 +19,9 @@ from apps.procurement.models import (
     SpendingPolicy,
     PolicyViolation
 )
+from .tiered_cache import lookup_cache
+
+SPENDING_POLICY_CACHE = 'spending_policies'
 
 
 class ComplianceService:
@@ -36,9 +39,13 @@ class ComplianceService:
         self.organization = organization
         self.transactions = Transaction.objects.filter(organization=organization)
         self.contracts = Contract.objects.filter(organization=organization)
-        self.policies = SpendingPolicy.objects.filter(
-            organization=organization,
-            is_active=True
+        self.policies = lookup_cache(SPENDING_POLICY_CACHE).get_or_set(
+            organization.id,
+            'active',
+            lambda: list(SpendingPolicy.objects.filter(
+                organization=organization,
+                is_active=True
+            ))
         )
         self.violations = PolicyViolation.objects.filter(organization=organization)
 
@@ -98,7 +105,7 @@ class ComplianceService:
             'maverick_spend': maverick_spend,
             'maverick_percentage': round(maverick_percentage, 1),
             'on_contract_spend': on_contract_spend,
-            'active_policies': self.policies.count(),
+            'active_policies': len(self.policies),
         }
 
     def get_maverick_spend_analysis(self):
@@ -496,7 +503,7 @@ class ComplianceService:
         Returns:
             list: Active spending policies with rule summaries
         """
-        policies = self.policies.all()
+        policies = self.policies
 
         return [
             {
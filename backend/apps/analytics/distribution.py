@@ -0,0 +1,161 @@
+"""
+Distribution statistics for duration metrics.
+
+Summarizes a DurationField annotation (e.g. paid_date - invoice_date) as
+count, mean, p50/p90/p95 and a fixed-bin histogram, all in days.
+
+- PostgreSQL: one query aggregating over the durations as a derived table,
+  using percentile_cont for percentiles and FILTER counts for histogram bins
+- Other backends (SQLite in tests/development): durations are fetched with
+  values_list(flat=True) and summarized with NumPy
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import connections
+
+PERCENTILES = (50, 90, 95)
+
+# Histogram bin edges in days; the last bin is open-ended
+HISTOGRAM_EDGES = (0, 3, 7, 14, 30, 60, 90)
+
+SECONDS_PER_DAY = 86400
+
+
+def _histogram_bins():
+    """(label, min_days, max_days) for each bin; max_days is None for the last."""
+    bins = []
+    for i, low in enumerate(HISTOGRAM_EDGES):
+        if i + 1 < len(HISTOGRAM_EDGES):
+            high = HISTOGRAM_EDGES[i + 1] - 1
+            bins.append((f'{low}-{high}', low, high))
+        else:
+            bins.append((f'{low}+', low, None))
+    return bins
+
+
+HISTOGRAM_BINS = _histogram_bins()
+
+
+def _to_days(value):
+    if value is None:
+        return 0.0
+    if isinstance(value, timedelta):
+        return value.total_seconds() / SECONDS_PER_DAY
+    return float(value)
+
+
+def empty_distribution():
+    """Stats for an empty sample (all zeros)."""
+    return _format_stats(0, None, [None] * len(PERCENTILES), [0] * len(HISTOGRAM_BINS))
+
+
+def _format_stats(count, avg, percentiles, bin_counts):
+    stats = {
+        'count': count,
+        'avg_days': round(_to_days(avg), 1),
+    }
+    for p, value in zip(PERCENTILES, percentiles):
+        stats[f'p{p}_days'] = round(_to_days(value), 1)
+    stats['histogram'] = [
+        {'bin': label, 'min_days': low, 'max_days': high, 'count': int(n)}
+        for (label, low, high), n in zip(HISTOGRAM_BINS, bin_counts)
+    ]
+    return stats
+
+
+def _postgres_distribution(queryset, field, group_by=None):
+    """
+    Aggregate over the queryset as a derived table.
+
+    Each duration is computed once by the inner query, even when it comes
+    from a correlated subquery, and then fed to every aggregate.
+    """
+    columns = [group_by, field] if group_by else [field]
+    inner_query = queryset.order_by().values_list(*columns).query
+    inner_sql, inner_params = inner_query.get_compiler(using=queryset.db).as_sql()
+
+    select = ['COUNT(d)', 'AVG(d)']
+    select += [
+        f'PERCENTILE_CONT({p / 100}) WITHIN GROUP (ORDER BY d)'
+        for p in PERCENTILES
+    ]
+    bin_params = []
+    for _, low, high in HISTOGRAM_BINS:
+        if high is None:
+            select.append('COUNT(*) FILTER (WHERE d >= %s)')
+            bin_params.append(timedelta(days=low))
+        else:
+            select.append('COUNT(*) FILTER (WHERE d >= %s AND d < %s)')
+            bin_params.extend([timedelta(days=low), timedelta(days=high + 1)])
+
+    if group_by:
+        sql = (
+            f"SELECT g, {', '.join(select)} FROM ({inner_sql}) AS dist (g, d) "
+            f"WHERE d IS NOT NULL GROUP BY g ORDER BY g"
+        )
+    else:
+        sql = f"SELECT {', '.join(select)} FROM ({inner_sql}) AS dist (d) WHERE d IS NOT NULL"
+
+    with connections[queryset.db].cursor() as cursor:
+        # Bin bounds appear before the inner query in the SQL text
+        cursor.execute(sql, (*bin_params, *inner_params))
+        rows = cursor.fetchall()
+
+    if not group_by:
+        return _stats_from_row(rows[0])
+    return {row[0]: _stats_from_row(row[1:]) for row in rows}
+
+
+def _stats_from_row(row):
+    count, avg = row[0], row[1]
+    if not count:
+        return empty_distribution()
+    n_percentiles = len(PERCENTILES)
+    return _format_stats(count, avg, row[2:2 + n_percentiles], row[2 + n_percentiles:])
+
+
+def _stats_from_array(days):
+    if days.size == 0:
+        return empty_distribution()
+    edges = [float(edge) for edge in HISTOGRAM_EDGES] + [np.inf]
+    bin_counts, _ = np.histogram(days, bins=edges)
+    return _format_stats(
+        int(days.size),
+        float(days.mean()),
+        np.percentile(days, PERCENTILES).tolist(),
+        bin_counts.tolist()
+    )
+
+
+def _days_array(durations):
+    return np.fromiter(
+        (_to_days(value) for value in durations if value is not None),
+        dtype=float
+    )
+
+
+def duration_distribution(queryset, field, group_by=None):
+    """
+    Summarize a duration annotation in days.
+
+    Args:
+        queryset: QuerySet annotated with `field` as a DurationField
+        field: Name of the duration annotation
+        group_by: Optional field name; returns one distribution per group value
+
+    Returns:
+        Stats dict (count, avg_days, p50_days, p90_days, p95_days, histogram),
+        or {group_value: stats} when group_by is given
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        return _postgres_distribution(queryset, field, group_by)
+
+    if group_by is None:
+        return _stats_from_array(_days_array(queryset.values_list(field, flat=True)))
+
+    pairs = queryset.values_list(group_by, field).order_by(group_by)
+    grouped = {}
+    for key, value in pairs:
+        grouped.setdefault(key, []).append(value)
+    return {key: _stats_from_array(_days_array(values)) for key, values in grouped.items()}
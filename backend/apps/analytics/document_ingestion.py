@@ -7,13 +7,17 @@ the EmbeddedDocument model for RAG-enhanced AI insights:
 - Historical successful insights from InsightFeedback model
 - Manual ingestion for policies, contracts, best practices
 
-Uses OpenAI text-embedding-3-small for generating embeddings.
+Embeddings come from the shared embedding service (see embeddings.py).
 """
 import logging
 from typing import Optional, List
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.utils import timezone
+
+from .embeddings import get_embedding_service
 
 logger = logging.getLogger(__name__)
 
@@ -24,15 +28,17 @@ class DocumentIngestionService:
 
     Features:
     - Automatic embedding generation
-    - Deduplication via content hashing
+    - Deduplication via content hashing (unchanged documents are not re-embedded)
+    - Incremental refresh of suppliers touched since the last run
     - Source tracking for updates
     - Batch processing for efficiency
     """
 
-    EMBEDDING_MODEL = "text-embedding-3-small"
-    EMBEDDING_DIMENSIONS = 1536
     MAX_CONTENT_LENGTH = 8000
     BATCH_SIZE = 10
+    WATERMARK_PREFIX = "rag_ingestion:watermark"
+    DELETED_SUPPLIERS_PREFIX = "rag_ingestion:deleted_suppliers"
+    DEFAULT_FULL_REFRESH_INTERVAL = 2419200  # 28 days
 
     def __init__(self, organization_id: int, openai_api_key: str = None):
         """
@@ -46,72 +52,32 @@ class DocumentIngestionService:
         self.openai_api_key = openai_api_key or getattr(
             settings, 'OPENAI_API_KEY', None
         )
-        self._openai_client = None
-
-    @property
-    def openai_client(self):
-        """Lazy-load OpenAI client."""
-        if self._openai_client is None and self.openai_api_key:
-            try:
-                import openai
-                self._openai_client = openai.OpenAI(api_key=self.openai_api_key)
-            except ImportError:
-                logger.warning("openai package not installed")
-        return self._openai_client
+        self.embeddings = get_embedding_service(self.openai_api_key)
 
     def _get_embedding(self, text: str) -> Optional[list]:
         """Generate embedding for text."""
-        if not self.openai_client:
-            return None
-
-        try:
-            truncated = text[:self.MAX_CONTENT_LENGTH]
-
-            response = self.openai_client.embeddings.create(
-                model=self.EMBEDDING_MODEL,
-                input=truncated,
-                dimensions=self.EMBEDDING_DIMENSIONS
-            )
-
-            return response.data[0].embedding
-
-        except Exception as e:
-            logger.error(f"Embedding generation failed: {e}")
-            return None
+        return self.embeddings.embed(text[:self.MAX_CONTENT_LENGTH])
 
     def _get_batch_embeddings(self, texts: List[str]) -> List[Optional[list]]:
         """Generate embeddings for multiple texts in a batch."""
-        if not self.openai_client or not texts:
-            return [None] * len(texts)
-
-        try:
-            truncated = [t[:self.MAX_CONTENT_LENGTH] for t in texts]
-
-            response = self.openai_client.embeddings.create(
-                model=self.EMBEDDING_MODEL,
-                input=truncated,
-                dimensions=self.EMBEDDING_DIMENSIONS
-            )
-
-            return [item.embedding for item in response.data]
-
-        except Exception as e:
-            logger.error(f"Batch embedding generation failed: {e}")
-            return [None] * len(texts)
+        return self.embeddings.embed_many([t[:self.MAX_CONTENT_LENGTH] for t in texts])
 
     def ingest_supplier_profiles(self, supplier_ids: List[int] = None) -> dict:
         """
         Ingest supplier profiles into EmbeddedDocument.
 
         Creates or updates documents for each supplier with their
-        profile information for RAG context.
+        profile information for RAG context. Spend statistics for all
+        suppliers come from one grouped query, and suppliers whose profile
+        content hash matches the stored document are skipped without
+        embedding or writing.
 
         Args:
             supplier_ids: Optional list of specific supplier IDs to ingest.
                          If None, ingests all suppliers for the organization.
 
         Returns:
-            Dict with counts of created, updated, and failed documents
+            Dict with counts of created, updated, unchanged, and failed documents
         """
         from apps.procurement.models import Supplier
         from .models import EmbeddedDocument
@@ -125,24 +91,36 @@ class DocumentIngestionService:
             qs = qs.filter(id__in=supplier_ids)
 
         suppliers = list(qs)
+        stats = self._get_supplier_stats([s.id for s in suppliers])
+        existing_hashes = dict(
+            EmbeddedDocument.objects.filter(
+                organization_id=self.organization_id,
+                source_model='Supplier',
+                source_id__in=[str(s.id) for s in suppliers]
+            ).values_list('source_id', 'content_hash')
+        )
+
+        pending = []
+        unchanged = 0
+        for supplier in suppliers:
+            content = self._build_supplier_content(supplier, stats.get(supplier.id))
+            existing_hash = existing_hashes.get(str(supplier.id))
+            if existing_hash == EmbeddedDocument.hash_content(content):
+                unchanged += 1
+            else:
+                pending.append((supplier, content, existing_hash is not None))
+
         created = 0
         updated = 0
         failed = 0
 
-        for i in range(0, len(suppliers), self.BATCH_SIZE):
-            batch = suppliers[i:i + self.BATCH_SIZE]
-            contents = [self._build_supplier_content(s) for s in batch]
-            embeddings = self._get_batch_embeddings(contents)
+        for i in range(0, len(pending), self.BATCH_SIZE):
+            batch = pending[i:i + self.BATCH_SIZE]
+            embeddings = self._get_batch_embeddings([content for _, content, _ in batch])
 
-            for supplier, content, embedding in zip(batch, contents, embeddings):
+            for (supplier, content, exists), embedding in zip(batch, embeddings):
                 try:
-                    existing = EmbeddedDocument.objects.filter(
-                        organization_id=self.organization_id,
-                        source_model='Supplier',
-                        source_id=str(supplier.id)
-                    ).first()
-
-                    doc = EmbeddedDocument.create_or_update(
+                    EmbeddedDocument.create_or_update(
                         organization_id=self.organization_id,
                         document_type='supplier_profile',
                         title=f"Supplier Profile: {supplier.name}",
@@ -157,7 +135,7 @@ class DocumentIngestionService:
                         source_id=str(supplier.id)
                     )
 
-                    if existing:
+                    if exists:
                         updated += 1
                     else:
                         created += 1
@@ -168,29 +146,47 @@ class DocumentIngestionService:
 
         logger.info(
             f"Supplier ingestion complete: {created} created, "
-            f"{updated} updated, {failed} failed"
+            f"{updated} updated, {unchanged} unchanged, {failed} failed"
         )
 
         return {
             'created': created,
             'updated': updated,
+            'unchanged': unchanged,
             'failed': failed,
             'total': len(suppliers),
         }
 
-    def _build_supplier_content(self, supplier) -> str:
-        """Build searchable content from supplier data."""
+    def _get_supplier_stats(self, supplier_ids: List[int]) -> dict:
+        """Spend statistics per supplier ID from one grouped query."""
         from apps.procurement.models import Transaction
         from django.db.models import Sum, Count, Avg
 
-        stats = Transaction.objects.filter(
-            supplier=supplier
-        ).aggregate(
+        if not supplier_ids:
+            return {}
+
+        rows = Transaction.objects.filter(
+            organization_id=self.organization_id,
+            supplier_id__in=supplier_ids
+        ).order_by().values('supplier_id').annotate(
             total_spend=Sum('amount'),
             transaction_count=Count('id'),
             avg_transaction=Avg('amount')
         )
 
+        return {row.pop('supplier_id'): row for row in rows}
+
+    def _build_supplier_content(self, supplier, stats: dict = None) -> str:
+        """
+        Build searchable content from supplier data.
+
+        Args:
+            supplier: Supplier instance
+            stats: Precomputed spend statistics (queried for this supplier if None)
+        """
+        if stats is None:
+            stats = self._get_supplier_stats([supplier.id]).get(supplier.id, {})
+
         content = f"""SUPPLIER PROFILE: {supplier.name}
 
 Supplier Code: {supplier.code or 'N/A'}
@@ -200,9 +196,9 @@ Address: {supplier.address or 'N/A'}
 Status: {'Active' if supplier.is_active else 'Inactive'}
 
 SPENDING STATISTICS:
-Total Historical Spend: ${stats['total_spend'] or 0:,.2f}
-Transaction Count: {stats['transaction_count'] or 0}
-Average Transaction: ${stats['avg_transaction'] or 0:,.2f}
+Total Historical Spend: ${stats.get('total_spend') or 0:,.2f}
+Transaction Count: {stats.get('transaction_count') or 0}
+Average Transaction: ${stats.get('avg_transaction') or 0:,.2f}
 
 Created: {supplier.created_at.strftime('%Y-%m-%d')}
 Last Updated: {supplier.updated_at.strftime('%Y-%m-%d')}"""
@@ -222,7 +218,7 @@ Last Updated: {supplier.updated_at.strftime('%Y-%m-%d')}"""
             limit: Max number of insights to ingest
 
         Returns:
-            Dict with counts of created, updated, and failed documents
+            Dict with counts of created, updated, unchanged, and failed documents
         """
         from .models import InsightFeedback, EmbeddedDocument
 
@@ -234,24 +230,35 @@ Last Updated: {supplier.updated_at.strftime('%Y-%m-%d')}"""
         ).order_by('-action_date')[:limit]
 
         feedbacks = list(feedbacks)
+        existing_hashes = dict(
+            EmbeddedDocument.objects.filter(
+                organization_id=self.organization_id,
+                source_model='InsightFeedback',
+                source_id__in=[str(f.id) for f in feedbacks]
+            ).values_list('source_id', 'content_hash')
+        )
+
+        pending = []
+        unchanged = 0
+        for feedback in feedbacks:
+            content = self._build_insight_content(feedback)
+            existing_hash = existing_hashes.get(str(feedback.id))
+            if existing_hash == EmbeddedDocument.hash_content(content):
+                unchanged += 1
+            else:
+                pending.append((feedback, content, existing_hash is not None))
+
         created = 0
         updated = 0
         failed = 0
 
-        for i in range(0, len(feedbacks), self.BATCH_SIZE):
-            batch = feedbacks[i:i + self.BATCH_SIZE]
-            contents = [self._build_insight_content(f) for f in batch]
-            embeddings = self._get_batch_embeddings(contents)
+        for i in range(0, len(pending), self.BATCH_SIZE):
+            batch = pending[i:i + self.BATCH_SIZE]
+            embeddings = self._get_batch_embeddings([content for _, content, _ in batch])
 
-            for feedback, content, embedding in zip(batch, contents, embeddings):
+            for (feedback, content, exists), embedding in zip(batch, embeddings):
                 try:
-                    existing = EmbeddedDocument.objects.filter(
-                        organization_id=self.organization_id,
-                        source_model='InsightFeedback',
-                        source_id=str(feedback.id)
-                    ).first()
-
-                    doc = EmbeddedDocument.create_or_update(
+                    EmbeddedDocument.create_or_update(
                         organization_id=self.organization_id,
                         document_type='historical_insight',
                         title=f"Historical Insight: {feedback.insight_title[:100]}",
@@ -269,7 +276,7 @@ Last Updated: {supplier.updated_at.strftime('%Y-%m-%d')}"""
                         source_id=str(feedback.id)
                     )
 
-                    if existing:
+                    if exists:
                         updated += 1
                     else:
                         created += 1
@@ -280,12 +287,13 @@ Last Updated: {supplier.updated_at.strftime('%Y-%m-%d')}"""
 
         logger.info(
             f"Historical insight ingestion complete: {created} created, "
-            f"{updated} updated, {failed} failed"
+            f"{updated} updated, {unchanged} unchanged, {failed} failed"
         )
 
         return {
             'created': created,
             'updated': updated,
+            'unchanged': unchanged,
             'failed': failed,
             'total': len(feedbacks),
         }
@@ -450,23 +458,136 @@ This insight was successfully implemented and achieved
             metadata=metadata
         )
 
+    def _watermark_key(self) -> str:
+        return f"{self.WATERMARK_PREFIX}:{self.organization_id}"
+
+    def get_watermark(self):
+        """Start time of the last completed refresh, or None."""
+        return cache.get(self._watermark_key())
+
+    @classmethod
+    def _full_refresh_interval(cls) -> int:
+        return getattr(settings, 'RAG_FULL_REFRESH_INTERVAL', cls.DEFAULT_FULL_REFRESH_INTERVAL)
+
+    @classmethod
+    def _deleted_suppliers_key(cls, organization_id: int) -> str:
+        return f"{cls.DELETED_SUPPLIERS_PREFIX}:{organization_id}"
+
+    @classmethod
+    def record_transaction_deleted(cls, organization_id: int, supplier_id: int) -> None:
+        """
+        Mark a supplier's profile stale after one of its transactions was deleted.
+
+        Deleted rows leave no updated_at behind, so the next incremental
+        refresh reads these marks instead.
+        """
+        if supplier_id is None:
+            return
+        key = cls._deleted_suppliers_key(organization_id)
+        supplier_ids = cache.get(key) or set()
+        if supplier_id not in supplier_ids:
+            supplier_ids.add(supplier_id)
+            cache.set(key, supplier_ids, cls._full_refresh_interval())
+
+    def _deleted_supplier_ids(self) -> set:
+        return cache.get(self._deleted_suppliers_key(self.organization_id)) or set()
+
+    def _clear_deleted_supplier_ids(self, handled: set) -> None:
+        """Drop the marks a refresh consumed, keeping any recorded meanwhile."""
+        key = self._deleted_suppliers_key(self.organization_id)
+        remaining = (cache.get(key) or set()) - handled
+        if remaining:
+            cache.set(key, remaining, self._full_refresh_interval())
+        else:
+            cache.delete(key)
+
+    def _changed_supplier_ids(self, since) -> List[int]:
+        """
+        Suppliers whose profile may have changed since a refresh.
+
+        Covers suppliers edited directly, suppliers with transactions
+        created or edited after `since` (including uploads finished after
+        it) and suppliers whose transactions were deleted.
+        """
+        from apps.procurement.models import DataUpload, Supplier, Transaction
+        from django.db.models import Q
+
+        batches = DataUpload.objects.filter(
+            Q(completed_at__gt=since) | Q(completed_at__isnull=True, created_at__gt=since),
+            organization_id=self.organization_id
+        ).values('batch_id')
+
+        supplier_ids = set(
+            Transaction.objects.filter(
+                organization_id=self.organization_id,
+                upload_batch__in=batches
+            ).order_by().values_list('supplier_id', flat=True).distinct()
+        )
+        supplier_ids.update(
+            Transaction.objects.filter(
+                organization_id=self.organization_id,
+                updated_at__gt=since
+            ).order_by().values_list('supplier_id', flat=True).distinct()
+        )
+        supplier_ids.update(
+            Supplier.objects.filter(
+                organization_id=self.organization_id,
+                updated_at__gt=since
+            ).values_list('id', flat=True)
+        )
+        supplier_ids.update(self._deleted_supplier_ids())
+        supplier_ids.discard(None)
+        return sorted(supplier_ids)
+
     @transaction.atomic
-    def refresh_all(self) -> dict:
+    def refresh_all(self, full: bool = False) -> dict:
         """
         Refresh all automatically generated documents.
 
         Re-ingests supplier profiles and historical insights.
         Manual documents (policies, contracts) are not affected.
 
+        After the first refresh, only suppliers touched since the previous
+        refresh's watermark are rebuilt; documents whose content hash is
+        unchanged are never re-embedded. The watermark expires after
+        RAG_FULL_REFRESH_INTERVAL, so a full rebuild periodically corrects
+        any profile the incremental path missed.
+
+        Args:
+            full: Rebuild every supplier profile regardless of the watermark
+
         Returns:
             Dict with results from each ingestion type
         """
+        started_at = timezone.now()
+        since = None if full else self.get_watermark()
+        deleted = self._deleted_supplier_ids()
+
+        if since is None:
+            suppliers = self.ingest_supplier_profiles()
+        else:
+            supplier_ids = self._changed_supplier_ids(since)
+            if supplier_ids:
+                suppliers = self.ingest_supplier_profiles(supplier_ids=supplier_ids)
+            else:
+                suppliers = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'total': 0}
+
         results = {
-            'suppliers': self.ingest_supplier_profiles(),
+            'suppliers': suppliers,
             'historical_insights': self.ingest_historical_insights(),
+            'incremental': since is not None,
         }
 
-        logger.info(f"Full RAG document refresh complete for org {self.organization_id}")
+        def save_watermark():
+            cache.set(self._watermark_key(), started_at, self._full_refresh_interval())
+            self._clear_deleted_supplier_ids(deleted)
+
+        transaction.on_commit(save_watermark)
+
+        logger.info(
+            f"{'Incremental' if since else 'Full'} RAG document refresh complete "
+            f"for org {self.organization_id}"
+        )
         return results
 
     def cleanup_orphaned(self) -> int:
@@ -507,6 +628,6 @@ This insight was successfully implemented and achieved
         from .models import EmbeddedDocument
 
         stats = EmbeddedDocument.get_document_stats(self.organization_id)
-        stats['openai_configured'] = self.openai_client is not None
+        stats['openai_configured'] = self.embeddings.available
 
         return stats
@@ -0,0 +1,376 @@
+"""
+Shared Embedding Service.
+
+RAG search, the semantic cache and document ingestion all embed text
+through EmbeddingService, so a given text is embedded at most once:
+
+- Cache: content-hash key (model + dimensions + text), checked in a
+  per-process LRU and then the Django cache (Redis in production); vectors
+  are stored as float32 bytes with EMBEDDING_CACHE_TTL
+- Coalescing: concurrent requests for the same uncached text share one
+  in-flight computation
+- Micro-batching: uncached texts requested concurrently within
+  EMBEDDING_BATCH_WINDOW_MS are sent in one embeddings call (up to
+  EMBEDDING_BATCH_SIZE texts), per backend and API key
+- Backends: 'openai' (text-embedding-3-small) or 'local', a deterministic
+  feature-hashing embedder for offline development and tests, selected with
+  EMBEDDING_BACKEND
+
+Usage:
+    service = get_embedding_service(api_key)
+    if service.available:
+        vector = service.embed(query)
+        vectors = service.embed_many(texts)
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+MAX_TEXT_LENGTH = 8000
+
+
+class Embedder(ABC):
+    """Turns a batch of texts into vectors with one backend call."""
+
+    name: str = "base"
+    model: str = ""
+    dimensions: int = EMBEDDING_DIMENSIONS
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def embed_batch(self, texts: List[str]) -> List[Optional[list]]:
+        """Embed texts in one call; None for texts that could not be embedded."""
+
+
+class OpenAIEmbedder(Embedder):
+    """OpenAI embeddings API; one client per API key, shared by all callers."""
+
+    name = "openai"
+    model = EMBEDDING_MODEL
+
+    _clients: Dict[str, object] = {}
+    _clients_lock = threading.Lock()
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key
+
+    @property
+    def client(self):
+        if not self.api_key:
+            return None
+        with self._clients_lock:
+            if self.api_key not in self._clients:
+                try:
+                    import openai
+                    self._clients[self.api_key] = openai.OpenAI(api_key=self.api_key)
+                except ImportError:
+                    logger.warning("openai package not installed")
+                    return None
+            return self._clients[self.api_key]
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def embed_batch(self, texts: List[str]) -> List[Optional[list]]:
+        client = self.client
+        if client is None:
+            return [None] * len(texts)
+        try:
+            response = client.embeddings.create(
+                model=self.model,
+                input=texts,
+                dimensions=self.dimensions
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except Exception as e:
+            logger.error(f"Embedding generation failed: {e}")
+            return [None] * len(texts)
+
+
+class LocalEmbedder(Embedder):
+    """
+    Deterministic feature-hashing embedder.
+
+    Each word and word bigram adds a signed weight to a hashed dimension, so
+    texts sharing vocabulary get similar vectors. No network access; meant
+    for offline development and tests, not for production relevance.
+    """
+
+    name = "local"
+    model = "local-hashing-v1"
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed_batch(self, texts: List[str]) -> List[Optional[list]]:
+        vectors = []
+        for text in texts:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % self.dimensions
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+            norm = np.linalg.norm(vector)
+            vectors.append((vector / norm).tolist() if norm else None)
+        return vectors
+
+
+EMBEDDERS: Dict[str, type] = {
+    'openai': OpenAIEmbedder,
+    'local': LocalEmbedder,
+}
+
+
+class _Batcher:
+    """
+    Coalesces and micro-batches uncached embedding requests for one embedder.
+
+    The first caller with pending work becomes the leader: it waits for the
+    batch window, then sends queued texts in batches until the queue is
+    empty. Other callers only wait on their futures.
+    """
+
+    def __init__(self, embedder: Embedder):
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._queue: List[Tuple[str, str]] = []
+        self._leader_active = False
+
+    def submit(self, items: List[Tuple[str, str]], on_result) -> Dict[str, Future]:
+        """
+        Queue (key, text) pairs and return a future per key.
+
+        on_result(key, vector) is called once per computed embedding.
+        """
+        futures = {}
+        with self._lock:
+            for key, text in items:
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._in_flight[key] = Future()
+                    self._queue.append((key, text))
+                futures[key] = future
+            lead = bool(self._queue) and not self._leader_active
+            if lead:
+                self._leader_active = True
+
+        if lead:
+            self._drain(on_result)
+        return futures
+
+    def _drain(self, on_result) -> None:
+        batch_size = getattr(settings, 'EMBEDDING_BATCH_SIZE', 64)
+        window = getattr(settings, 'EMBEDDING_BATCH_WINDOW_MS', 5) / 1000
+        with self._lock:
+            queued = len(self._queue)
+        if window and queued < batch_size:
+            time.sleep(window)
+
+        try:
+            while True:
+                with self._lock:
+                    batch, self._queue = self._queue[:batch_size], self._queue[batch_size:]
+                    if not batch:
+                        self._leader_active = False
+                        return
+                self._process(batch, on_result)
+        except BaseException:
+            # Never leave the batcher without a leader or callers without an answer
+            with self._lock:
+                leftover, self._queue = self._queue, []
+                self._leader_active = False
+            for key, _ in leftover:
+                self._resolve(key, None)
+            raise
+
+    def _process(self, batch: List[Tuple[str, str]], on_result) -> None:
+        """Embed one batch and resolve every one of its futures, with None on failure."""
+        vectors: Dict[str, list] = {}
+        try:
+            # Empty texts are answered with None; providers reject a batch containing one
+            texts = [(key, text) for key, text in batch if text.strip()]
+            if texts:
+                try:
+                    results = self.embedder.embed_batch([text for _, text in texts])
+                except Exception as e:
+                    logger.error(f"Embedding batch failed: {e}")
+                    results = []
+                if len(results) != len(texts):
+                    logger.error(f"Embedding batch returned {len(results)} vectors for {len(texts)} texts")
+                    results = []
+
+                for (key, _), vector in zip(texts, results):
+                    if vector is None:
+                        continue
+                    vectors[key] = vector
+                    try:
+                        on_result(key, vector)
+                    except Exception as e:
+                        logger.warning(f"Embedding result handler failed: {e}")
+        finally:
+            for key, _ in batch:
+                self._resolve(key, vectors.get(key))
+
+    def _resolve(self, key: str, vector: Optional[list]) -> None:
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(vector)
+
+
+class EmbeddingService:
+    """Cached, coalesced and batched embeddings for one backend and API key."""
+
+    CACHE_PREFIX = "embedding"
+    DEFAULT_TTL = 604800  # 7 days
+    DEFAULT_LOCAL_SIZE = 2048
+    WAIT_TIMEOUT = 60
+
+    _local: OrderedDict = OrderedDict()
+    _local_lock = threading.Lock()
+    _batchers: Dict[Tuple[str, str], _Batcher] = {}
+    _batchers_lock = threading.Lock()
+
+    def __init__(self, embedder: Embedder):
+        self.embedder = embedder
+        with self._batchers_lock:
+            batcher_key = (embedder.name, getattr(embedder, 'api_key', None) or '')
+            if batcher_key not in self._batchers:
+                self._batchers[batcher_key] = _Batcher(embedder)
+            self._batcher = self._batchers[batcher_key]
+
+    @property
+    def available(self) -> bool:
+        return self.embedder.available
+
+    @property
+    def dimensions(self) -> int:
+        return self.embedder.dimensions
+
+    def _cache_key(self, text: str) -> str:
+        digest = hashlib.sha256(
+            f"{self.embedder.model}:{self.embedder.dimensions}:{text}".encode()
+        ).hexdigest()
+        return f"{self.CACHE_PREFIX}:{digest}"
+
+    @staticmethod
+    def _prepare(text: str) -> str:
+        return (text or '')[:MAX_TEXT_LENGTH]
+
+    def _local_get(self, key: str) -> Optional[list]:
+        with self._local_lock:
+            vector = self._local.get(key)
+            if vector is not None:
+                self._local.move_to_end(key)
+            return vector
+
+    def _local_set(self, key: str, vector: list) -> None:
+        max_size = getattr(settings, 'EMBEDDING_CACHE_LOCAL_SIZE', self.DEFAULT_LOCAL_SIZE)
+        with self._local_lock:
+            self._local[key] = vector
+            self._local.move_to_end(key)
+            while len(self._local) > max_size:
+                self._local.popitem(last=False)
+
+    def _store(self, key: str, vector: list) -> None:
+        self._local_set(key, vector)
+        try:
+            cache.set(
+                key,
+                np.asarray(vector, dtype=np.float32).tobytes(),
+                getattr(settings, 'EMBEDDING_CACHE_TTL', self.DEFAULT_TTL)
+            )
+        except Exception as e:
+            logger.warning(f"Embedding cache store failed: {e}")
+
+    def embed(self, text: str) -> Optional[list]:
+        """Embedding for one text, or None if unavailable."""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> List[Optional[list]]:
+        """Embeddings for several texts, in order; None where unavailable."""
+        if not texts:
+            return []
+        if not self.available:
+            return [None] * len(texts)
+
+        prepared = [self._prepare(text) for text in texts]
+        keys = [self._cache_key(text) for text in prepared]
+        found: Dict[str, list] = {}
+
+        for key in keys:
+            vector = self._local_get(key)
+            if vector is not None:
+                found[key] = vector
+
+        shared_keys = [key for key in dict.fromkeys(keys) if key not in found]
+        if shared_keys:
+            try:
+                for key, raw in cache.get_many(shared_keys).items():
+                    vector = np.frombuffer(raw, dtype=np.float32).tolist()
+                    found[key] = vector
+                    self._local_set(key, vector)
+            except Exception as e:
+                logger.warning(f"Embedding cache read failed: {e}")
+
+        missing = [
+            (key, text) for key, text in dict(zip(keys, prepared)).items()
+            if key not in found
+        ]
+        if missing:
+            futures = self._batcher.submit(missing, self._store)
+            for key, future in futures.items():
+                try:
+                    vector = future.result(timeout=self.WAIT_TIMEOUT)
+                except Exception as e:
+                    logger.error(f"Embedding wait failed: {e}")
+                    vector = None
+                if vector is not None:
+                    found[key] = vector
+
+        return [found.get(key) for key in keys]
+
+    @classmethod
+    def clear_local(cls) -> None:
+        """Drop this process's embedding LRU."""
+        with cls._local_lock:
+            cls._local.clear()
+
+
+def get_embedding_service(api_key: str = None, backend: str = None) -> EmbeddingService:
+    """
+    Embedding service for the configured backend (EMBEDDING_BACKEND).
+
+    Args:
+        api_key: Provider API key (OPENAI_API_KEY by default)
+        backend: Override the configured backend name
+    """
+    backend = backend or getattr(settings, 'EMBEDDING_BACKEND', 'openai')
+    if backend not in EMBEDDERS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    api_key = api_key or getattr(settings, 'OPENAI_API_KEY', None)
+    return EmbeddingService(EMBEDDERS[backend](api_key))
@@ -0,0 +1,209 @@
+"""
+Shared spend features for the insight generators.
+
+Cost optimization, supplier risk, consolidation, the savings cap and the AI
+context all group the same transactions at overlapping grains:
+(category, subcategory, supplier), supplier, category and total. SpendFeatures
+runs one grouped query at the finest grain and derives every coarser view in
+memory, so generating all insights takes one scan of the transactions (plus
+the anomaly engine's row fetch) instead of one per generator.
+
+Blank subcategories are normalized to 'Unspecified', matching how insights
+display and identify them.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Count, Max, Min, Sum
+
+UNSPECIFIED_SUBCATEGORY = 'Unspecified'
+
+
+@dataclass
+class SupplierSpend:
+    """Spend with one supplier within some grouping."""
+
+    name: str
+    uuid: str
+    total: Decimal
+    count: int
+
+    @property
+    def avg_transaction(self) -> float:
+        return float(self.total / self.count) if self.count else 0.0
+
+
+@dataclass
+class SubcategoryGroup:
+    """Suppliers of one (category, subcategory), largest spend first."""
+
+    category: str
+    category_uuid: str
+    subcategory: str
+    suppliers: List[SupplierSpend]
+
+    @property
+    def total(self) -> Decimal:
+        return sum((s.total for s in self.suppliers), Decimal('0'))
+
+    @property
+    def transaction_count(self) -> int:
+        return sum(s.count for s in self.suppliers)
+
+    @property
+    def display_name(self) -> str:
+        if self.subcategory == UNSPECIFIED_SUBCATEGORY:
+            return self.category
+        return f"{self.category} > {self.subcategory}"
+
+
+@dataclass
+class SpendCell:
+    """One row of the grouped query: spend per (category, subcategory, supplier)."""
+
+    category_id: int
+    category_name: str
+    category_uuid: str
+    subcategory: str
+    supplier_id: int
+    supplier_name: str
+    supplier_uuid: str
+    total: Decimal
+    count: int
+    first_date: Optional[object]
+    last_date: Optional[object]
+
+
+class SpendFeatures:
+    """
+    Spend grouped by (category, subcategory, supplier), with coarser views
+    derived on first access.
+
+    Usage:
+        features = SpendFeatures.from_queryset(transactions)
+        features.total_spend
+        features.subcategory_groups
+        features.supplier_totals
+    """
+
+    def __init__(self, cells: List[SpendCell]):
+        self.cells = cells
+
+    @classmethod
+    def from_queryset(cls, queryset) -> 'SpendFeatures':
+        """Run the single grouped query."""
+        rows = queryset.values(
+            'category_id', 'category__name', 'category__uuid', 'subcategory',
+            'supplier_id', 'supplier__name', 'supplier__uuid'
+        ).annotate(
+            total=Sum('amount'),
+            count=Count('id'),
+            first_date=Min('date'),
+            last_date=Max('date'),
+        ).order_by()
+
+        return cls([
+            SpendCell(
+                category_id=row['category_id'],
+                category_name=row['category__name'],
+                category_uuid=str(row['category__uuid']),
+                subcategory=row['subcategory'] or UNSPECIFIED_SUBCATEGORY,
+                supplier_id=row['supplier_id'],
+                supplier_name=row['supplier__name'],
+                supplier_uuid=str(row['supplier__uuid']),
+                total=Decimal(str(row['total'] or 0)),
+                count=row['count'],
+                first_date=row['first_date'],
+                last_date=row['last_date'],
+            )
+            for row in rows
+        ])
+
+    @cached_property
+    def total_spend(self) -> Decimal:
+        return sum((cell.total for cell in self.cells), Decimal('0'))
+
+    @cached_property
+    def transaction_count(self) -> int:
+        return sum(cell.count for cell in self.cells)
+
+    @property
+    def avg_transaction(self) -> Decimal:
+        return self.total_spend / self.transaction_count if self.transaction_count else Decimal('0')
+
+    @cached_property
+    def supplier_count(self) -> int:
+        return len({cell.supplier_id for cell in self.cells})
+
+    @cached_property
+    def category_count(self) -> int:
+        return len({cell.category_id for cell in self.cells})
+
+    @cached_property
+    def date_range(self) -> Dict[str, Optional[str]]:
+        if not self.cells:
+            return {'earliest': None, 'latest': None}
+        return {
+            'earliest': str(min(cell.first_date for cell in self.cells)),
+            'latest': str(max(cell.last_date for cell in self.cells)),
+        }
+
+    @cached_property
+    def subcategory_groups(self) -> List[SubcategoryGroup]:
+        """
+        (category, subcategory) groups ordered by category and subcategory
+        name; suppliers within a group are ordered by spend, largest first.
+        """
+        groups: Dict[Tuple[str, str], SubcategoryGroup] = {}
+        merged: Dict[Tuple[str, str, str], SupplierSpend] = {}
+
+        for cell in self.cells:
+            group_key = (cell.category_name, cell.subcategory)
+            group = groups.get(group_key)
+            if group is None:
+                group = groups[group_key] = SubcategoryGroup(
+                    category=cell.category_name,
+                    category_uuid=cell.category_uuid,
+                    subcategory=cell.subcategory,
+                    suppliers=[],
+                )
+
+            # Rows normalized to the same subcategory share a group, so merge them
+            supplier_key = group_key + (cell.supplier_uuid,)
+            supplier = merged.get(supplier_key)
+            if supplier is None:
+                supplier = merged[supplier_key] = SupplierSpend(
+                    cell.supplier_name, cell.supplier_uuid, Decimal('0'), 0
+                )
+                group.suppliers.append(supplier)
+            supplier.total += cell.total
+            supplier.count += cell.count
+
+        for group in groups.values():
+            group.suppliers.sort(key=lambda s: (-s.total, s.name))
+
+        return [groups[key] for key in sorted(groups)]
+
+    @cached_property
+    def supplier_totals(self) -> List[SupplierSpend]:
+        """Spend per supplier across all categories, largest first."""
+        suppliers: Dict[str, SupplierSpend] = {}
+        for cell in self.cells:
+            supplier = suppliers.get(cell.supplier_uuid)
+            if supplier is None:
+                supplier = suppliers[cell.supplier_uuid] = SupplierSpend(
+                    cell.supplier_name, cell.supplier_uuid, Decimal('0'), 0
+                )
+            supplier.total += cell.total
+            supplier.count += cell.count
+        return sorted(suppliers.values(), key=lambda s: (-s.total, s.name))
+
+    @cached_property
+    def category_totals(self) -> List[Tuple[str, Decimal]]:
+        """(category name, spend) pairs, largest first."""
+        totals: Dict[str, Decimal] = {}
+        for cell in self.cells:
+            totals[cell.category_name] = totals.get(cell.category_name, Decimal('0')) + cell.total
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,71 @@
+"""
+Deterministic identity and cache keys for AI insights.
+
+Insights are recomputed on every request, so anything random or time-based
+in them (uuid4 IDs, created_at, list order) defeats every cache downstream.
+This module provides:
+
+- insight_id(): stable UUID derived from the insight type and the entities
+  it is about, so the same finding keeps the same ID across recomputations
+- canonical_json(): key-sorted, compact, type-stable serialization
+- insight_fingerprint(): hash of an insight's content, ignoring volatile and
+  internal fields
+- insights_fingerprint(): order-independent hash of a list of insights
+"""
+import hashlib
+import json
+import uuid
+from decimal import Decimal
+
+# Namespace for uuid5 insight IDs; must never change or every cached key is lost
+INSIGHT_NAMESPACE = uuid.UUID('6f1e1f0a-3c1b-5d8e-9a4f-2b7c0d9e4a11')
+
+# Fields that differ between identical recomputations or are added after generation
+VOLATILE_FIELDS = frozenset({'created_at', 'ai_analysis', 'ai_enhanced'})
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def canonical_json(value) -> str:
+    """Serialize with sorted keys and no whitespace so equal data gives equal text."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=_json_default)
+
+
+def insight_id(insight_type: str, *entities) -> str:
+    """
+    Stable ID for an insight.
+
+    Args:
+        insight_type: Insight type (cost_optimization, risk, anomaly, consolidation)
+        *entities: Identifiers of what the insight is about, e.g. category UUID
+            and subcategory, or supplier UUID
+
+    Returns:
+        UUID string, identical for identical inputs
+    """
+    return str(uuid.uuid5(INSIGHT_NAMESPACE, canonical_json([insight_type, *entities])))
+
+
+def insight_content(insight: dict) -> dict:
+    """Insight without volatile or internal (underscore-prefixed) fields."""
+    return {
+        key: value for key, value in insight.items()
+        if key not in VOLATILE_FIELDS and not key.startswith('_')
+    }
+
+
+def insight_fingerprint(insight: dict) -> str:
+    """Hash of an insight's content."""
+    return hashlib.sha256(canonical_json(insight_content(insight)).encode()).hexdigest()
+
+
+def insights_fingerprint(insights: list) -> str:
+    """Hash of a set of insights, independent of list order."""
+    fingerprints = sorted(insight_fingerprint(insight) for insight in insights)
+    return hashlib.sha256(canonical_json(fingerprints).encode()).hexdigest()
@@ -0,0 +1,387 @@
+"""
+Buffered LLM Telemetry Writer.
+
+LLM request logs and semantic cache hit counts used to be written inside the
+user-facing request after every provider call or cache hit. TelemetryBuffer
+queues them in-process and a daemon thread writes them in batches:
+
+- LLMRequestLog rows: one bulk_create per flush
+- SemanticCache hit counts: aggregated per entry and applied with one
+  UPDATE ... SET hit_count = hit_count + CASE id ... END per chunk
+
+A flush happens every LLM_TELEMETRY_FLUSH_INTERVAL seconds or as soon as
+LLM_TELEMETRY_BATCH_SIZE records are pending. Pending records are drained at
+interpreter exit and on Celery worker process shutdown. If more than
+LLM_TELEMETRY_MAX_PENDING logs pile up (database unavailable) the oldest are
+dropped rather than growing without bound. A flush that fails on a transient
+database error (OperationalError, InterfaceError) puts its records back in
+front of anything queued since, so they are retried on the next one. Any other
+error falls back to row-by-row writes; rows that still fail are logged and
+dropped, so one bad record cannot block the queue.
+
+On a Redis-backed cache, hit counts skip the in-process buffer: each hit is
+an HINCRBY on a shared hash, and the flush_semantic_cache_hits Celery task
+moves the accumulated deltas into the table.
+
+With LLM_TELEMETRY_ASYNC = False (tests, management commands) every record is
+written immediately.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict, deque
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import InterfaceError, OperationalError, close_old_connections, connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .ai_cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Redis hash of pending SemanticCache hit counts (entry ID -> delta); the hash
+# tag keeps the flush's RENAME target in the same cluster slot
+HITS_KEY = "semantic_cache:{hits}"
+HIT_UPDATE_CHUNK = 500
+
+# Errors worth retrying on the next flush; anything else is treated as a bad record
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError)
+
+
+def apply_hit_counts(hits: Dict[str, int]) -> int:
+    """
+    Add hit count deltas to SemanticCache rows.
+
+    Each chunk of entries is one UPDATE ... SET hit_count = hit_count +
+    CASE id WHEN ... END statement, which also stamps last_hit_at for
+    eviction recency.
+
+    Returns:
+        Number of rows updated
+    """
+    from .models import SemanticCache
+
+    items = [(entry_id, count) for entry_id, count in hits.items() if count]
+    updated = 0
+    for i in range(0, len(items), HIT_UPDATE_CHUNK):
+        chunk = items[i:i + HIT_UPDATE_CHUNK]
+        updated += SemanticCache.objects.filter(id__in=[entry_id for entry_id, _ in chunk]).update(
+            hit_count=F('hit_count') + Case(
+                *[When(id=entry_id, then=Value(count)) for entry_id, count in chunk],
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+            last_hit_at=timezone.now()
+        )
+    return updated
+
+
+class TelemetryBuffer:
+    """
+    In-process queue of pending telemetry writes with a background flusher.
+
+    Usage:
+        buffer = get_telemetry_buffer()
+        buffer.log_request(organization_id=1, request_type='enhance', ...)
+        buffer.record_cache_hit(entry_id)
+    """
+
+    DEFAULT_BATCH_SIZE = 100
+    DEFAULT_FLUSH_INTERVAL = 5.0
+    DEFAULT_MAX_PENDING = 10000
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_pending: int = None
+    ):
+        self.batch_size = batch_size or getattr(
+            settings, 'LLM_TELEMETRY_BATCH_SIZE', self.DEFAULT_BATCH_SIZE
+        )
+        self.flush_interval = flush_interval or getattr(
+            settings, 'LLM_TELEMETRY_FLUSH_INTERVAL', self.DEFAULT_FLUSH_INTERVAL
+        )
+        self.max_pending = max_pending or getattr(
+            settings, 'LLM_TELEMETRY_MAX_PENDING', self.DEFAULT_MAX_PENDING
+        )
+
+        self._logs: deque = deque()
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._logs) + len(self._hits)
+
+    def log_request(self, **fields) -> None:
+        """Queue an LLMRequestLog row."""
+        with self._lock:
+            if len(self._logs) >= self.max_pending:
+                self._logs.popleft()
+                self.dropped += 1
+            self._logs.append(fields)
+            full = len(self._logs) >= self.batch_size
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+
+    def record_cache_hit(self, entry_id) -> None:
+        """Queue a hit count increment for a SemanticCache entry."""
+        with self._lock:
+            self._hits[str(entry_id)] += 1
+        self._ensure_started()
+
+    def flush(self) -> Tuple[int, int]:
+        """
+        Write every pending record.
+
+        Returns:
+            (log rows inserted, cache entries updated)
+        """
+        from .models import LLMRequestLog
+
+        with self._flush_lock:
+            with self._lock:
+                logs = list(self._logs)
+                self._logs.clear()
+                hits = dict(self._hits)
+                self._hits.clear()
+
+            if not logs and not hits:
+                return 0, 0
+
+            inserted = 0
+            if logs:
+                try:
+                    with transaction.atomic():
+                        LLMRequestLog.objects.bulk_create(
+                            [LLMRequestLog(**fields) for fields in logs],
+                            batch_size=self.batch_size
+                        )
+                    inserted = len(logs)
+                except TRANSIENT_DB_ERRORS as e:
+                    logger.warning(f"Failed to write {len(logs)} LLM request logs; requeued: {e}")
+                    self._requeue_logs(logs)
+                except Exception as e:
+                    logger.warning(f"Batch write of {len(logs)} LLM request logs failed; writing rows singly: {e}")
+                    inserted = self._write_logs_singly(logs)
+
+            updated = 0
+            if hits:
+                try:
+                    updated = apply_hit_counts(hits)
+                except TRANSIENT_DB_ERRORS as e:
+                    logger.warning(f"Failed to update semantic cache hit counts; requeued: {e}")
+                    with self._lock:
+                        for entry_id, count in hits.items():
+                            self._hits[entry_id] += count
+                except Exception as e:
+                    logger.warning(f"Batch hit count update failed; applying entries singly: {e}")
+                    updated = self._apply_hits_singly(hits)
+
+            return inserted, updated
+
+    def _write_logs_singly(self, logs: list) -> int:
+        """Insert logs one at a time, dropping rows that fail; transient errors requeue the rest."""
+        from .models import LLMRequestLog
+
+        inserted = 0
+        for position, fields in enumerate(logs):
+            try:
+                with transaction.atomic():
+                    LLMRequestLog.objects.create(**fields)
+                inserted += 1
+            except TRANSIENT_DB_ERRORS as e:
+                logger.warning(f"Failed to write {len(logs) - position} LLM request logs; requeued: {e}")
+                self._requeue_logs(logs[position:])
+                break
+            except Exception as e:
+                with self._lock:
+                    self.dropped += 1
+                logger.error(f"Dropped LLM request log that cannot be written: {e}")
+        return inserted
+
+    def _apply_hits_singly(self, hits: Dict[str, int]) -> int:
+        """Apply hit deltas one entry at a time, dropping entries that fail."""
+        updated = 0
+        for entry_id, count in hits.items():
+            try:
+                updated += apply_hit_counts({entry_id: count})
+            except TRANSIENT_DB_ERRORS as e:
+                logger.warning(f"Failed to update semantic cache hit count; requeued: {e}")
+                with self._lock:
+                    self._hits[entry_id] += count
+            except Exception as e:
+                logger.error(f"Dropped hit count for semantic cache entry {entry_id}: {e}")
+        return updated
+
+    def _requeue_logs(self, logs: list) -> None:
+        """Put a failed batch back ahead of newer logs, dropping the oldest beyond max_pending."""
+        with self._lock:
+            self._logs.extendleft(reversed(logs))
+            while len(self._logs) > self.max_pending:
+                self._logs.popleft()
+                self.dropped += 1
+
+    def _ensure_started(self) -> None:
+        """Start the flusher thread, restarting it in a forked child."""
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='llm-telemetry-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"LLM telemetry flush failed: {e}")
+        connection.close()
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop the flusher thread and drain pending records."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"LLM telemetry drain failed: {e}")
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_telemetry_buffer() -> TelemetryBuffer:
+    """Return the process-wide telemetry buffer."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = TelemetryBuffer()
+            atexit.register(_buffer.shutdown)
+        return _buffer
+
+
+def _async_enabled() -> bool:
+    return getattr(settings, 'LLM_TELEMETRY_ASYNC', True)
+
+
+def log_llm_request(**fields) -> None:
+    """Record an LLMRequestLog row, buffered unless LLM_TELEMETRY_ASYNC is off."""
+    if _async_enabled():
+        get_telemetry_buffer().log_request(**fields)
+        return
+
+    from .models import LLMRequestLog
+    LLMRequestLog.objects.create(**fields)
+
+
+def record_semantic_cache_hit(entry_id) -> None:
+    """
+    Count a hit on a SemanticCache entry.
+
+    Accumulated in Redis when the cache is Redis-backed, otherwise in the
+    process buffer; written immediately when LLM_TELEMETRY_ASYNC is off.
+    """
+    if not _async_enabled():
+        apply_hit_counts({str(entry_id): 1})
+        return
+
+    client = get_redis_client()
+    if client is not None:
+        try:
+            client.hincrby(cache.make_key(HITS_KEY), str(entry_id), 1)
+            return
+        except Exception as e:
+            logger.warning(f"Redis hit counter unavailable, buffering in process: {e}")
+
+    get_telemetry_buffer().record_cache_hit(entry_id)
+
+
+def flush_semantic_cache_hits() -> int:
+    """
+    Move hit counts accumulated in Redis into the SemanticCache table.
+
+    The hash is renamed before it is read, so hits recorded during the flush
+    land in a fresh hash for the next run. If the database update fails the
+    deltas are added back.
+
+    Returns:
+        Number of cache entries updated
+    """
+    client = get_redis_client()
+    if client is None:
+        return 0
+
+    key = cache.make_key(HITS_KEY)
+    flushing = f"{key}:flushing:{uuid.uuid4().hex}"
+    try:
+        if not client.renamenx(key, flushing):
+            return 0
+    except Exception as e:
+        # RENAME fails when no hits were recorded since the last flush
+        if 'no such key' in str(e).lower():
+            return 0
+        raise
+
+    hits = {
+        (entry_id.decode() if isinstance(entry_id, bytes) else entry_id): int(count)
+        for entry_id, count in client.hgetall(flushing).items()
+    }
+    try:
+        updated = apply_hit_counts(hits)
+    except Exception:
+        pipe = client.pipeline(transaction=False)
+        for entry_id, count in hits.items():
+            pipe.hincrby(key, entry_id, count)
+        pipe.unlink(flushing)
+        pipe.execute()
+        raise
+
+    client.unlink(flushing)
+    return updated
+
+
+def flush_telemetry() -> Tuple[int, int]:
+    """Write pending telemetry now (no-op when nothing is buffered)."""
+    if _buffer is None:
+        return 0, 0
+    return _buffer.flush()
+
+
+try:
+    from celery.signals import worker_process_shutdown
+
+    @worker_process_shutdown.connect
+    def _drain_on_worker_shutdown(**kwargs):
+        if _buffer is not None:
+            _buffer.shutdown()
+except ImportError:
+    pass
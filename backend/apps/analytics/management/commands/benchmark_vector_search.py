@@ -0,0 +1,191 @@
+"""
+Management command to benchmark vector lookup latency against corpus size.
+
+For each corpus size, fills a temporary table with random embeddings spread
+over several organizations and runs the same organization-filtered top-k
+query the semantic cache and RAG service use, first as an exact sequential
+scan and then through an HNSW index. Reports p50/p95 latency for both, the
+index build time, and recall@k of the index against the exact results.
+
+With the organization filter the planner may prefer the btree index on
+organization_id plus an exact sort over the HNSW index, in which case the
+"HNSW" numbers would not measure the ANN index at all. Every ANN query is
+therefore EXPLAINed first and the number that actually used the HNSW index
+is reported; --force-ann drops the btree index before the ANN run so the
+planner has to use HNSW.
+
+Usage:
+    python manage.py benchmark_vector_search [--sizes 1000,10000,50000] [--queries 50] [--top-k 5]
+    python manage.py benchmark_vector_search --force-ann
+
+Runs against the configured PostgreSQL database with pgvector; nothing is
+left behind (temporary tables only). ANN settings come from
+PGVECTOR_HNSW_EF_SEARCH / PGVECTOR_ITERATIVE_SCAN, or --ef-search.
+"""
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.analytics.vector_search import HNSW_EF_CONSTRUCTION, HNSW_M, apply_search_settings
+
+ORG_INDEX = 'vector_bench_org'
+HNSW_INDEX = 'vector_bench_embedding_hnsw'
+
+QUERY = """
+    SELECT id FROM vector_bench
+    WHERE organization_id = %s
+    ORDER BY embedding <=> %s::vector
+    LIMIT %s
+"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark exact vs HNSW vector lookup latency across corpus sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000', help='Comma-separated corpus sizes')
+        parser.add_argument('--dimensions', type=int, default=1536)
+        parser.add_argument('--organizations', type=int, default=10, help='Organizations to spread rows over')
+        parser.add_argument('--queries', type=int, default=50, help='Queries per measurement')
+        parser.add_argument('--top-k', type=int, default=5)
+        parser.add_argument('--ef-search', type=int, default=None, help='Override PGVECTOR_HNSW_EF_SEARCH')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--force-ann', action='store_true',
+            help='Drop the organization_id btree index before the HNSW run so the planner must use HNSW'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Vector benchmarks require PostgreSQL with pgvector')
+
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers')
+
+        if options['ef_search']:
+            settings.PGVECTOR_HNSW_EF_SEARCH = options['ef_search']
+
+        rng = random.Random(options['seed'])
+        dims = options['dimensions']
+        queries = [
+            (rng.randint(1, options['organizations']), [rng.random() for _ in range(dims)])
+            for _ in range(options['queries'])
+        ]
+
+        self.stdout.write(
+            f"{'rows':>8} {'exact p50':>10} {'exact p95':>10} {'hnsw p50':>10} "
+            f"{'hnsw p95':>10} {'build s':>8} {'recall':>7} {'hnsw used':>10}"
+        )
+        for size in sizes:
+            row = self._benchmark(
+                size, dims, options['organizations'], queries, options['top_k'], options['force_ann']
+            )
+            self.stdout.write(
+                f"{size:>8} {row['exact_p50']:>9.1f}ms {row['exact_p95']:>9.1f}ms "
+                f"{row['ann_p50']:>9.1f}ms {row['ann_p95']:>9.1f}ms "
+                f"{row['build_seconds']:>8.1f} {row['recall']:>7.3f} "
+                f"{row['hnsw_used']:>5}/{len(queries):<4}"
+            )
+            if row['hnsw_used'] < len(queries):
+                self.stderr.write(
+                    f"  {size} rows: the planner skipped {HNSW_INDEX} for "
+                    f"{len(queries) - row['hnsw_used']} of {len(queries)} queries; "
+                    f"hnsw latency and recall are not pure ANN numbers (rerun with --force-ann)"
+                )
+
+    def _benchmark(self, size, dims, organizations, queries, top_k, force_ann) -> dict:
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS vector_bench")
+            cursor.execute(
+                f"CREATE TEMP TABLE vector_bench ("
+                f"id serial PRIMARY KEY, organization_id int NOT NULL, embedding vector({dims}))"
+            )
+            # The inner query references i so it is evaluated per row
+            cursor.execute(
+                f"""
+                INSERT INTO vector_bench (organization_id, embedding)
+                SELECT (i %% %s) + 1,
+                       (SELECT array_agg(random() + i * 0)::vector FROM generate_series(1, {dims}))
+                FROM generate_series(1, %s) AS i
+                """,
+                [organizations, size]
+            )
+            cursor.execute(f"CREATE INDEX {ORG_INDEX} ON vector_bench (organization_id)")
+            cursor.execute("ANALYZE vector_bench")
+
+        exact_times, exact_ids, _ = self._run_queries(queries, top_k, use_index=False)
+
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX {HNSW_INDEX} ON vector_bench USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+            )
+            if force_ann:
+                cursor.execute(f"DROP INDEX {ORG_INDEX}")
+            cursor.execute("ANALYZE vector_bench")
+        build_seconds = time.perf_counter() - started
+
+        ann_times, ann_ids, hnsw_used = self._run_queries(queries, top_k, use_index=True)
+
+        found = sum(len(set(exact) & set(ann)) for exact, ann in zip(exact_ids, ann_ids))
+        expected = sum(len(exact) for exact in exact_ids)
+
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE vector_bench")
+
+        return {
+            'exact_p50': statistics.median(exact_times),
+            'exact_p95': _percentile(exact_times, 95),
+            'ann_p50': statistics.median(ann_times),
+            'ann_p95': _percentile(ann_times, 95),
+            'build_seconds': build_seconds,
+            'recall': found / expected if expected else 1.0,
+            'hnsw_used': hnsw_used,
+        }
+
+    def _run_queries(self, queries, top_k, use_index):
+        """Time each query; with use_index, also count the plans that scan the HNSW index."""
+        times, ids, hnsw_used = [], [], 0
+        for organization_id, embedding in queries:
+            params = [organization_id, str(embedding), top_k]
+            with transaction.atomic(), connection.cursor() as cursor:
+                if use_index:
+                    apply_search_settings(cursor)
+                    cursor.execute(f"EXPLAIN (FORMAT JSON) {QUERY}", params)
+                    plan = cursor.fetchone()[0]
+                    if HNSW_INDEX in _plan_indexes(json.loads(plan) if isinstance(plan, str) else plan):
+                        hnsw_used += 1
+                else:
+                    cursor.execute("SET LOCAL enable_indexscan = off")
+                started = time.perf_counter()
+                cursor.execute(QUERY, params)
+                rows = cursor.fetchall()
+                times.append((time.perf_counter() - started) * 1000)
+            ids.append([row[0] for row in rows])
+        return times, ids, hnsw_used
+
+
+def _plan_indexes(plan) -> set:
+    """Names of every index scanned anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    names = set()
+    nodes = [entry['Plan'] for entry in plan]
+    while nodes:
+        node = nodes.pop()
+        if 'Index Name' in node:
+            names.add(node['Index Name'])
+        nodes.extend(node.get('Plans', []))
+    return names
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
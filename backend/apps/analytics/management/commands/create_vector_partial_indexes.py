@@ -0,0 +1,69 @@
+"""
+Management command to build per-organization partial HNSW indexes.
+
+A global HNSW index serves every organization, but a filtered query for a
+large tenant still has to walk past other tenants' neighbors. Organizations
+with at least PGVECTOR_PARTIAL_INDEX_MIN_ROWS vectors get their own partial
+index (WHERE organization_id = N), which the planner uses for their queries.
+
+Usage:
+    python manage.py create_vector_partial_indexes [--min-rows N] [--table semantic_cache|documents] [--dry-run]
+
+Safe to re-run; existing indexes are skipped. Indexes are built
+CONCURRENTLY, so tables stay writable.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.analytics.vector_search import VECTOR_TABLES, create_index_sql, partial_index_name
+
+
+class Command(BaseCommand):
+    help = 'Create partial HNSW indexes for organizations with many vectors'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=None,
+            help='Minimum vectors per organization (default: PGVECTOR_PARTIAL_INDEX_MIN_ROWS)'
+        )
+        parser.add_argument(
+            '--table',
+            choices=sorted(VECTOR_TABLES),
+            help='Only index this table'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the statements without executing them'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partial vector indexes require PostgreSQL with pgvector')
+
+        min_rows = options['min_rows'] or getattr(settings, 'PGVECTOR_PARTIAL_INDEX_MIN_ROWS', 10000)
+        table_keys = [options['table']] if options['table'] else sorted(VECTOR_TABLES)
+
+        created = 0
+        with connection.cursor() as cursor:
+            for table_key in table_keys:
+                table, column = VECTOR_TABLES[table_key]
+                cursor.execute(
+                    f"SELECT organization_id, COUNT(*) FROM {table} "
+                    f"WHERE {column} IS NOT NULL GROUP BY organization_id HAVING COUNT(*) >= %s",
+                    [min_rows]
+                )
+                for organization_id, rows in cursor.fetchall():
+                    name = partial_index_name(table_key, organization_id)
+                    sql = create_index_sql(table_key, name, where=f"organization_id = {int(organization_id)}")
+                    self.stdout.write(f"{table}: organization {organization_id} ({rows} vectors) -> {name}")
+                    if options['dry_run']:
+                        self.stdout.write(f"  {sql}")
+                        continue
+                    cursor.execute(sql)
+                    created += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{created} partial indexes created or already present'))
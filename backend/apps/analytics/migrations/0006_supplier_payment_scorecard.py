@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:55
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_embeddeddocument'),
+        ('authentication', '0010_audit_log_resolve_actions'),
+        ('procurement', '0008_remove_unique_transaction_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierPaymentScorecard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier_name', models.CharField(max_length=255)),
+                ('ap_balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('dpo', models.FloatField(default=0)),
+                ('on_time_rate', models.FloatField(default=0)),
+                ('exception_rate', models.FloatField(default=0)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('risk_level', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=10)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_payment_scorecards', to='authentication.organization')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_scorecards', to='procurement.supplier')),
+            ],
+            options={
+                'verbose_name': 'Supplier Payment Scorecard',
+                'verbose_name_plural': 'Supplier Payment Scorecards',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['organization', '-score'], name='analytics_s_organiz_a353a4_idx')],
+                'unique_together': {('organization', 'supplier')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 21:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_supplier_payment_scorecard'),
+        ('authentication', '0010_audit_log_resolve_actions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsightSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filters_key', models.CharField(help_text='Hash of the normalized filters and savings configuration', max_length=64)),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('insights', models.JSONField(default=list)),
+                ('summary', models.JSONField(default=dict)),
+                ('source', models.CharField(choices=[('nightly', 'Nightly Batch'), ('upload', 'Upload Completion')], default='nightly', max_length=20)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='insight_snapshots', to='authentication.organization')),
+            ],
+            options={
+                'verbose_name': 'Insight Snapshot',
+                'verbose_name_plural': 'Insight Snapshots',
+                'ordering': ['-computed_at'],
+                'unique_together': {('organization', 'filters_key')},
+            },
+        ),
+    ]
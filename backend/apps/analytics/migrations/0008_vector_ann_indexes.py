@@ -0,0 +1,71 @@
+# Generated by Django - Manual migration for pgvector ANN indexes
+"""
+Add HNSW indexes on the semantic cache and RAG document embeddings.
+
+Migrations 0004/0005 only created B-tree indexes, so every similarity lookup
+(ORDER BY embedding <=> query LIMIT k) was a sequential scan computing
+1536-dimensional distances over all rows. HNSW indexes with
+vector_cosine_ops serve those queries approximately in sub-linear time.
+
+Indexes are built CONCURRENTLY so existing tables stay writable. pgvector
+versions before 0.5 have no HNSW; IVFFlat is used there instead.
+
+Note: This migration is PostgreSQL-only and requires the vector extension.
+SQLite (used in tests) will skip these operations.
+"""
+
+from django.db import migrations
+
+INDEXES = [
+    ('analytics_semanticcache', 'query_embedding', 'analytics_semanticcache_embedding_ann'),
+    ('analytics_embeddeddocument', 'content_embedding', 'analytics_embeddeddocument_embedding_ann'),
+]
+
+
+def _pgvector_version(cursor):
+    cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return tuple(int(part) for part in row[0].split('.')[:2])
+
+
+def create_ann_indexes(apps, schema_editor):
+    """Create HNSW (or IVFFlat) cosine indexes (PostgreSQL with pgvector only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        version = _pgvector_version(cursor)
+        if version is None:
+            return
+
+        for table, column, name in INDEXES:
+            if version >= (0, 5):
+                method = f"hnsw ({column} vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+            else:
+                method = f"ivfflat ({column} vector_cosine_ops) WITH (lists = 100)"
+            cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING {method}")
+
+
+def drop_ann_indexes(apps, schema_editor):
+    """Drop the ANN indexes."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for _, _, name in INDEXES:
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('analytics', '0007_insight_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_ann_indexes, drop_ann_indexes),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django - Manual migration for RAG metadata lookups
+"""
+Add a GIN index on EmbeddedDocument.metadata.
+
+Supplier and category context is resolved with JSONB containment
+(metadata @> '{"supplier_id": 42}'), OR-ed across every requested entity in a
+single query. The jsonb_path_ops GIN index serves those containment tests
+without scanning the organization's documents.
+
+Note: This migration is PostgreSQL-only. SQLite (used in tests) will skip
+these operations and filter on the extracted metadata key instead.
+"""
+
+from django.db import migrations
+
+INDEX_NAME = 'analytics_embeddeddocument_metadata_gin'
+
+
+def create_metadata_index(apps, schema_editor):
+    """Create the jsonb_path_ops GIN index (PostgreSQL only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} "
+            f"ON analytics_embeddeddocument USING gin (metadata jsonb_path_ops)"
+        )
+
+
+def drop_metadata_index(apps, schema_editor):
+    """Drop the GIN index."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('analytics', '0008_vector_ann_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_metadata_index, drop_metadata_index),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django - Manual migration for RAG full-text search
+"""
+Add full-text search for EmbeddedDocument keyword retrieval.
+
+The keyword fallback OR-ed icontains filters over title and content, which
+no index can serve. This adds a database-native full-text index:
+
+- PostgreSQL: a generated tsvector column `search_vector` (title weighted A,
+  content weighted B) with a GIN index, built CONCURRENTLY
+- SQLite: an external-content FTS5 table over title and content, kept in
+  sync with triggers and backfilled on creation
+
+The column and table are not part of the Django model; queries live in
+apps/analytics/text_search.py.
+"""
+
+from django.db import migrations
+
+TABLE = 'analytics_embeddeddocument'
+FTS_TABLE = 'analytics_embeddeddocument_fts'
+GIN_INDEX = 'analytics_embeddeddocument_search_gin'
+
+POSTGRES_COLUMN = f"""
+ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(content, '')), 'B')
+) STORED
+"""
+
+SQLITE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, content='{TABLE}', content_rowid='rowid', tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.rowid, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def create_full_text_search(apps, schema_editor):
+    """Create the tsvector column and GIN index, or the FTS5 table and triggers."""
+    vendor = schema_editor.connection.vendor
+
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute(POSTGRES_COLUMN)
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {GIN_INDEX} ON {TABLE} USING gin (search_vector)"
+            )
+        elif vendor == 'sqlite':
+            for statement in SQLITE_STATEMENTS:
+                cursor.execute(statement)
+
+
+def drop_full_text_search(apps, schema_editor):
+    """Drop the full-text search structures."""
+    vendor = schema_editor.connection.vendor
+
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {GIN_INDEX}")
+            cursor.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector")
+        elif vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('analytics', '0009_embeddeddocument_metadata_gin'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_full_text_search, drop_full_text_search),
+    ]
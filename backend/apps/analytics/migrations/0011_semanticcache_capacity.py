@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0010_embeddeddocument_full_text_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='semanticcache',
+            name='last_hit_at',
+            field=models.DateTimeField(blank=True, help_text='When hits were last recorded (eviction recency)', null=True),
+        ),
+        migrations.AddField(
+            model_name='semanticcache',
+            name='size_bytes',
+            field=models.IntegerField(default=0, help_text='Approximate stored size of query, response and embedding'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0011_semanticcache_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmrequestlog',
+            name='tokens_per_second',
+            field=models.FloatField(blank=True, help_text='Streaming: output tokens per second after the first token', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmrequestlog',
+            name='ttft_ms',
+            field=models.IntegerField(blank=True, help_text='Streaming: time from request to first token', null=True),
+        ),
+    ]
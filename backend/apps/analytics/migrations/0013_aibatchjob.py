@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 22:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0012_llmrequestlog_streaming_metrics'),
+        ('authentication', '0010_audit_log_resolve_actions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIBatchJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=255, unique=True)),
+                ('backend', models.CharField(max_length=50)),
+                ('requests', models.JSONField(default=dict, help_text='custom_id -> organization_id, insights and context of each request')),
+                ('status', models.CharField(choices=[('submitted', 'Submitted'), ('completed', 'Completed'), ('partial', 'Partially Completed'), ('failed', 'Failed')], db_index=True, default='submitted', max_length=20)),
+                ('summary', models.JSONField(blank=True, default=dict)),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('key_owner', models.ForeignKey(help_text='Organization whose settings hold the API key the batch is billed to', on_delete=django.db.models.deletion.CASCADE, related_name='ai_batch_jobs', to='authentication.organization')),
+            ],
+            options={
+                'verbose_name': 'AI Batch Job',
+                'verbose_name_plural': 'AI Batch Jobs',
+                'ordering': ['-submitted_at'],
+            },
+        ),
+    ]
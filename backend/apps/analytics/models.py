@@ -6,8 +6,12 @@ Models:
 - SemanticCache: Stores embeddings for semantic similarity caching (73% cost reduction)
 - EmbeddedDocument: Stores document embeddings for RAG (Retrieval-Augmented Generation)
 - InsightFeedback: Tracks user actions on AI-generated insights for ROI measurement
+- SupplierPaymentScorecard: Nightly snapshot of per-supplier P2P payment KPIs
+- InsightSnapshot: Precomputed base insights per organization and filter set
+- AIBatchJob: Manifest of a submitted provider batch awaiting collection
 """
 import hashlib
+import json
 import uuid
 from datetime import timedelta
 from decimal import Decimal
@@ -75,6 +79,16 @@ class LLMRequestLog(models.Model):
     tokens_input = models.IntegerField(default=0)
     tokens_output = models.IntegerField(default=0)
     latency_ms = models.IntegerField(default=0)
+    ttft_ms = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Streaming: time from request to first token"
+    )
+    tokens_per_second = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Streaming: output tokens per second after the first token"
+    )
 
     cost_usd = models.DecimalField(
         max_digits=10,
@@ -170,6 +184,8 @@ class LLMRequestLog(models.Model):
             total_input_tokens=Sum('tokens_input'),
             total_output_tokens=Sum('tokens_output'),
             avg_latency=Avg('latency_ms'),
+            avg_ttft=Avg('ttft_ms'),
+            avg_tokens_per_second=Avg('tokens_per_second'),
             cache_hits=Count('id', filter=models.Q(cache_hit=True)),
             prompt_cache_reads=Sum('prompt_cache_read_tokens'),
         )
@@ -199,6 +215,8 @@ class LLMRequestLog(models.Model):
             'total_cost_usd': float(totals['total_cost'] or 0),
             'total_tokens': (totals['total_input_tokens'] or 0) + (totals['total_output_tokens'] or 0),
             'avg_latency_ms': round(totals['avg_latency'] or 0, 1),
+            'avg_ttft_ms': round(totals['avg_ttft'] or 0, 1),
+            'avg_tokens_per_second': round(totals['avg_tokens_per_second'] or 0, 1),
             'cache_hit_rate': round(
                 (totals['cache_hits'] or 0) / max(totals['total_requests'] or 1, 1) * 100, 1
             ),
@@ -221,8 +239,14 @@ class SemanticCache(models.Model):
     - Automatic TTL-based expiration
     - Hit count tracking for cache efficiency metrics
     - Request type scoping for targeted caching
+    - Per-organization capacity (entries and bytes) with LFU or LRU eviction
     """
 
+    DEFAULT_MAX_ENTRIES = 5000
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+    DEFAULT_PURGE_CHUNK = 1000
+    EVICTIONS_KEY = "semantic_cache:evictions"
+
     REQUEST_TYPE_CHOICES = [
         ('enhance', 'Insight Enhancement'),
         ('single_insight', 'Single Insight Analysis'),
@@ -261,6 +285,15 @@ class SemanticCache(models.Model):
         default=0,
         help_text="Number of times this cache entry was used"
     )
+    last_hit_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When hits were last recorded (eviction recency)"
+    )
+    size_bytes = models.IntegerField(
+        default=0,
+        help_text="Approximate stored size of query, response and embedding"
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(db_index=True)
@@ -320,6 +353,7 @@ class SemanticCache(models.Model):
             query_hash=query_hash,
             response_json=response,
             expires_at=expires_at,
+            size_bytes=cls.estimate_size(query_text, response, embedding),
         )
 
         if PGVECTOR_AVAILABLE and hasattr(entry, 'query_embedding'):
@@ -328,11 +362,111 @@ class SemanticCache(models.Model):
         entry.save()
         return entry
 
+    @staticmethod
+    def estimate_size(query_text: str, response: dict, embedding: list = None) -> int:
+        """Approximate bytes stored for an entry (text, JSON and float32 vector)."""
+        size = len(query_text.encode()) + len(json.dumps(response, default=str).encode())
+        if embedding is not None:
+            size += 4 * len(embedding)
+        return size
+
+    @classmethod
+    def purge(cls, queryset, chunk_size: int = None) -> int:
+        """
+        Delete the entries matched by a queryset in bounded chunks.
+
+        Each chunk is one short DELETE by primary key, so a large purge never
+        holds locks on the whole matching set. Chunks are deleted through the
+        ORM, so post_delete signals (and the vector index) see every entry.
+
+        Returns:
+            Number of entries deleted
+        """
+        from django.conf import settings
+
+        chunk_size = chunk_size or getattr(settings, 'SEMANTIC_CACHE_PURGE_CHUNK', cls.DEFAULT_PURGE_CHUNK)
+        deleted = 0
+
+        while True:
+            ids = list(queryset.order_by().values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            deleted += cls.objects.filter(pk__in=ids).delete()[0]
+            if len(ids) < chunk_size:
+                break
+
+        return deleted
+
     @classmethod
     def cleanup_expired(cls) -> int:
         """Delete expired cache entries. Returns count deleted."""
-        result = cls.objects.filter(expires_at__lt=timezone.now()).delete()
-        return result[0] if result else 0
+        return cls.purge(cls.objects.filter(expires_at__lt=timezone.now()))
+
+    @classmethod
+    def eviction_order(cls, policy: str = None) -> list:
+        """
+        Order in which entries are evicted, first victim first.
+
+        'lfu': fewest hits, then least recently hit; 'lru': least recently
+        hit (or created, if never hit), then fewest hits.
+        """
+        from django.conf import settings
+        from django.db.models.functions import Coalesce
+
+        policy = policy or getattr(settings, 'SEMANTIC_CACHE_EVICTION_POLICY', 'lfu')
+        recency = Coalesce('last_hit_at', 'created_at').asc()
+        if policy == 'lru':
+            return [recency, 'hit_count']
+        return ['hit_count', recency]
+
+    @classmethod
+    def enforce_capacity(cls, organization_id: int) -> int:
+        """
+        Evict an organization's entries until it is within capacity.
+
+        Expired entries go first, then live entries in eviction order until
+        both SEMANTIC_CACHE_MAX_ENTRIES_PER_ORG and
+        SEMANTIC_CACHE_MAX_BYTES_PER_ORG are satisfied.
+
+        Returns:
+            Number of entries evicted
+        """
+        from django.conf import settings
+        from django.core.cache import cache
+        from django.db.models import Count, Sum
+
+        max_entries = getattr(settings, 'SEMANTIC_CACHE_MAX_ENTRIES_PER_ORG', cls.DEFAULT_MAX_ENTRIES)
+        max_bytes = getattr(settings, 'SEMANTIC_CACHE_MAX_BYTES_PER_ORG', cls.DEFAULT_MAX_BYTES)
+
+        entries = cls.objects.filter(organization_id=organization_id)
+        usage = entries.aggregate(count=Count('id'), size=Sum('size_bytes'))
+        count, size = usage['count'], usage['size'] or 0
+        if count <= max_entries and size <= max_bytes:
+            return 0
+
+        evicted = cls.purge(entries.filter(expires_at__lte=timezone.now()))
+        usage = entries.aggregate(count=Count('id'), size=Sum('size_bytes'))
+        count, size = usage['count'], usage['size'] or 0
+
+        victims = []
+        for entry_id, entry_size in entries.order_by(*cls.eviction_order()).values_list('id', 'size_bytes').iterator():
+            if count <= max_entries and size <= max_bytes:
+                break
+            victims.append(entry_id)
+            count -= 1
+            size -= entry_size
+
+        if victims:
+            evicted += cls.purge(cls.objects.filter(id__in=victims))
+
+        if evicted:
+            key = f"{cls.EVICTIONS_KEY}:{organization_id}"
+            try:
+                cache.add(key, 0, None)
+                cache.incr(key, evicted)
+            except Exception:
+                pass
+        return evicted
 
     @classmethod
     def get_cache_stats(cls, organization_id: int) -> dict:
@@ -359,11 +493,32 @@ class SemanticCache(models.Model):
             .order_by('-hits')
         )
 
+        from django.conf import settings
+        from django.core.cache import cache
+        from django.db import connection
+
+        stored = cls.objects.filter(organization_id=organization_id).aggregate(
+            entries=Count('id'),
+            size=Sum('size_bytes'),
+        )
+
+        table_bytes = None
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_total_relation_size(%s)", [cls._meta.db_table])
+                table_bytes = cursor.fetchone()[0]
+
         return {
             'total_entries': stats['total_entries'] or 0,
             'total_hits': stats['total_hits'] or 0,
             'avg_hits_per_entry': round(stats['avg_hits'] or 0, 1),
             'by_request_type': by_type,
+            'stored_entries': stored['entries'] or 0,
+            'stored_bytes': stored['size'] or 0,
+            'max_entries': getattr(settings, 'SEMANTIC_CACHE_MAX_ENTRIES_PER_ORG', cls.DEFAULT_MAX_ENTRIES),
+            'max_bytes': getattr(settings, 'SEMANTIC_CACHE_MAX_BYTES_PER_ORG', cls.DEFAULT_MAX_BYTES),
+            'evictions': cache.get(f"{cls.EVICTIONS_KEY}:{organization_id}", 0),
+            'table_bytes': table_bytes,
         }
 
 
@@ -469,6 +624,11 @@ class EmbeddedDocument(models.Model):
     def __str__(self):
         return f"{self.get_document_type_display()}: {self.title[:50]}"
 
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """SHA-256 hex digest used to detect unchanged document content."""
+        return hashlib.sha256(content.encode()).hexdigest()
+
     @classmethod
     def create_or_update(
         cls,
@@ -487,7 +647,7 @@ class EmbeddedDocument(models.Model):
         Uses content_hash for deduplication - if content hasn't changed,
         the existing document is returned unchanged.
         """
-        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        content_hash = cls.hash_content(content)
 
         if source_model and source_id:
             existing = cls.objects.filter(
@@ -681,3 +841,160 @@ class InsightFeedback(models.Model):
         if self.actual_savings is not None and self.predicted_savings is not None:
             return float(self.actual_savings) - float(self.predicted_savings)
         return None
+
+
+class SupplierPaymentScorecard(models.Model):
+    """
+    Persisted supplier payment scorecard row.
+
+    Written nightly by refresh_supplier_payment_scorecards so the P2P
+    scorecard page is a single indexed read instead of a live aggregate.
+    """
+
+    RISK_LEVEL_CHOICES = [
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High'),
+    ]
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='supplier_payment_scorecards'
+    )
+    supplier = models.ForeignKey(
+        'procurement.Supplier',
+        on_delete=models.CASCADE,
+        related_name='payment_scorecards'
+    )
+    supplier_name = models.CharField(max_length=255)
+
+    ap_balance = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    dpo = models.FloatField(default=0)
+    on_time_rate = models.FloatField(default=0)
+    exception_rate = models.FloatField(default=0)
+    invoice_count = models.IntegerField(default=0)
+    score = models.FloatField(default=0)
+    risk_level = models.CharField(max_length=10, choices=RISK_LEVEL_CHOICES)
+
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['-score']
+        unique_together = ['organization', 'supplier']
+        indexes = [
+            models.Index(fields=['organization', '-score']),
+        ]
+        verbose_name = 'Supplier Payment Scorecard'
+        verbose_name_plural = 'Supplier Payment Scorecards'
+
+    def __str__(self):
+        return f"{self.supplier_name}: {self.score} ({self.risk_level})"
+
+    def to_dict(self) -> dict:
+        """Serialize in the same shape as the live scorecard."""
+        return {
+            'supplier_id': self.supplier_id,
+            'supplier': self.supplier_name,
+            'ap_balance': float(self.ap_balance),
+            'dpo': self.dpo,
+            'on_time_rate': self.on_time_rate,
+            'exception_rate': self.exception_rate,
+            'invoice_count': self.invoice_count,
+            'score': self.score,
+            'risk_level': self.risk_level,
+        }
+
+
+class InsightSnapshot(models.Model):
+    """
+    Persisted base insights for an organization and filter set.
+
+    Written nightly by generate_organization_insights and after each
+    completed upload, so ai_insights is a single indexed read instead of
+    rerunning every insight generator. Deleted whenever the organization's
+    transactions change.
+    """
+
+    SOURCE_CHOICES = [
+        ('nightly', 'Nightly Batch'),
+        ('upload', 'Upload Completion'),
+    ]
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='insight_snapshots'
+    )
+    filters_key = models.CharField(
+        max_length=64,
+        help_text="Hash of the normalized filters and savings configuration"
+    )
+    filters = models.JSONField(default=dict, blank=True)
+
+    insights = models.JSONField(default=list)
+    summary = models.JSONField(default=dict)
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='nightly')
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['-computed_at']
+        unique_together = ['organization', 'filters_key']
+        verbose_name = 'Insight Snapshot'
+        verbose_name_plural = 'Insight Snapshots'
+
+    def __str__(self):
+        return f"{self.organization_id}: {len(self.insights)} insights ({self.computed_at:%Y-%m-%d %H:%M})"
+
+
+class AIBatchJob(models.Model):
+    """
+    Manifest of a provider batch of insight enhancement requests.
+
+    Written when the nightly job submits a batch and updated when
+    poll_insight_enhancement_batch collects it. Kept in the database rather
+    than the cache so a batch that is already billed can still be collected
+    after a cache eviction or restart during the provider's processing window.
+    """
+
+    STATUS_CHOICES = [
+        ('submitted', 'Submitted'),
+        ('completed', 'Completed'),
+        ('partial', 'Partially Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    batch_id = models.CharField(max_length=255, unique=True)
+    backend = models.CharField(max_length=50)
+    key_owner = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='ai_batch_jobs',
+        help_text="Organization whose settings hold the API key the batch is billed to"
+    )
+    requests = models.JSONField(
+        default=dict,
+        help_text="custom_id -> organization_id, insights and context of each request"
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='submitted', db_index=True)
+    summary = models.JSONField(default=dict, blank=True)
+
+    submitted_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-submitted_at']
+        verbose_name = 'AI Batch Job'
+        verbose_name_plural = 'AI Batch Jobs'
+
+    def __str__(self):
+        return f"{self.batch_id} ({self.status}, {len(self.requests)} requests)"
+
+    def finish(self, summary: dict) -> None:
+        """Record the collection outcome."""
+        self.status = {'success': 'completed'}.get(summary['status'], summary['status'])
+        self.summary = summary
+        self.completed_at = timezone.now()
+        self.save(update_fields=['status', 'summary', 'completed_at'])
@@ -0,0 +1,182 @@
+"""
+P2P Analytics Caching Layer.
+
+Caches P2PAnalyticsService results in the Django cache (Redis in production).
+
+Cache Strategy:
+- Key: org_id + method + hash of (arguments, filters, today) + the current
+  version of every P2P document type the method reads
+- Versions: one counter per organization and document type (PR, PO, GR,
+  Invoice), bumped by post_save/post_delete signals, the P2P importer and
+  set-based updates that bypass signals
+- Invalidation: bumping a version orphans only the entries that depend on
+  that document type, e.g. an invoice change leaves PR endpoints cached
+- TTL: 15 minutes default, configurable via P2P_ANALYTICS_CACHE_TTL
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class P2PAnalyticsCache:
+    """
+    Version-keyed result cache for P2P analytics.
+
+    Entries are never deleted on invalidation; bumping a document-type
+    version changes the keys of all dependent entries, which then expire
+    through their TTL.
+    """
+
+    CACHE_PREFIX = "p2p_analytics"
+    DEFAULT_TTL = 900  # 15 minutes
+
+    PURCHASE_REQUISITION = 'pr'
+    PURCHASE_ORDER = 'po'
+    GOODS_RECEIPT = 'gr'
+    INVOICE = 'invoice'
+    DOCUMENT_TYPES = (PURCHASE_REQUISITION, PURCHASE_ORDER, GOODS_RECEIPT, INVOICE)
+
+    @classmethod
+    def _get_ttl(cls) -> int:
+        """Get cache TTL from settings or use default."""
+        return getattr(settings, 'P2P_ANALYTICS_CACHE_TTL', cls.DEFAULT_TTL)
+
+    @classmethod
+    def _version_key(cls, organization_id: int, doc_type: str) -> str:
+        return f"{cls.CACHE_PREFIX}:version:{organization_id}:{doc_type}"
+
+    @staticmethod
+    def _initial_version() -> int:
+        """
+        Seed for a missing counter.
+
+        Time-based so a counter that was evicted never restarts at a value
+        that older cached entries were keyed with.
+        """
+        return int(time.time() * 1000)
+
+    @classmethod
+    def get_versions(cls, organization_id: int, doc_types) -> dict:
+        """
+        Get current versions for the given document types in one round trip.
+
+        Missing counters are initialized.
+        """
+        keys = {cls._version_key(organization_id, doc_type): doc_type for doc_type in doc_types}
+        found = cache.get_many(list(keys))
+
+        versions = {}
+        for key, doc_type in keys.items():
+            version = found.get(key)
+            if version is None:
+                cache.add(key, cls._initial_version(), None)
+                version = cache.get(key)
+            versions[doc_type] = version
+        return versions
+
+    @classmethod
+    def bump_version(cls, organization_id: int, doc_type: str) -> None:
+        """
+        Invalidate every cached result that depends on a document type.
+
+        Args:
+            organization_id: Organization's primary key
+            doc_type: One of DOCUMENT_TYPES
+        """
+        if doc_type not in cls.DOCUMENT_TYPES:
+            raise ValueError(f"Unknown P2P document type: {doc_type}")
+
+        key = cls._version_key(organization_id, doc_type)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Counter missing (never read or evicted)
+            cache.set(key, cls._initial_version(), None)
+
+        logger.debug(f"P2P cache version bumped for org {organization_id}: {doc_type}")
+
+    @classmethod
+    def _generate_cache_key(
+        cls,
+        organization_id: int,
+        method_name: str,
+        filters: dict,
+        args: tuple,
+        kwargs: dict,
+        versions: dict
+    ) -> str:
+        """
+        Generate cache key from call signature and document versions.
+
+        Today's date is part of the key because aging and trend metrics are
+        relative to the current day.
+
+        Returns:
+            Cache key string in format: p2p_analytics:{org_id}:{method}:{hash}
+        """
+        payload = json.dumps(
+            {
+                'args': args,
+                'kwargs': kwargs,
+                'filters': filters,
+                'versions': versions,
+                'today': date.today().isoformat(),
+            },
+            sort_keys=True,
+            default=str
+        )
+        content_hash = hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+        return f"{cls.CACHE_PREFIX}:{organization_id}:{method_name}:{content_hash}"
+
+    @classmethod
+    def cached(cls, *doc_types):
+        """
+        Decorator for P2PAnalyticsService methods.
+
+        Args:
+            *doc_types: Document types whose changes invalidate the result
+
+        None results (e.g. document not found) are not cached.
+        """
+        unknown = set(doc_types) - set(cls.DOCUMENT_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown P2P document types: {sorted(unknown)}")
+
+        def decorator(method):
+            @functools.wraps(method)
+            def wrapper(service, *args, **kwargs):
+                organization_id = service.organization.id
+                try:
+                    versions = cls.get_versions(organization_id, doc_types)
+                    cache_key = cls._generate_cache_key(
+                        organization_id, method.__name__, service.filters,
+                        args, kwargs, versions
+                    )
+                    cached = cache.get(cache_key)
+                except Exception as e:
+                    # Cache is best-effort; never fail the request because of it
+                    logger.warning(f"P2P cache unavailable: {e}")
+                    return method(service, *args, **kwargs)
+
+                if cached is not None:
+                    return cached
+
+                result = method(service, *args, **kwargs)
+                if result is not None:
+                    try:
+                        cache.set(cache_key, result, cls._get_ttl())
+                    except Exception as e:
+                        logger.warning(f"P2P cache store failed: {e}")
+                return result
+            return wrapper
+        return decorator
@@ -12,17 +12,55 @@ Provides analytics for the complete procure-to-pay cycle including:
 from decimal import Decimal
 from datetime import date, datetime, timedelta
 from collections import defaultdict
+from django.db import transaction
+from django.conf import settings
 from django.db.models import (
     Sum, Count, Avg, Q, F, Min, Max, Case, When, Value,
-    DecimalField, IntegerField, CharField
+    DecimalField, IntegerField, CharField, TextField, DurationField,
+    ExpressionWrapper, Subquery, OuterRef
 )
-from django.db.models.functions import TruncMonth, TruncWeek, Coalesce, ExtractMonth
+from django.db.models.functions import TruncMonth, TruncWeek, Coalesce, ExtractMonth, Concat
+from django.utils import timezone
+from apps.authentication.models import Organization
+from .distribution import duration_distribution, empty_distribution
+from .p2p_cache import P2PAnalyticsCache
 from apps.procurement.models import (
     PurchaseRequisition, PurchaseOrder, GoodsReceipt, Invoice,
     Supplier, Category
 )
 
 
+# Invoice statuses that still count towards the open AP balance
+OPEN_AP_STATUSES = ['received', 'pending_match', 'matched', 'approved', 'on_hold']
+
+# Days between invoice and payment, evaluated in the database
+DAYS_TO_PAY = ExpressionWrapper(F('paid_date') - F('invoice_date'), output_field=DurationField())
+
+# Days between PR submission and approval, evaluated in the database
+APPROVAL_DURATION = ExpressionWrapper(
+    F('approval_date') - F('submitted_date'), output_field=DurationField()
+)
+
+# Open AP aging buckets: (name, min days outstanding, max days outstanding)
+AGING_BUCKETS = [
+    ('current', 0, 30),
+    ('days_31_60', 31, 60),
+    ('days_61_90', 61, 90),
+    ('days_90_plus', 91, 9999),
+]
+
+# Target days per P2P cycle stage, in process order
+CYCLE_STAGE_TARGETS = {
+    'pr_to_po': 3,
+    'po_to_gr': 7,
+    'gr_to_invoice': 3,
+    'invoice_to_payment': 30,
+}
+
+# Snapshots older than this are ignored and the scorecard is computed live
+SCORECARD_SNAPSHOT_MAX_AGE = timedelta(hours=26)
+
+
 class P2PAnalyticsService:
     """
     Analytics service for Procure-to-Pay process metrics.
@@ -64,86 +102,94 @@ class P2PAnalyticsService:
     # P2P CYCLE TIME ANALYSIS
     # =========================================================================
 
-    def get_p2p_cycle_overview(self):
-        """
-        Get end-to-end P2P cycle time metrics.
-        Returns average days for each stage and overall cycle.
+    def _stage_queryset(self, stage):
         """
-        # Get PRs with linked POs (PO.requisition -> PR, so PR.purchase_orders is reverse relation)
-        prs_with_po = PurchaseRequisition.objects.filter(
-            organization=self.organization,
-            status='converted_to_po',
-            purchase_orders__isnull=False,
-            submitted_date__isnull=False
-        ).prefetch_related('purchase_orders')
-
-        prs_with_po = self._apply_date_filters(prs_with_po, 'created_date')
-
-        # Calculate PR to PO time
-        pr_to_po_days = []
-        for pr in prs_with_po:
-            po = pr.purchase_orders.first()  # Get the first linked PO
-            if po and pr.approval_date:
-                days = (po.created_date - pr.approval_date).days
-                if days >= 0:
-                    pr_to_po_days.append(days)
-
-        # Get POs with linked GRs
-        pos_with_gr = PurchaseOrder.objects.filter(
-            organization=self.organization,
-            goods_receipts__isnull=False
-        ).prefetch_related('goods_receipts')
-
-        pos_with_gr = self._apply_date_filters(pos_with_gr, 'created_date')
-
-        # Calculate PO to GR time
-        po_to_gr_days = []
-        for po in pos_with_gr:
-            gr = po.goods_receipts.first()
-            if gr and po.sent_date:
-                days = (gr.received_date - po.sent_date).days
-                if days >= 0:
-                    po_to_gr_days.append(days)
-
-        # Get GRs with linked Invoices
-        grs_with_invoice = GoodsReceipt.objects.filter(
-            organization=self.organization,
-            invoices__isnull=False
-        ).prefetch_related('invoices')
-
-        # Calculate GR to Invoice time
-        gr_to_inv_days = []
-        for gr in grs_with_invoice:
-            inv = gr.invoices.first()
-            if inv:
-                days = (inv.invoice_date - gr.received_date).days
-                if days >= 0:
-                    gr_to_inv_days.append(days)
-
-        # Get paid invoices for Invoice to Payment time
-        paid_invoices = Invoice.objects.filter(
-            organization=self.organization,
-            status='paid',
-            paid_date__isnull=False
-        )
+        Documents in one P2P cycle stage annotated with their time in stage.
 
-        paid_invoices = self._apply_date_filters(paid_invoices, 'invoice_date')
+        Annotations:
+            days_in_stage: DurationField from stage start to the linked
+                downstream document; negative durations are excluded
+            stage_amount, document_number, supplier_name: drilldown columns
 
-        # Calculate Invoice to Payment time
-        inv_to_pay_days = []
-        for inv in paid_invoices:
-            days = (inv.paid_date - inv.invoice_date).days
-            if days >= 0:
-                inv_to_pay_days.append(days)
+        The downstream document is the most recent linked one, matching the
+        models' default ordering.
+        """
+        if stage == 'pr_to_po':
+            first_po = PurchaseOrder.objects.filter(
+                requisition=OuterRef('pk')
+            ).order_by('-created_date', '-created_at')
+            qs = PurchaseRequisition.objects.filter(
+                organization=self.organization,
+                status='converted_to_po',
+                approval_date__isnull=False
+            ).annotate(
+                stage_start=F('approval_date'),
+                stage_end=Subquery(first_po.values('created_date')[:1]),
+                stage_amount=F('estimated_amount'),
+                document_number=F('pr_number'),
+                supplier_name=F('supplier_suggested__name')
+            )
+            date_field = 'created_date'
+        elif stage == 'po_to_gr':
+            first_gr = GoodsReceipt.objects.filter(
+                purchase_order=OuterRef('pk')
+            ).order_by('-received_date', '-created_at')
+            qs = PurchaseOrder.objects.filter(
+                organization=self.organization,
+                sent_date__isnull=False
+            ).annotate(
+                stage_start=F('sent_date'),
+                stage_end=Subquery(first_gr.values('received_date')[:1]),
+                stage_amount=F('total_amount'),
+                document_number=F('po_number'),
+                supplier_name=F('supplier__name')
+            )
+            date_field = 'created_date'
+        elif stage == 'gr_to_invoice':
+            first_invoice = Invoice.objects.filter(
+                goods_receipt=OuterRef('pk')
+            ).order_by('-invoice_date', '-created_at')
+            qs = GoodsReceipt.objects.filter(
+                organization=self.organization
+            ).annotate(
+                stage_start=F('received_date'),
+                stage_end=Subquery(first_invoice.values('invoice_date')[:1]),
+                stage_amount=Subquery(first_invoice.values('invoice_amount')[:1]),
+                document_number=F('gr_number'),
+                supplier_name=F('purchase_order__supplier__name')
+            )
+            date_field = 'received_date'
+        elif stage == 'invoice_to_payment':
+            qs = Invoice.objects.filter(
+                organization=self.organization,
+                status='paid',
+                paid_date__isnull=False
+            ).annotate(
+                stage_start=F('invoice_date'),
+                stage_end=F('paid_date'),
+                stage_amount=F('invoice_amount'),
+                document_number=F('invoice_number'),
+                supplier_name=F('supplier__name')
+            )
+            date_field = 'invoice_date'
+        else:
+            raise ValueError(f"Unknown P2P stage: {stage}")
 
-        # Calculate averages
-        avg_pr_to_po = sum(pr_to_po_days) / len(pr_to_po_days) if pr_to_po_days else 0
-        avg_po_to_gr = sum(po_to_gr_days) / len(po_to_gr_days) if po_to_gr_days else 0
-        avg_gr_to_inv = sum(gr_to_inv_days) / len(gr_to_inv_days) if gr_to_inv_days else 0
-        avg_inv_to_pay = sum(inv_to_pay_days) / len(inv_to_pay_days) if inv_to_pay_days else 0
+        qs = self._apply_date_filters(qs, date_field)
 
-        total_cycle = avg_pr_to_po + avg_po_to_gr + avg_gr_to_inv + avg_inv_to_pay
+        return qs.filter(stage_end__isnull=False).annotate(
+            days_in_stage=ExpressionWrapper(
+                F('stage_end') - F('stage_start'), output_field=DurationField()
+            )
+        ).filter(days_in_stage__gte=timedelta(0))
 
+    @P2PAnalyticsCache.cached(*P2PAnalyticsCache.DOCUMENT_TYPES)
+    def get_p2p_cycle_overview(self):
+        """
+        Get end-to-end P2P cycle time metrics.
+        Returns mean, median/p90/p95 and a histogram of days for each stage,
+        plus the overall cycle.
+        """
         def get_status(avg, target):
             variance = (avg - target) / target * 100 if target > 0 else 0
             if variance <= 0:
@@ -152,40 +198,34 @@ class P2PAnalyticsService:
                 return 'warning'
             return 'critical'
 
+        stages = {}
+        for stage, target_days in CYCLE_STAGE_TARGETS.items():
+            stats = duration_distribution(self._stage_queryset(stage), 'days_in_stage')
+            stages[stage] = {
+                'avg_days': stats['avg_days'],
+                'p50_days': stats['p50_days'],
+                'p90_days': stats['p90_days'],
+                'p95_days': stats['p95_days'],
+                'target_days': target_days,
+                'sample_size': stats['count'],
+                'status': get_status(stats['avg_days'], target_days),
+                'histogram': stats['histogram']
+            }
+
+        total_cycle = sum(stage['avg_days'] for stage in stages.values())
+        total_target = sum(CYCLE_STAGE_TARGETS.values())
+
         return {
-            'stages': {
-                'pr_to_po': {
-                    'avg_days': round(avg_pr_to_po, 1),
-                    'target_days': 3,
-                    'sample_size': len(pr_to_po_days),
-                    'status': get_status(avg_pr_to_po, 3)
-                },
-                'po_to_gr': {
-                    'avg_days': round(avg_po_to_gr, 1),
-                    'target_days': 7,
-                    'sample_size': len(po_to_gr_days),
-                    'status': get_status(avg_po_to_gr, 7)
-                },
-                'gr_to_invoice': {
-                    'avg_days': round(avg_gr_to_inv, 1),
-                    'target_days': 3,
-                    'sample_size': len(gr_to_inv_days),
-                    'status': get_status(avg_gr_to_inv, 3)
-                },
-                'invoice_to_payment': {
-                    'avg_days': round(avg_inv_to_pay, 1),
-                    'target_days': 30,
-                    'sample_size': len(inv_to_pay_days),
-                    'status': get_status(avg_inv_to_pay, 30)
-                }
-            },
+            'stages': stages,
             'total_cycle': {
                 'avg_days': round(total_cycle, 1),
-                'target_days': 43,
-                'status': get_status(total_cycle, 43)
+                'p50_days': round(sum(stage['p50_days'] for stage in stages.values()), 1),
+                'target_days': total_target,
+                'status': get_status(total_cycle, total_target)
             }
         }
 
+    @P2PAnalyticsCache.cached(*P2PAnalyticsCache.DOCUMENT_TYPES)
     def get_cycle_time_trends(self, months=12):
         """Get monthly trend of cycle times."""
         cutoff_date = date.today() - timedelta(days=months * 30)
@@ -212,6 +252,7 @@ class P2PAnalyticsService:
             for item in paid_invoices
         ]
 
+    @P2PAnalyticsCache.cached(*P2PAnalyticsCache.DOCUMENT_TYPES)
     def get_cycle_time_by_category(self):
         """Cycle times broken down by spend category."""
         # Get invoices with linked POs for cycle time calculation
@@ -253,6 +294,7 @@ class P2PAnalyticsService:
 
         return sorted(result, key=lambda x: x['total_spend'], reverse=True)
 
+    @P2PAnalyticsCache.cached(*P2PAnalyticsCache.DOCUMENT_TYPES)
     def get_cycle_time_by_supplier(self):
         """Cycle times broken down by supplier."""
         invoices = Invoice.objects.filter(
@@ -295,131 +337,47 @@ class P2PAnalyticsService:
 
         return sorted(result, key=lambda x: x['total_spend'], reverse=True)
 
+    @P2PAnalyticsCache.cached(*P2PAnalyticsCache.DOCUMENT_TYPES)
     def get_stage_drilldown(self, stage):
         """Get detailed breakdown for a specific P2P stage."""
-        slowest_docs = []
-        avg_days = 0
-        total_value = Decimal('0')
-        doc_count = 0
-
-        if stage == 'pr_to_po':
-            prs = PurchaseRequisition.objects.filter(
-                organization=self.organization,
-                status='converted_to_po',
-                approval_date__isnull=False,
-                purchase_orders__isnull=False
-            ).select_related('supplier_suggested').prefetch_related('purchase_orders')[:100]
-
-            days_list = []
-            for pr in prs:
-                po = pr.purchase_orders.first()
-                if po and pr.approval_date:
-                    days = (po.created_date - pr.approval_date).days
-                    if days >= 0:
-                        days_list.append((pr, days, pr.estimated_amount))
-                        total_value += pr.estimated_amount
-
-            days_list.sort(key=lambda x: x[1], reverse=True)
-            doc_count = len(days_list)
-            avg_days = sum(d[1] for d in days_list) / len(days_list) if days_list else 0
-
-            for pr, days, amt in days_list[:10]:
-                slowest_docs.append({
-                    'document_number': pr.pr_number,
-                    'supplier_name': pr.supplier_suggested.name if pr.supplier_suggested else 'N/A',
-                    'days_in_stage': days,
-                    'amount': float(amt)
-                })
-
-        elif stage == 'po_to_gr':
-            pos = PurchaseOrder.objects.filter(
-                organization=self.organization,
-                sent_date__isnull=False,
-                goods_receipts__isnull=False
-            ).select_related('supplier').prefetch_related('goods_receipts')[:100]
-
-            days_list = []
-            for po in pos:
-                gr = po.goods_receipts.first()
-                if gr:
-                    days = (gr.received_date - po.sent_date).days
-                    if days >= 0:
-                        days_list.append((po, days, po.total_amount))
-                        total_value += po.total_amount
-
-            days_list.sort(key=lambda x: x[1], reverse=True)
-            doc_count = len(days_list)
-            avg_days = sum(d[1] for d in days_list) / len(days_list) if days_list else 0
-
-            for po, days, amt in days_list[:10]:
-                slowest_docs.append({
-                    'document_number': po.po_number,
-                    'supplier_name': po.supplier.name if po.supplier else 'N/A',
-                    'days_in_stage': days,
-                    'amount': float(amt)
-                })
-
-        elif stage == 'gr_to_invoice':
-            grs = GoodsReceipt.objects.filter(
-                organization=self.organization,
-                invoices__isnull=False
-            ).select_related('purchase_order', 'purchase_order__supplier').prefetch_related('invoices')[:100]
-
-            days_list = []
-            for gr in grs:
-                inv = gr.invoices.first()
-                if inv:
-                    days = (inv.invoice_date - gr.received_date).days
-                    if days >= 0:
-                        days_list.append((gr, inv, days, inv.invoice_amount))
-                        total_value += inv.invoice_amount
-
-            days_list.sort(key=lambda x: x[2], reverse=True)
-            doc_count = len(days_list)
-            avg_days = sum(d[2] for d in days_list) / len(days_list) if days_list else 0
+        if stage not in CYCLE_STAGE_TARGETS:
+            return {
+                'stage': stage,
+                'avg_days': 0,
+                'documents_count': 0,
+                'total_value': 0.0,
+                'slowest_documents': []
+            }
 
-            for gr, inv, days, amt in days_list[:10]:
-                slowest_docs.append({
-                    'document_number': gr.gr_number,
-                    'supplier_name': gr.purchase_order.supplier.name if gr.purchase_order and gr.purchase_order.supplier else 'N/A',
-                    'days_in_stage': days,
-                    'amount': float(amt)
-                })
+        qs = self._stage_queryset(stage)
+        stats = duration_distribution(qs, 'days_in_stage')
+        total_value = qs.aggregate(total=Sum('stage_amount'))['total'] or Decimal('0')
 
-        elif stage == 'invoice_to_payment':
-            invoices = Invoice.objects.filter(
-                organization=self.organization,
-                status='paid',
-                paid_date__isnull=False
-            ).select_related('supplier')[:100]
-
-            days_list = []
-            for inv in invoices:
-                days = (inv.paid_date - inv.invoice_date).days
-                if days >= 0:
-                    days_list.append((inv, days, inv.invoice_amount))
-                    total_value += inv.invoice_amount
-
-            days_list.sort(key=lambda x: x[1], reverse=True)
-            doc_count = len(days_list)
-            avg_days = sum(d[1] for d in days_list) / len(days_list) if days_list else 0
-
-            for inv, days, amt in days_list[:10]:
-                slowest_docs.append({
-                    'document_number': inv.invoice_number,
-                    'supplier_name': inv.supplier.name if inv.supplier else 'N/A',
-                    'days_in_stage': days,
-                    'amount': float(amt)
-                })
+        slowest = qs.order_by('-days_in_stage').values(
+            'document_number', 'supplier_name', 'days_in_stage', 'stage_amount'
+        )[:10]
 
         return {
             'stage': stage,
-            'avg_days': round(avg_days, 1),
-            'documents_count': doc_count,
+            'avg_days': stats['avg_days'],
+            'p50_days': stats['p50_days'],
+            'p90_days': stats['p90_days'],
+            'p95_days': stats['p95_days'],
+            'documents_count': stats['count'],
             'total_value': float(total_value),
-            'slowest_documents': slowest_docs
+            'histogram': stats['histogram'],
+            'slowest_documents': [
+                {
+                    'document_number': doc['document_number'],
+                    'supplier_name': doc['supplier_name'] or 'N/A',
+                    'days_in_stage': doc['days_in_stage'].days,
+                    'amount': float(doc['stage_amount'] or 0)
+                }
+                for doc in slowest
+            ]
         }
 
+    @P2PAnalyticsCache.cached(*P2PAnalyticsCache.DOCUMENT_TYPES)
     def get_bottleneck_analysis(self):
         """Identify where delays occur in the P2P process."""
         cycle = self.get_p2p_cycle_overview()
@@ -450,8 +408,14 @@ class P2PAnalyticsService:
 
         return bottlenecks
 
+    @P2PAnalyticsCache.cached(*P2PAnalyticsCache.DOCUMENT_TYPES)
     def get_process_funnel(self, months=12):
-        """Get document flow funnel (PRs → POs → GRs → Invoices → Paid)."""
+        """
+        Get document flow funnel (PRs → POs → GRs → Invoices → Paid).
+
+        All stage counts are returned by one query using per-document-type
+        count subqueries.
+        """
         filters = Q(organization=self.organization)
 
         # Apply date filters (use months if no explicit date filter)
@@ -466,38 +430,34 @@ class P2PAnalyticsService:
             parsed_date = self._parse_date(date_to)
             filters &= Q(created_date__lte=parsed_date)
 
-        # Count documents at each stage
-        pr_count = PurchaseRequisition.objects.filter(filters).count()
-        pr_approved = PurchaseRequisition.objects.filter(
-            filters,
-            status__in=['approved', 'converted_to_po']
-        ).count()
-
-        po_count = PurchaseOrder.objects.filter(
-            organization=self.organization
-        ).count()
-
-        gr_count = GoodsReceipt.objects.filter(
-            organization=self.organization
-        ).count()
-
-        inv_count = Invoice.objects.filter(
-            organization=self.organization
-        ).count()
-
-        inv_paid = Invoice.objects.filter(
-            organization=self.organization,
-            status='paid'
-        ).count()
+        def count_of(qs):
+            """Correlated COUNT(*) subquery for one document type."""
+            return Coalesce(Subquery(
+                qs.filter(organization=OuterRef('pk')).order_by().values('organization')
+                .annotate(n=Count('id')).values('n'),
+                output_field=IntegerField()
+            ), 0)
+
+        prs = PurchaseRequisition.objects.filter(filters)
+        counts = Organization.objects.filter(pk=self.organization.pk).annotate(
+            pr_count=count_of(prs),
+            pr_approved=count_of(prs.filter(status__in=['approved', 'converted_to_po'])),
+            po_count=count_of(PurchaseOrder.objects.all()),
+            gr_count=count_of(GoodsReceipt.objects.all()),
+            inv_count=count_of(Invoice.objects.all()),
+            inv_paid=count_of(Invoice.objects.filter(status='paid'))
+        ).values(
+            'pr_count', 'pr_approved', 'po_count', 'gr_count', 'inv_count', 'inv_paid'
+        ).get()
 
         return {
             'stages': [
-                {'name': 'PRs Created', 'count': pr_count},
-                {'name': 'PRs Approved', 'count': pr_approved},
-                {'name': 'POs Created', 'count': po_count},
-                {'name': 'GRs Received', 'count': gr_count},
-                {'name': 'Invoices', 'count': inv_count},
-                {'name': 'Paid', 'count': inv_paid}
+                {'name': 'PRs Created', 'count': counts['pr_count']},
+                {'name': 'PRs Approved', 'count': counts['pr_approved']},
+                {'name': 'POs Created', 'count': counts['po_count']},
+                {'name': 'GRs Received', 'count': counts['gr_count']},
+                {'name': 'Invoices', 'count': counts['inv_count']},
+                {'name': 'Paid', 'count': counts['inv_paid']}
             ]
         }
 
@@ -505,6 +465,7 @@ class P2PAnalyticsService:
     # 3-WAY MATCHING ANALYSIS
     # =========================================================================
 
+    @P2PAnalyticsCache.cached('po', 'gr', 'invoice')
     def get_matching_overview(self):
         """Get 3-way match rates and exception metrics."""
         invoices = Invoice.objects.filter(organization=self.organization)
@@ -595,6 +556,7 @@ class P2PAnalyticsService:
             'match_breakdown': match_breakdown
         }
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_exceptions_by_type(self):
         """Breakdown of exceptions by type."""
         exceptions = Invoice.objects.filter(
@@ -625,6 +587,7 @@ class P2PAnalyticsService:
             for item in by_type
         ]
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_exceptions_by_supplier(self, limit=20):
         """Which suppliers have most exceptions."""
         from django.db.models import Subquery, OuterRef
@@ -700,6 +663,7 @@ class P2PAnalyticsService:
 
         return result
 
+    @P2PAnalyticsCache.cached('po', 'invoice')
     def get_price_variance_analysis(self):
         """PO price vs Invoice price variances."""
         invoices = Invoice.objects.filter(
@@ -732,6 +696,7 @@ class P2PAnalyticsService:
 
         return sorted(variances, key=lambda x: abs(x['variance_percent']), reverse=True)
 
+    @P2PAnalyticsCache.cached('po', 'gr', 'invoice')
     def get_quantity_variance_analysis(self):
         """PO qty vs GR qty vs Invoice qty variances."""
         grs = GoodsReceipt.objects.filter(
@@ -761,6 +726,7 @@ class P2PAnalyticsService:
 
         return sorted(variances, key=lambda x: abs(x['variance_percent']), reverse=True)
 
+    @P2PAnalyticsCache.cached('po', 'gr', 'invoice')
     def get_matching_exceptions(self, status='open', exception_type=None, limit=100):
         """Get list of invoice exceptions with filtering."""
         exceptions = Invoice.objects.filter(
@@ -802,6 +768,7 @@ class P2PAnalyticsService:
             for inv in exceptions
         ]
 
+    @P2PAnalyticsCache.cached('po', 'gr', 'invoice')
     def get_invoice_match_detail(self, invoice_id):
         """Get detailed match information for a specific invoice."""
         try:
@@ -887,37 +854,66 @@ class P2PAnalyticsService:
         }
 
     def bulk_resolve_exceptions(self, invoice_ids, user, resolution_notes):
-        """Resolve multiple invoice exceptions at once."""
-        invoices = Invoice.objects.filter(
-            id__in=invoice_ids,
-            organization=self.organization,
-            has_exception=True,
-            exception_resolved=False
-        )
+        """
+        Resolve multiple invoice exceptions at once.
 
-        resolved_count = 0
-        failed_ids = []
+        Runs as one set-based UPDATE scoped to the organization rather than a
+        fetch and save per invoice. Requested IDs that are not open exceptions
+        in this organization are reported back as skipped.
+        """
+        requested_ids = list(dict.fromkeys(invoice_ids))
 
-        for inv in invoices:
-            try:
-                inv.exception_resolved = True
-                inv.exception_notes = (inv.exception_notes or '') + f'\n\nResolved: {resolution_notes}'
-                inv.save(update_fields=['exception_resolved', 'exception_notes', 'updated_at'])
-                resolved_count += 1
-            except Exception:
-                failed_ids.append(inv.id)
+        with transaction.atomic():
+            # Lock the eligible rows so the returned IDs match what gets updated
+            resolved_ids = list(
+                Invoice.objects.select_for_update().filter(
+                    id__in=requested_ids,
+                    organization=self.organization,
+                    has_exception=True,
+                    exception_resolved=False
+                ).order_by('id').values_list('id', flat=True)
+            )
+
+            if resolved_ids:
+                now = timezone.now()
+                Invoice.objects.filter(
+                    id__in=resolved_ids,
+                    organization=self.organization
+                ).update(
+                    exception_resolved=True,
+                    exception_resolved_by=user,
+                    exception_resolved_at=now,
+                    exception_notes=Concat(
+                        'exception_notes',
+                        Value(f'\n\nResolved: {resolution_notes}'),
+                        output_field=TextField()
+                    ),
+                    updated_at=now
+                )
+
+        if resolved_ids:
+            # QuerySet.update() does not send post_save, so invalidate here
+            P2PAnalyticsCache.bump_version(self.organization.id, P2PAnalyticsCache.INVOICE)
+
+        resolved_set = set(resolved_ids)
+        skipped_ids = [inv_id for inv_id in requested_ids if inv_id not in resolved_set]
 
         return {
-            'resolved_count': resolved_count,
-            'failed_count': len(failed_ids),
-            'failed_ids': failed_ids,
-            'message': f'Successfully resolved {resolved_count} exceptions'
+            'resolved_count': len(resolved_ids),
+            'resolved_ids': resolved_ids,
+            'skipped_count': len(skipped_ids),
+            'skipped_ids': skipped_ids,
+            # Kept for backwards compatibility; the single UPDATE either applies or raises
+            'failed_count': 0,
+            'failed_ids': [],
+            'message': f'Successfully resolved {len(resolved_ids)} exceptions'
         }
 
     # =========================================================================
     # INVOICE AGING / AP ANALYSIS
     # =========================================================================
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_aging_overview(self):
         """Invoice aging buckets: Current, 1-30, 31-60, 61-90, 90+"""
         today = date.today()
@@ -1020,6 +1016,7 @@ class P2PAnalyticsService:
             'trend': trend  # Added for frontend compatibility
         }
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_aging_by_supplier(self, limit=20):
         """Aging breakdown by supplier with bucket details."""
         invoices = Invoice.objects.filter(
@@ -1101,6 +1098,7 @@ class P2PAnalyticsService:
 
         return sorted(result, key=lambda x: x['total_ap'], reverse=True)[:limit]
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_payment_terms_compliance(self):
         """On-time vs late payment rates by payment terms."""
         paid_invoices = Invoice.objects.filter(
@@ -1133,6 +1131,7 @@ class P2PAnalyticsService:
             for terms, stats in terms_stats.items()
         ]
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_cash_flow_forecast(self, weeks=4):
         """Projected payments by week."""
         today = date.today()
@@ -1166,38 +1165,25 @@ class P2PAnalyticsService:
     # PURCHASE REQUISITION ANALYSIS
     # =========================================================================
 
+    @P2PAnalyticsCache.cached('pr')
     def get_pr_overview(self):
         """PR metrics: volume, conversion rate, rejection rate."""
         prs = PurchaseRequisition.objects.filter(organization=self.organization)
         prs = self._apply_date_filters(prs, 'created_date')
 
-        total = prs.count()
-        converted = prs.filter(status='converted_to_po').count()
-        rejected = prs.filter(status='rejected').count()
-        pending = prs.filter(status='pending_approval').count()
-
-        # Average approval time
-        approved_prs = prs.filter(
+        # One grouped query: per-status counts/values plus approval time totals
+        approved_in_order = Q(
             submitted_date__isnull=False,
-            approval_date__isnull=False
+            approval_date__isnull=False,
+            approval_date__gte=F('submitted_date')
         )
-
-        approval_days = []
-        for pr in approved_prs:
-            days = (pr.approval_date - pr.submitted_date).days
-            if days >= 0:
-                approval_days.append(days)
-
-        avg_approval = sum(approval_days) / len(approval_days) if approval_days else 0
-
-        # Total value
-        total_value = prs.aggregate(total=Sum('estimated_amount'))['total'] or Decimal('0')
-
-        # Status breakdown for frontend
-        status_counts = prs.values('status').annotate(
+        status_counts = list(prs.values('status').annotate(
             count=Count('id'),
-            value=Sum('estimated_amount')
-        )
+            value=Sum('estimated_amount'),
+            approval_count=Count('id', filter=approved_in_order),
+            approval_total=Sum(APPROVAL_DURATION, filter=approved_in_order)
+        ).order_by())
+
         by_status = [
             {
                 'status': item['status'],
@@ -1210,6 +1196,20 @@ class P2PAnalyticsService:
         # Status breakdown as dict for quick lookup
         status_breakdown = {item['status']: item['count'] for item in by_status}
 
+        total = sum(item['count'] for item in status_counts)
+        converted = status_breakdown.get('converted_to_po', 0)
+        rejected = status_breakdown.get('rejected', 0)
+        pending = status_breakdown.get('pending_approval', 0)
+        total_value = sum((item['value'] or Decimal('0')) for item in status_counts)
+
+        # Average approval time
+        approval_count = sum(item['approval_count'] for item in status_counts)
+        approval_total = sum(
+            (item['approval_total'] for item in status_counts if item['approval_total']),
+            timedelta()
+        )
+        avg_approval = approval_total.total_seconds() / 86400 / approval_count if approval_count else 0
+
         return {
             'total_prs': total,
             'total_count': total,  # Added for frontend compatibility
@@ -1222,6 +1222,7 @@ class P2PAnalyticsService:
             'status_breakdown': status_breakdown  # Added for quick lookup
         }
 
+    @P2PAnalyticsCache.cached('pr')
     def get_pr_by_department(self):
         """Requisition patterns by department."""
         prs = PurchaseRequisition.objects.filter(organization=self.organization)
@@ -1251,6 +1252,7 @@ class P2PAnalyticsService:
             for item in by_dept
         ]
 
+    @P2PAnalyticsCache.cached('pr')
     def get_pr_pending(self, limit=50):
         """Get pending approval PRs."""
         pending = PurchaseRequisition.objects.filter(
@@ -1279,24 +1281,19 @@ class P2PAnalyticsService:
     # PURCHASE ORDER ANALYSIS
     # =========================================================================
 
+    @P2PAnalyticsCache.cached('po')
     def get_po_overview(self):
         """PO metrics: volume, value, contract coverage."""
         pos = PurchaseOrder.objects.filter(organization=self.organization)
         pos = self._apply_date_filters(pos, 'created_date')
 
-        total = pos.count()
-        total_value = pos.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-
-        contract_backed = pos.filter(is_contract_backed=True)
-        contract_value = contract_backed.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-
-        amended = pos.filter(amendment_count__gt=0).count()
-
-        # Status breakdown
-        by_status = pos.values('status').annotate(
+        # One grouped query: per-status counts/values plus contract and amendment totals
+        status_rows = list(pos.values('status').annotate(
             count=Count('id'),
-            value=Sum('total_amount')
-        )
+            value=Sum('total_amount'),
+            contract_value=Sum('total_amount', filter=Q(is_contract_backed=True)),
+            amended=Count('id', filter=Q(amendment_count__gt=0))
+        ).order_by())
 
         status_list = [
             {
@@ -1304,9 +1301,14 @@ class P2PAnalyticsService:
                 'count': item['count'],
                 'value': float(item['value'] or 0)
             }
-            for item in by_status
+            for item in status_rows
         ]
 
+        total = sum(item['count'] for item in status_rows)
+        total_value = sum((item['value'] or Decimal('0')) for item in status_rows)
+        contract_value = sum((item['contract_value'] or Decimal('0')) for item in status_rows)
+        amended = sum(item['amended'] for item in status_rows)
+
         # Calculate values for frontend
         off_contract_value = float(total_value - contract_value)
         contract_coverage_pct = round(float(contract_value / total_value * 100), 1) if total_value > 0 else 0
@@ -1326,51 +1328,37 @@ class P2PAnalyticsService:
             'by_status': status_list  # Changed from 'status_breakdown' to 'by_status'
         }
 
+    @P2PAnalyticsCache.cached('po')
     def get_po_leakage(self, limit=20):
         """Off-contract PO identification by category."""
-        maverick_pos = PurchaseOrder.objects.filter(
-            organization=self.organization,
-            is_contract_backed=False
-        ).select_related('category', 'supplier')
-
-        maverick_pos = self._apply_date_filters(maverick_pos, 'created_date')
-
-        # Group by category
-        by_category = defaultdict(lambda: {'maverick_amount': Decimal('0'), 'count': 0})
-
-        for po in maverick_pos:
-            cat_name = po.category.name if po.category else 'Uncategorized'
-            by_category[cat_name]['maverick_amount'] += po.total_amount
-            by_category[cat_name]['count'] += 1
-
-        # Get total by category for percentage calculation
-        all_pos = PurchaseOrder.objects.filter(organization=self.organization)
-        all_pos = self._apply_date_filters(all_pos, 'created_date')
-
-        category_totals = all_pos.values('category__name').annotate(
-            total=Sum('total_amount')
-        )
+        pos = PurchaseOrder.objects.filter(organization=self.organization)
+        pos = self._apply_date_filters(pos, 'created_date')
 
-        cat_total_map = {
-            item['category__name'] or 'Uncategorized': float(item['total'] or 0)
-            for item in category_totals
-        }
+        # Category totals and off-contract totals in one grouped query
+        off_contract = Q(is_contract_backed=False)
+        by_category = pos.values('category__name').annotate(
+            category_total=Sum('total_amount'),
+            maverick_amount=Sum('total_amount', filter=off_contract),
+            maverick_count=Count('id', filter=off_contract)
+        ).filter(maverick_count__gt=0).order_by('-maverick_amount')[:limit]
 
         result = []
-        for cat_name, data in by_category.items():
-            cat_total = cat_total_map.get(cat_name, 0)
-            maverick_pct = float(data['maverick_amount']) / cat_total * 100 if cat_total > 0 else 0
+        for item in by_category:
+            cat_total = float(item['category_total'] or 0)
+            maverick_amount = float(item['maverick_amount'] or 0)
+            maverick_pct = maverick_amount / cat_total * 100 if cat_total > 0 else 0
 
             result.append({
-                'category': cat_name,
-                'maverick_amount': float(data['maverick_amount']),
-                'maverick_count': data['count'],
+                'category': item['category__name'] or 'Uncategorized',
+                'maverick_amount': maverick_amount,
+                'maverick_count': item['maverick_count'],
                 'category_total': cat_total,
                 'maverick_percent': round(maverick_pct, 1)
             })
 
-        return sorted(result, key=lambda x: x['maverick_amount'], reverse=True)[:limit]
+        return result
 
+    @P2PAnalyticsCache.cached('po')
     def get_po_amendment_analysis(self):
         """PO change order patterns."""
         amended_pos = PurchaseOrder.objects.filter(
@@ -1416,6 +1404,7 @@ class P2PAnalyticsService:
     # SUPPLIER PAYMENT PERFORMANCE
     # =========================================================================
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_supplier_payments_overview(self):
         """Overview of supplier payment metrics."""
         invoices = Invoice.objects.filter(organization=self.organization)
@@ -1458,73 +1447,179 @@ class P2PAnalyticsService:
             'total_ap_balance': float(total_ap_balance)  # Added missing field
         }
 
-    def get_supplier_payments_scorecard(self, limit=50):
-        """Detailed supplier payment scorecard."""
-        suppliers = Supplier.objects.filter(
-            organization=self.organization,
-            invoices__isnull=False
-        ).distinct()
+    def _supplier_payment_stats(self, supplier_id=None, include_aging=False):
+        """
+        Per-supplier payment KPIs from a single grouped Invoice query.
 
-        scorecard = []
+        Args:
+            supplier_id: Optional supplier to restrict the query to
+            include_aging: Also compute open AP aging buckets per supplier
 
-        for supplier in suppliers[:limit]:
-            invoices = Invoice.objects.filter(
-                organization=self.organization,
-                supplier=supplier
-            )
+        Returns:
+            Dict keyed by supplier_id with counts, amounts, DPO, on-time and
+            exception rates.
+        """
+        invoices = Invoice.objects.filter(organization=self.organization)
+        if supplier_id is not None:
+            invoices = invoices.filter(supplier_id=supplier_id)
+
+        paid = Q(status='paid', paid_date__isnull=False)
+        # DPO and on-time rate only consider payments made on or after invoicing
+        paid_in_order = paid & Q(paid_date__gte=F('invoice_date'))
+        open_ap = Q(status__in=OPEN_AP_STATUSES)
+
+        aggregates = {
+            'invoice_count': Count('id'),
+            'total_amount': Sum('invoice_amount'),
+            'exception_count': Count('id', filter=Q(has_exception=True)),
+            'ap_balance': Sum('invoice_amount', filter=open_ap),
+            'paid_count': Count('id', filter=paid_in_order),
+            'on_time_count': Count('id', filter=paid_in_order & Q(paid_date__lte=F('due_date'))),
+            'avg_days_to_pay': Avg(DAYS_TO_PAY, filter=paid_in_order),
+            'avg_payment': Avg('invoice_amount', filter=paid),
+        }
 
-            # AP Balance
-            ap_balance = invoices.filter(
-                status__in=['received', 'pending_match', 'matched', 'approved', 'on_hold']
-            ).aggregate(total=Sum('invoice_amount'))['total'] or Decimal('0')
-
-            # DPO
-            paid = invoices.filter(status='paid', paid_date__isnull=False)
-            dpo_days = [
-                (inv.paid_date - inv.invoice_date).days
-                for inv in paid
-                if (inv.paid_date - inv.invoice_date).days >= 0
-            ]
-            avg_dpo = sum(dpo_days) / len(dpo_days) if dpo_days else 0
-
-            # On-time rate
-            on_time = sum(1 for inv in paid if inv.days_overdue == 0)
-            on_time_rate = on_time / len(dpo_days) * 100 if dpo_days else 0
-
-            # Exception rate
-            exception_count = invoices.filter(has_exception=True).count()
-            total_count = invoices.count()
-            exception_rate = exception_count / total_count * 100 if total_count > 0 else 0
-
-            # Calculate score (weighted)
-            score = (
-                on_time_rate * 0.4 +
-                (100 - min(exception_rate * 2, 100)) * 0.3 +
-                min(100, max(0, 100 - abs(avg_dpo - 30) * 2)) * 0.3
+        if include_aging:
+            today = date.today()
+            for bucket_name, min_days, max_days in AGING_BUCKETS:
+                in_bucket = open_ap & Q(
+                    invoice_date__lte=today - timedelta(days=min_days),
+                    invoice_date__gte=today - timedelta(days=max_days)
+                )
+                aggregates[f'{bucket_name}_amount'] = Sum('invoice_amount', filter=in_bucket)
+                aggregates[f'{bucket_name}_count'] = Count('id', filter=in_bucket)
+
+        rows = invoices.values('supplier_id', 'supplier__name').annotate(
+            **aggregates
+        ).order_by()
+
+        stats = {}
+        for row in rows:
+            invoice_count = row['invoice_count']
+            paid_count = row['paid_count']
+            avg_days = row['avg_days_to_pay']
+
+            row['dpo'] = avg_days.total_seconds() / 86400 if avg_days else 0
+            row['on_time_rate'] = row['on_time_count'] / paid_count * 100 if paid_count else 0
+            row['exception_rate'] = (
+                row['exception_count'] / invoice_count * 100 if invoice_count else 0
             )
+            stats[row['supplier_id']] = row
 
-            # Determine risk level based on score
-            if score >= 75:
-                risk_level = 'low'
-            elif score >= 50:
-                risk_level = 'medium'
-            else:
-                risk_level = 'high'
+        return stats
+
+    @staticmethod
+    def _score_supplier_payments(on_time_rate, exception_rate, avg_dpo):
+        """Weighted payment score (0-100) and risk level for a supplier."""
+        score = (
+            on_time_rate * 0.4 +
+            (100 - min(exception_rate * 2, 100)) * 0.3 +
+            min(100, max(0, 100 - abs(avg_dpo - 30) * 2)) * 0.3
+        )
+
+        # Determine risk level based on score
+        if score >= 75:
+            risk_level = 'low'
+        elif score >= 50:
+            risk_level = 'medium'
+        else:
+            risk_level = 'high'
+
+        return score, risk_level
+
+    def _build_supplier_payments_scorecard(self):
+        """Compute the full scorecard for every supplier with invoices, best first."""
+        scorecard = []
+
+        for supplier_id, stats in self._supplier_payment_stats().items():
+            score, risk_level = self._score_supplier_payments(
+                stats['on_time_rate'], stats['exception_rate'], stats['dpo']
+            )
 
             scorecard.append({
-                'supplier_id': supplier.id,
-                'supplier': supplier.name,  # Changed from 'supplier_name'
-                'ap_balance': float(ap_balance),
-                'dpo': round(avg_dpo, 1),  # Changed from 'avg_dpo'
-                'on_time_rate': round(on_time_rate, 1),
-                'exception_rate': round(exception_rate, 1),
-                'invoice_count': total_count,
+                'supplier_id': supplier_id,
+                'supplier': stats['supplier__name'],  # Changed from 'supplier_name'
+                'ap_balance': float(stats['ap_balance'] or 0),
+                'dpo': round(stats['dpo'], 1),  # Changed from 'avg_dpo'
+                'on_time_rate': round(stats['on_time_rate'], 1),
+                'exception_rate': round(stats['exception_rate'], 1),
+                'invoice_count': stats['invoice_count'],
                 'score': round(score, 0),
                 'risk_level': risk_level  # Added for frontend compatibility
             })
 
         return sorted(scorecard, key=lambda x: x['score'], reverse=True)
 
+    def _get_scorecard_snapshot(self, limit):
+        """
+        Read the persisted scorecard in one indexed query.
+
+        Returns None when snapshots are disabled, missing or stale so the
+        caller falls back to live computation.
+        """
+        from .models import SupplierPaymentScorecard
+
+        if not getattr(settings, 'P2P_SCORECARD_SNAPSHOTS_ENABLED', False):
+            return None
+
+        rows = list(
+            SupplierPaymentScorecard.objects.filter(
+                organization=self.organization
+            ).order_by('-score', 'supplier_name')[:limit]
+        )
+        if not rows or rows[0].computed_at < timezone.now() - SCORECARD_SNAPSHOT_MAX_AGE:
+            return None
+
+        return [row.to_dict() for row in rows]
+
+    def refresh_supplier_scorecard_snapshot(self):
+        """
+        Recompute and persist the supplier payment scorecard for the organization.
+
+        Returns:
+            Number of supplier rows written
+        """
+        from .models import SupplierPaymentScorecard
+
+        scorecard = self._build_supplier_payments_scorecard()
+        computed_at = timezone.now()
+
+        with transaction.atomic():
+            SupplierPaymentScorecard.objects.filter(organization=self.organization).delete()
+            SupplierPaymentScorecard.objects.bulk_create([
+                SupplierPaymentScorecard(
+                    organization=self.organization,
+                    supplier_id=row['supplier_id'],
+                    supplier_name=row['supplier'],
+                    ap_balance=Decimal(str(row['ap_balance'])),
+                    dpo=row['dpo'],
+                    on_time_rate=row['on_time_rate'],
+                    exception_rate=row['exception_rate'],
+                    invoice_count=row['invoice_count'],
+                    score=row['score'],
+                    risk_level=row['risk_level'],
+                    computed_at=computed_at,
+                )
+                for row in scorecard
+            ])
+
+        return len(scorecard)
+
+    @P2PAnalyticsCache.cached('invoice')
+    def get_supplier_payments_scorecard(self, limit=50):
+        """
+        Detailed supplier payment scorecard.
+
+        Served from the nightly snapshot when enabled and fresh, otherwise
+        computed live from one grouped query.
+        """
+        snapshot = self._get_scorecard_snapshot(limit)
+        if snapshot is not None:
+            return snapshot
+
+        return self._build_supplier_payments_scorecard()[:limit]
+
+    @P2PAnalyticsCache.cached('invoice')
     def get_supplier_payment_detail(self, supplier_id):
         """Detailed payment history for a specific supplier."""
         try:
@@ -1540,25 +1635,13 @@ class P2PAnalyticsService:
             supplier=supplier
         ).order_by('-invoice_date')
 
-        # Summary stats
-        total_invoices = invoices.count()
-        total_amount = invoices.aggregate(total=Sum('invoice_amount'))['total'] or Decimal('0')
-
-        paid = invoices.filter(status='paid', paid_date__isnull=False)
-        avg_payment = paid.aggregate(avg=Avg('invoice_amount'))['avg'] or Decimal('0')
-
-        # DPO
-        dpo_days = [
-            (inv.paid_date - inv.invoice_date).days
-            for inv in paid
-            if (inv.paid_date - inv.invoice_date).days >= 0
-        ]
-        avg_dpo = sum(dpo_days) / len(dpo_days) if dpo_days else 0
+        # Summary stats, rates and aging buckets in one grouped query
+        stats = self._supplier_payment_stats(supplier.id, include_aging=True).get(supplier.id)
 
         # Exception breakdown
         exceptions = invoices.filter(has_exception=True).values('exception_type').annotate(
             count=Count('id')
-        )
+        ).order_by()
 
         # Recent invoices
         recent = [
@@ -1574,47 +1657,32 @@ class P2PAnalyticsService:
             for inv in invoices[:20]
         ]
 
-        # Calculate additional metrics for frontend compatibility
-        on_time = sum(1 for inv in paid if inv.days_overdue == 0)
-        on_time_rate = on_time / len(dpo_days) * 100 if dpo_days else 0
-
-        exception_count = invoices.filter(has_exception=True).count()
-        exception_rate = exception_count / total_invoices * 100 if total_invoices > 0 else 0
-
-        ap_balance = invoices.filter(
-            status__in=['received', 'pending_match', 'matched', 'approved', 'on_hold']
-        ).aggregate(total=Sum('invoice_amount'))['total'] or Decimal('0')
-
-        # Aging buckets
-        today = date.today()
-        aging_buckets = []
-        unpaid = invoices.filter(status__in=['received', 'pending_match', 'matched', 'approved', 'on_hold'])
-        for bucket_name, min_days, max_days in [
-            ('current', 0, 30), ('days_31_60', 31, 60), ('days_61_90', 61, 90), ('days_90_plus', 91, 9999)
-        ]:
-            bucket_invoices = [
-                inv for inv in unpaid
-                if min_days <= (today - inv.invoice_date).days <= max_days
-            ]
-            bucket_amount = sum(float(inv.invoice_amount) for inv in bucket_invoices)
-            aging_buckets.append({'bucket': bucket_name, 'amount': bucket_amount, 'count': len(bucket_invoices)})
+        aging_buckets = [
+            {
+                'bucket': bucket_name,
+                'amount': float(stats[f'{bucket_name}_amount'] or 0) if stats else 0.0,
+                'count': stats[f'{bucket_name}_count'] if stats else 0
+            }
+            for bucket_name, _, _ in AGING_BUCKETS
+        ]
 
         return {
             'supplier_id': supplier.id,
             'supplier': supplier.name,  # Changed from 'supplier_name'
-            'total_invoices': total_invoices,
-            'total_amount': float(total_amount),
-            'avg_payment': float(avg_payment),
-            'dpo': round(avg_dpo, 1),  # Changed from 'avg_dpo'
-            'on_time_rate': round(on_time_rate, 1),
-            'exception_count': exception_count,
-            'exception_rate': round(exception_rate, 1),
-            'ap_balance': float(ap_balance),
+            'total_invoices': stats['invoice_count'] if stats else 0,
+            'total_amount': float(stats['total_amount'] or 0) if stats else 0.0,
+            'avg_payment': float(stats['avg_payment'] or 0) if stats else 0.0,
+            'dpo': round(stats['dpo'], 1) if stats else 0,  # Changed from 'avg_dpo'
+            'on_time_rate': round(stats['on_time_rate'], 1) if stats else 0,
+            'exception_count': stats['exception_count'] if stats else 0,
+            'exception_rate': round(stats['exception_rate'], 1) if stats else 0,
+            'ap_balance': float(stats['ap_balance'] or 0) if stats else 0.0,
             'aging_buckets': aging_buckets,
             'exception_breakdown': list(exceptions),
             'recent_invoices': recent
         }
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_supplier_payment_history(self, supplier_id, months=12):
         """Get payment history timeline for a specific supplier."""
         try:
@@ -1626,6 +1694,7 @@ class P2PAnalyticsService:
             return None
 
         cutoff_date = date.today() - timedelta(days=months * 30)
+        paid_in_order = Q(status='paid', paid_date__isnull=False, paid_date__gte=F('invoice_date'))
 
         # Monthly payment trend
         invoices = Invoice.objects.filter(
@@ -1637,10 +1706,10 @@ class P2PAnalyticsService:
         ).values('month').annotate(
             total=Sum('invoice_amount'),
             count=Count('id'),
-            paid=Count(Case(
-                When(status='paid', then=1),
-                output_field=IntegerField()
-            ))
+            paid=Count('id', filter=Q(status='paid')),
+            on_time=Count('id', filter=paid_in_order & Q(paid_date__lte=F('due_date'))),
+            avg_days_to_pay=Avg(DAYS_TO_PAY, filter=paid_in_order),
+            exceptions=Count('id', filter=Q(has_exception=True))
         ).order_by('month')
 
         monthly_trend = [
@@ -1648,7 +1717,11 @@ class P2PAnalyticsService:
                 'month': item['month'].strftime('%Y-%m'),
                 'total_amount': float(item['total'] or 0),
                 'invoice_count': item['count'],
-                'paid_count': item['paid']
+                'paid_count': item['paid'],
+                'on_time_count': item['on_time'],
+                'avg_dpo': round(item['avg_days_to_pay'].total_seconds() / 86400, 1)
+                if item['avg_days_to_pay'] else 0,
+                'exception_count': item['exceptions']
             }
             for item in invoices
         ]
@@ -1697,6 +1770,7 @@ class P2PAnalyticsService:
             'exception_history': exception_history
         }
 
+    @P2PAnalyticsCache.cached('invoice')
     def get_dpo_trends(self, months=12):
         """Get Days Payable Outstanding trends over time."""
         cutoff_date = date.today() - timedelta(days=months * 30)
@@ -1706,31 +1780,36 @@ class P2PAnalyticsService:
             status='paid',
             paid_date__isnull=False,
             invoice_date__gte=cutoff_date
-        )
+        ).annotate(month=TruncMonth('invoice_date'))
 
-        # Group by month
-        monthly_data = defaultdict(lambda: {'days': [], 'count': 0, 'amount': Decimal('0')})
+        monthly_totals = paid_invoices.values('month').annotate(
+            count=Count('id'),
+            amount=Sum('invoice_amount')
+        ).order_by('month')
 
-        for inv in paid_invoices:
-            month_key = inv.invoice_date.strftime('%Y-%m')
-            days = (inv.paid_date - inv.invoice_date).days
-            if days >= 0:
-                monthly_data[month_key]['days'].append(days)
-            monthly_data[month_key]['count'] += 1
-            monthly_data[month_key]['amount'] += inv.invoice_amount
+        monthly_dpo = duration_distribution(
+            paid_invoices.annotate(days_to_pay=DAYS_TO_PAY).filter(days_to_pay__gte=timedelta(0)),
+            'days_to_pay',
+            group_by='month'
+        )
 
         result = []
-        for month, data in sorted(monthly_data.items()):
-            avg_dpo = sum(data['days']) / len(data['days']) if data['days'] else 0
+        for item in monthly_totals:
+            stats = monthly_dpo.get(item['month']) or empty_distribution()
             result.append({
-                'month': month,
-                'avg_dpo': round(avg_dpo, 1),
-                'invoice_count': data['count'],
-                'total_amount': float(data['amount'])
+                'month': item['month'].strftime('%Y-%m'),
+                'avg_dpo': stats['avg_days'],
+                'p50_dpo': stats['p50_days'],
+                'p90_dpo': stats['p90_days'],
+                'p95_dpo': stats['p95_days'],
+                'invoice_count': item['count'],
+                'total_amount': float(item['amount'] or 0),
+                'histogram': stats['histogram']
             })
 
         return result
 
+    @P2PAnalyticsCache.cached('pr')
     def get_pr_approval_analysis(self):
         """Analyze PR approval bottlenecks and patterns."""
         prs = PurchaseRequisition.objects.filter(
@@ -1739,51 +1818,61 @@ class P2PAnalyticsService:
         )
         prs = self._apply_date_filters(prs, 'created_date')
 
-        # Approval time distribution
-        approved_prs = prs.filter(approval_date__isnull=False)
-        time_buckets = {'<1 day': 0, '1-2 days': 0, '2-5 days': 0, '>5 days': 0}
+        # Approval time distribution, average and pending count in one query
+        approved = Q(approval_date__isnull=False, approval_date__gte=F('submitted_date'))
+        stats = prs.annotate(approval_days=APPROVAL_DURATION).aggregate(
+            total_approved=Count('id', filter=approved),
+            approval_total=Sum('approval_days', filter=approved),
+            under_1_day=Count('id', filter=approved & Q(approval_days__lt=timedelta(days=1))),
+            days_1_2=Count('id', filter=approved & Q(
+                approval_days__gte=timedelta(days=1), approval_days__lte=timedelta(days=2)
+            )),
+            days_2_5=Count('id', filter=approved & Q(
+                approval_days__gt=timedelta(days=2), approval_days__lte=timedelta(days=5)
+            )),
+            over_5_days=Count('id', filter=approved & Q(approval_days__gt=timedelta(days=5))),
+            pending_count=Count('id', filter=Q(status='pending_approval'))
+        )
 
-        approval_days_list = []
-        for pr in approved_prs:
-            days = (pr.approval_date - pr.submitted_date).days
-            if days >= 0:
-                approval_days_list.append(days)
-                if days < 1:
-                    time_buckets['<1 day'] += 1
-                elif days <= 2:
-                    time_buckets['1-2 days'] += 1
-                elif days <= 5:
-                    time_buckets['2-5 days'] += 1
-                else:
-                    time_buckets['>5 days'] += 1
+        time_buckets = {
+            '<1 day': stats['under_1_day'],
+            '1-2 days': stats['days_1_2'],
+            '2-5 days': stats['days_2_5'],
+            '>5 days': stats['over_5_days'],
+        }
 
-        avg_approval = sum(approval_days_list) / len(approval_days_list) if approval_days_list else 0
+        total_approved = stats['total_approved']
+        avg_approval = (
+            stats['approval_total'].total_seconds() / 86400 / total_approved
+            if total_approved and stats['approval_total'] else 0
+        )
 
-        # Pending by age
-        pending = prs.filter(status='pending_approval')
+        # Oldest pending PRs
         today = date.today()
-        pending_age = []
-        for pr in pending:
-            if pr.submitted_date:
-                days = (today - pr.submitted_date).days
-                pending_age.append({
-                    'id': pr.id,
-                    'pr_number': pr.pr_number,
-                    'days_pending': days,
-                    'amount': float(pr.estimated_amount),
-                    'priority': pr.priority
-                })
+        oldest_pending = prs.filter(status='pending_approval').order_by(
+            'submitted_date', 'id'
+        ).values('id', 'pr_number', 'submitted_date', 'estimated_amount', 'priority')[:10]
 
-        pending_age.sort(key=lambda x: x['days_pending'], reverse=True)
+        pending_age = [
+            {
+                'id': pr['id'],
+                'pr_number': pr['pr_number'],
+                'days_pending': (today - pr['submitted_date']).days,
+                'amount': float(pr['estimated_amount']),
+                'priority': pr['priority']
+            }
+            for pr in oldest_pending
+        ]
 
         return {
             'avg_approval_days': round(avg_approval, 1),
-            'total_approved': len(approval_days_list),
+            'total_approved': total_approved,
             'time_distribution': time_buckets,
-            'pending_count': len(pending_age),
-            'oldest_pending': pending_age[:10]
+            'pending_count': stats['pending_count'],
+            'oldest_pending': pending_age
         }
 
+    @P2PAnalyticsCache.cached('pr', 'po')
     def get_pr_detail(self, pr_id):
         """Get detailed information for a specific PR."""
         try:
@@ -1825,6 +1914,7 @@ class P2PAnalyticsService:
             } if first_po else None
         }
 
+    @P2PAnalyticsCache.cached('po', 'gr', 'invoice')
     def get_po_by_supplier(self, limit=20):
         """Get PO metrics by supplier."""
         pos = PurchaseOrder.objects.filter(organization=self.organization)
@@ -1893,6 +1983,7 @@ class P2PAnalyticsService:
 
         return result
 
+    @P2PAnalyticsCache.cached(*P2PAnalyticsCache.DOCUMENT_TYPES)
     def get_po_detail(self, po_id):
         """Get detailed information for a specific PO."""
         try:
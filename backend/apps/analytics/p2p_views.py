@@ -13,7 +13,7 @@ from rest_framework.exceptions import ValidationError
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
 
-from apps.authentication.utils import log_action
+from apps.authentication.utils import log_action, log_actions_bulk
 from apps.authentication.permissions import (
     HasP2PAccess,
     CanResolveExceptions,
@@ -54,6 +54,10 @@ LIMIT_PARAM = OpenApiParameter(
 )
 
 
+# Upper bound on invoice IDs accepted by the bulk-resolve endpoint
+MAX_BULK_RESOLVE_IDS = 5000
+
+
 class P2PAnalyticsThrottle(ScopedRateThrottle):
     """Throttle for P2P analytics endpoints."""
     scope = 'p2p_analytics'
@@ -750,7 +754,7 @@ def resolve_exception(request, invoice_id):
                 'invoice_ids': {
                     'type': 'array',
                     'items': {'type': 'integer'},
-                    'description': 'List of invoice IDs to resolve (max 50)',
+                    'description': f'List of invoice IDs to resolve (max {MAX_BULK_RESOLVE_IDS})',
                 },
                 'resolution_notes': {
                     'type': 'string',
@@ -770,10 +774,11 @@ def bulk_resolve_exceptions(request):
     Resolve multiple invoice exceptions at once.
 
     Request body:
-    - invoice_ids: List of invoice IDs to resolve (required, max 50)
+    - invoice_ids: List of invoice IDs to resolve (required, max 5000)
     - resolution_notes: Notes explaining the resolution (required)
 
-    Only managers and admins can resolve exceptions.
+    Only managers and admins can resolve exceptions. IDs that are not open
+    exceptions in the organization are returned as skipped_ids.
 
     Query params (superusers only):
     - organization_id: Resolve exceptions for a specific organization
@@ -792,8 +797,11 @@ def bulk_resolve_exceptions(request):
     if not isinstance(invoice_ids, list):
         return Response({'error': 'invoice_ids must be a list'}, status=400)
 
-    if len(invoice_ids) > 50:
-        return Response({'error': 'Maximum 50 invoices can be resolved at once'}, status=400)
+    if len(invoice_ids) > MAX_BULK_RESOLVE_IDS:
+        return Response(
+            {'error': f'Maximum {MAX_BULK_RESOLVE_IDS} invoices can be resolved at once'},
+            status=400
+        )
 
     if not resolution_notes or not resolution_notes.strip():
         return Response({'error': 'resolution_notes is required'}, status=400)
@@ -815,6 +823,19 @@ def bulk_resolve_exceptions(request):
         resolution_notes=resolution_notes.strip()
     )
 
+    # One audit entry per resolved invoice, written in a single INSERT
+    log_actions_bulk(
+        user=request.user,
+        action='resolve',
+        resource='invoice_exception',
+        resource_ids=data['resolved_ids'],
+        request=request,
+        details={
+            'resolution_notes': resolution_notes[:200],  # Truncate for log
+            'organization_id': organization.id
+        } if request.user.is_superuser else {'resolution_notes': resolution_notes[:200]}
+    )
+
     log_action(
         user=request.user,
         action='bulk_resolve',
@@ -822,11 +843,13 @@ def bulk_resolve_exceptions(request):
         request=request,
         details={
             'invoice_count': len(invoice_ids),
-            'resolved_count': data.get('resolved_count', 0),
+            'resolved_count': data['resolved_count'],
+            'skipped_count': data['skipped_count'],
             'organization_id': organization.id
         } if request.user.is_superuser else {
             'invoice_count': len(invoice_ids),
-            'resolved_count': data.get('resolved_count', 0)
+            'resolved_count': data['resolved_count'],
+            'skipped_count': data['skipped_count']
         }
     )
 
@@ -6,13 +6,20 @@ contracts, policies, historical insights) that can augment LLM context for
 more accurate and grounded AI-generated insights.
 
 Uses OpenAI text-embedding-3-small (1536 dimensions) for embeddings
-and pgvector for efficient similarity search.
+and pgvector for efficient similarity search. Without the pgvector
+extension, similarity search runs on the in-process vector index.
 """
 import logging
-from typing import Optional, List
+from typing import Dict, Optional, List, Union
 
 from django.conf import settings
 from django.db import connection
+from django.db.models import Q
+
+from .embeddings import get_embedding_service
+from .text_search import lexical_search, reciprocal_rank_fusion
+from .vector_index import DOCUMENTS, VectorIndexRegistry
+from .vector_search import ann_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -24,14 +31,16 @@ class RAGService:
     Features:
     - Vector similarity search with configurable threshold
     - Document type filtering for targeted retrieval
-    - Fallback to keyword search when pgvector unavailable
+    - In-process vector index when the pgvector extension is unavailable
+    - Fallback to full-text keyword search when no embeddings are available
+    - Optional reciprocal-rank fusion of vector and keyword results
     - Context augmentation for LLM prompts
     """
 
     TOP_K = 5
     SIMILARITY_THRESHOLD = 0.70
-    EMBEDDING_MODEL = "text-embedding-3-small"
-    EMBEDDING_DIMENSIONS = 1536
+    SUPPLIER_DOCS_PER_ENTITY = 3
+    CATEGORY_DOCS_PER_ENTITY = 2
 
     def __init__(self, organization_id: int, openai_api_key: str = None):
         """
@@ -45,8 +54,9 @@ class RAGService:
         self.openai_api_key = openai_api_key or getattr(
             settings, 'OPENAI_API_KEY', None
         )
-        self._openai_client = None
+        self.embeddings = get_embedding_service(self.openai_api_key)
         self._pgvector_available = self._check_pgvector()
+        self._index_available = not self._pgvector_available and VectorIndexRegistry.enabled()
 
     def _check_pgvector(self) -> bool:
         """Check if pgvector extension is available."""
@@ -60,20 +70,9 @@ class RAGService:
             logger.warning(f"pgvector check failed: {e}")
             return False
 
-    @property
-    def openai_client(self):
-        """Lazy-load OpenAI client."""
-        if self._openai_client is None and self.openai_api_key:
-            try:
-                import openai
-                self._openai_client = openai.OpenAI(api_key=self.openai_api_key)
-            except ImportError:
-                logger.warning("openai package not installed")
-        return self._openai_client
-
     def _get_embedding(self, text: str) -> Optional[list]:
         """
-        Get embedding vector for text using OpenAI.
+        Get embedding vector for text from the shared embedding service.
 
         Args:
             text: Text to embed
@@ -81,56 +80,105 @@ class RAGService:
         Returns:
             List of floats (1536 dimensions) or None if unavailable
         """
-        if not self.openai_client:
-            return None
-
-        try:
-            truncated = text[:8000]
-
-            response = self.openai_client.embeddings.create(
-                model=self.EMBEDDING_MODEL,
-                input=truncated,
-                dimensions=self.EMBEDDING_DIMENSIONS
-            )
-
-            return response.data[0].embedding
-
-        except Exception as e:
-            logger.error(f"Embedding generation failed: {e}")
-            return None
+        return self.embeddings.embed(text)
 
     def search(
         self,
         query: str,
         doc_types: List[str] = None,
         top_k: int = None,
-        threshold: float = None
+        threshold: float = None,
+        hybrid: bool = None
     ) -> List[dict]:
         """
         Search for documents relevant to the query.
 
-        Uses vector similarity search if pgvector is available,
-        otherwise falls back to keyword-based search.
+        Uses vector similarity search if pgvector or the in-process vector
+        index is available, otherwise falls back to full-text keyword search.
 
         Args:
             query: Search query text
             doc_types: Optional list of document types to filter
             top_k: Number of results to return (default: 5)
             threshold: Minimum similarity threshold (default: 0.70)
+            hybrid: Fuse vector and full-text results with reciprocal-rank
+                fusion (default: RAG_HYBRID_SEARCH setting)
 
         Returns:
             List of document dicts with title, content, type, metadata, similarity
         """
         top_k = top_k or self.TOP_K
         threshold = threshold or self.SIMILARITY_THRESHOLD
+        if hybrid is None:
+            hybrid = getattr(settings, 'RAG_HYBRID_SEARCH', False)
 
-        if self._pgvector_available and self.openai_client:
+        if (self._pgvector_available or self._index_available) and self.embeddings.available:
             embedding = self._get_embedding(query)
             if embedding:
-                return self._vector_search(embedding, doc_types, top_k, threshold)
+                if self._pgvector_available:
+                    results = self._vector_search(embedding, doc_types, top_k, threshold)
+                else:
+                    results = self._index_search(embedding, doc_types, top_k, threshold)
+                if results is not None:
+                    if hybrid:
+                        return self._fuse(
+                            [results, self._keyword_search(query, doc_types, top_k * 2)], top_k
+                        )
+                    return results
 
         return self._keyword_search(query, doc_types, top_k)
 
+    @staticmethod
+    def _fuse(result_lists: List[List[dict]], top_k: int) -> List[dict]:
+        """Merge ranked result lists with reciprocal-rank fusion."""
+        by_id = {}
+        for results in result_lists:
+            for result in results:
+                by_id.setdefault(result['id'], result)
+
+        fused = reciprocal_rank_fusion([[r['id'] for r in results] for results in result_lists])
+        return [by_id[doc_id] for doc_id, _ in fused[:top_k]]
+
+    def search_many(
+        self,
+        queries: List[str],
+        doc_types: List[str] = None,
+        top_k: int = None,
+        threshold: float = None
+    ) -> List[List[dict]]:
+        """
+        Search for documents relevant to each of several queries.
+
+        Query embeddings come from one batched call; with pgvector all
+        queries run in a single LATERAL query, and the in-process index
+        fetches every matched document at once.
+
+        Args:
+            queries: Search query texts
+            doc_types: Optional list of document types to filter
+            top_k: Number of results per query (default: 5)
+            threshold: Minimum similarity threshold (default: 0.70)
+
+        Returns:
+            One result list per query, in query order
+        """
+        if not queries:
+            return []
+
+        top_k = top_k or self.TOP_K
+        threshold = threshold or self.SIMILARITY_THRESHOLD
+
+        if (self._pgvector_available or self._index_available) and self.embeddings.available:
+            embeddings = self.embeddings.embed_many(queries)
+            if all(embeddings):
+                if self._pgvector_available:
+                    return self._vector_search_many(embeddings, doc_types, top_k, threshold)
+                results = self._index_search_many(embeddings, doc_types, top_k, threshold)
+                if results is not None:
+                    return results
+
+        return [self._keyword_search(query, doc_types, top_k) for query in queries]
+
     def _vector_search(
         self,
         embedding: list,
@@ -152,7 +200,7 @@ class RAGService:
 
             params.extend([embedding, threshold, top_k])
 
-            with connection.cursor() as cursor:
+            with ann_cursor() as cursor:
                 cursor.execute(
                     f"""
                     SELECT
@@ -200,15 +248,171 @@ class RAGService:
                 "fallback", doc_types, top_k
             )
 
+    def _vector_search_many(
+        self,
+        embeddings: List[list],
+        doc_types: List[str],
+        top_k: int,
+        threshold: float
+    ) -> List[List[dict]]:
+        """Perform several pgvector similarity searches in one LATERAL query."""
+        try:
+            type_filter = ""
+            type_params = []
+            if doc_types:
+                placeholders = ', '.join(['%s'] * len(doc_types))
+                type_filter = f"AND document_type IN ({placeholders})"
+                type_params = list(doc_types)
+
+            values = ', '.join(['(%s, %s::vector)'] * len(embeddings))
+            params = [p for i, embedding in enumerate(embeddings) for p in (i, embedding)]
+            params += [self.organization_id] + type_params + [top_k]
+
+            with ann_cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT q.query_index, d.id, d.document_type, d.title,
+                           d.content, d.metadata, d.similarity
+                    FROM (VALUES {values}) AS q(query_index, embedding)
+                    CROSS JOIN LATERAL (
+                        SELECT
+                            id,
+                            document_type,
+                            title,
+                            content,
+                            metadata,
+                            1 - (content_embedding <=> q.embedding) as similarity
+                        FROM analytics_embeddeddocument
+                        WHERE organization_id = %s
+                          AND is_active = TRUE
+                          AND content_embedding IS NOT NULL
+                          {type_filter}
+                        ORDER BY content_embedding <=> q.embedding
+                        LIMIT %s
+                    ) d
+                    ORDER BY q.query_index, d.similarity DESC
+                    """,
+                    params
+                )
+
+                results = [[] for _ in embeddings]
+                for query_index, doc_id, document_type, title, content, metadata, similarity in cursor.fetchall():
+                    if similarity >= threshold:
+                        results[query_index].append({
+                            'id': str(doc_id),
+                            'document_type': document_type,
+                            'title': title,
+                            'content': content,
+                            'metadata': metadata,
+                            'similarity': round(similarity, 4),
+                        })
+
+                logger.info(
+                    f"RAG vector search: {sum(len(r) for r in results)} docs found "
+                    f"for {len(embeddings)} queries (threshold: {threshold}, top_k: {top_k})"
+                )
+                return results
+
+        except Exception as e:
+            logger.error(f"Vector search failed: {e}")
+            return [self._keyword_search("fallback", doc_types, top_k) for _ in embeddings]
+
+    def _index_search(
+        self,
+        embedding: list,
+        doc_types: List[str],
+        top_k: int,
+        threshold: float
+    ) -> Optional[List[dict]]:
+        """
+        Perform vector similarity search on the in-process index.
+
+        Returns None when the organization is too large to index.
+        """
+        results = self._index_search_many([embedding], doc_types, top_k, threshold)
+        return results[0] if results is not None else None
+
+    def _index_search_many(
+        self,
+        embeddings: List[list],
+        doc_types: List[str],
+        top_k: int,
+        threshold: float
+    ) -> Optional[List[List[dict]]]:
+        """
+        Perform several similarity searches on the in-process index.
+
+        Matched documents for all queries are fetched in one query. Returns
+        None when the organization is too large to index.
+        """
+        from .models import EmbeddedDocument
+
+        index = VectorIndexRegistry.get(DOCUMENTS, self.organization_id)
+        if index is None:
+            return None
+
+        all_matches = [
+            index.search(embedding, top_k=top_k, threshold=threshold, kinds=doc_types or None)
+            for embedding in embeddings
+        ]
+        docs = EmbeddedDocument.objects.filter(
+            id__in={doc_id for matches in all_matches for doc_id, _ in matches},
+            is_active=True
+        ).in_bulk()
+
+        results = [
+            [
+                {
+                    'id': str(doc_id),
+                    'document_type': docs[doc_id].document_type,
+                    'title': docs[doc_id].title,
+                    'content': docs[doc_id].content,
+                    'metadata': docs[doc_id].metadata,
+                    'similarity': round(similarity, 4),
+                }
+                for doc_id, similarity in matches
+                if doc_id in docs
+            ]
+            for matches in all_matches
+        ]
+        logger.info(
+            f"RAG index search: {sum(len(r) for r in results)} docs found "
+            f"for {len(embeddings)} queries (threshold: {threshold}, top_k: {top_k})"
+        )
+        return results
+
     def _keyword_search(
         self,
         query: str,
         doc_types: List[str],
         top_k: int
     ) -> List[dict]:
-        """Fallback keyword-based search when vector search unavailable."""
+        """
+        Keyword search when vector search is unavailable.
+
+        Ranked with the database's full-text index (PostgreSQL tsvector or
+        SQLite FTS5); falls back to substring matching without one.
+        """
         from .models import EmbeddedDocument
 
+        ranked = lexical_search(self.organization_id, query, doc_types, top_k)
+        if ranked is not None:
+            docs = EmbeddedDocument.objects.in_bulk([doc_id for doc_id, _ in ranked])
+            results = [
+                {
+                    'id': str(doc_id),
+                    'document_type': docs[doc_id].document_type,
+                    'title': docs[doc_id].title,
+                    'content': docs[doc_id].content,
+                    'metadata': docs[doc_id].metadata,
+                    'similarity': round(score, 4),
+                }
+                for doc_id, score in ranked
+                if doc_id in docs
+            ]
+            logger.info(f"RAG full-text search: {len(results)} docs found")
+            return results
+
         qs = EmbeddedDocument.objects.filter(
             organization_id=self.organization_id,
             is_active=True
@@ -243,7 +447,7 @@ class RAGService:
 
     def augment_context(
         self,
-        query: str,
+        query: Union[str, List[str]],
         base_context: dict,
         doc_types: List[str] = None,
         max_content_length: int = 500
@@ -255,7 +459,8 @@ class RAGService:
         dict for use in LLM prompts.
 
         Args:
-            query: Query to find relevant documents for
+            query: Query, or several queries searched together, to find
+                relevant documents for
             base_context: Base context dict to augment
             doc_types: Optional document type filter
             max_content_length: Max chars of content to include per doc
@@ -263,7 +468,14 @@ class RAGService:
         Returns:
             Augmented context dict with 'relevant_documents' key
         """
-        docs = self.search(query, doc_types)
+        if isinstance(query, str):
+            docs = self.search(query, doc_types)
+        else:
+            best = {}
+            for doc in (d for results in self.search_many(query, doc_types) for d in results):
+                if doc['id'] not in best or doc['similarity'] > best[doc['id']]['similarity']:
+                    best[doc['id']] = doc
+            docs = sorted(best.values(), key=lambda d: d['similarity'], reverse=True)[:self.TOP_K]
 
         if docs:
             base_context['relevant_documents'] = [
@@ -280,46 +492,101 @@ class RAGService:
 
         return base_context
 
-    def get_supplier_context(
+    @staticmethod
+    def _metadata_in(key: str, values: List[int]) -> Q:
+        """
+        Filter documents whose metadata[key] is one of values.
+
+        On PostgreSQL this is an OR of JSONB containment tests, served by the
+        GIN index on metadata; other databases compare the extracted key.
+        """
+        if connection.vendor == 'postgresql':
+            condition = Q()
+            for value in values:
+                condition |= Q(metadata__contains={key: value})
+            return condition
+        return Q(**{f'metadata__{key}__in': list(values)})
+
+    def get_entity_context(
         self,
-        supplier_ids: List[int],
-        include_contracts: bool = True
-    ) -> List[dict]:
+        supplier_ids: List[int] = None,
+        category_ids: List[int] = None,
+        include_contracts: bool = True,
+        max_content_length: int = 500
+    ) -> Dict[str, List[dict]]:
         """
-        Get document context for specific suppliers.
+        Get document context for several suppliers and categories in one query.
 
         Args:
-            supplier_ids: List of supplier IDs to get context for
+            supplier_ids: Supplier IDs (profiles and, optionally, contracts)
+            category_ids: Category IDs (policies and best practices)
             include_contracts: Whether to include contract documents
+            max_content_length: Max chars of content to include per doc
 
         Returns:
-            List of relevant document dicts
+            Dict with 'suppliers' and 'categories' document lists, grouped in
+            the order the IDs were given
         """
         from .models import EmbeddedDocument
 
-        doc_types = ['supplier_profile']
-        if include_contracts:
-            doc_types.append('contract')
+        supplier_ids = list(dict.fromkeys(supplier_ids or []))
+        category_ids = list(dict.fromkeys(category_ids or []))
+        supplier_types = ['supplier_profile'] + (['contract'] if include_contracts else [])
+        category_types = ['policy', 'best_practice']
 
-        results = []
-        for supplier_id in supplier_ids:
+        condition = Q(pk__in=[])
+        if supplier_ids:
+            condition |= Q(document_type__in=supplier_types) & self._metadata_in('supplier_id', supplier_ids)
+        if category_ids:
+            condition |= Q(document_type__in=category_types) & self._metadata_in('category_id', category_ids)
+
+        grouped = {('supplier_id', i): [] for i in supplier_ids}
+        grouped.update({('category_id', i): [] for i in category_ids})
+        limits = {'supplier_id': self.SUPPLIER_DOCS_PER_ENTITY, 'category_id': self.CATEGORY_DOCS_PER_ENTITY}
+
+        if supplier_ids or category_ids:
             docs = EmbeddedDocument.objects.filter(
+                condition,
                 organization_id=self.organization_id,
-                document_type__in=doc_types,
-                is_active=True,
-                metadata__supplier_id=supplier_id
-            )[:3]
+                is_active=True
+            ).order_by('-updated_at')
 
             for doc in docs:
-                results.append({
-                    'id': str(doc.id),
-                    'document_type': doc.document_type,
-                    'title': doc.title,
-                    'content': doc.content[:500],
-                    'metadata': doc.metadata,
-                })
+                key = 'supplier_id' if doc.document_type in supplier_types else 'category_id'
+                bucket = grouped.get((key, doc.metadata.get(key)))
+                if bucket is not None and len(bucket) < limits[key]:
+                    bucket.append({
+                        'id': str(doc.id),
+                        'document_type': doc.document_type,
+                        'title': doc.title,
+                        'content': doc.content[:max_content_length],
+                        'metadata': doc.metadata,
+                    })
+
+        return {
+            'suppliers': [d for i in supplier_ids for d in grouped[('supplier_id', i)]],
+            'categories': [d for i in category_ids for d in grouped[('category_id', i)]],
+        }
 
-        return results
+    def get_supplier_context(
+        self,
+        supplier_ids: List[int],
+        include_contracts: bool = True
+    ) -> List[dict]:
+        """
+        Get document context for specific suppliers.
+
+        Args:
+            supplier_ids: List of supplier IDs to get context for
+            include_contracts: Whether to include contract documents
+
+        Returns:
+            List of relevant document dicts
+        """
+        return self.get_entity_context(
+            supplier_ids=supplier_ids,
+            include_contracts=include_contracts
+        )['suppliers']
 
     def get_category_context(self, category_ids: List[int]) -> List[dict]:
         """
@@ -331,27 +598,7 @@ class RAGService:
         Returns:
             List of relevant document dicts (policies, best practices)
         """
-        from .models import EmbeddedDocument
-
-        results = []
-        for category_id in category_ids:
-            docs = EmbeddedDocument.objects.filter(
-                organization_id=self.organization_id,
-                document_type__in=['policy', 'best_practice'],
-                is_active=True,
-                metadata__category_id=category_id
-            )[:2]
-
-            for doc in docs:
-                results.append({
-                    'id': str(doc.id),
-                    'document_type': doc.document_type,
-                    'title': doc.title,
-                    'content': doc.content[:500],
-                    'metadata': doc.metadata,
-                })
-
-        return results
+        return self.get_entity_context(category_ids=category_ids)['categories']
 
     def get_historical_insights(
         self,
@@ -397,6 +644,6 @@ class RAGService:
 
         stats = EmbeddedDocument.get_document_stats(self.organization_id)
         stats['pgvector_available'] = self._pgvector_available
-        stats['openai_configured'] = self.openai_client is not None
+        stats['openai_configured'] = self.embeddings.available
 
         return stats
@@ -6,16 +6,24 @@ Provides vector similarity search for LLM response caching, enabling
 similar queries (not just exact matches).
 
 Uses OpenAI text-embedding-3-small (1536 dimensions) for embeddings
-and pgvector for efficient similarity search.
+and pgvector for efficient similarity search. Without the pgvector
+extension, similarity search runs on the in-process vector index.
 """
 import hashlib
+import json
 import logging
-from typing import Optional
+import time
+from typing import Optional, Tuple
 
 from django.conf import settings
 from django.db import connection
 from django.utils import timezone
 
+from .embeddings import get_embedding_service
+from .llm_telemetry import record_semantic_cache_hit
+from .vector_index import SEMANTIC_CACHE, VectorIndexRegistry
+from .vector_search import ann_cursor
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,15 +33,16 @@ class SemanticCacheService:
 
     Features:
     - Vector similarity search with configurable threshold
-    - Fallback to exact hash matching when pgvector unavailable
+    - In-process vector index when the pgvector extension is unavailable
+    - Exact hash matching when no embeddings are available
     - Automatic embedding generation via OpenAI
     - TTL-based expiration with configurable duration
     """
 
     SIMILARITY_THRESHOLD = 0.90
     DEFAULT_TTL_HOURS = 1
-    EMBEDDING_MODEL = "text-embedding-3-small"
-    EMBEDDING_DIMENSIONS = 1536
+    DEFAULT_CAPACITY_CHECK_INTERVAL = 50
+    STORES_KEY = "semantic_cache:stores"
 
     def __init__(self, organization_id: int, openai_api_key: str = None):
         """
@@ -47,8 +56,9 @@ class SemanticCacheService:
         self.openai_api_key = openai_api_key or getattr(
             settings, 'OPENAI_API_KEY', None
         )
-        self._openai_client = None
+        self.embeddings = get_embedding_service(self.openai_api_key)
         self._pgvector_available = self._check_pgvector()
+        self._index_available = not self._pgvector_available and VectorIndexRegistry.enabled()
 
     def _check_pgvector(self) -> bool:
         """Check if pgvector extension is available."""
@@ -62,20 +72,9 @@ class SemanticCacheService:
             logger.warning(f"pgvector check failed: {e}")
             return False
 
-    @property
-    def openai_client(self):
-        """Lazy-load OpenAI client."""
-        if self._openai_client is None and self.openai_api_key:
-            try:
-                import openai
-                self._openai_client = openai.OpenAI(api_key=self.openai_api_key)
-            except ImportError:
-                logger.warning("openai package not installed")
-        return self._openai_client
-
     def _get_embedding(self, text: str) -> Optional[list]:
         """
-        Get embedding vector for text using OpenAI.
+        Get embedding vector for text from the shared embedding service.
 
         Args:
             text: Text to embed
@@ -83,23 +82,7 @@ class SemanticCacheService:
         Returns:
             List of floats (1536 dimensions) or None if unavailable
         """
-        if not self.openai_client:
-            return None
-
-        try:
-            truncated = text[:8000]
-
-            response = self.openai_client.embeddings.create(
-                model=self.EMBEDDING_MODEL,
-                input=truncated,
-                dimensions=self.EMBEDDING_DIMENSIONS
-            )
-
-            return response.data[0].embedding
-
-        except Exception as e:
-            logger.error(f"Embedding generation failed: {e}")
-            return None
+        return self.embeddings.embed(text)
 
     def lookup(
         self,
@@ -109,7 +92,8 @@ class SemanticCacheService:
         """
         Find semantically similar cached response.
 
-        Tries vector similarity search first, falls back to exact hash match.
+        Tries exact hash match first, then vector similarity search (pgvector
+        or the in-process index).
 
         Args:
             query: Query text to find similar cache entry for
@@ -127,24 +111,28 @@ class SemanticCacheService:
             request_type=request_type,
             query_hash=query_hash,
             expires_at__gt=timezone.now()
-        ).first()
+        ).values_list('id', 'response_json').first()
 
         if exact_match:
-            exact_match.increment_hit_count()
+            record_semantic_cache_hit(exact_match[0])
             logger.info(f"Semantic cache exact hit for {request_type}")
-            return exact_match.response_json
+            return exact_match[1]
 
-        if self._pgvector_available and self.openai_client:
+        if (self._pgvector_available or self._index_available) and self.embeddings.available:
             embedding = self._get_embedding(query)
             if embedding:
-                similar = self._vector_lookup(embedding, request_type)
+                if self._pgvector_available:
+                    similar = self._vector_lookup(embedding, request_type)
+                else:
+                    similar = self._index_lookup(embedding, request_type)
                 if similar:
-                    similar.increment_hit_count()
+                    entry_id, response = similar
+                    record_semantic_cache_hit(entry_id)
                     logger.info(
                         f"Semantic cache similarity hit for {request_type} "
                         f"(threshold: {self.SIMILARITY_THRESHOLD})"
                     )
-                    return similar.response_json
+                    return response
 
         return None
 
@@ -152,44 +140,89 @@ class SemanticCacheService:
         self,
         embedding: list,
         request_type: str
-    ) -> Optional['SemanticCache']:
+    ) -> Optional[Tuple[str, dict]]:
         """
         Perform vector similarity search using pgvector.
 
+        The cached response is returned by the similarity query itself, so a
+        hit costs one round trip.
+
         Args:
             embedding: Query embedding vector
             request_type: Type of request to filter
 
         Returns:
-            SemanticCache entry if similar found, None otherwise
+            (entry ID, cached response) if similar found, None otherwise
         """
-        from .models import SemanticCache
-
         try:
-            with connection.cursor() as cursor:
+            with ann_cursor() as cursor:
                 cursor.execute(
                     """
-                    SELECT id, 1 - (query_embedding <=> %s::vector) as similarity
-                    FROM analytics_semanticcache
-                    WHERE organization_id = %s
-                      AND request_type = %s
-                      AND expires_at > NOW()
-                      AND query_embedding IS NOT NULL
-                    ORDER BY query_embedding <=> %s::vector
-                    LIMIT 1
+                    SELECT id, response_json, similarity
+                    FROM (
+                        SELECT id, response_json,
+                               1 - (query_embedding <=> %s::vector) as similarity
+                        FROM analytics_semanticcache
+                        WHERE organization_id = %s
+                          AND request_type = %s
+                          AND expires_at > NOW()
+                          AND query_embedding IS NOT NULL
+                        ORDER BY query_embedding <=> %s::vector
+                        LIMIT 1
+                    ) nearest
+                    WHERE similarity >= %s
                     """,
-                    [embedding, self.organization_id, request_type, embedding]
+                    [embedding, self.organization_id, request_type, embedding, self.SIMILARITY_THRESHOLD]
                 )
                 row = cursor.fetchone()
 
-                if row and row[1] >= self.SIMILARITY_THRESHOLD:
-                    return SemanticCache.objects.get(id=row[0])
+                if row:
+                    response = row[1]
+                    if isinstance(response, str):
+                        response = json.loads(response)
+                    return str(row[0]), response
 
         except Exception as e:
             logger.error(f"Vector lookup failed: {e}")
 
         return None
 
+    def _index_lookup(
+        self,
+        embedding: list,
+        request_type: str
+    ) -> Optional[Tuple[str, dict]]:
+        """
+        Perform vector similarity search on the in-process index.
+
+        Args:
+            embedding: Query embedding vector
+            request_type: Type of request to filter
+
+        Returns:
+            (entry ID, cached response) if similar found, None otherwise
+        """
+        from .models import SemanticCache
+
+        index = VectorIndexRegistry.get(SEMANTIC_CACHE, self.organization_id)
+        if index is None:
+            return None
+
+        matches = index.search(
+            embedding,
+            top_k=1,
+            threshold=self.SIMILARITY_THRESHOLD,
+            kinds=[request_type],
+            now=time.time()
+        )
+        if not matches:
+            return None
+
+        return SemanticCache.objects.filter(
+            id=matches[0][0],
+            expires_at__gt=timezone.now()
+        ).values_list('id', 'response_json').first()
+
     def store(
         self,
         query: str,
@@ -214,7 +247,7 @@ class SemanticCacheService:
         ttl = ttl_hours or self.DEFAULT_TTL_HOURS
 
         embedding = None
-        if self._pgvector_available and self.openai_client:
+        if (self._pgvector_available or self._index_available) and self.embeddings.available:
             embedding = self._get_embedding(query)
 
         try:
@@ -230,12 +263,47 @@ class SemanticCacheService:
                 f"Cached {request_type} response "
                 f"(embedding: {'yes' if embedding else 'no'}, ttl: {ttl}h)"
             )
-            return entry
-
         except Exception as e:
             logger.error(f"Cache store failed: {e}")
             return None
 
+        try:
+            if self._capacity_check_due():
+                evicted = SemanticCache.enforce_capacity(self.organization_id)
+            else:
+                evicted = 0
+            if evicted:
+                logger.info(f"Evicted {evicted} semantic cache entries over capacity")
+        except Exception as e:
+            logger.warning(f"Cache eviction failed: {e}")
+
+        return entry
+
+    def _capacity_check_due(self) -> bool:
+        """
+        Whether this store should run the capacity check.
+
+        Counting and sizing an organization's entries costs two aggregate
+        queries, so stores only check every SEMANTIC_CACHE_CAPACITY_CHECK_INTERVAL
+        inserts; the periodic cleanup task enforces capacity for every org.
+        """
+        from django.core.cache import cache
+
+        interval = getattr(
+            settings, 'SEMANTIC_CACHE_CAPACITY_CHECK_INTERVAL', self.DEFAULT_CAPACITY_CHECK_INTERVAL
+        )
+        if interval <= 1:
+            return True
+
+        key = f"{self.STORES_KEY}:{self.organization_id}"
+        cache.add(key, 0, timeout=None)
+        try:
+            return cache.incr(key) % interval == 0
+        except ValueError:
+            # Counter evicted between add and incr; restart the count
+            cache.set(key, 1, timeout=None)
+            return False
+
     def invalidate(
         self,
         request_type: str = None,
@@ -263,8 +331,7 @@ class SemanticCacheService:
             cutoff = timezone.now() - timedelta(hours=older_than_hours)
             qs = qs.filter(created_at__lt=cutoff)
 
-        result = qs.delete()
-        count = result[0] if result else 0
+        count = SemanticCache.purge(qs)
         logger.info(f"Invalidated {count} cache entries")
         return count
 
@@ -93,7 +93,8 @@ class BaseAnalyticsService:
 
         return qs
 
-    def _get_fiscal_year(self, date, use_fiscal_year=True):
+    @staticmethod
+    def _get_fiscal_year(date, use_fiscal_year=True):
         """
         Get fiscal year for a date.
         Fiscal year runs Jul-Jun, so Jul 2024 = FY2025.
@@ -0,0 +1,54 @@
+"""
+Analytics signals for in-process index maintenance.
+
+Keeps the in-process vector index (the fallback when pgvector is
+unavailable) in sync with semantic cache entries and RAG documents. When the
+pgvector extension serves searches, the handlers do nothing, so embedding
+writes pay no cache round trip.
+"""
+
+import logging
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import SemanticCache, EmbeddedDocument
+from .vector_index import DOCUMENTS, SEMANTIC_CACHE, VectorIndexRegistry
+
+logger = logging.getLogger(__name__)
+
+# Saves limited to other fields (e.g. hit counts) leave the index unchanged
+CACHE_INDEXED_FIELDS = {'query_embedding', 'request_type', 'expires_at'}
+DOCUMENT_INDEXED_FIELDS = {'content_embedding', 'document_type', 'is_active'}
+
+
+def _touches(update_fields, indexed_fields) -> bool:
+    return update_fields is None or bool(indexed_fields & set(update_fields))
+
+
+@receiver(post_save, sender=SemanticCache)
+def update_vector_index_on_cache_save(sender, instance, update_fields=None, **kwargs):
+    """Add or replace a semantic cache entry in the vector index."""
+    if VectorIndexRegistry.active() and _touches(update_fields, CACHE_INDEXED_FIELDS):
+        VectorIndexRegistry.semantic_cache_saved(instance)
+
+
+@receiver(post_save, sender=EmbeddedDocument)
+def update_vector_index_on_document_save(sender, instance, update_fields=None, **kwargs):
+    """Add, replace or remove (when deactivated) a document in the vector index."""
+    if VectorIndexRegistry.active() and _touches(update_fields, DOCUMENT_INDEXED_FIELDS):
+        VectorIndexRegistry.document_saved(instance)
+
+
+@receiver(post_delete, sender=SemanticCache)
+def update_vector_index_on_cache_delete(sender, instance, **kwargs):
+    """Remove a deleted semantic cache entry from the vector index."""
+    if VectorIndexRegistry.active():
+        VectorIndexRegistry.deleted(SEMANTIC_CACHE, instance)
+
+
+@receiver(post_delete, sender=EmbeddedDocument)
+def update_vector_index_on_document_delete(sender, instance, **kwargs):
+    """Remove a deleted document from the vector index."""
+    if VectorIndexRegistry.active():
+        VectorIndexRegistry.deleted(DOCUMENTS, instance)
@@ -7,12 +7,15 @@ Contains background tasks for:
 - Async AI enhancement processing
 - Deep insight analysis
 - Batch AI insight generation (overnight)
+- Provider batch API submission and polling for nightly enhancement
 - Semantic cache maintenance
+- Nightly P2P supplier scorecard snapshots
 """
 import logging
 import json
-from datetime import timedelta
+from datetime import datetime, timedelta
 from celery import shared_task
+from django.conf import settings
 from django.db import connection
 from django.core.cache import cache
 from django.utils import timezone
@@ -20,6 +23,16 @@ from django.utils import timezone
 logger = logging.getLogger(__name__)
 
 
+MATERIALIZED_VIEWS = (
+    'mv_monthly_category_spend',
+    'mv_monthly_supplier_spend',
+    'mv_daily_transaction_summary',
+)
+
+NIGHTLY_SUMMARY_PREFIX = "nightly_job_summary"
+NIGHTLY_SUMMARY_TTL = 172800  # 48 hours
+
+
 @shared_task(
     name='refresh_materialized_views',
     bind=True,
@@ -33,46 +46,25 @@ def refresh_materialized_views(self):
     Refresh all analytics materialized views concurrently.
 
     This task should be triggered after data uploads complete.
-    Uses CONCURRENTLY option to avoid locking the views during refresh.
+    Enqueues one refresh_single_materialized_view task per view as a chord,
+    so views refresh in parallel across workers; the summary is written by
+    summarize_nightly_job.
 
     Returns:
-        dict: Status and count of views refreshed
+        dict: Dispatch status and number of views enqueued
     """
-    views = [
-        'mv_monthly_category_spend',
-        'mv_monthly_supplier_spend',
-        'mv_daily_transaction_summary',
-    ]
+    from celery import chord
 
-    refreshed = 0
-    errors = []
-
-    with connection.cursor() as cursor:
-        for view in views:
-            try:
-                # Use CONCURRENTLY to avoid locking (requires unique index)
-                cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
-                refreshed += 1
-                logger.info(f"Refreshed materialized view: {view}")
-            except Exception as e:
-                error_msg = f"Failed to refresh {view}: {str(e)}"
-                logger.error(error_msg)
-                errors.append(error_msg)
-
-                # Try non-concurrent refresh as fallback
-                try:
-                    cursor.execute(f"REFRESH MATERIALIZED VIEW {view}")
-                    refreshed += 1
-                    logger.info(f"Refreshed materialized view (non-concurrent): {view}")
-                    errors.pop()  # Remove error if fallback succeeded
-                except Exception as e2:
-                    logger.error(f"Fallback refresh also failed for {view}: {str(e2)}")
+    started_at = timezone.now().isoformat()
+    callback = chord(refresh_single_view.s(view) for view in MATERIALIZED_VIEWS)(
+        summarize_nightly_job.s(job='materialized_views', started_at=started_at)
+    )
 
+    logger.info(f"Dispatched refresh of {len(MATERIALIZED_VIEWS)} materialized views")
     return {
-        'status': 'success' if not errors else 'partial',
-        'views_refreshed': refreshed,
-        'total_views': len(views),
-        'errors': errors,
+        'status': 'dispatched',
+        'total_views': len(MATERIALIZED_VIEWS),
+        'summary_task_id': callback.id,
     }
 
 
@@ -93,16 +85,10 @@ def refresh_single_view(self, view_name: str):
     Returns:
         dict: Status of the refresh operation
     """
-    valid_views = {
-        'mv_monthly_category_spend',
-        'mv_monthly_supplier_spend',
-        'mv_daily_transaction_summary',
-    }
-
-    if view_name not in valid_views:
+    if view_name not in MATERIALIZED_VIEWS:
         return {
             'status': 'error',
-            'message': f"Invalid view name: {view_name}. Valid views: {valid_views}"
+            'message': f"Invalid view name: {view_name}. Valid views: {set(MATERIALIZED_VIEWS)}"
         }
 
     with connection.cursor() as cursor:
@@ -131,6 +117,138 @@ def refresh_single_view(self, view_name: str):
                 }
 
 
+# ============================================================================
+# Per-Organization Fan-out
+# ============================================================================
+
+def _dispatch_per_organization(job: str, subtask) -> dict:
+    """
+    Enqueue one subtask per active organization as a chord.
+
+    Each organization runs on whichever worker is free, so one slow tenant
+    no longer delays the rest; summarize_nightly_job aggregates the results.
+
+    Returns:
+        dict: Dispatch status and number of organizations enqueued
+    """
+    from celery import chord
+    from apps.authentication.models import Organization
+
+    started_at = timezone.now().isoformat()
+    org_ids = list(Organization.objects.filter(is_active=True).values_list('id', flat=True))
+
+    if not org_ids:
+        return summarize_nightly_job([], job=job, started_at=started_at)
+
+    callback = chord(subtask.s(org_id) for org_id in org_ids)(
+        summarize_nightly_job.s(job=job, started_at=started_at)
+    )
+
+    logger.info(f"Dispatched {job} for {len(org_ids)} organizations")
+    return {
+        'status': 'dispatched',
+        'job': job,
+        'organizations': len(org_ids),
+        'summary_task_id': callback.id,
+    }
+
+
+def _run_for_organization(task, org_id: int, work) -> dict:
+    """
+    Run work(org) for a single organization inside a per-org subtask.
+
+    Errors are retried with exponential backoff up to the task's max_retries.
+    After that, and on time limits, the error is returned instead of raised
+    so the chord callback still runs for the other organizations.
+
+    Args:
+        task: The bound subtask
+        org_id: Organization ID
+        work: Callable taking the Organization and returning a dict of counts
+
+    Returns:
+        dict: organization_id, status ('success', 'failed' or 'skipped') and
+        the counts returned by work
+    """
+    from celery.exceptions import SoftTimeLimitExceeded
+    from apps.authentication.models import Organization
+
+    result = {'organization_id': org_id, 'status': 'success'}
+    try:
+        org = Organization.objects.get(id=org_id, is_active=True)
+        result.update(work(org))
+    except Organization.DoesNotExist:
+        result['status'] = 'skipped'
+    except SoftTimeLimitExceeded:
+        logger.error(f"{task.name} exceeded its time limit for organization {org_id}")
+        result.update(status='failed', error='Time limit exceeded')
+    except Exception as e:
+        if task.request.retries < task.max_retries:
+            raise task.retry(exc=e, countdown=60 * 2 ** task.request.retries)
+        logger.error(f"{task.name} failed for organization {org_id}: {e}")
+        result.update(status='failed', error=str(e))
+    return result
+
+
+@shared_task(name='summarize_nightly_job')
+def summarize_nightly_job(results: list, job: str, started_at: str):
+    """
+    Chord callback aggregating the per-organization (or per-view) results.
+
+    Numeric fields are summed across results. The summary is also cached
+    under nightly_job_summary:{job} for monitoring.
+
+    Args:
+        results: Return values of the subtasks
+        job: Job name
+        started_at: ISO timestamp of dispatch
+
+    Returns:
+        dict: Aggregated summary
+    """
+    end_time = timezone.now()
+    summary = {
+        'job': job,
+        'total': len(results),
+        'succeeded': 0,
+        'failed': 0,
+        'skipped': 0,
+        'totals': {},
+        'errors': [],
+        'started_at': started_at,
+        'completed_at': end_time.isoformat(),
+    }
+
+    for result in results:
+        status = result.get('status')
+        if status == 'success':
+            summary['succeeded'] += 1
+        elif status == 'skipped':
+            summary['skipped'] += 1
+        else:
+            summary['failed'] += 1
+            error = result.get('error') or result.get('message')
+            label = result.get('organization_id', result.get('view'))
+            summary['errors'].append(f"{label}: {error}")
+
+        for key, value in result.items():
+            if key != 'organization_id' and isinstance(value, (int, float)) and not isinstance(value, bool):
+                summary['totals'][key] = summary['totals'].get(key, 0) + value
+
+    summary['duration_seconds'] = (
+        end_time - datetime.fromisoformat(started_at)
+    ).total_seconds()
+    summary['status'] = 'success' if not summary['failed'] else 'partial'
+
+    cache.set(f"{NIGHTLY_SUMMARY_PREFIX}:{job}", summary, NIGHTLY_SUMMARY_TTL)
+    logger.info(
+        f"{job} completed: {summary['succeeded']} succeeded, "
+        f"{summary['failed']} failed, {summary['skipped']} skipped, "
+        f"{summary['duration_seconds']:.1f}s"
+    )
+    return summary
+
+
 # ============================================================================
 # Async AI Enhancement Tasks
 # ============================================================================
@@ -312,102 +430,64 @@ def perform_deep_analysis_async(self, org_id: int, user_id: int, insight_data: d
     autoretry_for=(Exception,),
     retry_backoff=True,
     track_started=True,
-    soft_time_limit=3600,
-    time_limit=3900,
 )
 def batch_generate_insights(self):
     """
     Nightly batch generation of AI insights for all active organizations.
 
-    This task:
-    1. Fetches all active organizations
-    2. Generates base insights for each organization
-    3. Enhances insights using AI (if configured)
-    4. Caches results for immediate availability next day
+    Enqueues generate_organization_insights for each active organization
+    as a chord; summarize_nightly_job aggregates the results.
 
     Benefits:
     - Pre-computed insights ready when users log in
-    - Can use Anthropic Batch API for 50% cost savings (future enhancement)
+    - Organizations are processed in parallel across workers
     - Reduces daytime API load
 
     Returns:
-        dict: Summary of batch processing results
+        dict: Dispatch status and number of organizations enqueued
     """
-    from apps.authentication.models import Organization
-    from .ai_services import AIInsightsService
-    from .ai_cache import AIInsightsCache
+    return _dispatch_per_organization('insight_generation', generate_organization_insights)
 
-    start_time = timezone.now()
-    results = {
-        'organizations_processed': 0,
-        'organizations_failed': 0,
-        'insights_generated': 0,
-        'errors': [],
-        'started_at': start_time.isoformat(),
-    }
-
-    organizations = Organization.objects.filter(is_active=True)
-    total_orgs = organizations.count()
-
-    logger.info(f"Starting batch insight generation for {total_orgs} organizations")
-
-    for idx, org in enumerate(organizations):
-        try:
-            logger.info(f"Processing organization {idx + 1}/{total_orgs}: {org.name}")
 
-            service = AIInsightsService(
-                organization=org,
-                use_external_ai=False,
-            )
+@shared_task(
+    name='generate_organization_insights',
+    bind=True,
+    max_retries=2,
+    track_started=True,
+    soft_time_limit=600,
+    time_limit=660,
+)
+def generate_organization_insights(self, org_id: int, source: str = 'nightly', upload_batch: str = None):
+    """
+    Precompute one organization's insight snapshots.
 
-            insights = service.get_all_insights()
-
-            if insights:
-                cache_service = AIInsightsCache(org.id)
-                cache_key = cache_service._generate_cache_key(
-                    insight_type='all',
-                    filters={}
-                )
-                cache.set(
-                    cache_key,
-                    {
-                        'insights': insights,
-                        'generated_at': timezone.now().isoformat(),
-                        'batch_generated': True,
-                    },
-                    timeout=86400
-                )
-
-                results['insights_generated'] += len(insights)
-                results['organizations_processed'] += 1
-
-                logger.info(f"Generated {len(insights)} insights for {org.name}")
-            else:
-                results['organizations_processed'] += 1
-                logger.info(f"No insights generated for {org.name} (no data)")
+    Runs nightly and after each completed upload; ai_insights serves the
+    snapshots instead of recomputing. After an upload, the new batch is
+    first scored for anomalies on its own, against baselines built from the
+    rest of the organization's data.
 
-        except Exception as e:
-            error_msg = f"Failed to process {org.name}: {str(e)}"
-            logger.error(error_msg)
-            results['errors'].append(error_msg)
-            results['organizations_failed'] += 1
-
-    end_time = timezone.now()
-    duration = (end_time - start_time).total_seconds()
+    Args:
+        org_id: Organization ID
+        source: 'nightly' or 'upload'
+        upload_batch: Batch ID of the completed upload, if any
 
-    results['completed_at'] = end_time.isoformat()
-    results['duration_seconds'] = duration
-    results['status'] = 'success' if not results['errors'] else 'partial'
+    Returns:
+        dict: Per-organization result with snapshots_written and
+            insights_generated (and upload_anomalies for an upload)
+    """
+    from .ai_services import AIInsightsService
 
-    logger.info(
-        f"Batch insight generation completed: "
-        f"{results['organizations_processed']} orgs, "
-        f"{results['insights_generated']} insights, "
-        f"{results['organizations_failed']} failures, "
-        f"{duration:.1f}s duration"
-    )
+    def generate(org):
+        result = {}
+        if upload_batch:
+            result['upload_anomalies'] = AIInsightsService.score_upload_anomalies(org, upload_batch)
+        snapshots = AIInsightsService.refresh_snapshots(org, source=source)
+        insight_count = len(snapshots[0].insights)
+        logger.info(f"Generated {insight_count} insights for {org.name}")
+        result.update({'snapshots_written': len(snapshots), 'insights_generated': insight_count})
+        return result
 
-    return results
+    return _run_for_organization(self, org_id, generate)
 
 
 @shared_task(
@@ -423,60 +503,73 @@ def batch_enhance_insights(self):
     with AI enabled.
 
     This should run AFTER batch_generate_insights completes.
-    Uses external AI to add recommendations and priority actions.
+
+    Anthropic organizations' prompts are submitted through the provider's
+    batch API (one submission per API key) and collected later by
+    poll_insight_enhancement_batch. Organizations on other providers are
+    enhanced synchronously.
 
     Returns:
         dict: Summary of enhancement results
     """
-    from apps.authentication.models import Organization, UserProfile
+    from apps.authentication.models import Organization
+    from .ai_batch import (
+        EnhancementBatch, get_org_ai_settings, prepare_enhancement_request,
+        submit_enhancement_batch,
+    )
+    from .ai_cache import AIInsightsCache
     from .ai_services import AIInsightsService
 
     start_time = timezone.now()
     results = {
         'organizations_enhanced': 0,
+        'organizations_submitted': 0,
         'organizations_skipped': 0,
         'organizations_failed': 0,
+        'batches_submitted': [],
         'errors': [],
         'started_at': start_time.isoformat(),
     }
 
+    batches = {}
     organizations = Organization.objects.filter(is_active=True)
 
     for org in organizations:
         try:
-            admin_profile = UserProfile.objects.filter(
-                organization=org,
-                role='admin',
-                is_active=True
-            ).first()
-
-            if not admin_profile:
+            ai_settings = get_org_ai_settings(org)
+            if not ai_settings:
                 results['organizations_skipped'] += 1
                 continue
 
-            ai_settings = admin_profile.preferences.get('ai_settings', {})
-
-            if not ai_settings.get('use_external_ai') or not ai_settings.get('ai_api_key'):
-                results['organizations_skipped'] += 1
+            provider = ai_settings.get('ai_provider', 'anthropic')
+            if provider == 'anthropic':
+                request = prepare_enhancement_request(org, ai_settings)
+                if request is None:
+                    results['organizations_skipped'] += 1
+                    continue
+                api_key = ai_settings['ai_api_key']
+                batches.setdefault(api_key, EnhancementBatch(api_key=api_key, key_owner_id=org.id))
+                batches[api_key].requests.append(request)
                 continue
 
             service = AIInsightsService(
                 organization=org,
                 use_external_ai=True,
-                ai_provider=ai_settings.get('ai_provider', 'anthropic'),
+                ai_provider=provider,
                 api_key=ai_settings.get('ai_api_key')
             )
+            insights = AIInsightsService(organization=org).get_all_insights()['insights']
+            if not insights:
+                results['organizations_skipped'] += 1
+                continue
 
-            insights = service.get_all_insights()
-            if insights:
-                enhanced = service._enhance_with_external_ai_structured(insights)
-                if enhanced:
-                    results['organizations_enhanced'] += 1
-                    logger.info(f"Enhanced insights for {org.name}")
-                else:
-                    results['organizations_failed'] += 1
+            enhanced = service._enhance_with_external_ai_structured(insights)
+            if enhanced:
+                AIInsightsCache.cache_enhancement(org.id, insights, enhanced)
+                results['organizations_enhanced'] += 1
+                logger.info(f"Enhanced insights for {org.name}")
             else:
-                results['organizations_skipped'] += 1
+                results['organizations_failed'] += 1
 
         except Exception as e:
             error_msg = f"Enhancement failed for {org.name}: {str(e)}"
@@ -484,6 +577,21 @@ def batch_enhance_insights(self):
             results['errors'].append(error_msg)
             results['organizations_failed'] += 1
 
+    poll_interval = getattr(settings, 'AI_BATCH_POLL_INTERVAL', 300)
+    for batch in batches.values():
+        try:
+            batch_id = submit_enhancement_batch(batch)
+        except Exception as e:
+            error_msg = f"Batch submission failed for {len(batch.requests)} organizations: {str(e)}"
+            logger.error(error_msg)
+            results['errors'].append(error_msg)
+            results['organizations_failed'] += len(batch.requests)
+            continue
+
+        results['batches_submitted'].append(batch_id)
+        results['organizations_submitted'] += len(batch.requests)
+        poll_insight_enhancement_batch.apply_async(args=[batch_id], countdown=poll_interval)
+
     end_time = timezone.now()
     results['completed_at'] = end_time.isoformat()
     results['duration_seconds'] = (end_time - start_time).total_seconds()
@@ -491,6 +599,7 @@ def batch_enhance_insights(self):
 
     logger.info(
         f"Batch enhancement completed: "
+        f"{results['organizations_submitted']} submitted in {len(results['batches_submitted'])} batches, "
         f"{results['organizations_enhanced']} enhanced, "
         f"{results['organizations_skipped']} skipped, "
         f"{results['organizations_failed']} failed"
@@ -499,6 +608,45 @@ def batch_enhance_insights(self):
     return results
 
 
+@shared_task(
+    name='poll_insight_enhancement_batch',
+    bind=True,
+    max_retries=None,
+    soft_time_limit=1800,
+    time_limit=1900,
+)
+def poll_insight_enhancement_batch(self, batch_id: str):
+    """
+    Collect a submitted enhancement batch once the provider has finished it.
+
+    Re-schedules itself every AI_BATCH_POLL_INTERVAL seconds, up to
+    AI_BATCH_MAX_POLLS times, then writes each organization's result to the
+    AI insights cache, semantic cache and LLM request log.
+
+    Args:
+        batch_id: Provider batch ID returned at submission
+
+    Returns:
+        dict: Summary of the fan-out
+    """
+    from .ai_batch import collect_enhancement_batch, expire_enhancement_batch
+
+    summary = collect_enhancement_batch(batch_id)
+    if summary is not None:
+        logger.info(
+            f"Enhancement batch {batch_id} collected: "
+            f"{summary.get('organizations_enhanced', 0)} enhanced, "
+            f"{summary.get('organizations_failed', 0)} failed"
+        )
+        return summary
+
+    if self.request.retries >= getattr(settings, 'AI_BATCH_MAX_POLLS', 288):
+        logger.error(f"Enhancement batch {batch_id} did not complete in time")
+        return expire_enhancement_batch(batch_id, 'Batch did not complete in time')
+
+    raise self.retry(countdown=getattr(settings, 'AI_BATCH_POLL_INTERVAL', 300))
+
+
 # ============================================================================
 # Cache Maintenance Tasks
 # ============================================================================
@@ -518,44 +666,50 @@ def cleanup_semantic_cache(self):
     - Expired cache entries (past expires_at)
     - Orphaned entries (organization deleted)
     - Low-value entries (hit_count=0 and older than 24 hours)
+    - Entries over each organization's capacity (LFU/LRU eviction)
+
+    Deletes run in chunks (SEMANTIC_CACHE_PURGE_CHUNK) to keep locks short.
 
     Returns:
         dict: Summary of cleanup results
     """
+    from .llm_telemetry import flush_semantic_cache_hits
     from .models import SemanticCache
 
+    # Pending hit counts decide which entries count as low-value
+    flush_semantic_cache_hits()
+
     start_time = timezone.now()
     results = {
         'expired_deleted': 0,
         'orphaned_deleted': 0,
         'low_value_deleted': 0,
+        'evicted': 0,
         'total_remaining': 0,
         'started_at': start_time.isoformat(),
     }
 
     try:
-        expired = SemanticCache.objects.filter(
-            expires_at__lt=timezone.now()
-        )
-        results['expired_deleted'] = expired.count()
-        expired.delete()
+        results['expired_deleted'] = SemanticCache.cleanup_expired()
         logger.info(f"Deleted {results['expired_deleted']} expired cache entries")
 
-        orphaned = SemanticCache.objects.filter(
-            organization__isnull=True
+        results['orphaned_deleted'] = SemanticCache.purge(
+            SemanticCache.objects.filter(organization__isnull=True)
         )
-        results['orphaned_deleted'] = orphaned.count()
-        orphaned.delete()
 
         cutoff = timezone.now() - timedelta(hours=24)
-        low_value = SemanticCache.objects.filter(
-            hit_count=0,
-            created_at__lt=cutoff
+        results['low_value_deleted'] = SemanticCache.purge(
+            SemanticCache.objects.filter(hit_count=0, created_at__lt=cutoff)
         )
-        results['low_value_deleted'] = low_value.count()
-        low_value.delete()
         logger.info(f"Deleted {results['low_value_deleted']} low-value cache entries")
 
+        organization_ids = SemanticCache.objects.values_list(
+            'organization_id', flat=True
+        ).order_by().distinct()
+        for organization_id in organization_ids:
+            results['evicted'] += SemanticCache.enforce_capacity(organization_id)
+        logger.info(f"Evicted {results['evicted']} cache entries over capacity")
+
         results['total_remaining'] = SemanticCache.objects.count()
 
     except Exception as e:
@@ -569,13 +723,36 @@ def cleanup_semantic_cache(self):
 
     logger.info(
         f"Semantic cache cleanup completed: "
-        f"{results['expired_deleted'] + results['orphaned_deleted'] + results['low_value_deleted']} deleted, "
+        f"{results['expired_deleted'] + results['orphaned_deleted'] + results['low_value_deleted'] + results['evicted']} deleted, "
         f"{results['total_remaining']} remaining"
     )
 
     return results
 
 
+@shared_task(
+    name='flush_semantic_cache_hits',
+    bind=True,
+    max_retries=3,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+)
+def flush_semantic_cache_hits(self):
+    """
+    Write semantic cache hit counts accumulated in Redis to the database.
+
+    Returns:
+        dict: Number of cache entries updated
+    """
+    from .llm_telemetry import flush_semantic_cache_hits as flush_hits
+
+    updated = flush_hits()
+    if updated:
+        logger.info(f"Flushed hit counts for {updated} semantic cache entries")
+
+    return {'entries_updated': updated, 'status': 'success'}
+
+
 @shared_task(
     name='cleanup_llm_request_logs',
     bind=True,
@@ -635,51 +812,104 @@ def cleanup_llm_request_logs(self, days_to_keep: int = 30):
     max_retries=2,
     autoretry_for=(Exception,),
     retry_backoff=True,
-    soft_time_limit=1800,
-    time_limit=2100,
 )
 def refresh_rag_documents(self):
     """
     Refresh RAG document embeddings for all organizations.
 
+    Enqueues refresh_organization_rag_documents for each active organization
+    as a chord; summarize_nightly_job aggregates the results.
+
+    Returns:
+        dict: Dispatch status and number of organizations enqueued
+    """
+    return _dispatch_per_organization('rag_refresh', refresh_organization_rag_documents)
+
+
+@shared_task(
+    name='refresh_organization_rag_documents',
+    bind=True,
+    max_retries=2,
+    soft_time_limit=900,
+    time_limit=960,
+)
+def refresh_organization_rag_documents(self, org_id: int):
+    """
+    Refresh one organization's RAG documents.
+
     This task:
-    1. Re-ingests supplier profiles with updated data
+    1. Re-ingests supplier profiles touched since the last refresh
     2. Re-ingests historical insights
-    3. Updates embeddings for modified documents
+    3. Updates embeddings only for documents whose content changed
+
+    Args:
+        org_id: Organization ID
+
+    Returns:
+        dict: Per-organization result with documents_updated
+    """
+    from .document_ingestion import DocumentIngestionService
+
+    def refresh(org):
+        results = DocumentIngestionService(org.id).refresh_all()
+        suppliers = results['suppliers']
+        insights = results['historical_insights']
+
+        logger.info(
+            f"Refreshed RAG documents for {org.name}: "
+            f"{suppliers['created'] + suppliers['updated']} suppliers "
+            f"({suppliers['unchanged']} unchanged), "
+            f"{insights['created'] + insights['updated']} insights"
+        )
+        return {
+            'documents_updated': sum(
+                r['created'] + r['updated'] for r in (suppliers, insights)
+            )
+        }
+
+    return _run_for_organization(self, org_id, refresh)
+
+
+@shared_task(
+    name='refresh_supplier_payment_scorecards',
+    bind=True,
+    max_retries=2,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    soft_time_limit=1800,
+    time_limit=2100,
+)
+def refresh_supplier_payment_scorecards(self):
+    """
+    Persist the P2P supplier payment scorecard for all active organizations.
+
+    Only runs when P2P_SCORECARD_SNAPSHOTS_ENABLED is set; the scorecard
+    endpoint then reads the snapshot instead of aggregating invoices.
 
     Returns:
         dict: Summary of refresh results
     """
     from apps.authentication.models import Organization
-    from .document_ingestion import DocumentIngestionService
+    from .p2p_services import P2PAnalyticsService
+
+    if not getattr(settings, 'P2P_SCORECARD_SNAPSHOTS_ENABLED', False):
+        return {'status': 'skipped', 'reason': 'P2P scorecard snapshots disabled'}
 
     start_time = timezone.now()
     results = {
         'organizations_processed': 0,
-        'documents_updated': 0,
+        'suppliers_scored': 0,
         'errors': [],
         'started_at': start_time.isoformat(),
     }
 
-    organizations = Organization.objects.filter(is_active=True)
-
-    for org in organizations:
+    for org in Organization.objects.filter(is_active=True):
         try:
-            ingestion_service = DocumentIngestionService(org.id)
-
-            supplier_count = ingestion_service.ingest_supplier_profiles()
-            insight_count = ingestion_service.ingest_historical_insights()
-
-            results['documents_updated'] += supplier_count + insight_count
+            service = P2PAnalyticsService(org)
+            results['suppliers_scored'] += service.refresh_supplier_scorecard_snapshot()
             results['organizations_processed'] += 1
-
-            logger.info(
-                f"Refreshed RAG documents for {org.name}: "
-                f"{supplier_count} suppliers, {insight_count} insights"
-            )
-
         except Exception as e:
-            error_msg = f"RAG refresh failed for {org.name}: {str(e)}"
+            error_msg = f"Scorecard refresh failed for {org.name}: {str(e)}"
             logger.error(error_msg)
             results['errors'].append(error_msg)
 
@@ -689,9 +919,9 @@ def refresh_rag_documents(self):
     results['status'] = 'success' if not results['errors'] else 'partial'
 
     logger.info(
-        f"RAG document refresh completed: "
+        f"Supplier scorecard refresh completed: "
         f"{results['organizations_processed']} orgs, "
-        f"{results['documents_updated']} documents"
+        f"{results['suppliers_scored']} suppliers"
     )
 
     return results
@@ -1,9 +1,13 @@
 """
 Tests for AI Insights service.
 """
+import threading
+
 import pytest
 from decimal import Decimal
 from datetime import date, timedelta
+from django.utils import timezone
+from apps.analytics.ai_providers import AIProvider
 from apps.analytics.ai_services import AIInsightsService
 from apps.procurement.tests.factories import (
     TransactionFactory, SupplierFactory, CategoryFactory
@@ -319,6 +323,117 @@ class TestAnomalyInsights:
         insights = service.get_anomaly_insights()
         assert insights == []
 
+    def test_anomaly_detection_low_outliers(self, organization, supplier, category, admin_user):
+        """Test that unusually low amounts are flagged as well as high ones."""
+        for i in range(10):
+            TransactionFactory(
+                organization=organization, supplier=supplier, category=category,
+                uploaded_by=admin_user, amount=Decimal('1000.00'), invoice_number=f'NORMAL-{i}'
+            )
+        TransactionFactory(
+            organization=organization, supplier=supplier, category=category,
+            uploaded_by=admin_user, amount=Decimal('5.00'), invoice_number='OUTLIER-LOW'
+        )
+
+        insights = AIInsightsService(organization).get_anomaly_insights()
+
+        assert len(insights) == 1
+        sample = insights[0]['details']['sample_anomalies']
+        assert [a['amount'] for a in sample] == [5.0]
+        assert sample[0]['z_score'] < 0
+        assert insights[0]['potential_savings'] is None
+
+    def test_anomaly_query_count_independent_of_categories(
+        self, organization, supplier, admin_user, django_assert_num_queries
+    ):
+        """Test that detection scans the table once instead of once per category."""
+        for c in range(4):
+            category = CategoryFactory(organization=organization)
+            for i in range(8):
+                TransactionFactory(
+                    organization=organization, supplier=supplier, category=category,
+                    uploaded_by=admin_user, amount=Decimal('100.00') + i
+                )
+            TransactionFactory(
+                organization=organization, supplier=supplier, category=category,
+                uploaded_by=admin_user, amount=Decimal('50000.00')
+            )
+        service = AIInsightsService(organization)
+
+        # One scan for the arrays, one lookup for the flagged rows' display fields
+        with django_assert_num_queries(2):
+            insights = service.get_anomaly_insights()
+
+        assert len(insights) == 4
+
+    def test_supplier_baseline_suppresses_normal_premium_supplier(
+        self, organization, category, admin_user
+    ):
+        """Test that a supplier's consistent price level is not an anomaly."""
+        budget = SupplierFactory(organization=organization)
+        premium = SupplierFactory(organization=organization)
+        for i in range(20):
+            TransactionFactory(
+                organization=organization, supplier=budget, category=category,
+                uploaded_by=admin_user, amount=Decimal('100.00') + i
+            )
+        for i in range(5):
+            TransactionFactory(
+                organization=organization, supplier=premium, category=category,
+                uploaded_by=admin_user, amount=Decimal('2000.00') + i
+            )
+
+        insights = AIInsightsService(organization).get_anomaly_insights()
+
+        assert insights == []
+
+    def test_anomaly_incremental_batch(self, organization, supplier, category, admin_user):
+        """Test scoring only a new upload batch against cached baselines."""
+        for i in range(12):
+            TransactionFactory(
+                organization=organization, supplier=supplier, category=category,
+                uploaded_by=admin_user, amount=Decimal('1000.00') + i, upload_batch='history'
+            )
+        service = AIInsightsService(organization)
+        assert service.get_anomaly_insights() == []
+
+        TransactionFactory(
+            organization=organization, supplier=supplier, category=category,
+            uploaded_by=admin_user, amount=Decimal('1001.00'), upload_batch='new'
+        )
+        TransactionFactory(
+            organization=organization, supplier=supplier, category=category,
+            uploaded_by=admin_user, amount=Decimal('25000.00'), upload_batch='new'
+        )
+
+        insights = service.get_anomaly_insights(upload_batch='new')
+
+        assert len(insights) == 1
+        assert [a['amount'] for a in insights[0]['details']['sample_anomalies']] == [25000.0]
+
+
+    def test_anomaly_baselines_invalidated_on_change(self, organization, supplier, category, admin_user):
+        """Test that transaction edits and deletes orphan the cached baselines."""
+        from apps.analytics.anomaly_engine import TransactionAnomalyEngine
+
+        transactions = [
+            TransactionFactory(
+                organization=organization, supplier=supplier, category=category,
+                uploaded_by=admin_user, amount=Decimal('1000.00') + i
+            )
+            for i in range(8)
+        ]
+        AIInsightsService(organization).get_anomaly_insights()
+        assert TransactionAnomalyEngine(organization.id, {}).get_cached_stats() is not None
+
+        transactions[0].amount = Decimal('5000.00')
+        transactions[0].save()
+        assert TransactionAnomalyEngine(organization.id, {}).get_cached_stats() is None
+
+        AIInsightsService(organization).get_anomaly_insights()
+        transactions[1].delete()
+        assert TransactionAnomalyEngine(organization.id, {}).get_cached_stats() is None
+
 
 @pytest.mark.django_db
 class TestConsolidationInsights:
@@ -793,3 +908,1093 @@ class TestDeduplicateSavings:
         for insight in result['insights']:
             for key in insight.keys():
                 assert not key.startswith('_'), f"Found internal field: {key}"
+
+
+@pytest.mark.django_db
+class TestDeterministicInsightIdentity:
+    """Tests for stable insight IDs and cache keys across recomputations."""
+
+    @pytest.fixture
+    def mixed_data(self, organization, admin_user):
+        category = CategoryFactory(organization=organization, name='Identity Category')
+        for i in range(4):
+            supplier = SupplierFactory(organization=organization, name=f'Identity Supplier {i}')
+            TransactionFactory(
+                organization=organization, supplier=supplier, category=category,
+                uploaded_by=admin_user, amount=Decimal(str(1000 * (i + 1))),
+                subcategory='Parts', invoice_number=f'ID-{i}'
+            )
+
+    def test_ids_stable_across_recomputation(self, organization, mixed_data):
+        """Test that the same data yields the same IDs in the same order."""
+        first = AIInsightsService(organization).get_all_insights()['insights']
+        second = AIInsightsService(organization).get_all_insights()['insights']
+
+        assert first
+        assert [i['id'] for i in first] == [i['id'] for i in second]
+
+    def test_ids_unique_per_entity(self, organization, mixed_data):
+        """Test that different insights never share an ID."""
+        insights = AIInsightsService(organization).get_all_insights()['insights']
+
+        ids = [i['id'] for i in insights]
+        assert len(ids) == len(set(ids))
+
+    def test_cache_key_ignores_order_and_timestamps(self, organization, mixed_data):
+        """Test that recomputed insights map to the same enhancement cache key."""
+        from apps.analytics.ai_cache import AIInsightsCache
+
+        first = AIInsightsService(organization).get_all_insights()['insights']
+        second = AIInsightsService(organization).get_all_insights()['insights']
+        for insight in second:
+            insight['created_at'] = '2000-01-01T00:00:00'
+
+        key = AIInsightsCache._generate_cache_key(organization.id, first)
+        assert key == AIInsightsCache._generate_cache_key(organization.id, list(reversed(second)))
+
+        second[0]['potential_savings'] = (second[0]['potential_savings'] or 0) + 1
+        assert key != AIInsightsCache._generate_cache_key(organization.id, second)
+
+    def test_per_insight_analysis_reused(self, organization):
+        """Test that an identical insight is not sent to the provider twice."""
+        from unittest.mock import patch
+        from apps.analytics.ai_services import PerInsightEnhancer
+
+        insight = {
+            'id': 'fixed', 'type': 'risk', 'severity': 'critical', 'title': 'Risk',
+            'description': 'Concentration', 'potential_savings': None, 'created_at': 'now'
+        }
+        enhancer = PerInsightEnhancer(api_key='test-key', organization_id=organization.id)
+
+        with patch.object(
+            PerInsightEnhancer, '_get_single_insight_enhancement',
+            return_value={'root_cause': 'Single source'}
+        ) as provider_call:
+            enhancer.enhance_insights([dict(insight)])
+            result = enhancer.enhance_insights([dict(insight, created_at='later')])
+
+        assert provider_call.call_count == 1
+        assert result[0]['ai_analysis'] == {'root_cause': 'Single source'}
+
+
+class GatedProvider(AIProvider):
+    """
+    In-process provider whose calls block on events rather than sleeping.
+
+    Calls for blocked_ids wait until `release` is set; with wait_for_peak,
+    every call waits until that many calls are in flight at once. Records
+    peak concurrency.
+    """
+
+    name = 'gated'
+
+    def __init__(self, blocked_ids=(), wait_for_peak: int = None):
+        self.blocked_ids = set(blocked_ids)
+        self.wait_for_peak = wait_for_peak
+        self.release = threading.Event()
+        self.all_blocked = threading.Event()
+        self.peak_reached = threading.Event()
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+        self.blocked = 0
+        self._lock = threading.Lock()
+
+    def analyze_single_insight(self, insight, tool_schema):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            if self.wait_for_peak and self.active >= self.wait_for_peak:
+                self.peak_reached.set()
+            if insight['id'] in self.blocked_ids:
+                self.blocked += 1
+                if self.blocked == len(self.blocked_ids):
+                    self.all_blocked.set()
+        try:
+            if self.wait_for_peak:
+                self.peak_reached.wait(timeout=10)
+            if insight['id'] in self.blocked_ids:
+                self.release.wait(timeout=10)
+            return {'root_cause': f"cause {insight['id']}"}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def enhance_insights(self, insights, context, tool_schema):
+        return None
+
+    def deep_analysis(self, insight_data, context, tool_schema):
+        return None
+
+    def is_available(self):
+        return True
+
+    def health_check(self):
+        return {'healthy': True, 'latency_ms': 0, 'error': None}
+
+
+class TestConcurrentEnhancement:
+    """Tests for bounded concurrent per-insight enhancement."""
+
+    @staticmethod
+    def _insights(count):
+        return [
+            {'id': f'insight-{i}', 'type': 'risk', 'severity': 'high', 'title': f'Risk {i}',
+             'description': 'Concentration', 'potential_savings': None}
+            for i in range(count)
+        ]
+
+    @staticmethod
+    def _enhancer(provider, **kwargs):
+        from apps.analytics.ai_providers import AIProviderManager
+        from apps.analytics.ai_services import PerInsightEnhancer
+
+        manager = AIProviderManager(
+            primary_provider=provider.name, api_keys={}, enable_logging=False,
+            providers={provider.name: provider}
+        )
+        return PerInsightEnhancer(provider=provider.name, provider_manager=manager, **kwargs)
+
+    def test_calls_run_in_parallel_within_bound(self):
+        """Test that provider calls overlap but never exceed max_concurrency."""
+        provider = GatedProvider(wait_for_peak=3)
+        enhancer = self._enhancer(provider, max_concurrency=3)
+
+        result = enhancer.enhance_insights(self._insights(5))
+
+        assert provider.peak_reached.is_set()
+        assert all(insight['ai_enhanced'] for insight in result)
+        assert result[4]['ai_analysis']['root_cause'] == 'cause insight-4'
+        assert provider.peak == 3
+        assert enhancer.last_run_stats['enhanced'] == 5
+
+    def test_sequential_when_concurrency_is_one(self):
+        """Test that max_concurrency=1 never overlaps calls."""
+        provider = GatedProvider()
+        enhancer = self._enhancer(provider, max_concurrency=1)
+
+        enhancer.enhance_insights(self._insights(3))
+
+        assert provider.peak == 1
+        assert provider.calls == 3
+
+    def test_deadline_returns_partial_results(self):
+        """Test that insights still in flight at the deadline come back unenhanced."""
+        from concurrent.futures import TimeoutError as FuturesTimeoutError
+        from unittest.mock import patch
+
+        provider = GatedProvider(blocked_ids={'insight-2', 'insight-3'})
+        enhancer = self._enhancer(provider, max_concurrency=2)
+
+        def deadline_once_blocked(futures, timeout=None):
+            # The deadline passes exactly when only the blocked calls remain in flight
+            assert provider.all_blocked.wait(timeout=10)
+            for future in list(futures):
+                if future.done():
+                    yield future
+            raise FuturesTimeoutError()
+
+        try:
+            with patch('apps.analytics.ai_services.as_completed', deadline_once_blocked):
+                result = enhancer.enhance_insights(self._insights(4))
+        finally:
+            provider.release.set()
+
+        enhanced = [insight['id'] for insight in result if insight.get('ai_enhanced')]
+        assert enhanced == ['insight-0', 'insight-1']
+        assert enhancer.last_run_stats['incomplete'] == 2
+
+    def test_provider_metrics_are_thread_local(self):
+        """Test that one thread's metrics are not visible from another."""
+        provider = GatedProvider()
+        provider._last_metrics = 'main'
+        seen = []
+
+        worker = threading.Thread(target=lambda: seen.append(provider._last_metrics))
+        worker.start()
+        worker.join()
+
+        assert seen == [None]
+        assert provider._last_metrics == 'main'
+
+
+@pytest.mark.django_db
+class TestInsightSnapshots:
+    """Tests for precomputed insight snapshots."""
+
+    @pytest.mark.parametrize('today, fiscal_year', [
+        (date(2026, 6, 30), 2026),
+        (date(2026, 7, 1), 2027),
+        (date(2026, 12, 31), 2027),
+    ])
+    def test_presets_use_current_fiscal_year(self, today, fiscal_year):
+        """Test that the year preset follows the July-June fiscal year."""
+        from unittest.mock import patch
+        from apps.analytics.ai_services import insight_snapshot_presets
+
+        with patch('apps.analytics.ai_services.timezone.localdate', return_value=today):
+            assert insight_snapshot_presets() == [{}, {'years': [fiscal_year]}]
+
+    @pytest.fixture
+    def spend_data(self, organization, admin_user):
+        category = CategoryFactory(organization=organization, name='Snapshot Category')
+        for i in range(4):
+            supplier = SupplierFactory(organization=organization, name=f'Snapshot Supplier {i}')
+            TransactionFactory(
+                organization=organization, supplier=supplier, category=category,
+                uploaded_by=admin_user, amount=Decimal(str(1000 * (i + 1))),
+                subcategory='Parts', invoice_number=f'SNAP-{i}', upload_batch='batch-1'
+            )
+
+    def test_snapshot_served_with_age(self, organization, spend_data):
+        """Test that a snapshot is served instead of recomputing."""
+        from unittest.mock import patch
+        live = AIInsightsService(organization).get_all_insights()
+        AIInsightsService.refresh_snapshots(organization)
+
+        with patch.object(AIInsightsService, 'compute_base_insights') as compute:
+            served = AIInsightsService(organization).get_all_insights()
+
+        compute.assert_not_called()
+        assert live['snapshot'] is None
+        assert served['snapshot']['source'] == 'nightly'
+        assert served['snapshot']['age_seconds'] >= 0
+        assert [i['id'] for i in served['insights']] == [i['id'] for i in live['insights']]
+
+    def test_unmatched_filters_computed_live(self, organization, spend_data):
+        """Test that filters without a snapshot fall back to live computation."""
+        AIInsightsService.refresh_snapshots(organization)
+
+        result = AIInsightsService(organization, filters={'min_amount': 1500}).get_all_insights()
+
+        assert result['snapshot'] is None
+
+    def test_snapshot_key_ignores_list_order(self, organization):
+        """Test that equivalent filter lists share a snapshot."""
+        first = AIInsightsService(organization, filters={'years': [2024, 2025]})
+        second = AIInsightsService(organization, filters={'years': [2025, 2024]})
+
+        assert first.snapshot_key() == second.snapshot_key()
+        assert first.snapshot_key() != AIInsightsService(organization).snapshot_key()
+
+    def test_force_refresh_bypasses_snapshot(self, organization, spend_data):
+        """Test that refresh recomputes even when a snapshot exists."""
+        AIInsightsService.refresh_snapshots(organization)
+
+        result = AIInsightsService(organization).get_all_insights(force_refresh=True)
+
+        assert result['snapshot'] is None
+
+    def test_transaction_change_invalidates_snapshot(self, organization, spend_data):
+        """Test that editing a transaction deletes the organization's snapshots."""
+        from apps.analytics.models import InsightSnapshot
+        from apps.procurement.models import Transaction
+        AIInsightsService.refresh_snapshots(organization)
+
+        transaction = Transaction.objects.filter(organization=organization).first()
+        transaction.amount = Decimal('9999')
+        transaction.save()
+
+        assert not InsightSnapshot.objects.filter(organization=organization).exists()
+
+    def test_stale_snapshot_ignored(self, organization, spend_data):
+        """Test that snapshots older than the max age are not served."""
+        from apps.analytics.models import InsightSnapshot
+        AIInsightsService.refresh_snapshots(organization)
+        InsightSnapshot.objects.filter(organization=organization).update(
+            computed_at=timezone.now() - timedelta(days=2)
+        )
+
+        assert AIInsightsService(organization).get_snapshot() is None
+
+    def test_savings_config_change_bypasses_snapshot(self, organization, spend_data):
+        """Test that snapshots computed with other savings rates are not served."""
+        AIInsightsService.refresh_snapshots(organization)
+
+        organization.savings_config = {'consolidation_rate': 0.05}
+        organization.save()
+
+        assert AIInsightsService(organization).get_snapshot() is None
+
+
+@pytest.mark.django_db
+class TestSharedSpendFeatures:
+    """Tests for the shared grouped-spend stage behind the insight generators."""
+
+    @pytest.fixture
+    def grouped_data(self, organization, admin_user):
+        suppliers = [SupplierFactory(organization=organization, name=f'Feature Supplier {i}') for i in range(3)]
+        for c in range(3):
+            category = CategoryFactory(organization=organization, name=f'Feature Category {c}')
+            for i, supplier in enumerate(suppliers):
+                for subcategory in ('Parts', '', ''):
+                    TransactionFactory(
+                        organization=organization, supplier=supplier, category=category,
+                        uploaded_by=admin_user, amount=Decimal(str(100 * (i + 1))),
+                        subcategory=subcategory
+                    )
+
+    def test_generators_share_one_grouped_query(
+        self, organization, grouped_data, django_assert_num_queries
+    ):
+        """Test that cost, risk and consolidation reuse one grouped query."""
+        service = AIInsightsService(organization)
+
+        with django_assert_num_queries(1):
+            service.get_cost_optimization_insights()
+            service.get_supplier_risk_insights()
+            service.get_consolidation_recommendations()
+
+    def test_blank_subcategories_grouped_as_unspecified(self, organization, grouped_data):
+        """Test that blank subcategories form one 'Unspecified' group."""
+        features = AIInsightsService(organization).features
+
+        keys = [(g.category, g.subcategory) for g in features.subcategory_groups]
+        assert len(keys) == 6
+        assert ('Feature Category 0', 'Unspecified') in keys
+        unspecified = next(
+            g for g in features.subcategory_groups
+            if g.category == 'Feature Category 0' and g.subcategory == 'Unspecified'
+        )
+        assert [s.count for s in unspecified.suppliers] == [2, 2, 2]
+        assert [s.name for s in unspecified.suppliers][0] == 'Feature Supplier 2'
+
+    def test_derived_totals_match_database(self, organization, grouped_data):
+        """Test that totals derived in memory match direct aggregates."""
+        from django.db.models import Sum
+        service = AIInsightsService(organization)
+        features = service.features
+
+        assert features.total_spend == service.transactions.aggregate(t=Sum('amount'))['t']
+        assert features.transaction_count == service.transactions.count()
+        assert features.supplier_count == 3
+        assert features.category_count == 3
+        assert features.supplier_totals[0].name == 'Feature Supplier 2'
+        assert features.supplier_totals[0].total == Decimal('2700')
+
+
+class TestAIInsightsCacheBookkeeping:
+    """Tests for AIInsightsCache stats and key tracking."""
+
+    INSIGHTS = [{'id': 'a', 'type': 'cost_optimization', 'title': 'Consolidate', 'potential_savings': 100}]
+
+    def test_redis_client_from_django_redis(self):
+        """Test that django-redis backends (cache.client) expose their raw client."""
+        from types import SimpleNamespace
+        from unittest.mock import MagicMock, patch
+        from apps.analytics.ai_cache import get_redis_client
+
+        redis_client = MagicMock()
+        backend = SimpleNamespace(client=MagicMock(spec=['get_client']))
+        backend.client.get_client.return_value = redis_client
+
+        with patch('apps.analytics.ai_cache.cache', backend):
+            assert get_redis_client() is redis_client
+        backend.client.get_client.assert_called_once_with(write=True)
+
+    def test_redis_client_none_for_other_backends(self):
+        """Test that a non-Redis cache yields no raw client."""
+        from apps.analytics.ai_cache import get_redis_client
+
+        assert get_redis_client() is None
+
+    def test_keys_share_organization_hash_tag(self):
+        """Test that every key of an organization carries the same cluster hash tag."""
+        from apps.analytics.ai_cache import AIInsightsCache
+
+        keys = [
+            AIInsightsCache._generate_cache_key(42, self.INSIGHTS),
+            AIInsightsCache._generate_insight_key(42, self.INSIGHTS[0]),
+            AIInsightsCache._get_org_pattern_key(42),
+            AIInsightsCache._stat_key(42, 'hits'),
+        ]
+
+        assert all(key.startswith('ai_insights:{42}:') for key in keys)
+
+    def test_concurrent_stats_not_lost(self):
+        """Test that hit/miss counters are exact under concurrent increments."""
+        from apps.analytics.ai_cache import AIInsightsCache
+
+        def lookup():
+            for _ in range(25):
+                AIInsightsCache.get_cached_enhancement(7, self.INSIGHTS)
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = AIInsightsCache.get_cache_stats(7)
+        assert stats['misses'] == 200
+        assert stats['total_requests'] == 200
+
+    def test_invalidation_clears_entries_and_stats(self):
+        """Test that invalidation removes tracked entries and resets stats."""
+        from apps.analytics.ai_cache import AIInsightsCache
+
+        AIInsightsCache.cache_enhancement(7, self.INSIGHTS, {'summary': 'x'})
+        AIInsightsCache.cache_insight_analysis(7, self.INSIGHTS[0], {'root_cause': 'y'})
+        AIInsightsCache.cache_enhancement(8, self.INSIGHTS, {'summary': 'other org'})
+        AIInsightsCache.get_cached_enhancement(7, self.INSIGHTS)
+
+        assert AIInsightsCache.invalidate_org_cache(7) == 2
+        assert AIInsightsCache.get_cache_stats(7)['total_requests'] == 0
+        assert AIInsightsCache.get_cached_enhancement(7, self.INSIGHTS) is None
+        assert AIInsightsCache.get_cached_enhancement(8, self.INSIGHTS) == {'summary': 'other org'}
+
+    def test_redis_commands(self):
+        """Test that a Redis-backed cache uses INCR, a key SET and pipelined UNLINK."""
+        from unittest.mock import MagicMock, patch
+        from django.core.cache import cache
+        from apps.analytics.ai_cache import AIInsightsCache
+
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        client.smembers.return_value = {b'entry-1', b'entry-2'}
+        pipe.execute.return_value = [2, 3]
+
+        with patch.object(AIInsightsCache, '_redis_client', return_value=client):
+            AIInsightsCache._increment_stat(7, 'hits')
+            pipe.incr.assert_called_once_with(cache.make_key('ai_insights:{7}:stats:hits'))
+
+            AIInsightsCache.cache_enhancement(7, self.INSIGHTS, {'summary': 'x'})
+            pipe.sadd.assert_called_once_with(
+                cache.make_key('ai_insights:{7}:keys'),
+                cache.make_key(AIInsightsCache._generate_cache_key(7, self.INSIGHTS))
+            )
+
+            assert AIInsightsCache.invalidate_org_cache(7) == 2
+
+        unlinked = pipe.unlink.call_args_list
+        assert sorted(unlinked[0].args) == [b'entry-1', b'entry-2']
+        assert cache.make_key('ai_insights:{7}:keys') in unlinked[1].args
+        client.delete.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestTelemetryBuffer:
+    """Tests for buffered LLM request logs and semantic cache hit counts."""
+
+    @staticmethod
+    def _log_fields(organization, **overrides):
+        fields = {
+            'organization_id': organization.id, 'request_type': 'enhance',
+            'model_used': 'claude-sonnet', 'provider': 'anthropic',
+            'tokens_input': 100, 'tokens_output': 50,
+        }
+        fields.update(overrides)
+        return fields
+
+    @pytest.fixture
+    def buffer(self):
+        from unittest.mock import patch
+        from apps.analytics.llm_telemetry import TelemetryBuffer
+
+        buffer = TelemetryBuffer(batch_size=3, flush_interval=60, max_pending=5)
+        with patch.object(TelemetryBuffer, '_ensure_started'):
+            yield buffer
+
+    def test_logs_written_in_one_batch(self, organization, buffer):
+        """Test that queued logs are not written until a flush inserts them together."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.analytics.models import LLMRequestLog
+
+        for _ in range(2):
+            buffer.log_request(**self._log_fields(organization))
+        assert LLMRequestLog.objects.count() == 0
+
+        with CaptureQueriesContext(connection) as queries:
+            assert buffer.flush() == (2, 0)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        assert len(inserts) == 1
+        assert LLMRequestLog.objects.filter(organization=organization).count() == 2
+
+    def test_failed_flush_requeues_logs(self, organization, buffer):
+        """Test that logs from a failed write are retried first, still bounded by max_pending."""
+        from unittest.mock import patch
+        from django.db import OperationalError
+        from apps.analytics.models import LLMRequestLog
+
+        for i in range(3):
+            buffer.log_request(**self._log_fields(organization, tokens_input=i))
+
+        with patch.object(LLMRequestLog.objects, 'bulk_create', side_effect=OperationalError('db down')):
+            assert buffer.flush() == (0, 0)
+
+        for i in range(3, 6):
+            buffer.log_request(**self._log_fields(organization, tokens_input=i))
+        assert buffer.pending == 5
+        assert buffer.dropped == 1
+
+        assert buffer.flush() == (5, 0)
+        assert sorted(LLMRequestLog.objects.values_list('tokens_input', flat=True)) == [1, 2, 3, 4, 5]
+
+    def test_bad_row_dropped_without_blocking_batch(self, organization, buffer):
+        """Test that a permanently failing row is dropped while the rest of its batch is written."""
+        from apps.analytics.models import LLMRequestLog
+
+        buffer.log_request(**self._log_fields(organization, tokens_input=1))
+        buffer.log_request(**self._log_fields(organization, tokens_input='not-a-number'))
+        buffer.log_request(**self._log_fields(organization, tokens_input=3))
+
+        assert buffer.flush() == (2, 0)
+        assert buffer.pending == 0
+        assert buffer.dropped == 1
+        assert sorted(LLMRequestLog.objects.values_list('tokens_input', flat=True)) == [1, 3]
+
+        assert buffer.flush() == (0, 0)
+
+    def test_full_batch_wakes_flusher(self, organization, buffer):
+        """Test that reaching the batch size triggers an early flush."""
+        for _ in range(2):
+            buffer.log_request(**self._log_fields(organization))
+        assert not buffer._wakeup.is_set()
+
+        buffer.log_request(**self._log_fields(organization))
+        assert buffer._wakeup.is_set()
+
+    def test_pending_logs_bounded(self, organization, buffer):
+        """Test that the oldest logs are dropped when the buffer is full."""
+        for i in range(7):
+            buffer.log_request(**self._log_fields(organization, tokens_input=i))
+
+        buffer.flush()
+
+        from apps.analytics.models import LLMRequestLog
+        assert buffer.dropped == 2
+        assert sorted(LLMRequestLog.objects.values_list('tokens_input', flat=True)) == [2, 3, 4, 5, 6]
+
+    def test_cache_hits_aggregated(self, organization, buffer, django_assert_num_queries):
+        """Test that hit increments are summed per entry and applied in one CASE update."""
+        from apps.analytics.models import SemanticCache
+
+        entries = [
+            SemanticCache.objects.create(
+                organization=organization, request_type='enhance', query_text=f'q{i}',
+                query_hash=f'h{i}', response_json={}, expires_at=timezone.now() + timedelta(hours=1)
+            )
+            for i in range(3)
+        ]
+        for entry, hits in zip(entries, (3, 1, 1)):
+            for _ in range(hits):
+                buffer.record_cache_hit(entry.id)
+
+        with django_assert_num_queries(1):
+            assert buffer.flush() == (0, 3)
+
+        assert [SemanticCache.objects.get(id=e.id).hit_count for e in entries] == [3, 1, 1]
+
+    def test_redis_hit_counts_flushed(self, organization, settings):
+        """Test that hits go to a Redis hash and the flush task applies and clears it."""
+        from unittest.mock import MagicMock, patch
+        from django.core.cache import cache
+        from apps.analytics.llm_telemetry import record_semantic_cache_hit
+        from apps.analytics.models import SemanticCache
+        from apps.analytics.tasks import flush_semantic_cache_hits
+
+        settings.LLM_TELEMETRY_ASYNC = True
+        entry = SemanticCache.objects.create(
+            organization=organization, request_type='enhance', query_text='q',
+            query_hash='h', response_json={}, expires_at=timezone.now() + timedelta(hours=1)
+        )
+        client = MagicMock()
+        client.renamenx.return_value = True
+        client.hgetall.return_value = {str(entry.id).encode(): b'4'}
+
+        with patch('apps.analytics.llm_telemetry.get_redis_client', return_value=client):
+            record_semantic_cache_hit(entry.id)
+            result = flush_semantic_cache_hits()
+
+        hits_key = cache.make_key('semantic_cache:{hits}')
+        client.hincrby.assert_called_once_with(hits_key, str(entry.id), 1)
+        flushing_key = client.renamenx.call_args.args[1]
+        assert flushing_key.startswith(hits_key + ':flushing:')
+        client.unlink.assert_called_once_with(flushing_key)
+        assert result['entries_updated'] == 1
+        assert SemanticCache.objects.get(id=entry.id).hit_count == 4
+
+    def test_semantic_cache_hit_single_query(self, organization, django_assert_num_queries):
+        """Test that an exact semantic cache hit reads the response and counts the hit without re-fetching."""
+        from apps.analytics.models import SemanticCache
+        from apps.analytics.semantic_cache import SemanticCacheService
+
+        service = SemanticCacheService(organization.id)
+        entry = service.store('top suppliers', {'answer': 1})
+
+        with django_assert_num_queries(2):
+            assert service.lookup('top suppliers') == {'answer': 1}
+
+        assert SemanticCache.objects.get(id=entry.id).hit_count == 1
+
+    def test_provider_manager_logs_through_buffer(self, organization, settings):
+        """Test that provider calls queue their log instead of writing inline."""
+        from unittest.mock import patch
+        from apps.analytics.ai_providers import AIProviderManager, LLMRequestMetrics
+        from apps.analytics.llm_telemetry import TelemetryBuffer
+        from apps.analytics.models import LLMRequestLog
+
+        settings.LLM_TELEMETRY_ASYNC = True
+        manager = AIProviderManager(
+            primary_provider='anthropic', api_keys={}, organization_id=organization.id,
+            enable_rag=False, enable_validation=False
+        )
+
+        with patch.object(TelemetryBuffer, 'log_request') as log_request:
+            manager._log_request(LLMRequestMetrics(
+                provider='anthropic', model='claude-sonnet', model_tier='sonnet', request_type='enhance'
+            ))
+
+        assert log_request.call_args.kwargs['organization_id'] == organization.id
+        assert LLMRequestLog.objects.count() == 0
+
+@pytest.mark.django_db
+class TestSemanticCacheCapacity:
+    """Tests for per-organization semantic cache capacity and eviction."""
+
+    @staticmethod
+    def _entry(organization, i, hits=0, last_hit_minutes=None, size=100):
+        from apps.analytics.models import SemanticCache
+
+        return SemanticCache.objects.create(
+            organization=organization, request_type='enhance', query_text=f'q{i}',
+            query_hash=f'h{i}', response_json={}, hit_count=hits, size_bytes=size,
+            last_hit_at=timezone.now() - timedelta(minutes=last_hit_minutes) if last_hit_minutes else None,
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+
+    def test_lfu_evicts_least_used(self, organization, settings):
+        """Test that LFU evicts the fewest-hit entries, oldest hit first on ties."""
+        from apps.analytics.models import SemanticCache
+
+        settings.SEMANTIC_CACHE_MAX_ENTRIES_PER_ORG = 2
+        settings.SEMANTIC_CACHE_EVICTION_POLICY = 'lfu'
+        keep_hot = self._entry(organization, 1, hits=5, last_hit_minutes=90)
+        self._entry(organization, 2, hits=1, last_hit_minutes=60)
+        keep_recent = self._entry(organization, 3, hits=1, last_hit_minutes=1)
+        self._entry(organization, 4, hits=0)
+
+        assert SemanticCache.enforce_capacity(organization.id) == 2
+        assert set(SemanticCache.objects.values_list('id', flat=True)) == {keep_hot.id, keep_recent.id}
+        assert SemanticCache.get_cache_stats(organization.id)['evictions'] == 2
+
+    def test_lru_evicts_least_recent(self, organization, settings):
+        """Test that LRU evicts by last hit regardless of hit count."""
+        from apps.analytics.models import SemanticCache
+
+        settings.SEMANTIC_CACHE_MAX_ENTRIES_PER_ORG = 1
+        settings.SEMANTIC_CACHE_EVICTION_POLICY = 'lru'
+        self._entry(organization, 1, hits=50, last_hit_minutes=90)
+        recent = self._entry(organization, 2, hits=1, last_hit_minutes=1)
+
+        assert SemanticCache.enforce_capacity(organization.id) == 1
+        assert list(SemanticCache.objects.values_list('id', flat=True)) == [recent.id]
+
+    def test_byte_limit_enforced(self, organization, settings):
+        """Test that entries are evicted until the organization fits its byte budget."""
+        from apps.analytics.models import SemanticCache
+
+        settings.SEMANTIC_CACHE_MAX_BYTES_PER_ORG = 250
+        for i in range(4):
+            self._entry(organization, i, hits=i)
+
+        assert SemanticCache.enforce_capacity(organization.id) == 2
+        stats = SemanticCache.get_cache_stats(organization.id)
+        assert stats['stored_bytes'] == 200
+        assert stats['max_bytes'] == 250
+
+    def test_purge_chunked(self, organization, django_assert_num_queries):
+        """Test that purges delete in bounded chunks and send per-row delete signals."""
+        from django.db.models.signals import post_delete
+        from apps.analytics.models import SemanticCache
+
+        for i in range(5):
+            self._entry(organization, i)
+
+        deleted_ids = []
+
+        def receiver(sender, instance, **kwargs):
+            deleted_ids.append(instance.id)
+
+        post_delete.connect(receiver, sender=SemanticCache)
+        try:
+            # Three chunks: select ids, load rows for signals, delete for 2, 2 and 1 entries
+            with django_assert_num_queries(9):
+                assert SemanticCache.purge(SemanticCache.objects.all(), chunk_size=2) == 5
+        finally:
+            post_delete.disconnect(receiver, sender=SemanticCache)
+
+        assert len(deleted_ids) == 5
+        assert SemanticCache.objects.count() == 0
+
+    def test_store_records_size_and_enforces_capacity(self, organization, settings):
+        """Test that stored entries carry their size and inserts keep the organization within capacity."""
+        from apps.analytics.models import SemanticCache
+        from apps.analytics.semantic_cache import SemanticCacheService
+
+        settings.SEMANTIC_CACHE_MAX_ENTRIES_PER_ORG = 2
+        settings.SEMANTIC_CACHE_CAPACITY_CHECK_INTERVAL = 1
+        service = SemanticCacheService(organization.id)
+        for i in range(3):
+            entry = service.store(f'query {i}', {'answer': i})
+
+        assert entry.size_bytes == len(b'query 2') + len(b'{"answer": 2}')
+        assert SemanticCache.objects.filter(organization=organization).count() == 2
+
+    def test_store_checks_capacity_every_interval(self, organization, settings):
+        """Test that stores only run the capacity check every N inserts."""
+        from unittest.mock import patch
+        from apps.analytics.models import SemanticCache
+        from apps.analytics.semantic_cache import SemanticCacheService
+
+        settings.SEMANTIC_CACHE_CAPACITY_CHECK_INTERVAL = 3
+        service = SemanticCacheService(organization.id)
+        with patch.object(SemanticCache, 'enforce_capacity', return_value=0) as enforce:
+            for i in range(7):
+                service.store(f'query {i}', {'answer': i})
+
+        assert enforce.call_count == 2
+        enforce.assert_called_with(organization.id)
+
+
+@pytest.mark.django_db
+class TestChatStreaming:
+    """Tests for streamed chat assembly, server-side context and latency metrics."""
+
+    @staticmethod
+    def _events(frames):
+        import json
+        return [json.loads(frame[len('data: '):]) for frame in frames]
+
+    @staticmethod
+    def _client(tokens, input_tokens=12, output_tokens=4):
+        from unittest.mock import MagicMock
+
+        stream = MagicMock()
+        stream.text_stream = iter(tokens)
+        stream.get_final_message.return_value.usage.input_tokens = input_tokens
+        stream.get_final_message.return_value.usage.output_tokens = output_tokens
+        client = MagicMock()
+        client.messages.stream.return_value.__enter__.return_value = stream
+        return client
+
+    def test_preamble_sent_before_context(self, organization):
+        """Test that the first frame is yielded before context or provider work starts."""
+        from unittest.mock import patch
+        from apps.analytics.chat_streaming import stream_chat
+
+        with patch('apps.analytics.chat_streaming.get_chat_context') as get_context, \
+                patch('apps.analytics.chat_streaming.get_anthropic_client') as get_client:
+            frames = stream_chat(organization, [{'role': 'user', 'content': 'hi'}], 'claude-sonnet-4-20250514', 100, 'key')
+            first = self._events([next(frames)])[0]
+
+            assert first == {'status': 'started', 'model': 'claude-sonnet-4-20250514'}
+            get_context.assert_not_called()
+            get_client.assert_not_called()
+            frames.close()
+
+    def test_stream_logs_latency_metrics(self, organization):
+        """Test that a finished stream reports and logs TTFT, tokens/sec and latency."""
+        from unittest.mock import patch
+        from apps.analytics.chat_streaming import stream_chat
+        from apps.analytics.models import LLMRequestLog
+
+        TransactionFactory.create_batch(2, organization=organization)
+        client = self._client(['Top ', 'supplier'])
+
+        with patch('apps.analytics.chat_streaming.get_anthropic_client', return_value=client):
+            events = self._events(list(stream_chat(
+                organization, [{'role': 'user', 'content': 'hi'}], 'claude-sonnet-4-20250514', 100, 'key'
+            )))
+
+        assert [e.get('token') for e in events[1:3]] == ['Top ', 'supplier']
+        done = events[-1]
+        assert done['usage'] == {'input_tokens': 12, 'output_tokens': 4}
+        assert done['metrics']['ttft_ms'] is not None
+        assert 'Total Spend' in client.messages.stream.call_args.kwargs['system']
+
+        log = LLMRequestLog.objects.get(organization=organization)
+        assert log.request_type == 'chat'
+        assert log.tokens_output == 4
+        assert log.ttft_ms == done['metrics']['ttft_ms']
+        assert log.latency_ms >= log.ttft_ms
+
+    def test_context_cached_until_data_changes(self, organization, django_assert_num_queries):
+        """Test that the org context is served from cache until a transaction changes."""
+        from apps.analytics.chat_streaming import get_chat_context
+
+        transaction = TransactionFactory(organization=organization, amount=Decimal('100.00'))
+        first = get_chat_context(organization.id)
+        assert first['total_spend'] == 100.0
+        assert first['top_suppliers'][0]['name'] == transaction.supplier.name
+
+        with django_assert_num_queries(0):
+            assert get_chat_context(organization.id) == first
+
+        transaction.amount = Decimal('250.00')
+        transaction.save()
+        assert get_chat_context(organization.id)['total_spend'] == 250.0
+
+
+
+
+class TestVectorSearchIndexes:
+    """Tests for pgvector ANN index helpers."""
+
+    def test_partial_index_sql(self):
+        """Test that partial HNSW indexes are cosine indexes filtered by organization."""
+        from apps.analytics.vector_search import create_index_sql, partial_index_name
+
+        name = partial_index_name('documents', 12)
+        sql = create_index_sql('documents', name, where='organization_id = 12')
+
+        assert name == 'analytics_embeddeddocument_org12_hnsw'
+        assert 'CONCURRENTLY IF NOT EXISTS' in sql
+        assert 'USING hnsw (content_embedding vector_cosine_ops)' in sql
+        assert sql.endswith('WHERE organization_id = 12')
+
+    @pytest.mark.django_db
+    def test_search_settings_skipped_without_postgres(self):
+        """Test that ANN settings are not applied on non-PostgreSQL databases."""
+        from apps.analytics.vector_search import ann_cursor
+
+        with ann_cursor() as cursor:
+            cursor.execute('SELECT 1')
+            assert cursor.fetchone() == (1,)
+
+    @pytest.mark.django_db
+    def test_index_commands_require_postgres(self):
+        """Test that the index and benchmark commands refuse to run without PostgreSQL."""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        for command in ('create_vector_partial_indexes', 'benchmark_vector_search'):
+            with pytest.raises(CommandError):
+                call_command(command)
+
+    def test_benchmark_detects_hnsw_in_plan(self):
+        """Test that the benchmark finds the HNSW index anywhere in an EXPLAIN plan, and not a btree-only plan."""
+        from apps.analytics.management.commands.benchmark_vector_search import (
+            HNSW_INDEX, ORG_INDEX, _plan_indexes,
+        )
+
+        ann_plan = [{'Plan': {'Node Type': 'Limit', 'Plans': [
+            {'Node Type': 'Index Scan', 'Index Name': HNSW_INDEX},
+        ]}}]
+        btree_plan = [{'Plan': {'Node Type': 'Limit', 'Plans': [
+            {'Node Type': 'Sort', 'Plans': [
+                {'Node Type': 'Bitmap Heap Scan', 'Plans': [
+                    {'Node Type': 'Bitmap Index Scan', 'Index Name': ORG_INDEX},
+                ]},
+            ]},
+        ]}}]
+
+        assert HNSW_INDEX in _plan_indexes(ann_plan)
+        assert _plan_indexes(btree_plan) == {ORG_INDEX}
+
+
+class TestEmbeddingService:
+    """Tests for the shared, cached and batched embedding service."""
+
+    def test_local_embedder_is_deterministic(self):
+        """Test that the local embedder is stable and ranks shared vocabulary higher."""
+        import numpy as np
+        from apps.analytics.embeddings import LocalEmbedder
+
+        embedder = LocalEmbedder()
+        first, again, related, unrelated = embedder.embed_batch([
+            'office supplies spend', 'office supplies spend',
+            'office supplies contract', 'freight logistics'
+        ])
+
+        assert first == again
+        assert len(first) == 1536
+        assert np.dot(first, related) > np.dot(first, unrelated)
+
+    def test_repeated_text_embedded_once(self):
+        """Test that the local LRU and the shared cache both avoid a second embedding call."""
+        from unittest.mock import patch
+        from apps.analytics.embeddings import EmbeddingService, LocalEmbedder, get_embedding_service
+
+        service = get_embedding_service(backend='local')
+        with patch.object(LocalEmbedder, 'embed_batch', autospec=True, side_effect=LocalEmbedder.embed_batch) as embed_batch:
+            vector = service.embed('top suppliers by spend')
+            assert service.embed('top suppliers by spend') == vector
+
+            EmbeddingService.clear_local()
+            assert service.embed('top suppliers by spend') == pytest.approx(vector, abs=1e-6)
+
+        assert embed_batch.call_count == 1
+
+    def test_concurrent_requests_coalesced_into_one_batch(self, settings):
+        """Test that concurrent callers share one call and duplicate texts are embedded once."""
+        from unittest.mock import patch
+        from apps.analytics.embeddings import LocalEmbedder, get_embedding_service
+
+        settings.EMBEDDING_BATCH_WINDOW_MS = 100
+        service = get_embedding_service(backend='local')
+        barrier = threading.Barrier(4)
+        results = {}
+
+        def worker(i):
+            barrier.wait()
+            results[i] = service.embed_many(['shared question', f'question {i}'])
+
+        with patch.object(LocalEmbedder, 'embed_batch', autospec=True, side_effect=LocalEmbedder.embed_batch) as embed_batch:
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert embed_batch.call_count == 1
+        assert sorted(embed_batch.call_args.args[1]) == sorted(
+            ['shared question'] + [f'question {i}' for i in range(4)]
+        )
+        assert all(result[0] == results[0][0] for result in results.values())
+
+    def test_short_batch_resolves_every_caller(self, settings):
+        """Test that an embedder returning too few vectors answers every text with None."""
+        from unittest.mock import patch
+        from apps.analytics.embeddings import LocalEmbedder, get_embedding_service
+
+        settings.EMBEDDING_BATCH_WINDOW_MS = 0
+        service = get_embedding_service(backend='local')
+        with patch.object(LocalEmbedder, 'embed_batch', return_value=[[0.1] * 1536]):
+            assert service.embed_many(['first text', 'second text']) == [None, None]
+
+        assert service._batcher._in_flight == {}
+        assert service.embed('first text') is not None
+
+    def test_failing_result_handler_does_not_wedge_batcher(self, settings):
+        """Test that a cache write failure still resolves callers and frees the leader slot."""
+        from unittest.mock import patch
+        from apps.analytics.embeddings import EmbeddingService, get_embedding_service
+
+        settings.EMBEDDING_BATCH_WINDOW_MS = 0
+        service = get_embedding_service(backend='local')
+        with patch.object(EmbeddingService, '_store', side_effect=RuntimeError('cache down')):
+            assert service.embed('supplier risk') is not None
+
+        assert service._batcher._leader_active is False
+        assert service.embed('category trends') is not None
+
+    def test_empty_text_not_sent_to_embedder(self, settings):
+        """Test that empty texts are answered with None without reaching the provider."""
+        from unittest.mock import patch
+        from apps.analytics.embeddings import LocalEmbedder, get_embedding_service
+
+        settings.EMBEDDING_BATCH_WINDOW_MS = 0
+        service = get_embedding_service(backend='local')
+        with patch.object(LocalEmbedder, 'embed_batch', autospec=True, side_effect=LocalEmbedder.embed_batch) as embed_batch:
+            vectors = service.embed_many(['', 'spend by region', None])
+
+        assert vectors[0] is None and vectors[2] is None
+        assert vectors[1] is not None
+        assert embed_batch.call_args.args[1] == ['spend by region']
+
+    def test_unavailable_without_api_key(self, settings):
+        """Test that the OpenAI backend reports unavailable and returns no vectors without a key."""
+        from apps.analytics.embeddings import get_embedding_service
+
+        settings.OPENAI_API_KEY = None
+        service = get_embedding_service()
+
+        assert service.available is False
+        assert service.embed_many(['a', 'b']) == [None, None]
+
+
+@pytest.mark.django_db
+class TestIncrementalIngestion:
+    """Tests for content-hash skipping and watermark-based RAG refresh."""
+
+    @pytest.fixture(autouse=True)
+    def local_embeddings(self, settings):
+        settings.EMBEDDING_BACKEND = 'local'
+
+    def test_unchanged_profiles_not_reembedded(self, organization, django_assert_num_queries):
+        """Test that a second ingestion only reads: supplier list, grouped stats and stored hashes."""
+        from unittest.mock import patch
+        from apps.analytics.document_ingestion import DocumentIngestionService
+
+        for supplier in SupplierFactory.create_batch(3, organization=organization):
+            TransactionFactory.create_batch(2, organization=organization, supplier=supplier)
+        service = DocumentIngestionService(organization.id)
+
+        first = service.ingest_supplier_profiles()
+        with patch.object(DocumentIngestionService, '_get_batch_embeddings') as embed, \
+                django_assert_num_queries(3):
+            second = service.ingest_supplier_profiles()
+
+        assert (first['created'], first['unchanged']) == (3, 0)
+        assert (second['created'], second['updated'], second['unchanged']) == (0, 0, 3)
+        embed.assert_not_called()
+
+    def test_refresh_only_touches_suppliers_from_new_uploads(
+        self, organization, django_capture_on_commit_callbacks
+    ):
+        """Test that a refresh after the watermark rebuilds only suppliers in newer uploads."""
+        from apps.analytics.document_ingestion import DocumentIngestionService
+        from apps.procurement.tests.factories import DataUploadFactory
+
+        touched, untouched = SupplierFactory.create_batch(2, organization=organization)
+        service = DocumentIngestionService(organization.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            full = service.refresh_all()
+        assert full['incremental'] is False
+        assert full['suppliers']['created'] == 2
+
+        upload = DataUploadFactory(organization=organization, completed_at=timezone.now())
+        TransactionFactory(organization=organization, supplier=touched, upload_batch=upload.batch_id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            incremental = service.refresh_all()
+
+        assert incremental['incremental'] is True
+        assert incremental['suppliers']['total'] == 1
+        assert incremental['suppliers']['updated'] == 1
+
+    def test_refresh_picks_up_edited_and_deleted_transactions(
+        self, organization, django_capture_on_commit_callbacks
+    ):
+        """Test that transaction edits and deletions outside uploads rebuild the supplier profile."""
+        from django.core.cache import cache
+        from apps.analytics.document_ingestion import DocumentIngestionService
+
+        edited, deleted, untouched = SupplierFactory.create_batch(3, organization=organization)
+        edited_txn = TransactionFactory(organization=organization, supplier=edited)
+        deleted_txn = TransactionFactory(organization=organization, supplier=deleted)
+        TransactionFactory(organization=organization, supplier=untouched)
+        service = DocumentIngestionService(organization.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            service.refresh_all()
+
+        edited_txn.amount += 1
+        edited_txn.save()
+        deleted_txn.delete()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            incremental = service.refresh_all()
+
+        assert incremental['incremental'] is True
+        assert incremental['suppliers']['total'] == 2
+        assert incremental['suppliers']['updated'] == 2
+        assert cache.get(service._deleted_suppliers_key(organization.id)) is None
+
+    def test_watermark_expires_into_full_refresh(self, organization, settings, django_capture_on_commit_callbacks):
+        """Test that the watermark is stored with RAG_FULL_REFRESH_INTERVAL as its TTL."""
+        from unittest.mock import patch
+        from apps.analytics.document_ingestion import DocumentIngestionService, cache
+
+        settings.RAG_FULL_REFRESH_INTERVAL = 3600
+        service = DocumentIngestionService(organization.id)
+
+        with patch.object(cache, 'set', wraps=cache.set) as cache_set, \
+                django_capture_on_commit_callbacks(execute=True):
+            service.refresh_all()
+
+        cache_set.assert_any_call(service._watermark_key(), service.get_watermark(), 3600)
@@ -5,6 +5,7 @@ import pytest
 from decimal import Decimal
 from datetime import date, timedelta
 from apps.analytics.compliance_services import ComplianceService
+from apps.analytics.tiered_cache import TieredCache, lookup_cache
 from apps.procurement.models import Contract, SpendingPolicy, PolicyViolation
 from apps.procurement.tests.factories import (
     TransactionFactory, SupplierFactory, CategoryFactory
@@ -642,3 +643,72 @@ class TestOrganizationScoping:
 
         assert len(result) == 1
         assert result[0]['name'] == 'Main Org Policy'
+
+
+@pytest.mark.django_db
+class TestLookupCache:
+    """Tests for the two-tier cache behind policy and name lookups."""
+
+    def test_policies_served_from_local_tier(self, organization, policy_factory, django_assert_num_queries):
+        """Test that a repeated policy lookup does not hit the database."""
+        policy_factory(name='Cached Policy')
+        ComplianceService(organization)
+
+        with django_assert_num_queries(0):
+            service = ComplianceService(organization)
+
+        assert [p.name for p in service.policies] == ['Cached Policy']
+        assert lookup_cache('spending_policies').get_stats()['local_hits'] == 1
+
+    def test_shared_tier_used_by_other_workers(self, organization, policy_factory, django_assert_num_queries):
+        """Test that a worker with a cold local tier reads from the shared tier."""
+        policy_factory(name='Shared Policy')
+        ComplianceService(organization)
+        lookup_cache('spending_policies').clear_local()
+
+        with django_assert_num_queries(0):
+            service = ComplianceService(organization)
+
+        assert [p.name for p in service.policies] == ['Shared Policy']
+        assert lookup_cache('spending_policies').get_stats()['shared_hits'] == 1
+
+    def test_policy_change_invalidates(self, organization, policy_factory):
+        """Test that saving a policy is visible to the next lookup."""
+        policy = policy_factory(name='Before')
+        ComplianceService(organization)
+
+        policy.name = 'After'
+        policy.save()
+
+        assert [p.name for p in ComplianceService(organization).policies] == ['After']
+
+    def test_invalidation_reaches_other_workers(self, organization, settings):
+        """Test that a generation bump in the shared cache orphans other workers' local entries."""
+        settings.TIERED_CACHE_GENERATION_CHECK = 0
+        worker_a, worker_b = TieredCache('names'), TieredCache('names')
+
+        assert worker_a.get_or_set(organization.id, 'k', lambda: 'old') == 'old'
+        worker_b.invalidate(organization.id)
+
+        assert worker_a.get_or_set(organization.id, 'k', lambda: 'new') == 'new'
+
+    def test_local_tier_bounded(self, settings):
+        """Test that the local tier evicts least recently used entries."""
+        settings.TIERED_CACHE_LOCAL_MAX_ENTRIES = 2
+        lookups = TieredCache('bounded')
+
+        for key in ('a', 'b', 'a', 'c'):
+            lookups.get_or_set(1, key, lambda: key)
+
+        assert lookups.get_stats()['local_entries'] == 2
+        assert (1, 'b') not in lookups._local
+
+    def test_validator_names_invalidated_on_supplier_create(self, organization):
+        """Test that a new supplier is recognized by a later validator."""
+        from apps.analytics.ai_validation import LLMResponseValidator
+
+        assert 'new vendor' not in LLMResponseValidator(organization.id).supplier_names
+
+        SupplierFactory(organization=organization, name='New Vendor')
+
+        assert 'new vendor' in LLMResponseValidator(organization.id).supplier_names
@@ -0,0 +1,462 @@
+"""
+Tests for P2P (Procure-to-Pay) Analytics service.
+"""
+import pytest
+from decimal import Decimal
+from datetime import date, timedelta
+from django.core.cache import cache
+from apps.analytics.p2p_services import P2PAnalyticsService
+from apps.procurement.models import Invoice
+
+
+@pytest.fixture
+def invoice_factory(organization, supplier):
+    """Factory function for creating invoices."""
+    def create_invoice(**kwargs):
+        defaults = {
+            'organization': organization,
+            'supplier': supplier,
+            'invoice_number': f'INV-{Invoice.objects.count() + 1:05d}',
+            'invoice_date': date.today() - timedelta(days=20),
+            'due_date': date.today() + timedelta(days=10),
+            'invoice_amount': Decimal('1000.00'),
+            'net_amount': Decimal('1000.00'),
+        }
+        defaults.update(kwargs)
+        return Invoice.objects.create(**defaults)
+    return create_invoice
+
+
+@pytest.mark.django_db
+class TestBulkResolveExceptions:
+    """Tests for set-based bulk exception resolution."""
+
+    def test_resolves_open_exceptions(self, organization, admin_user, invoice_factory):
+        """Test that open exceptions are resolved and stamped."""
+        invoices = [
+            invoice_factory(has_exception=True, exception_type='price_variance',
+                            exception_notes='Price mismatch')
+            for _ in range(3)
+        ]
+        service = P2PAnalyticsService(organization)
+
+        result = service.bulk_resolve_exceptions(
+            [inv.id for inv in invoices], admin_user, 'Approved by buyer'
+        )
+
+        assert result['resolved_count'] == 3
+        assert result['resolved_ids'] == sorted(inv.id for inv in invoices)
+        assert result['skipped_ids'] == []
+        for inv in invoices:
+            inv.refresh_from_db()
+            assert inv.exception_resolved is True
+            assert inv.exception_resolved_by == admin_user
+            assert inv.exception_resolved_at is not None
+            assert inv.exception_notes == 'Price mismatch\n\nResolved: Approved by buyer'
+
+    def test_skips_ineligible_invoices(self, organization, other_organization, admin_user,
+                                       invoice_factory):
+        """Test that resolved, clean and other-org invoices are skipped."""
+        from apps.procurement.models import Supplier
+        open_inv = invoice_factory(has_exception=True)
+        resolved_inv = invoice_factory(has_exception=True, exception_resolved=True)
+        clean_inv = invoice_factory(has_exception=False)
+        other_supplier = Supplier.objects.create(organization=other_organization, name='Other')
+        other_inv = invoice_factory(
+            organization=other_organization, supplier=other_supplier, has_exception=True
+        )
+        requested = [open_inv.id, resolved_inv.id, clean_inv.id, other_inv.id, 999999]
+        service = P2PAnalyticsService(organization)
+
+        result = service.bulk_resolve_exceptions(requested, admin_user, 'Done')
+
+        assert result['resolved_ids'] == [open_inv.id]
+        assert result['skipped_count'] == 4
+        assert result['skipped_ids'] == [resolved_inv.id, clean_inv.id, other_inv.id, 999999]
+        other_inv.refresh_from_db()
+        assert other_inv.exception_resolved is False
+
+    def test_single_update_query(self, organization, admin_user, invoice_factory,
+                                 django_assert_max_num_queries):
+        """Test that resolution cost does not grow with the number of invoices."""
+        invoices = [invoice_factory(has_exception=True) for _ in range(25)]
+        service = P2PAnalyticsService(organization)
+
+        # SELECT ... FOR UPDATE + UPDATE (+ savepoint bookkeeping)
+        with django_assert_max_num_queries(4):
+            result = service.bulk_resolve_exceptions(
+                [inv.id for inv in invoices], admin_user, 'Done'
+            )
+
+        assert result['resolved_count'] == 25
+
+
+@pytest.fixture
+def payment_history(organization, supplier, invoice_factory):
+    """Invoices covering on-time, late, open and exception cases for one supplier."""
+    today = date.today()
+    # Paid on time after 10 days
+    invoice_factory(invoice_date=today - timedelta(days=40), due_date=today - timedelta(days=10),
+                    paid_date=today - timedelta(days=30), status='paid')
+    # Paid late after 30 days
+    invoice_factory(invoice_date=today - timedelta(days=70), due_date=today - timedelta(days=60),
+                    paid_date=today - timedelta(days=40), status='paid', has_exception=True,
+                    exception_type='price_variance')
+    # Open, 45 days outstanding
+    invoice_factory(invoice_date=today - timedelta(days=45), due_date=today - timedelta(days=15),
+                    status='approved', invoice_amount=Decimal('2500.00'))
+    return supplier
+
+
+@pytest.mark.django_db
+class TestSupplierPaymentScorecard:
+    """Tests for grouped supplier payment KPIs and scorecard snapshots."""
+
+    def test_scorecard_metrics(self, organization, payment_history):
+        """Test on-time rate, DPO, exception rate and AP balance per supplier."""
+        service = P2PAnalyticsService(organization)
+
+        scorecard = service.get_supplier_payments_scorecard()
+
+        assert len(scorecard) == 1
+        row = scorecard[0]
+        assert row['supplier_id'] == payment_history.id
+        assert row['invoice_count'] == 3
+        assert row['on_time_rate'] == 50.0
+        assert row['dpo'] == 20.0
+        assert row['exception_rate'] == 33.3
+        assert row['ap_balance'] == 2500.0
+        assert row['risk_level'] in ('low', 'medium', 'high')
+
+    def test_scorecard_query_count_is_constant(self, organization, invoice_factory,
+                                               django_assert_num_queries):
+        """Test that the live scorecard is a single grouped query regardless of suppliers."""
+        from apps.procurement.models import Supplier
+        for i in range(5):
+            other = Supplier.objects.create(organization=organization, name=f'Scorecard {i}')
+            invoice_factory(supplier=other)
+        service = P2PAnalyticsService(organization)
+
+        with django_assert_num_queries(1):
+            scorecard = service.get_supplier_payments_scorecard()
+
+        assert len(scorecard) == 5
+
+    def test_payment_detail_aging_buckets(self, organization, payment_history):
+        """Test that detail aging buckets come from the grouped query."""
+        service = P2PAnalyticsService(organization)
+
+        detail = service.get_supplier_payment_detail(payment_history.id)
+
+        buckets = {b['bucket']: b for b in detail['aging_buckets']}
+        assert buckets['days_31_60'] == {'bucket': 'days_31_60', 'amount': 2500.0, 'count': 1}
+        assert buckets['current']['count'] == 0
+        assert detail['total_invoices'] == 3
+        assert detail['exception_count'] == 1
+
+    def test_payment_history_monthly_kpis(self, organization, payment_history):
+        """Test that monthly history includes on-time counts and DPO."""
+        service = P2PAnalyticsService(organization)
+
+        history = service.get_supplier_payment_history(payment_history.id)
+
+        assert sum(m['invoice_count'] for m in history['monthly_trend']) == 3
+        assert sum(m['on_time_count'] for m in history['monthly_trend']) == 1
+
+    def test_snapshot_served_when_enabled(self, organization, payment_history, settings,
+                                          django_assert_num_queries):
+        """Test that a fresh snapshot is read in a single query."""
+        settings.P2P_SCORECARD_SNAPSHOTS_ENABLED = True
+        service = P2PAnalyticsService(organization)
+        live = service.get_supplier_payments_scorecard()
+
+        assert service.refresh_supplier_scorecard_snapshot() == 1
+        cache.clear()  # bypass the result cache to exercise the snapshot read
+
+        with django_assert_num_queries(1):
+            snapshot = service.get_supplier_payments_scorecard()
+
+        assert snapshot == live
+
+    def test_snapshot_ignored_when_disabled(self, organization, payment_history, settings):
+        """Test that snapshots are not read when the feature is off."""
+        from apps.analytics.models import SupplierPaymentScorecard
+        settings.P2P_SCORECARD_SNAPSHOTS_ENABLED = True
+        service = P2PAnalyticsService(organization)
+        service.refresh_supplier_scorecard_snapshot()
+        SupplierPaymentScorecard.objects.update(score=1)
+
+        settings.P2P_SCORECARD_SNAPSHOTS_ENABLED = False
+
+        assert service.get_supplier_payments_scorecard()[0]['score'] != 1
+
+
+@pytest.fixture
+def p2p_documents(organization, supplier, category, invoice_factory):
+    """A small PR → PO → GR → Invoice dataset across several statuses."""
+    from apps.procurement.models import PurchaseRequisition, PurchaseOrder, GoodsReceipt
+    today = date.today()
+    prs = []
+    for i, (pr_status, approval_lag) in enumerate([
+        ('converted_to_po', 0), ('converted_to_po', 2), ('approved', 4),
+        ('rejected', None), ('pending_approval', None), ('pending_approval', None),
+    ]):
+        submitted = today - timedelta(days=20 + i)
+        prs.append(PurchaseRequisition.objects.create(
+            organization=organization,
+            pr_number=f'PR-{i:03d}',
+            category=category,
+            estimated_amount=Decimal('1000.00') * (i + 1),
+            status=pr_status,
+            created_date=submitted,
+            submitted_date=submitted,
+            approval_date=submitted + timedelta(days=approval_lag) if approval_lag is not None else None
+        ))
+
+    pos = []
+    for i, contract_backed in enumerate([True, False, False]):
+        pos.append(PurchaseOrder.objects.create(
+            organization=organization,
+            po_number=f'PO-{i:03d}',
+            supplier=supplier,
+            category=category if i < 2 else None,
+            requisition=prs[i],
+            total_amount=Decimal('1000.00') * (i + 1),
+            status='approved',
+            is_contract_backed=contract_backed,
+            amendment_count=1 if i == 0 else 0,
+            created_date=today - timedelta(days=15)
+        ))
+
+    GoodsReceipt.objects.create(
+        organization=organization,
+        gr_number='GR-000',
+        purchase_order=pos[0],
+        quantity_ordered=10,
+        quantity_received=10,
+        received_date=today - timedelta(days=10)
+    )
+    invoice_factory(status='paid', paid_date=today - timedelta(days=5))
+    invoice_factory(status='approved')
+    return {'prs': prs, 'pos': pos}
+
+
+@pytest.mark.django_db
+class TestP2POverviewQueryBudget:
+    """Overview pages must run a fixed number of queries regardless of data volume."""
+
+    def test_process_funnel(self, organization, p2p_documents, django_assert_num_queries):
+        """Test that every funnel stage is counted in one query."""
+        service = P2PAnalyticsService(organization)
+
+        with django_assert_num_queries(1):
+            funnel = service.get_process_funnel()
+
+        counts = {stage['name']: stage['count'] for stage in funnel['stages']}
+        assert counts == {
+            'PRs Created': 6, 'PRs Approved': 3, 'POs Created': 3,
+            'GRs Received': 1, 'Invoices': 2, 'Paid': 1,
+        }
+
+    def test_pr_overview(self, organization, p2p_documents, django_assert_num_queries):
+        """Test PR overview metrics from a single grouped query."""
+        service = P2PAnalyticsService(organization)
+
+        with django_assert_num_queries(1):
+            overview = service.get_pr_overview()
+
+        assert overview['total_prs'] == 6
+        assert overview['total_value'] == 21000.0
+        assert overview['conversion_rate'] == 33.3
+        assert overview['pending_count'] == 2
+        assert overview['avg_approval_days'] == 2.0
+        assert overview['status_breakdown']['rejected'] == 1
+
+    def test_po_overview(self, organization, p2p_documents, django_assert_num_queries):
+        """Test PO overview metrics from a single grouped query."""
+        service = P2PAnalyticsService(organization)
+
+        with django_assert_num_queries(1):
+            overview = service.get_po_overview()
+
+        assert overview['total_pos'] == 3
+        assert overview['total_value'] == 6000.0
+        assert overview['on_contract_value'] == 1000.0
+        assert overview['off_contract_value'] == 5000.0
+        assert overview['amendment_rate'] == 33.3
+
+    def test_po_leakage(self, organization, p2p_documents, django_assert_num_queries):
+        """Test off-contract spend by category from a single grouped query."""
+        service = P2PAnalyticsService(organization)
+
+        with django_assert_num_queries(1):
+            leakage = service.get_po_leakage()
+
+        assert leakage == [
+            {
+                'category': 'Uncategorized', 'maverick_amount': 3000.0, 'maverick_count': 1,
+                'category_total': 3000.0, 'maverick_percent': 100.0,
+            },
+            {
+                'category': 'Test Category', 'maverick_amount': 2000.0, 'maverick_count': 1,
+                'category_total': 3000.0, 'maverick_percent': 66.7,
+            },
+        ]
+
+    def test_pr_approval_analysis(self, organization, p2p_documents, django_assert_num_queries):
+        """Test approval distribution and oldest pending PRs in two queries."""
+        service = P2PAnalyticsService(organization)
+
+        with django_assert_num_queries(2):
+            analysis = service.get_pr_approval_analysis()
+
+        assert analysis['total_approved'] == 3
+        assert analysis['avg_approval_days'] == 2.0
+        assert analysis['time_distribution'] == {
+            '<1 day': 1, '1-2 days': 1, '2-5 days': 1, '>5 days': 0
+        }
+        assert analysis['pending_count'] == 2
+        assert [pr['pr_number'] for pr in analysis['oldest_pending']] == ['PR-005', 'PR-004']
+
+
+@pytest.mark.django_db
+class TestP2PAnalyticsCache:
+    """Tests for result caching with per-document-type invalidation."""
+
+    def test_repeat_call_served_from_cache(self, organization, p2p_documents, django_assert_num_queries):
+        """Test that an unchanged dataset is not queried twice."""
+        service = P2PAnalyticsService(organization)
+        first = service.get_pr_overview()
+
+        with django_assert_num_queries(0):
+            second = P2PAnalyticsService(organization).get_pr_overview()
+
+        assert second == first
+
+    def test_filters_are_part_of_key(self, organization, p2p_documents):
+        """Test that different filters do not share cached results."""
+        P2PAnalyticsService(organization).get_pr_overview()
+        filtered = P2PAnalyticsService(
+            organization, filters={'date_from': date.today() - timedelta(days=21)}
+        ).get_pr_overview()
+
+        assert filtered['total_prs'] == 2
+
+    def test_invoice_change_only_invalidates_invoice_results(
+        self, organization, p2p_documents, invoice_factory, django_assert_num_queries
+    ):
+        """Test that saving an invoice leaves PR-only results cached."""
+        service = P2PAnalyticsService(organization)
+        pr_overview = service.get_pr_overview()
+        aging = service.get_aging_overview()
+
+        invoice_factory(status='approved', invoice_amount=Decimal('500.00'))
+
+        with django_assert_num_queries(0):
+            assert service.get_pr_overview() == pr_overview
+        assert service.get_aging_overview() != aging
+
+    def test_document_delete_invalidates(self, organization, p2p_documents):
+        """Test that deleting a PR refreshes PR results."""
+        service = P2PAnalyticsService(organization)
+        assert service.get_pr_overview()['total_prs'] == 6
+
+        p2p_documents['prs'][-1].delete()
+
+        assert service.get_pr_overview()['total_prs'] == 5
+
+    def test_bulk_resolve_invalidates(self, organization, admin_user, invoice_factory):
+        """Test that set-based resolution bumps the invoice version."""
+        invoice = invoice_factory(has_exception=True, exception_type='price_variance')
+        service = P2PAnalyticsService(organization)
+        assert service.get_exceptions_by_type()[0]['open_count'] == 1
+
+        service.bulk_resolve_exceptions([invoice.id], admin_user, 'Confirmed')
+
+        assert service.get_exceptions_by_type()[0]['open_count'] == 0
+
+    def test_cache_scoped_by_organization(self, organization, other_organization, p2p_documents):
+        """Test that organizations never share cached results."""
+        P2PAnalyticsService(organization).get_pr_overview()
+
+        assert P2PAnalyticsService(other_organization).get_pr_overview()['total_prs'] == 0
+
+
+@pytest.fixture
+def payment_durations(invoice_factory):
+    """Paid invoices taking 1, 2, 3, 4 and 100 days, plus one paid before invoicing."""
+    invoice_date = date.today() - timedelta(days=120)
+    for days in [1, 2, 3, 4, 100, -5]:
+        invoice_factory(
+            status='paid',
+            invoice_date=invoice_date,
+            paid_date=invoice_date + timedelta(days=days),
+            invoice_amount=Decimal('100.00') * abs(days)
+        )
+    return invoice_date
+
+
+@pytest.mark.django_db
+class TestCycleTimeDistribution:
+    """Tests for percentile and histogram statistics on cycle times."""
+
+    def test_stage_percentiles_resist_outliers(self, organization, payment_durations):
+        """Test that the median is not pulled up by a single slow payment."""
+        service = P2PAnalyticsService(organization)
+
+        stage = service.get_p2p_cycle_overview()['stages']['invoice_to_payment']
+
+        assert stage['sample_size'] == 5
+        assert stage['avg_days'] == 22.0
+        assert stage['p50_days'] == 3.0
+        assert stage['p90_days'] == 61.6
+        assert stage['p95_days'] == 80.8
+
+    def test_stage_histogram(self, organization, payment_durations):
+        """Test that histogram bins count every sample once."""
+        service = P2PAnalyticsService(organization)
+
+        stage = service.get_p2p_cycle_overview()['stages']['invoice_to_payment']
+        counts = {b['bin']: b['count'] for b in stage['histogram']}
+
+        assert counts == {
+            '0-2': 2, '3-6': 2, '7-13': 0, '14-29': 0,
+            '30-59': 0, '60-89': 0, '90+': 1,
+        }
+
+    def test_linked_stage_uses_downstream_document(self, organization, p2p_documents):
+        """Test PR to PO time measured from approval to PO creation."""
+        service = P2PAnalyticsService(organization)
+
+        stages = service.get_p2p_cycle_overview()['stages']
+
+        assert stages['pr_to_po']['sample_size'] == 2
+        assert stages['pr_to_po']['p50_days'] == 4.5
+        assert stages['po_to_gr']['sample_size'] == 0
+        assert stages['po_to_gr']['p50_days'] == 0
+
+    def test_stage_drilldown(self, organization, payment_durations, django_assert_max_num_queries):
+        """Test drilldown stats and slowest documents without loading instances."""
+        service = P2PAnalyticsService(organization)
+
+        with django_assert_max_num_queries(3):
+            drilldown = service.get_stage_drilldown('invoice_to_payment')
+
+        assert drilldown['documents_count'] == 5
+        assert drilldown['total_value'] == 11000.0
+        assert drilldown['p50_days'] == 3.0
+        assert drilldown['slowest_documents'][0]['days_in_stage'] == 100
+        assert [d['days_in_stage'] for d in drilldown['slowest_documents']] == [100, 4, 3, 2, 1]
+        assert sum(b['count'] for b in drilldown['histogram']) == 5
+
+    def test_dpo_trends_percentiles(self, organization, payment_durations):
+        """Test that monthly DPO includes percentiles and keeps all invoices in counts."""
+        service = P2PAnalyticsService(organization)
+
+        trends = service.get_dpo_trends()
+
+        assert len(trends) == 1
+        assert trends[0]['invoice_count'] == 6
+        assert trends[0]['avg_dpo'] == 22.0
+        assert trends[0]['p50_dpo'] == 3.0
+        assert trends[0]['p95_dpo'] == 80.8
@@ -0,0 +1,275 @@
+"""
+Tests for Analytics Celery Tasks.
+
+Tests cover:
+- batch_enhance_insights (provider batch submission)
+- poll_insight_enhancement_batch (result fan-out)
+- Per-organization chord dispatch and summary
+"""
+import pytest
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from apps.analytics.ai_batch import LOCAL_BATCH_PREFIX, LocalBatchBackend
+from apps.analytics.ai_cache import AIInsightsCache
+from apps.analytics.ai_services import AIInsightsService
+from apps.analytics.models import AIBatchJob, LLMRequestLog
+from apps.analytics.tasks import (
+    batch_enhance_insights,
+    batch_generate_insights,
+    generate_organization_insights,
+    poll_insight_enhancement_batch,
+    refresh_rag_documents,
+    summarize_nightly_job,
+)
+from apps.authentication.models import UserProfile
+from apps.procurement.tests.factories import (
+    TransactionFactory, SupplierFactory, CategoryFactory, DataUploadFactory
+)
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+def _enable_ai(organization, api_key, provider='anthropic'):
+    """Create an admin for the organization with external AI configured."""
+    user = User.objects.create_user(username=f'ai-admin-{organization.slug}', password='x')
+    UserProfile.objects.create(
+        user=user,
+        organization=organization,
+        role='admin',
+        is_active=True,
+        preferences={'ai_settings': {
+            'use_external_ai': True, 'ai_provider': provider, 'ai_api_key': api_key
+        }}
+    )
+    return user
+
+
+def _spend(organization, user):
+    """Create transactions that produce insights."""
+    category = CategoryFactory(organization=organization, name='Batch Category')
+    for i in range(4):
+        supplier = SupplierFactory(organization=organization, name=f'Batch Supplier {i}')
+        TransactionFactory(
+            organization=organization, supplier=supplier, category=category,
+            uploaded_by=user, amount=Decimal(str(1000 * (i + 1))),
+            subcategory='Parts', invoice_number=f'BATCH-{organization.id}-{i}'
+        )
+
+
+@pytest.fixture
+def ai_organizations(organization, other_organization):
+    """Two organizations sharing one API key, both with spend."""
+    for org in (organization, other_organization):
+        _spend(org, _enable_ai(org, 'shared-key'))
+    return organization, other_organization
+
+
+# ============================================================================
+# Batch Enhancement Tests
+# ============================================================================
+
+@pytest.mark.django_db
+class TestBatchEnhanceInsights:
+    """Tests for the nightly batch enhancement pipeline."""
+
+    def test_shared_key_organizations_submitted_together(self, ai_organizations):
+        """Test that organizations sharing an API key go into one batch."""
+        with patch.object(poll_insight_enhancement_batch, 'apply_async') as poll:
+            results = batch_enhance_insights()
+
+        assert results['organizations_submitted'] == 2
+        assert len(results['batches_submitted']) == 1
+        poll.assert_called_once()
+
+    def test_results_fan_out_to_cache_and_log(self, ai_organizations):
+        """Test that collected results are cached and logged per organization."""
+        results = batch_enhance_insights()
+
+        assert results['status'] == 'success'
+        for org in ai_organizations:
+            insights = AIInsightsService(org).get_all_insights()['insights']
+            cached = AIInsightsCache.get_cached_enhancement(org.id, insights)
+            assert cached['batch_generated'] is True
+            assert cached['strategic_summary'] == f'Local batch analysis for org-{org.id}'
+
+            log = LLMRequestLog.objects.get(organization=org)
+            assert log.request_type == 'enhance'
+            assert log.tokens_input > 0
+
+    def test_cached_organizations_not_resubmitted(self, ai_organizations):
+        """Test that a second run skips organizations with a cached enhancement."""
+        batch_enhance_insights()
+
+        with patch.object(poll_insight_enhancement_batch, 'apply_async') as poll:
+            results = batch_enhance_insights()
+
+        assert results['organizations_submitted'] == 0
+        assert results['organizations_skipped'] == 2
+        poll.assert_not_called()
+
+    def test_organizations_without_ai_skipped(self, organization, admin_user):
+        """Test that organizations without external AI are not submitted."""
+        _spend(organization, admin_user)
+
+        results = batch_enhance_insights()
+
+        assert results['organizations_skipped'] == 1
+        assert results['batches_submitted'] == []
+
+    def test_failed_result_isolated_to_organization(self, ai_organizations):
+        """Test that one organization's failed request does not affect the others."""
+        failing_id = f'org-{ai_organizations[0].id}'
+
+        def responder(request):
+            if request['custom_id'] == failing_id:
+                raise ValueError('overloaded')
+            return {'strategic_summary': 'ok'}
+
+        with patch.object(LocalBatchBackend, 'responder', staticmethod(responder)), \
+                patch.object(poll_insight_enhancement_batch, 'apply_async') as poll:
+            batch_enhance_insights()
+            summary = poll_insight_enhancement_batch(poll.call_args.kwargs['args'][0])
+
+        assert summary['status'] == 'partial'
+        assert summary['organizations_enhanced'] == 1
+        assert summary['organizations_failed'] == 1
+        failed_log = LLMRequestLog.objects.get(organization=ai_organizations[0])
+        assert failed_log.error_occurred is True
+
+    def test_manifest_survives_cache_loss(self, ai_organizations):
+        """Test that a submitted batch is still collected after the cache is cleared."""
+        with patch.object(poll_insight_enhancement_batch, 'apply_async') as poll:
+            batch_enhance_insights()
+        batch_id = poll.call_args.kwargs['args'][0]
+
+        job = AIBatchJob.objects.get(batch_id=batch_id)
+        assert job.status == 'submitted'
+        assert len(job.requests) == 2
+
+        # Only the local provider's own state is restored; the manifest comes from the database
+        provider_state = cache.get(f'{LOCAL_BATCH_PREFIX}:{batch_id}')
+        cache.clear()
+        cache.set(f'{LOCAL_BATCH_PREFIX}:{batch_id}', provider_state)
+
+        summary = poll_insight_enhancement_batch(batch_id)
+
+        job.refresh_from_db()
+        assert summary['organizations_enhanced'] == 2
+        assert job.status == 'completed'
+        assert job.completed_at is not None
+        assert poll_insight_enhancement_batch(batch_id)['error'] == 'Batch manifest not found'
+
+    def test_poll_unknown_batch(self, db):
+        """Test that polling a batch without a manifest fails cleanly."""
+        summary = poll_insight_enhancement_batch('missing-batch')
+
+        assert summary['status'] == 'failed'
+
+
+# ============================================================================
+# Per-Organization Dispatch Tests
+# ============================================================================
+
+@pytest.mark.django_db
+class TestPerOrganizationDispatch:
+    """Tests for nightly jobs fanned out per organization."""
+
+    def test_generation_dispatches_one_task_per_organization(self, organization, other_organization):
+        """Test that each active organization gets its own subtask."""
+        with patch('celery.chord') as chord:
+            result = batch_generate_insights()
+
+        header = list(chord.call_args.args[0])
+        assert result['status'] == 'dispatched'
+        assert result['organizations'] == 2
+        assert sorted(sig.args[0] for sig in header) == sorted([organization.id, other_organization.id])
+
+    def test_generation_summary_aggregates_organizations(self, ai_organizations):
+        """Test that the chord callback sums per-organization results."""
+        batch_generate_insights()
+
+        summary = cache.get('nightly_job_summary:insight_generation')
+        assert summary['status'] == 'success'
+        assert summary['succeeded'] == 2
+        assert summary['totals']['insights_generated'] > 0
+
+    def test_failed_organization_does_not_fail_job(self, organization):
+        """Test that an organization's final failure is reported, not raised."""
+        with patch(
+            'apps.analytics.ai_services.AIInsightsService.compute_base_insights',
+            side_effect=RuntimeError('database gone')
+        ):
+            result = generate_organization_insights.apply(args=[organization.id], retries=2).get()
+
+        assert result['status'] == 'failed'
+        assert 'database gone' in result['error']
+
+    def test_inactive_organization_skipped(self, organization):
+        """Test that an organization deactivated after dispatch is skipped."""
+        organization.is_active = False
+        organization.save()
+
+        result = generate_organization_insights.apply(args=[organization.id]).get()
+
+        assert result['status'] == 'skipped'
+
+    def test_upload_scores_new_batch_for_anomalies(self, organization):
+        """Test that an upload's batch is scored on its own and the anomalies stored on the upload."""
+        supplier = SupplierFactory(organization=organization)
+        category = CategoryFactory(organization=organization)
+        for i in range(12):
+            TransactionFactory(
+                organization=organization, supplier=supplier, category=category,
+                amount=Decimal('1000.00') + i, upload_batch='history'
+            )
+        upload = DataUploadFactory(organization=organization, status='processing')
+        TransactionFactory(
+            organization=organization, supplier=supplier, category=category,
+            amount=Decimal('25000.00'), upload_batch=upload.batch_id
+        )
+
+        result = generate_organization_insights.apply(
+            args=[organization.id], kwargs={'source': 'upload', 'upload_batch': upload.batch_id}
+        ).get()
+
+        upload.refresh_from_db()
+        assert result['upload_anomalies'] == 1
+        assert [a['amount'] for a in upload.anomaly_insights[0]['details']['sample_anomalies']] == [25000.0]
+
+    def test_rag_refresh_per_organization(self, organization, other_organization):
+        """Test that RAG refresh runs once per organization."""
+        with patch(
+            'apps.analytics.document_ingestion.DocumentIngestionService.ingest_supplier_profiles',
+            return_value={'created': 1, 'updated': 2, 'unchanged': 5, 'failed': 0, 'total': 8}
+        ), patch(
+            'apps.analytics.document_ingestion.DocumentIngestionService.ingest_historical_insights',
+            return_value={'created': 1, 'updated': 0, 'unchanged': 0, 'failed': 0, 'total': 1}
+        ):
+            refresh_rag_documents()
+
+        summary = cache.get('nightly_job_summary:rag_refresh')
+        assert summary['succeeded'] == 2
+        assert summary['totals']['documents_updated'] == 8
+
+    def test_summary_counts_statuses(self):
+        """Test summary aggregation across mixed results."""
+        summary = summarize_nightly_job(
+            [
+                {'organization_id': 1, 'status': 'success', 'insights_generated': 4},
+                {'organization_id': 2, 'status': 'failed', 'error': 'timeout'},
+                {'organization_id': 3, 'status': 'skipped'},
+            ],
+            job='test_job',
+            started_at='2024-01-01T00:00:00+00:00'
+        )
+
+        assert summary['status'] == 'partial'
+        assert (summary['succeeded'], summary['failed'], summary['skipped']) == (1, 1, 1)
+        assert summary['totals'] == {'insights_generated': 4}
+        assert summary['errors'] == ['2: timeout']
@@ -0,0 +1,308 @@
+"""
+Tests for the in-process vector index.
+
+Tests cover:
+- VectorIndex top-k, filters and row removal
+- VectorIndexRegistry incremental updates from model signals
+- SemanticCacheService and RAGService fallback when pgvector is unavailable
+- Batched entity context and multi-query RAG search
+- Full-text keyword search and hybrid rank fusion
+"""
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from django.utils import timezone
+
+from apps.analytics.embeddings import get_embedding_service
+from apps.analytics.models import EmbeddedDocument, SemanticCache
+from apps.analytics.rag_service import RAGService
+from apps.analytics.semantic_cache import SemanticCacheService
+from apps.analytics.vector_index import (
+    DOCUMENTS, SEMANTIC_CACHE, VectorIndex, VectorIndexRegistry
+)
+
+DIMS = VectorIndexRegistry.DIMENSIONS
+
+
+def _vector(*hot, dims=DIMS):
+    """Embedding with weight on the given dimensions."""
+    vector = np.zeros(dims, dtype=np.float32)
+    for position, weight in hot:
+        vector[position] = weight
+    return vector.tolist()
+
+
+# ============================================================================
+# VectorIndex Tests
+# ============================================================================
+
+class TestVectorIndex:
+    """Tests for the float32 matrix index."""
+
+    def test_top_k_ordered_by_similarity(self):
+        """Test that results are the k most similar rows, best first."""
+        index = VectorIndex(dimensions=3)
+        index.add('a', [1, 0, 0])
+        index.add('b', [1, 1, 0])
+        index.add('c', [0, 1, 0])
+        index.add('d', [0, 0, 1])
+
+        results = index.search([1, 0.2, 0], top_k=2)
+
+        assert [item_id for item_id, _ in results] == ['a', 'b']
+        assert results[0][1] == pytest.approx(1 / np.linalg.norm([1, 0.2]), rel=1e-5)
+
+    def test_kind_threshold_and_expiry_filters(self):
+        """Test that kind, threshold and expiry filters exclude rows."""
+        index = VectorIndex(dimensions=2)
+        index.add('fresh', [1, 0], kind='enhance', expires_at=time.time() + 60)
+        index.add('expired', [1, 0], kind='enhance', expires_at=time.time() - 60)
+        index.add('other', [1, 0], kind='chat')
+        index.add('far', [0, 1], kind='enhance')
+
+        results = index.search([1, 0], top_k=5, threshold=0.5, kinds=['enhance'], now=time.time())
+
+        assert [item_id for item_id, _ in results] == ['fresh']
+
+    def test_remove_and_replace(self):
+        """Test that removal keeps the remaining rows addressable and adds replace in place."""
+        index = VectorIndex(dimensions=2, capacity=2)
+        for item_id, vector in (('a', [1, 0]), ('b', [0, 1]), ('c', [1, 1])):
+            index.add(item_id, vector)
+
+        index.remove('a')
+        index.add('b', [1, 0])
+
+        assert len(index) == 2
+        assert index.search([1, 0], top_k=1)[0][0] == 'b'
+        assert index.search([1, 1], top_k=1)[0][0] == 'c'
+
+
+# ============================================================================
+# Registry and Service Fallback Tests
+# ============================================================================
+
+@pytest.fixture
+def documents(organization):
+    """Embedded documents pointing along distinct dimensions."""
+    return [
+        EmbeddedDocument.create_or_update(
+            organization_id=organization.id,
+            document_type=document_type,
+            title=title,
+            content=f'{title} content',
+            embedding=_vector((position, 1.0)),
+            source_model='Test',
+            source_id=str(position),
+        )
+        for position, (document_type, title) in enumerate([
+            ('supplier_profile', 'Acme profile'),
+            ('policy', 'Travel policy'),
+            ('supplier_profile', 'Globex profile'),
+        ])
+    ]
+
+
+@pytest.mark.django_db
+class TestVectorIndexRegistry:
+    """Tests for per-organization indexes kept in sync with the database."""
+
+    def test_index_loaded_from_stored_embeddings(self, organization, documents):
+        """Test that the first lookup loads the organization's embeddings."""
+        index = VectorIndexRegistry.get(DOCUMENTS, organization.id)
+
+        assert len(index) == 3
+        assert index.search(_vector((2, 1.0)), top_k=1)[0][0] == documents[2].id
+
+    def test_saves_and_deletes_applied_incrementally(self, organization, documents, django_assert_num_queries):
+        """Test that signal updates reach the loaded index without a reload."""
+        index = VectorIndexRegistry.get(DOCUMENTS, organization.id)
+
+        documents[0].is_active = False
+        documents[0].save()
+        documents[1].delete()
+
+        with django_assert_num_queries(0):
+            assert VectorIndexRegistry.get(DOCUMENTS, organization.id) is index
+        assert len(index) == 1
+
+    def test_other_process_change_triggers_reload(self, organization, documents):
+        """Test that a version bump from another process invalidates the loaded index."""
+        index = VectorIndexRegistry.get(DOCUMENTS, organization.id)
+
+        VectorIndexRegistry._bump_version(DOCUMENTS, organization.id)
+
+        assert VectorIndexRegistry.get(DOCUMENTS, organization.id) is not index
+
+    def test_signals_skip_index_when_pgvector_installed(self, organization, documents):
+        """Test that embedding writes do no index bookkeeping when pgvector serves searches."""
+        with patch.object(VectorIndexRegistry, '_pgvector_extension', True), \
+                patch.object(VectorIndexRegistry, '_bump_version') as bump:
+            documents[0].title = 'Renamed'
+            documents[0].save()
+            documents[1].delete()
+
+        bump.assert_not_called()
+
+    def test_oversized_organization_not_indexed(self, organization, documents, settings):
+        """Test that organizations above VECTOR_INDEX_MAX_ROWS are left to the fallback path."""
+        settings.VECTOR_INDEX_MAX_ROWS = 2
+
+        assert VectorIndexRegistry.get(DOCUMENTS, organization.id) is None
+
+    def test_oversized_organization_indexed_after_shrinking(self, organization, documents, settings,
+                                                             django_assert_num_queries):
+        """Test that the size check is cached per version and rerun once rows are deleted."""
+        settings.VECTOR_INDEX_MAX_ROWS = 2
+        assert VectorIndexRegistry.get(DOCUMENTS, organization.id) is None
+        with django_assert_num_queries(0):
+            assert VectorIndexRegistry.get(DOCUMENTS, organization.id) is None
+
+        documents[0].delete()
+
+        index = VectorIndexRegistry.get(DOCUMENTS, organization.id)
+        assert index is not None
+        assert len(index) == 2
+
+
+@pytest.mark.django_db
+class TestServiceFallback:
+    """Tests for semantic search without the pgvector extension."""
+
+    def test_rag_search_uses_index(self, organization, documents):
+        """Test that RAG search ranks documents by embedding similarity."""
+        service = RAGService(organization.id, openai_api_key='test-key')
+        service.embeddings = get_embedding_service(backend='local')
+
+        with patch.object(RAGService, '_get_embedding', return_value=_vector((0, 0.9), (2, 0.4))):
+            results = service.search('anything', doc_types=['supplier_profile'], threshold=0.1)
+
+        assert service._pgvector_available is False
+        assert [r['title'] for r in results] == ['Acme profile', 'Globex profile']
+        assert results[0]['similarity'] > results[1]['similarity']
+
+    def test_semantic_cache_similarity_hit(self, organization):
+        """Test that a similar (not identical) query hits the cache."""
+        service = SemanticCacheService(organization.id, openai_api_key='test-key')
+        service.embeddings = get_embedding_service(backend='local')
+
+        with patch.object(SemanticCacheService, '_get_embedding', return_value=_vector((0, 1.0), (1, 0.1))):
+            service.store('original query', {'answer': 42})
+        with patch.object(SemanticCacheService, '_get_embedding', return_value=_vector((0, 1.0), (1, 0.12))):
+            result = service.lookup('reworded query')
+
+        assert result == {'answer': 42}
+
+    def test_expired_entries_not_served(self, organization):
+        """Test that expired cache entries are skipped by the index."""
+        entry = SemanticCache.create_entry(
+            organization_id=organization.id, request_type='enhance', query_text='old',
+            embedding=_vector((0, 1.0)), response={'answer': 'stale'}
+        )
+        entry.expires_at = timezone.now() - timedelta(minutes=1)
+        entry.save()
+
+        service = SemanticCacheService(organization.id, openai_api_key='test-key')
+        service.embeddings = get_embedding_service(backend='local')
+        with patch.object(SemanticCacheService, '_get_embedding', return_value=_vector((0, 1.0))):
+            assert service.lookup('new') is None
+        assert len(VectorIndexRegistry.get(SEMANTIC_CACHE, organization.id)) == 0
+
+
+@pytest.mark.django_db
+class TestBatchedRetrieval:
+    """Tests for multi-entity and multi-query RAG retrieval."""
+
+    def _document(self, organization, document_type, title, **metadata):
+        return EmbeddedDocument.create_or_update(
+            organization_id=organization.id,
+            document_type=document_type,
+            title=title,
+            content=f'{title} content',
+            metadata=metadata,
+        )
+
+    def test_entity_context_single_query(self, organization, django_assert_num_queries):
+        """Test that supplier and category context resolve in one query, grouped by entity."""
+        self._document(organization, 'supplier_profile', 'Acme profile', supplier_id=1)
+        self._document(organization, 'contract', 'Acme contract', supplier_id=1)
+        self._document(organization, 'supplier_profile', 'Globex profile', supplier_id=2)
+        self._document(organization, 'supplier_profile', 'Initech profile', supplier_id=3)
+        for n in range(3):
+            self._document(organization, 'policy', f'IT policy {n}', category_id=7)
+
+        service = RAGService(organization.id)
+        with django_assert_num_queries(1):
+            context = service.get_entity_context(supplier_ids=[2, 1], category_ids=[7])
+
+        assert [d['title'] for d in context['suppliers']][0] == 'Globex profile'
+        assert {d['title'] for d in context['suppliers'][1:]} == {'Acme profile', 'Acme contract'}
+        assert len(context['categories']) == RAGService.CATEGORY_DOCS_PER_ENTITY
+        assert [d['title'] for d in service.get_supplier_context([1], include_contracts=False)] == ['Acme profile']
+
+    def test_search_many_one_embedding_call(self, organization, documents, django_assert_num_queries):
+        """Test that several queries share one embedding call and one document fetch."""
+        service = RAGService(organization.id)
+        service.embeddings = get_embedding_service(backend='local')
+        VectorIndexRegistry.get(DOCUMENTS, organization.id)
+
+        with patch.object(
+            service.embeddings, 'embed_many', return_value=[_vector((0, 1.0)), _vector((1, 1.0))]
+        ) as embed_many, django_assert_num_queries(1):
+            results = service.search_many(['acme', 'travel'], threshold=0.5)
+
+        embed_many.assert_called_once_with(['acme', 'travel'])
+        assert [[r['title'] for r in query_results] for query_results in results] == [
+            ['Acme profile'], ['Travel policy']
+        ]
+
+
+@pytest.mark.django_db
+class TestFullTextSearch:
+    """Tests for ranked full-text keyword search and hybrid fusion."""
+
+    def _document(self, organization, title, content, document_type='policy'):
+        return EmbeddedDocument.create_or_update(
+            organization_id=organization.id,
+            document_type=document_type,
+            title=title,
+            content=content,
+        )
+
+    def test_keyword_search_ranked(self, organization, other_organization):
+        """Test that documents matching more query terms rank first and others are excluded."""
+        self._document(organization, 'Travel policy', 'Economy class travel for all employees')
+        self._document(organization, 'Travel and expense policy', 'Travel expense approvals and hotel limits')
+        self._document(organization, 'IT standards', 'Laptop procurement standards')
+        self._document(other_organization, 'Travel expense policy', 'Other tenant travel expense rules')
+
+        results = RAGService(organization.id).search('travel expense approvals')
+
+        assert [r['title'] for r in results] == ['Travel and expense policy', 'Travel policy']
+        assert results[0]['similarity'] > results[1]['similarity']
+
+    def test_index_follows_updates_and_deletes(self, organization):
+        """Test that edited and deleted documents are reflected in keyword results."""
+        document = self._document(organization, 'Travel policy', 'Economy class travel')
+        self._document(organization, 'Fleet policy', 'Vehicle leasing rules')
+        service = RAGService(organization.id)
+
+        document.content = 'Vehicle rental rules'
+        document.save()
+        assert {r['title'] for r in service.search('vehicle')} == {'Travel policy', 'Fleet policy'}
+
+        document.delete()
+        assert [r['title'] for r in service.search('vehicle')] == ['Fleet policy']
+
+    def test_hybrid_search_fuses_rankings(self, organization, documents):
+        """Test that hybrid search ranks documents found by both retrievers first."""
+        service = RAGService(organization.id)
+        service.embeddings = get_embedding_service(backend='local')
+
+        with patch.object(RAGService, '_get_embedding', return_value=_vector((0, 0.9), (1, 0.5))):
+            results = service.search('travel', threshold=0.1, hybrid=True)
+
+        assert [r['title'] for r in results][:2] == ['Travel policy', 'Acme profile']
@@ -293,3 +293,73 @@ class TestAnalyticsOrganizationScoping:
         assert response.status_code == status.HTTP_200_OK
         # Should only see 1 transaction from own org
         assert response.data['transaction_count'] == 1
+
+
+@pytest.mark.django_db
+class TestBulkResolveExceptions:
+    """Tests for bulk exception resolution endpoint."""
+
+    def test_bulk_resolve_writes_audit_entries(self, admin_client, admin_user, organization, supplier):
+        """Test that each resolved invoice gets an audit entry and skips are reported."""
+        from datetime import date, timedelta
+        from decimal import Decimal
+        from apps.authentication.models import AuditLog
+        from apps.procurement.models import Invoice
+        invoices = [
+            Invoice.objects.create(
+                organization=organization,
+                supplier=supplier,
+                invoice_number=f'INV-BULK-{i}',
+                invoice_date=date.today() - timedelta(days=10),
+                due_date=date.today() + timedelta(days=20),
+                invoice_amount=Decimal('500.00'),
+                net_amount=Decimal('500.00'),
+                has_exception=True,
+                exception_resolved=(i == 2)
+            )
+            for i in range(3)
+        ]
+        url = reverse('bulk-resolve-exceptions')
+        response = admin_client.post(url, {
+            'invoice_ids': [inv.id for inv in invoices],
+            'resolution_notes': 'Vendor credit received'
+        }, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['resolved_count'] == 2
+        assert response.data['skipped_ids'] == [invoices[2].id]
+        logged_ids = set(AuditLog.objects.filter(
+            user=admin_user, action='resolve', resource='invoice_exception'
+        ).values_list('resource_id', flat=True))
+        assert logged_ids == {str(invoices[0].id), str(invoices[1].id)}
+        assert AuditLog.objects.filter(user=admin_user, action='bulk_resolve').exists()
+
+    def test_bulk_resolve_requires_manager(self, authenticated_client):
+        """Test that viewers cannot resolve exceptions."""
+        url = reverse('bulk-resolve-exceptions')
+        response = authenticated_client.post(url, {
+            'invoice_ids': [1],
+            'resolution_notes': 'Nope'
+        }, format='json')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestAIInsightsSnapshot:
+    """Tests for serving AI insights from snapshots."""
+
+    def test_live_response_has_no_snapshot(self, authenticated_client, transaction):
+        """Test that insights computed live report no snapshot."""
+        response = authenticated_client.get(reverse('ai-insights'))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['snapshot'] is None
+
+    def test_snapshot_age_exposed(self, authenticated_client, organization, transaction):
+        """Test that a served snapshot reports its age and source."""
+        from apps.analytics.ai_services import AIInsightsService
+        AIInsightsService.refresh_snapshots(organization, source='upload')
+
+        response = authenticated_client.get(reverse('ai-insights'))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['snapshot']['source'] == 'upload'
+        assert 'age_seconds' in response.data['snapshot']
@@ -0,0 +1,136 @@
+"""
+Full-text search over RAG documents.
+
+Keyword retrieval for EmbeddedDocument uses the database's full-text engine
+instead of icontains scans (migration 0010):
+
+- PostgreSQL: generated `search_vector` tsvector column (title weighted A,
+  content B) with a GIN index, ranked with ts_rank
+- SQLite: external-content FTS5 table kept in sync by triggers, ranked with
+  bm25()
+
+Query terms are OR-ed, so documents matching more (and rarer) terms rank
+higher. Lexical and vector result lists can be merged with reciprocal-rank
+fusion.
+"""
+
+import logging
+import re
+import uuid
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TABLE = 'analytics_embeddeddocument'
+FTS_TABLE = 'analytics_embeddeddocument_fts'
+TS_CONFIG = 'english'
+MAX_TERMS = 8
+
+# Reciprocal-rank fusion constant; damps the weight of top ranks
+RRF_K = 60
+
+
+def _terms(query: str) -> List[str]:
+    """Distinct lowercase word terms of at least three characters."""
+    words = re.findall(r"\w+", query.lower())
+    return list(dict.fromkeys(word for word in words if len(word) > 2))[:MAX_TERMS]
+
+
+def lexical_search(
+    organization_id: int,
+    query: str,
+    doc_types: List[str] = None,
+    limit: int = 5
+) -> Optional[List[Tuple[uuid.UUID, float]]]:
+    """
+    Rank an organization's active documents against the query terms.
+
+    Args:
+        organization_id: Organization to search
+        query: Free-text query
+        doc_types: Optional list of document types to filter
+        limit: Maximum results
+
+    Returns:
+        (document ID, score in 0-1) pairs, best first; None when full-text
+        search is unavailable on this database
+    """
+    terms = _terms(query)
+    if connection.vendor == 'postgresql':
+        search = _postgres_search
+    elif connection.vendor == 'sqlite':
+        search = _sqlite_search
+    else:
+        return None
+
+    if not terms:
+        return []
+
+    type_filter = ""
+    type_params = []
+    if doc_types:
+        type_filter = f"AND d.document_type IN ({', '.join(['%s'] * len(doc_types))})"
+        type_params = list(doc_types)
+
+    try:
+        rows = search(organization_id, terms, type_filter, type_params, limit)
+    except Exception as e:
+        logger.warning(f"Full-text search unavailable: {e}")
+        return None
+
+    return [(uuid.UUID(str(doc_id)), score / (score + 1)) for doc_id, score in rows]
+
+
+def _postgres_search(organization_id, terms, type_filter, type_params, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT d.id, ts_rank(d.search_vector, q.query) AS score
+            FROM {DOCUMENT_TABLE} d, to_tsquery(%s, %s) AS q(query)
+            WHERE d.organization_id = %s
+              AND d.is_active = TRUE
+              AND d.search_vector @@ q.query
+              {type_filter}
+            ORDER BY score DESC
+            LIMIT %s
+            """,
+            [TS_CONFIG, ' | '.join(terms), organization_id] + type_params + [limit]
+        )
+        return cursor.fetchall()
+
+
+def _sqlite_search(organization_id, terms, type_filter, type_params, limit):
+    match = ' OR '.join(f'"{term}"' for term in terms)
+    with connection.cursor() as cursor:
+        # bm25() is lower for better matches; negate it for a positive score
+        cursor.execute(
+            f"""
+            SELECT d.id, -bm25({FTS_TABLE}, 2.0, 1.0) AS score
+            FROM {FTS_TABLE}
+            JOIN {DOCUMENT_TABLE} d ON d.rowid = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s
+              AND d.organization_id = %s
+              AND d.is_active = 1
+              {type_filter}
+            ORDER BY score DESC
+            LIMIT %s
+            """,
+            [match, organization_id] + type_params + [limit]
+        )
+        return cursor.fetchall()
+
+
+def reciprocal_rank_fusion(rankings: List[List[Hashable]], k: int = RRF_K) -> List[Tuple[Hashable, float]]:
+    """
+    Merge ranked ID lists: each list contributes 1 / (k + rank) per ID.
+
+    Returns:
+        (ID, fused score) pairs, best first
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,232 @@
+"""
+Two-Tier Cache for Hot Lookups.
+
+Small, rarely-changing per-organization objects (spending policies,
+supplier/category name sets) are read on nearly every request. TieredCache
+keeps them in a per-process LRU (local tier) in front of the Django cache
+(shared tier, Redis in production), so most reads never leave the worker.
+
+Cache Strategy:
+- Key: namespace + scope (usually the organization ID) + key + generation
+- Generation: one counter per namespace and scope in the shared cache.
+  invalidate() bumps it, which orphans every entry built at the old
+  generation in every worker; workers re-read the counter at most every
+  TIERED_CACHE_GENERATION_CHECK seconds, which bounds cross-worker staleness
+- TTL: TIERED_CACHE_LOCAL_TTL for the local tier, TIERED_CACHE_TTL for the
+  shared tier
+- Stats: hits per tier and misses, counted per process
+
+Usage:
+    policies = lookup_cache('spending_policies').get_or_set(
+        organization.id, 'active', lambda: list(...)
+    )
+    lookup_cache('spending_policies').invalidate(organization.id)
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TieredCache:
+    """
+    Per-process LRU with TTL in front of the Django cache, invalidated
+    through a generation counter in the shared cache.
+
+    Instances are shared per namespace; obtain them with lookup_cache().
+    """
+
+    CACHE_PREFIX = "tiered"
+    DEFAULT_TTL = 3600  # 1 hour
+    DEFAULT_LOCAL_TTL = 60
+    DEFAULT_LOCAL_MAX_ENTRIES = 1024
+    DEFAULT_GENERATION_CHECK = 5
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._local: OrderedDict = OrderedDict()  # (scope, key) -> (expires_at, generation, value)
+        self._generations: Dict[Hashable, tuple] = {}  # scope -> (checked_at, generation)
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, 'TIERED_CACHE_TTL', self.DEFAULT_TTL)
+
+    @property
+    def local_ttl(self) -> float:
+        return getattr(settings, 'TIERED_CACHE_LOCAL_TTL', self.DEFAULT_LOCAL_TTL)
+
+    @property
+    def max_entries(self) -> int:
+        return getattr(settings, 'TIERED_CACHE_LOCAL_MAX_ENTRIES', self.DEFAULT_LOCAL_MAX_ENTRIES)
+
+    @property
+    def generation_check(self) -> float:
+        return getattr(settings, 'TIERED_CACHE_GENERATION_CHECK', self.DEFAULT_GENERATION_CHECK)
+
+    def _generation_key(self, scope: Hashable) -> str:
+        return f"{self.CACHE_PREFIX}:{self.namespace}:gen:{scope}"
+
+    def _shared_key(self, scope: Hashable, generation: int, key: str) -> str:
+        return f"{self.CACHE_PREFIX}:{self.namespace}:{scope}:{generation}:{key}"
+
+    @staticmethod
+    def _initial_generation() -> int:
+        """
+        Seed for a missing counter.
+
+        Time-based so a counter that was evicted never restarts at a value
+        that older cached entries were keyed with.
+        """
+        return int(time.time() * 1000)
+
+    def _generation(self, scope: Hashable) -> int:
+        """Current generation of a scope, re-read from the shared cache periodically."""
+        now = time.monotonic()
+        with self._lock:
+            checked = self._generations.get(scope)
+        if checked and now - checked[0] < self.generation_check:
+            return checked[1]
+
+        key = self._generation_key(scope)
+        try:
+            generation = cache.get(key)
+            if generation is None:
+                cache.add(key, self._initial_generation(), None)
+                generation = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Tiered cache generation unavailable for {self.namespace}: {e}")
+            generation = checked[1] if checked else 0
+
+        with self._lock:
+            self._generations[scope] = (now, generation)
+        return generation
+
+    def get_or_set(self, scope: Hashable, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value, loading and storing it in both tiers on a miss.
+
+        Args:
+            scope: Invalidation unit, usually the organization ID
+            key: Lookup name within the scope
+            loader: Computes the value; must return something picklable
+        """
+        generation = self._generation(scope)
+        local_key = (scope, key)
+
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry and entry[0] > time.monotonic() and entry[1] == generation:
+                self._local.move_to_end(local_key)
+                self.local_hits += 1
+                return entry[2]
+
+        shared_key = self._shared_key(scope, generation, key)
+        try:
+            value = cache.get(shared_key, _MISSING)
+        except Exception as e:
+            logger.warning(f"Tiered cache shared tier unavailable for {self.namespace}: {e}")
+            value = _MISSING
+
+        if value is _MISSING:
+            value = loader()
+            with self._lock:
+                self.misses += 1
+            try:
+                cache.set(shared_key, value, self.ttl)
+            except Exception as e:
+                logger.warning(f"Tiered cache store failed for {self.namespace}: {e}")
+        else:
+            with self._lock:
+                self.shared_hits += 1
+
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + self.local_ttl, generation, value)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+        return value
+
+    def invalidate(self, scope: Hashable) -> None:
+        """Orphan every entry of a scope in all workers by bumping its generation."""
+        key = self._generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Counter missing (never read or evicted)
+            cache.set(key, self._initial_generation(), None)
+        except Exception as e:
+            logger.error(f"Tiered cache invalidation failed for {self.namespace}: {e}")
+
+        with self._lock:
+            self._generations.pop(scope, None)
+            for local_key in [k for k in self._local if k[0] == scope]:
+                del self._local[local_key]
+
+        logger.debug(f"Tiered cache {self.namespace} invalidated for scope {scope}")
+
+    def clear_local(self) -> None:
+        """Drop this process's local tier and cached generations."""
+        with self._lock:
+            self._local.clear()
+            self._generations.clear()
+
+    def get_stats(self) -> dict:
+        """Per-tier hit counts and rates for this process."""
+        with self._lock:
+            local_hits, shared_hits, misses = self.local_hits, self.shared_hits, self.misses
+            local_entries = len(self._local)
+        total = local_hits + shared_hits + misses
+
+        def rate(count):
+            return round(count / total * 100, 1) if total > 0 else 0
+
+        return {
+            'namespace': self.namespace,
+            'local_hits': local_hits,
+            'shared_hits': shared_hits,
+            'misses': misses,
+            'total_requests': total,
+            'local_hit_rate': rate(local_hits),
+            'shared_hit_rate': rate(shared_hits),
+            'local_entries': local_entries,
+        }
+
+
+_caches: Dict[str, TieredCache] = {}
+_caches_lock = threading.Lock()
+
+
+def lookup_cache(namespace: str) -> TieredCache:
+    """Return the process-wide TieredCache for a namespace."""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = TieredCache(namespace)
+        return _caches[namespace]
+
+
+def get_lookup_cache_stats() -> List[dict]:
+    """Stats of every TieredCache used in this process."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [c.get_stats() for c in sorted(caches, key=lambda c: c.namespace)]
+
+
+def clear_local_caches() -> None:
+    """Drop every local tier in this process (used by tests)."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for c in caches:
+        c.clear_local()
@@ -0,0 +1,352 @@
+"""
+In-Process Vector Index.
+
+Fallback for semantic matching when the database has no pgvector extension
+(SQLite, some managed databases). Embeddings stored on SemanticCache and
+EmbeddedDocument are loaded per organization into a float32 matrix of
+unit-normalized rows, so a cosine similarity search is one matrix-vector
+product plus an argpartition top-k.
+
+Index Strategy:
+- Scope: one index per (table, organization), loaded lazily on first search
+- Updates: post_save/post_delete signals add, replace or remove single rows
+  in this process and bump a version counter in the shared cache; with the
+  pgvector extension installed the index is never read and signals skip
+  this work
+- Cross-process: a worker whose index version differs from the shared
+  counter reloads it on the next search
+- Size: organizations with more than VECTOR_INDEX_MAX_ROWS vectors are not
+  indexed; callers fall back to their non-semantic path
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE = 'semantic_cache'
+DOCUMENTS = 'documents'
+
+
+class VectorIndex:
+    """
+    Unit-normalized float32 embeddings with a kind label and expiry per row.
+
+    Rows are stored in a preallocated matrix that grows by doubling; removal
+    moves the last row into the freed slot, so add and remove are O(d).
+    """
+
+    def __init__(self, dimensions: int, capacity: int = 64):
+        self.dimensions = dimensions
+        self._matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+        self._expires = np.full(capacity, np.inf)
+        self._kinds = np.zeros(capacity, dtype=np.int32)
+        self._ids: List[Hashable] = []
+        self._rows: Dict[Hashable, int] = {}
+        self._kind_codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.version = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _kind_code(self, kind: str) -> int:
+        if kind not in self._kind_codes:
+            self._kind_codes[kind] = len(self._kind_codes)
+        return self._kind_codes[kind]
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+
+    def add(self, item_id: Hashable, embedding, kind: str = '', expires_at: float = np.inf) -> None:
+        """Insert a row, replacing any existing row with the same ID."""
+        vector = self._normalize(embedding)
+        if vector is None or vector.shape != (self.dimensions,):
+            self.remove(item_id)
+            return
+
+        with self._lock:
+            row = self._rows.get(item_id)
+            if row is None:
+                row = len(self._ids)
+                if row == len(self._matrix):
+                    self._grow()
+                self._ids.append(item_id)
+                self._rows[item_id] = row
+            self._matrix[row] = vector
+            self._kinds[row] = self._kind_code(kind)
+            self._expires[row] = expires_at
+
+    def _grow(self) -> None:
+        capacity = len(self._matrix) * 2
+        matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        matrix[:len(self._matrix)] = self._matrix
+        self._matrix = matrix
+        self._expires = np.concatenate([self._expires, np.full(capacity - len(self._expires), np.inf)])
+        self._kinds = np.concatenate([self._kinds, np.zeros(capacity - len(self._kinds), dtype=np.int32)])
+
+    def remove(self, item_id: Hashable) -> None:
+        """Remove a row if present."""
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._kinds[row] = self._kinds[last]
+                self._expires[row] = self._expires[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids.pop()
+
+    def search(
+        self,
+        embedding,
+        top_k: int = 5,
+        threshold: float = 0.0,
+        kinds: Iterable[str] = None,
+        now: float = None
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Cosine-similarity top-k.
+
+        Args:
+            embedding: Query vector
+            top_k: Maximum results
+            threshold: Minimum similarity
+            kinds: Only rows with one of these kinds (all kinds if None)
+            now: Epoch seconds; rows expiring at or before it are skipped
+
+        Returns:
+            (item ID, similarity) pairs, most similar first
+        """
+        query = self._normalize(embedding)
+        if query is None or query.shape != (self.dimensions,):
+            return []
+
+        with self._lock:
+            count = len(self._ids)
+            if not count:
+                return []
+
+            scores = self._matrix[:count] @ query
+            mask = scores >= threshold
+            if kinds is not None:
+                codes = [self._kind_codes[k] for k in kinds if k in self._kind_codes]
+                mask &= np.isin(self._kinds[:count], codes)
+            if now is not None:
+                mask &= self._expires[:count] > now
+
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > top_k:
+                top = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+                candidates = candidates[top]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+            return [(self._ids[row], float(scores[row])) for row in candidates]
+
+
+class VectorIndexRegistry:
+    """Process-wide indexes per (table, organization), kept in sync with the database."""
+
+    VERSION_PREFIX = "vector_index:version"
+    DEFAULT_MAX_ROWS = 20000
+    DIMENSIONS = 1536
+
+    _indexes: Dict[Tuple[str, int], VectorIndex] = {}
+    _oversized: Dict[Tuple[str, int], object] = {}  # (table, org) -> version found over VECTOR_INDEX_MAX_ROWS
+    _lock = threading.Lock()
+    _pgvector_extension: Optional[bool] = None
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """Whether the fallback can run: enabled in settings and embeddings are stored."""
+        from .models import PGVECTOR_AVAILABLE
+        return PGVECTOR_AVAILABLE and getattr(settings, 'VECTOR_INDEX_FALLBACK_ENABLED', True)
+
+    @classmethod
+    def pgvector_extension_installed(cls) -> bool:
+        """Whether the database has the pgvector extension (checked once per process)."""
+        if cls._pgvector_extension is None:
+            from django.db import connection
+
+            installed = False
+            if connection.vendor == 'postgresql':
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'vector'")
+                        installed = cursor.fetchone() is not None
+                except Exception as e:
+                    logger.warning(f"pgvector check failed: {e}")
+                    return False
+            cls._pgvector_extension = installed
+        return cls._pgvector_extension
+
+    @classmethod
+    def active(cls) -> bool:
+        """Whether searches use this index: the fallback is enabled and pgvector is not installed."""
+        return cls.enabled() and not cls.pgvector_extension_installed()
+
+    @classmethod
+    def _version_key(cls, table: str, organization_id: int) -> str:
+        return f"{cls.VERSION_PREFIX}:{table}:{organization_id}"
+
+    @classmethod
+    def _shared_version(cls, table: str, organization_id: int):
+        """Current version counter, initialized (time-based) when missing."""
+        key = cls._version_key(table, organization_id)
+        try:
+            version = cache.get(key)
+            if version is None:
+                cache.add(key, int(time.time() * 1000), None)
+                version = cache.get(key)
+            return version
+        except Exception:
+            return None
+
+    @classmethod
+    def get(cls, table: str, organization_id: int) -> Optional[VectorIndex]:
+        """
+        The organization's index, loaded or reloaded as needed.
+
+        Returns None when the organization has too many vectors to index;
+        the size is checked again once the table's version changes.
+        """
+        key = (table, organization_id)
+        version = cls._shared_version(table, organization_id)
+        with cls._lock:
+            index = cls._indexes.get(key)
+            if index is not None and index.version == version:
+                return index
+            if key in cls._oversized and cls._oversized[key] == version:
+                return None
+
+        index = cls._load(table, organization_id)
+        with cls._lock:
+            if index is None:
+                cls._indexes.pop(key, None)
+                cls._oversized[key] = version
+            else:
+                index.version = version
+                cls._indexes[key] = index
+                cls._oversized.pop(key, None)
+        return index
+
+    @classmethod
+    def _load(cls, table: str, organization_id: int) -> Optional[VectorIndex]:
+        from django.utils import timezone
+        from .models import EmbeddedDocument, SemanticCache
+
+        if table == SEMANTIC_CACHE:
+            rows = SemanticCache.objects.filter(
+                organization_id=organization_id,
+                expires_at__gt=timezone.now(),
+                query_embedding__isnull=False
+            ).values_list('id', 'query_embedding', 'request_type', 'expires_at')
+        else:
+            rows = EmbeddedDocument.objects.filter(
+                organization_id=organization_id,
+                is_active=True,
+                content_embedding__isnull=False
+            ).values_list('id', 'content_embedding', 'document_type')
+
+        max_rows = getattr(settings, 'VECTOR_INDEX_MAX_ROWS', cls.DEFAULT_MAX_ROWS)
+        if rows.count() > max_rows:
+            logger.warning(
+                f"Vector index for {table} org {organization_id} exceeds {max_rows} rows; not indexed"
+            )
+            return None
+
+        started = time.perf_counter()
+        index = VectorIndex(cls.DIMENSIONS)
+        for row in rows:
+            expires_at = row[3].timestamp() if len(row) > 3 else np.inf
+            index.add(row[0], row[1], row[2], expires_at)
+        logger.info(
+            f"Loaded vector index for {table} org {organization_id}: "
+            f"{len(index)} rows in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return index
+
+    @classmethod
+    def _bump_version(cls, table: str, organization_id: int):
+        key = cls._version_key(table, organization_id)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Counter missing (evicted); every loaded index reloads
+            cache.set(key, int(time.time() * 1000), None)
+            return None
+        except Exception:
+            return None
+
+    @classmethod
+    def _apply(cls, table: str, organization_id: int, change) -> None:
+        """
+        Apply a single-row change to the loaded index and publish it.
+
+        The local index stays current when no other process changed the
+        table since it was loaded; otherwise it is dropped and reloaded.
+        """
+        key = (table, organization_id)
+        with cls._lock:
+            index = cls._indexes.get(key)
+        previous = index.version if index is not None else None
+        version = cls._bump_version(table, organization_id)
+
+        if index is None:
+            return
+        if version is not None and previous is not None and version == previous + 1:
+            change(index)
+            index.version = version
+        else:
+            with cls._lock:
+                cls._indexes.pop(key, None)
+
+    @classmethod
+    def semantic_cache_saved(cls, entry) -> None:
+        embedding = getattr(entry, 'query_embedding', None)
+
+        def change(index):
+            if embedding is None:
+                index.remove(entry.id)
+            else:
+                index.add(entry.id, embedding, entry.request_type, entry.expires_at.timestamp())
+
+        cls._apply(SEMANTIC_CACHE, entry.organization_id, change)
+
+    @classmethod
+    def document_saved(cls, document) -> None:
+        embedding = getattr(document, 'content_embedding', None)
+
+        def change(index):
+            if embedding is None or not document.is_active:
+                index.remove(document.id)
+            else:
+                index.add(document.id, embedding, document.document_type)
+
+        cls._apply(DOCUMENTS, document.organization_id, change)
+
+    @classmethod
+    def deleted(cls, table: str, instance) -> None:
+        cls._apply(table, instance.organization_id, lambda index: index.remove(instance.id))
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop every loaded index in this process."""
+        with cls._lock:
+            cls._indexes.clear()
+            cls._oversized.clear()
@@ -0,0 +1,84 @@
+"""
+Approximate-nearest-neighbor search settings for pgvector.
+
+SemanticCache.query_embedding and EmbeddedDocument.content_embedding are
+indexed with HNSW (vector_cosine_ops, migration 0008). Lookups filter by
+organization, so two strategies keep recall and latency in check as tenants
+grow:
+
+- Global index + filtered scan: one HNSW index per table. With pgvector
+  >= 0.8, PGVECTOR_ITERATIVE_SCAN lets the index scan continue until enough
+  rows pass the organization filter instead of returning too few
+- Per-organization partial indexes: `manage.py create_vector_partial_indexes`
+  builds a partial HNSW index (WHERE organization_id = N) for organizations
+  with at least PGVECTOR_PARTIAL_INDEX_MIN_ROWS vectors; the planner picks it
+  for that organization's queries
+
+Query-time tuning (PGVECTOR_HNSW_EF_SEARCH, PGVECTOR_IVFFLAT_PROBES) is
+applied per transaction with SET LOCAL by ann_cursor().
+"""
+
+import logging
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Logical name -> (table, embedding column)
+VECTOR_TABLES: Dict[str, Tuple[str, str]] = {
+    'semantic_cache': ('analytics_semanticcache', 'query_embedding'),
+    'documents': ('analytics_embeddeddocument', 'content_embedding'),
+}
+
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+
+def partial_index_name(table_key: str, organization_id: int) -> str:
+    """Name of an organization's partial HNSW index (within the 63-char limit)."""
+    table, _ = VECTOR_TABLES[table_key]
+    return f"{table}_org{organization_id}_hnsw"
+
+
+def create_index_sql(table_key: str, name: str, where: str = '', concurrently: bool = True) -> str:
+    """CREATE INDEX statement for an HNSW cosine index on a vector table."""
+    table, column = VECTOR_TABLES[table_key]
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} USING hnsw ({column} vector_cosine_ops) "
+        f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+        f"{f' WHERE {where}' if where else ''}"
+    )
+
+
+def apply_search_settings(cursor) -> None:
+    """Apply ANN query-time settings to the current transaction (PostgreSQL only)."""
+    if connection.vendor != 'postgresql':
+        return
+
+    cursor.execute(
+        "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+        [
+            str(getattr(settings, 'PGVECTOR_HNSW_EF_SEARCH', 40)),
+            str(getattr(settings, 'PGVECTOR_IVFFLAT_PROBES', 10)),
+        ]
+    )
+    iterative_scan = getattr(settings, 'PGVECTOR_ITERATIVE_SCAN', '')
+    if iterative_scan:
+        cursor.execute("SELECT set_config('hnsw.iterative_scan', %s, true)", [iterative_scan])
+
+
+@contextmanager
+def ann_cursor():
+    """
+    Cursor for vector similarity queries with ANN settings applied.
+
+    Runs inside a transaction so the settings are scoped to it (SET LOCAL)
+    and never leak to other queries on a pooled connection.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        apply_search_settings(cursor)
+        yield cursor
@@ -1359,6 +1359,7 @@ def ai_insights_metrics(request):
 
     Returns comprehensive metrics including:
     - Cache statistics (hits, misses, hit rate)
+    - Lookup cache hit rates per tier (this worker process)
     - Provider health status
     - Usage statistics
 
@@ -1370,6 +1371,7 @@ def ai_insights_metrics(request):
     - include_health_check: If 'true', perform live provider health checks (slower)
     """
     from .ai_cache import AIInsightsCache
+    from .tiered_cache import get_lookup_cache_stats
 
     organization = get_target_organization(request)
     if organization is None:
@@ -1399,6 +1401,7 @@ def ai_insights_metrics(request):
             'hit_rate': cache_stats.get('hit_rate', 0),
             'total_requests': cache_stats.get('total_requests', 0),
         },
+        'lookup_cache': get_lookup_cache_stats(),
         'providers': {
             'primary': provider_status.get('primary_provider'),
             'fallback_enabled': provider_status.get('fallback_enabled', False),
@@ -1438,6 +1441,7 @@ def ai_insights_metrics_prometheus(request):
     """
     from django.http import HttpResponse
     from .ai_cache import AIInsightsCache
+    from .tiered_cache import get_lookup_cache_stats
 
     organization = get_target_organization(request)
     if organization is None:
@@ -1482,8 +1486,17 @@ def ai_insights_metrics_prometheus(request):
         '# HELP ai_insights_fallback_enabled Whether provider fallback is enabled',
         '# TYPE ai_insights_fallback_enabled gauge',
         f'ai_insights_fallback_enabled{{org_id="{org_id}"}} {1 if provider_status.get("fallback_enabled") else 0}',
+        '',
+        '# HELP analytics_lookup_cache_requests_total Lookup cache requests by tier served (this worker)',
+        '# TYPE analytics_lookup_cache_requests_total counter',
     ])
 
+    for stats in get_lookup_cache_stats():
+        for tier, count in (('local', stats['local_hits']), ('shared', stats['shared_hits']), ('miss', stats['misses'])):
+            lines.append(
+                f'analytics_lookup_cache_requests_total{{namespace="{stats["namespace"]}",tier="{tier}"}} {count}'
+            )
+
     metrics_text = '\n'.join(lines) + '\n'
 
     return HttpResponse(
@@ -3020,7 +3033,7 @@ def refresh_rag_documents(request):
     service = DocumentIngestionService(organization_id=organization.id)
 
     try:
-        result = service.refresh_all()
+        result = service.refresh_all(full=True)
 
         log_action(
             user=request.user,
@@ -3121,22 +3134,22 @@ def ai_chat_stream(request):
     POST body:
     {
         "messages": [{"role": "user", "content": "..."}],
-        "context": {"spending": {...}, "suppliers": [...]},
         "model": "claude-sonnet-4-20250514"  // optional
     }
 
-    Returns SSE stream with tokens.
+    Organization context (spend totals, top suppliers and categories) is
+    loaded server-side. Returns SSE stream with a 'started' preamble, tokens
+    and a final 'done' event with usage and latency metrics.
     """
-    import json
     from django.http import StreamingHttpResponse
     from django.conf import settings
+    from .chat_streaming import stream_chat
 
     organization = get_target_organization(request)
     if organization is None:
         return Response({'error': 'User profile not found'}, status=400)
 
     messages = request.data.get('messages', [])
-    context = request.data.get('context', {})
     model = request.data.get('model', 'claude-sonnet-4-20250514')
 
     if not messages:
@@ -3149,39 +3162,13 @@ def ai_chat_stream(request):
             status=503
         )
 
-    system_prompt = _build_chat_system_prompt(organization, context)
-
-    def generate_stream():
-        try:
-            import anthropic
-            client = anthropic.Anthropic(api_key=api_key)
-
-            formatted_messages = [
-                {"role": m.get("role", "user"), "content": m.get("content", "")}
-                for m in messages
-            ]
-
-            with client.messages.stream(
-                model=model,
-                max_tokens=2000,
-                system=system_prompt,
-                messages=formatted_messages,
-            ) as stream:
-                for text in stream.text_stream:
-                    yield f"data: {json.dumps({'token': text})}\n\n"
-
-                final_message = stream.get_final_message()
-                usage = {
-                    'input_tokens': final_message.usage.input_tokens,
-                    'output_tokens': final_message.usage.output_tokens,
-                }
-                yield f"data: {json.dumps({'done': True, 'usage': usage})}\n\n"
-
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    formatted_messages = [
+        {"role": m.get("role", "user"), "content": m.get("content", "")}
+        for m in messages
+    ]
 
     response = StreamingHttpResponse(
-        generate_stream(),
+        stream_chat(organization, formatted_messages, model, 2000, api_key),
         content_type='text/event-stream'
     )
     response['Cache-Control'] = 'no-cache'
@@ -3203,9 +3190,9 @@ def ai_quick_query(request):
 
     Returns SSE stream with response.
     """
-    import json
     from django.http import StreamingHttpResponse
     from django.conf import settings
+    from .chat_streaming import stream_chat
 
     organization = get_target_organization(request)
     if organization is None:
@@ -3224,80 +3211,17 @@ def ai_quick_query(request):
             status=503
         )
 
-    context = {}
-    if include_context:
-        try:
-            service = AnalyticsService(organization)
-            overview = service.get_overview_stats()
-            context = {
-                'total_spend': overview.get('total_spend', 0),
-                'transaction_count': overview.get('transaction_count', 0),
-                'supplier_count': overview.get('supplier_count', 0),
-                'category_count': overview.get('category_count', 0),
-            }
-        except Exception:
-            pass
-
-    system_prompt = _build_chat_system_prompt(organization, context)
-
-    def generate_stream():
-        try:
-            import anthropic
-            client = anthropic.Anthropic(api_key=api_key)
-
-            with client.messages.stream(
-                model='claude-sonnet-4-20250514',
-                max_tokens=1000,
-                system=system_prompt,
-                messages=[{"role": "user", "content": query}],
-            ) as stream:
-                for text in stream.text_stream:
-                    yield f"data: {json.dumps({'token': text})}\n\n"
-
-                final_message = stream.get_final_message()
-                usage = {
-                    'input_tokens': final_message.usage.input_tokens,
-                    'output_tokens': final_message.usage.output_tokens,
-                }
-                yield f"data: {json.dumps({'done': True, 'usage': usage})}\n\n"
-
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-
     response = StreamingHttpResponse(
-        generate_stream(),
+        stream_chat(
+            organization,
+            [{"role": "user", "content": query}],
+            'claude-sonnet-4-20250514',
+            1000,
+            api_key,
+            include_context=include_context,
+        ),
         content_type='text/event-stream'
     )
     response['Cache-Control'] = 'no-cache'
     response['X-Accel-Buffering'] = 'no'
     return response
-
-
-def _build_chat_system_prompt(organization, context: dict = None) -> str:
-    """Build system prompt for chat with organization context."""
-    context = context or {}
-
-    context_str = ""
-    if context:
-        context_str = f"""
-
-Current Data Context:
-- Total Spend: ${context.get('total_spend', 0):,.2f}
-- Transaction Count: {context.get('transaction_count', 0):,}
-- Supplier Count: {context.get('supplier_count', 0)}
-- Category Count: {context.get('category_count', 0)}"""
-
-    return f"""You are an AI procurement analytics assistant for {organization.name}.
-You help users understand their procurement data, identify cost savings opportunities,
-analyze supplier performance, and answer questions about their spending patterns.
-
-Guidelines:
-- Be concise and actionable in your responses
-- Reference specific data when available
-- Suggest follow-up questions or analyses when appropriate
-- Flag any concerning patterns or risks
-- Use clear formatting with bullet points for lists
-- Include confidence levels when making estimates or projections
-
-When uncertain, ask clarifying questions rather than guessing.
-{context_str}"""
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_savings_config'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action',
+            field=models.CharField(choices=[('login', 'Login'), ('logout', 'Logout'), ('create', 'Create'), ('update', 'Update'), ('delete', 'Delete'), ('upload', 'Upload'), ('export', 'Export'), ('download', 'Download'), ('view', 'View'), ('reset', 'Reset'), ('bulk_delete', 'Bulk Delete'), ('generate', 'Generate'), ('share', 'Share'), ('execute', 'Execute'), ('resolve', 'Resolve'), ('bulk_resolve', 'Bulk Resolve')], max_length=20),
+        ),
+    ]
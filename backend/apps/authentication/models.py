@@ -374,6 +374,8 @@ class AuditLog(models.Model):
         ('generate', 'Generate'),  # Report generation
         ('share', 'Share'),            # Report sharing
         ('execute', 'Execute'),        # Schedule execution
+        ('resolve', 'Resolve'),        # P2P exception resolution
+        ('bulk_resolve', 'Bulk Resolve'),
     ]
 
     # Allowed keys for the details JSONField (security: prevent arbitrary data injection)
@@ -400,7 +402,8 @@ class AuditLog(models.Model):
         'is_public', 'shared_count', 'frequency',  # Report sharing and scheduling
         # P2P Analytics keys
         'weeks', 'stage', 'invoice_id', 'pr_id', 'po_id', 'limit',
-        'status', 'exception_type', 'resolved_count', 'failed_count'
+        'status', 'exception_type', 'resolved_count', 'failed_count',
+        'invoice_count', 'skipped_count'
     }
 
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='audit_logs')
@@ -166,6 +166,38 @@ def log_action(user, action, resource, resource_id='', details=None, request=Non
     return AuditLog.objects.create(**log_data)
 
 
+def log_actions_bulk(user, action, resource, resource_ids, details=None, request=None):
+    """
+    Log the same user action against many resources with a single INSERT.
+
+    bulk_create() bypasses AuditLog.save(), so the shared fields are validated
+    once with full_clean() before the entries are written.
+    """
+    if not hasattr(user, 'profile') or not resource_ids:
+        return []
+
+    log_data = {
+        'user': user,
+        'organization': user.profile.organization,
+        'action': action,
+        'resource': resource,
+        'details': details or {},
+    }
+
+    if request:
+        log_data['ip_address'] = get_client_ip(request)
+        # Hash user agent for privacy
+        log_data['user_agent'] = hash_user_agent(get_user_agent(request))
+
+    # Only resource_id differs between entries, so one validation covers all
+    AuditLog(resource_id=str(resource_ids[0]), **log_data).full_clean()
+
+    return AuditLog.objects.bulk_create([
+        AuditLog(resource_id=str(resource_id), **log_data)
+        for resource_id in resource_ids
+    ])
+
+
 def log_security_event(event_type: str, request, details: dict = None):
     """
     Log a security event (not tied to a specific user action).
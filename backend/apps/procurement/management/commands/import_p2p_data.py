@@ -24,6 +24,7 @@ from decimal import Decimal, InvalidOperation
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
+from apps.analytics.p2p_cache import P2PAnalyticsCache
 from apps.authentication.models import Organization
 from apps.procurement.models import (
     PurchaseRequisition, PurchaseOrder, GoodsReceipt, Invoice,
@@ -120,6 +121,9 @@ class Command(BaseCommand):
                 rows, organization, batch_id, skip_errors, dry_run
             )
 
+        if not dry_run and stats['successful']:
+            P2PAnalyticsCache.bump_version(organization.id, doc_type)
+
         # Summary
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS(f'Import complete:'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0008_remove_unique_transaction_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataupload',
+            name='anomaly_insights',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -281,6 +281,9 @@ class DataUpload(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
     error_log = models.JSONField(default=list, blank=True)
 
+    # Anomaly insights for this batch, scored after the upload completes
+    anomaly_insights = models.JSONField(default=list, blank=True)
+
     # Background processing support
     celery_task_id = models.CharField(max_length=255, blank=True, db_index=True)
     progress_percent = models.IntegerField(default=0)
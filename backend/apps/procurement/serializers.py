@@ -167,10 +167,10 @@ class DataUploadSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'file_name', 'file_size', 'batch_id',
             'total_rows', 'successful_rows', 'failed_rows', 'duplicate_rows',
-            'status', 'error_log', 'uploaded_by', 'uploaded_by_name',
+            'status', 'error_log', 'anomaly_insights', 'uploaded_by', 'uploaded_by_name',
             'created_at', 'completed_at'
         ]
-        read_only_fields = ['id', 'uploaded_by', 'created_at', 'completed_at']
+        read_only_fields = ['id', 'anomaly_insights', 'uploaded_by', 'created_at', 'completed_at']
 
 
 class CSVUploadSerializer(serializers.Serializer):
@@ -1,15 +1,24 @@
 """
 Procurement signals for cache invalidation and data synchronization.
 
-Invalidates AI insights cache when procurement data changes.
+Invalidates AI insights cache, insight snapshots and anomaly baselines when
+procurement data changes, regenerates snapshots and scores the new batch for
+anomalies after an upload completes, bumps the P2P
+analytics cache version for the document type that changed, and invalidates
+the two-tier lookup caches for spending policies, supplier/category names and
+the streaming chat context.
 """
 
 import logging
 
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
-from .models import Transaction, DataUpload
+from .models import (
+    Transaction, DataUpload, Supplier, Category, SpendingPolicy,
+    PurchaseRequisition, PurchaseOrder, GoodsReceipt, Invoice
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,11 +41,107 @@ def _invalidate_ai_cache(organization_id: int, reason: str) -> None:
     except Exception as e:
         logger.error(f"Failed to invalidate AI cache: {e}")
 
+    _invalidate_insight_snapshots(organization_id)
+    _invalidate_anomaly_baselines(organization_id)
+    _invalidate_lookup_cache('chat_context', organization_id)
+
+
+def _invalidate_insight_snapshots(organization_id: int) -> None:
+    """
+    Delete an organization's precomputed insight snapshots.
+
+    Imports InsightSnapshot lazily to avoid circular imports.
+    """
+    try:
+        from apps.analytics.models import InsightSnapshot
+        InsightSnapshot.objects.filter(organization_id=organization_id).delete()
+    except ImportError:
+        logger.warning("InsightSnapshot not available")
+    except Exception as e:
+        logger.error(f"Failed to invalidate insight snapshots: {e}")
+
+
+def _invalidate_anomaly_baselines(organization_id: int) -> None:
+    """
+    Orphan an organization's cached anomaly baselines.
+
+    Imports TransactionAnomalyEngine lazily to avoid circular imports.
+    """
+    try:
+        from apps.analytics.anomaly_engine import TransactionAnomalyEngine
+        TransactionAnomalyEngine.invalidate(organization_id)
+    except ImportError:
+        logger.warning("TransactionAnomalyEngine not available")
+    except Exception as e:
+        logger.error(f"Failed to invalidate anomaly baselines: {e}")
+
+
+def _schedule_snapshot_refresh(organization_id: int, upload_batch: str = None) -> None:
+    """Regenerate insight snapshots (scoring the upload batch first) once the surrounding transaction commits."""
+    try:
+        from apps.analytics.tasks import generate_organization_insights
+    except ImportError:
+        logger.warning("generate_organization_insights not available")
+        return
+
+    transaction.on_commit(
+        lambda: generate_organization_insights.delay(
+            organization_id, source='upload', upload_batch=upload_batch
+        )
+    )
+
+
+def _invalidate_p2p_cache(organization_id: int, doc_type: str) -> None:
+    """
+    Bump the P2P analytics cache version for a document type.
+
+    Imports P2PAnalyticsCache lazily to avoid circular imports.
+    """
+    try:
+        from apps.analytics.p2p_cache import P2PAnalyticsCache
+        P2PAnalyticsCache.bump_version(organization_id, doc_type)
+    except ImportError:
+        logger.warning("P2PAnalyticsCache not available")
+    except Exception as e:
+        logger.error(f"Failed to invalidate P2P cache: {e}")
+
+
+def _invalidate_lookup_cache(namespace: str, organization_id: int) -> None:
+    """
+    Invalidate an organization's entries in a two-tier lookup cache.
+
+    Imports lookup_cache lazily to avoid circular imports.
+    """
+    try:
+        from apps.analytics.tiered_cache import lookup_cache
+        lookup_cache(namespace).invalidate(organization_id)
+    except ImportError:
+        logger.warning("TieredCache not available")
+    except Exception as e:
+        logger.error(f"Failed to invalidate {namespace} lookup cache: {e}")
+
+
+def _record_rag_supplier_change(organization_id: int, supplier_id: int) -> None:
+    """
+    Mark a supplier's RAG profile stale for the next incremental refresh.
+
+    Imports DocumentIngestionService lazily to avoid circular imports.
+    """
+    try:
+        from apps.analytics.document_ingestion import DocumentIngestionService
+        DocumentIngestionService.record_transaction_deleted(organization_id, supplier_id)
+    except ImportError:
+        logger.warning("DocumentIngestionService not available")
+    except Exception as e:
+        logger.error(f"Failed to record RAG supplier change: {e}")
+
 
 @receiver(post_save, sender=DataUpload)
 def invalidate_ai_cache_on_upload(sender, instance, created, **kwargs):
     """
-    Invalidate AI insights cache when a data upload completes.
+    Invalidate AI insights cache when a data upload completes, then score
+    the uploaded batch for anomalies and regenerate the organization's
+    insight snapshots in the background.
 
     Only triggers on completed uploads to avoid premature invalidation.
     """
@@ -45,15 +150,18 @@ def invalidate_ai_cache_on_upload(sender, instance, created, **kwargs):
             instance.organization_id,
             f"DataUpload completed (id={instance.id})"
         )
+        _schedule_snapshot_refresh(instance.organization_id, upload_batch=instance.batch_id)
+        _invalidate_lookup_cache('entity_names', instance.organization_id)
 
 
 @receiver(post_delete, sender=Transaction)
 def invalidate_ai_cache_on_transaction_delete(sender, instance, **kwargs):
-    """Invalidate AI insights cache when transactions are deleted."""
+    """Invalidate AI insights cache and mark the supplier's RAG profile stale when transactions are deleted."""
     _invalidate_ai_cache(
         instance.organization_id,
         f"Transaction deleted (id={instance.id})"
     )
+    _record_rag_supplier_change(instance.organization_id, instance.supplier_id)
 
 
 @receiver(post_save, sender=Transaction)
@@ -62,10 +170,48 @@ def invalidate_ai_cache_on_transaction_save(sender, instance, created, **kwargs)
     Invalidate AI insights cache when transactions are created or modified.
 
     Note: Bulk creates via upload are handled by DataUpload signal.
-    This handles individual transaction edits.
+    This handles individual transaction edits and creates outside an upload.
     """
-    if not created:
+    if not created or not instance.upload_batch:
         _invalidate_ai_cache(
             instance.organization_id,
-            f"Transaction updated (id={instance.id})"
+            f"Transaction {'updated' if not created else 'created'} (id={instance.id})"
         )
+
+
+P2P_DOCUMENT_TYPES = {
+    PurchaseRequisition: 'pr',
+    PurchaseOrder: 'po',
+    GoodsReceipt: 'gr',
+    Invoice: 'invoice',
+}
+
+
+@receiver(post_save, sender=PurchaseRequisition)
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_save, sender=GoodsReceipt)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=PurchaseRequisition)
+@receiver(post_delete, sender=PurchaseOrder)
+@receiver(post_delete, sender=GoodsReceipt)
+@receiver(post_delete, sender=Invoice)
+def invalidate_p2p_cache_on_document_change(sender, instance, **kwargs):
+    """Invalidate cached P2P analytics that depend on the changed document type."""
+    _invalidate_p2p_cache(instance.organization_id, P2P_DOCUMENT_TYPES[sender])
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Category)
+def invalidate_entity_names_on_change(sender, instance, **kwargs):
+    """Invalidate cached supplier/category name sets and the chat context that names them."""
+    _invalidate_lookup_cache('entity_names', instance.organization_id)
+    _invalidate_lookup_cache('chat_context', instance.organization_id)
+
+
+@receiver(post_save, sender=SpendingPolicy)
+@receiver(post_delete, sender=SpendingPolicy)
+def invalidate_spending_policies_on_change(sender, instance, **kwargs):
+    """Invalidate cached active spending policies used by ComplianceService."""
+    _invalidate_lookup_cache('spending_policies', instance.organization_id)
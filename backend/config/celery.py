@@ -12,6 +12,10 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 app.conf.beat_schedule = {
+    'nightly-supplier-scorecards': {
+        'task': 'refresh_supplier_payment_scorecards',
+        'schedule': crontab(hour=1, minute=30),
+    },
     'nightly-insight-generation': {
         'task': 'batch_generate_insights',
         'schedule': crontab(hour=2, minute=0),
@@ -20,6 +24,10 @@ app.conf.beat_schedule = {
         'task': 'batch_enhance_insights',
         'schedule': crontab(hour=2, minute=30),
     },
+    'flush-semantic-cache-hits': {
+        'task': 'flush_semantic_cache_hits',
+        'schedule': 60.0,
+    },
     'cleanup-semantic-cache': {
         'task': 'cleanup_semantic_cache',
         'schedule': crontab(hour=3, minute=0),
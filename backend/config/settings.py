@@ -311,6 +311,62 @@ CACHES = {
 
 # AI Insights Cache Settings
 AI_INSIGHTS_CACHE_TTL = config('AI_INSIGHTS_CACHE_TTL', default=3600, cast=int)  # 1 hour
+# Per-insight AI enhancement: parallel provider calls, per-call timeout and overall deadline (seconds)
+AI_ENHANCEMENT_CONCURRENCY = config('AI_ENHANCEMENT_CONCURRENCY', default=4, cast=int)
+AI_ENHANCEMENT_CALL_TIMEOUT = config('AI_ENHANCEMENT_CALL_TIMEOUT', default=20, cast=float)
+AI_ENHANCEMENT_DEADLINE = config('AI_ENHANCEMENT_DEADLINE', default=45, cast=float)
+# Nightly enhancement: provider batch backend ('anthropic' or 'local') and result polling
+AI_BATCH_BACKEND = config('AI_BATCH_BACKEND', default='anthropic')
+AI_BATCH_POLL_INTERVAL = config('AI_BATCH_POLL_INTERVAL', default=300, cast=int)  # 5 minutes
+AI_BATCH_MAX_POLLS = config('AI_BATCH_MAX_POLLS', default=288, cast=int)  # 24 hours
+# LLM request logs and semantic cache hit counts are buffered and written in batches
+LLM_TELEMETRY_ASYNC = config('LLM_TELEMETRY_ASYNC', default=True, cast=bool)
+LLM_TELEMETRY_BATCH_SIZE = config('LLM_TELEMETRY_BATCH_SIZE', default=100, cast=int)
+LLM_TELEMETRY_FLUSH_INTERVAL = config('LLM_TELEMETRY_FLUSH_INTERVAL', default=5, cast=float)  # seconds
+LLM_TELEMETRY_MAX_PENDING = config('LLM_TELEMETRY_MAX_PENDING', default=10000, cast=int)
+# pgvector ANN search: HNSW candidate list size, IVFFlat lists probed, and iterative
+# index scans for organization-filtered queries ('', 'strict_order' or 'relaxed_order'; pgvector >= 0.8)
+PGVECTOR_HNSW_EF_SEARCH = config('PGVECTOR_HNSW_EF_SEARCH', default=40, cast=int)
+PGVECTOR_IVFFLAT_PROBES = config('PGVECTOR_IVFFLAT_PROBES', default=10, cast=int)
+PGVECTOR_ITERATIVE_SCAN = config('PGVECTOR_ITERATIVE_SCAN', default='')
+# Organizations with at least this many vectors get a partial HNSW index (create_vector_partial_indexes)
+PGVECTOR_PARTIAL_INDEX_MIN_ROWS = config('PGVECTOR_PARTIAL_INDEX_MIN_ROWS', default=10000, cast=int)
+# Without the pgvector extension, semantic search uses an in-process NumPy index per organization
+VECTOR_INDEX_FALLBACK_ENABLED = config('VECTOR_INDEX_FALLBACK_ENABLED', default=True, cast=bool)
+VECTOR_INDEX_MAX_ROWS = config('VECTOR_INDEX_MAX_ROWS', default=20000, cast=int)  # ~120 MB at 1536 dims
+# RAG refresh: the incremental watermark expires after this, forcing a full supplier profile rebuild
+RAG_FULL_REFRESH_INTERVAL = config('RAG_FULL_REFRESH_INTERVAL', default=2419200, cast=int)  # 28 days
+# RAG search: fuse vector and full-text results with reciprocal-rank fusion
+RAG_HYBRID_SEARCH = config('RAG_HYBRID_SEARCH', default=False, cast=bool)
+# Semantic cache capacity per organization; entries over either limit are evicted
+# ('lfu': fewest hits first, 'lru': least recently hit first) in chunked deletes
+SEMANTIC_CACHE_MAX_ENTRIES_PER_ORG = config('SEMANTIC_CACHE_MAX_ENTRIES_PER_ORG', default=5000, cast=int)
+SEMANTIC_CACHE_MAX_BYTES_PER_ORG = config('SEMANTIC_CACHE_MAX_BYTES_PER_ORG', default=67108864, cast=int)  # 64 MB
+SEMANTIC_CACHE_EVICTION_POLICY = config('SEMANTIC_CACHE_EVICTION_POLICY', default='lfu')
+SEMANTIC_CACHE_PURGE_CHUNK = config('SEMANTIC_CACHE_PURGE_CHUNK', default=1000, cast=int)
+# Stores check capacity every N inserts per organization; the cleanup task checks all orgs
+SEMANTIC_CACHE_CAPACITY_CHECK_INTERVAL = config('SEMANTIC_CACHE_CAPACITY_CHECK_INTERVAL', default=50, cast=int)
+# Embeddings: 'openai' or 'local' (deterministic hashing embedder for offline development).
+# Vectors are cached by content hash; concurrent requests are coalesced and micro-batched.
+EMBEDDING_BACKEND = config('EMBEDDING_BACKEND', default='openai')
+EMBEDDING_CACHE_TTL = config('EMBEDDING_CACHE_TTL', default=604800, cast=int)  # 7 days
+EMBEDDING_CACHE_LOCAL_SIZE = config('EMBEDDING_CACHE_LOCAL_SIZE', default=2048, cast=int)  # per process
+EMBEDDING_BATCH_SIZE = config('EMBEDDING_BATCH_SIZE', default=64, cast=int)
+EMBEDDING_BATCH_WINDOW_MS = config('EMBEDDING_BATCH_WINDOW_MS', default=5, cast=int)
+# Insight snapshots older than this are ignored and insights are computed live
+INSIGHT_SNAPSHOT_MAX_AGE = config('INSIGHT_SNAPSHOT_MAX_AGE', default=93600, cast=int)  # 26 hours
+
+# P2P Analytics: serve the supplier payment scorecard from the nightly snapshot table
+P2P_SCORECARD_SNAPSHOTS_ENABLED = config('P2P_SCORECARD_SNAPSHOTS_ENABLED', default=False, cast=bool)
+# P2P Analytics: result cache TTL; entries are also invalidated per document type on change
+P2P_ANALYTICS_CACHE_TTL = config('P2P_ANALYTICS_CACHE_TTL', default=900, cast=int)  # 15 minutes
+
+# Two-tier lookup cache (per-process LRU in front of Redis) for policies and name sets
+TIERED_CACHE_TTL = config('TIERED_CACHE_TTL', default=3600, cast=int)  # shared tier, 1 hour
+TIERED_CACHE_LOCAL_TTL = config('TIERED_CACHE_LOCAL_TTL', default=60, cast=float)
+TIERED_CACHE_LOCAL_MAX_ENTRIES = config('TIERED_CACHE_LOCAL_MAX_ENTRIES', default=1024, cast=int)
+# How often workers re-read invalidation generations; bounds cross-worker staleness (seconds)
+TIERED_CACHE_GENERATION_CHECK = config('TIERED_CACHE_GENERATION_CHECK', default=5, cast=float)
 
 # API Documentation
 SPECTACULAR_SETTINGS = {
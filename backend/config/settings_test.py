@@ -24,6 +24,12 @@ REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {}
 CELERY_TASK_ALWAYS_EAGER = True
 CELERY_TASK_EAGER_PROPAGATES = True
 
+# Answer provider batch submissions in-process
+AI_BATCH_BACKEND = 'local'
+
+# Write LLM telemetry inline so tests can assert on it immediately
+LLM_TELEMETRY_ASYNC = False
+
 # Use local memory cache for tests
 CACHES = {
     'default': {
@@ -319,8 +319,17 @@ def django_db_setup(django_db_blocker):
 
 @pytest.fixture(autouse=True)
 def clear_cache():
-    """Clear Django cache before each test."""
+    """Clear Django cache and process-local caches and indexes before each test."""
     from django.core.cache import cache
+    from apps.analytics.embeddings import EmbeddingService
+    from apps.analytics.tiered_cache import clear_local_caches
+    from apps.analytics.vector_index import VectorIndexRegistry
     cache.clear()
+    clear_local_caches()
+    EmbeddingService.clear_local()
+    VectorIndexRegistry.clear()
     yield
     cache.clear()
+    clear_local_caches()
+    EmbeddingService.clear_local()
+    VectorIndexRegistry.clear()